@@ -149,6 +149,8 @@ CONDA_TEMP_EXTENSION = '.c~'
 
 UNKNOWN_CHANNEL = "<unknown>"
 REPODATA_FN = 'repodata.json'
+REPODATA_JLAP_FN = 'repodata.jlap'
+REPODATA_SHARDS_FN = 'repodata_shards.json'
 
 
 # TODO: Determine whether conda.base is the right place for this data; it
@@ -275,6 +277,7 @@ class SatSolverChoice(Enum):
     PYCOSAT = 'pycosat'
     PYCRYPTOSAT = 'pycryptosat'
     PYSAT = 'pysat'
+    PYSAT_INCREMENTAL = 'pysat-incremental'
 
     def __str__(self):
         return self.value
@@ -282,6 +285,10 @@ class SatSolverChoice(Enum):
 
 # Magic files for permissions determination
 PACKAGE_CACHE_MAGIC_FILE = 'urls.txt'
+# the content-addressed file store within a package cache, see PackageBlobStore
+PACKAGE_CACHE_BLOB_STORE = '.blobs'
+# where the offsets of binary prefix placeholders are recorded when a package is extracted
+PACKAGE_PLACEHOLDER_OFFSETS_FILE = join('info', 'placeholder_offsets.json')
 PREFIX_MAGIC_FILE = join('conda-meta', 'history')
 
 PREFIX_STATE_FILE = join('conda-meta', 'state')
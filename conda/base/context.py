@@ -162,6 +162,18 @@ class Context(Configuration):
     # this one actually defaults to 1 - that is handled in the property below
     _execute_threads = ParameterLoader(PrimitiveParameter(0, element_type=int),
                                        aliases=('execute_threads',))
+    # this one actually defaults to 5 - that is handled in the property below
+    _fetch_threads = ParameterLoader(PrimitiveParameter(0, element_type=int),
+                                     aliases=('fetch_threads',))
+    extract_processes = ParameterLoader(PrimitiveParameter(0, element_type=int))
+    verify_processes = ParameterLoader(PrimitiveParameter(0, element_type=int))
+    download_segments = ParameterLoader(PrimitiveParameter(1, element_type=int))
+    download_segment_size = ParameterLoader(PrimitiveParameter(2 ** 26, element_type=int))
+    streaming_extract = ParameterLoader(PrimitiveParameter(False))
+    deduplicate_package_cache = ParameterLoader(PrimitiveParameter(False))
+    package_cache_manifest = ParameterLoader(PrimitiveParameter(True))
+    index_placeholder_offsets = ParameterLoader(PrimitiveParameter(False))
+    prefix_database = ParameterLoader(PrimitiveParameter(False))
 
     # Safety & Security
     _aggressive_update_packages = ParameterLoader(
@@ -204,6 +216,13 @@ class Context(Configuration):
         SequenceParameter(PrimitiveParameter("", string_types)), aliases=('subdirs',))
 
     local_repodata_ttl = ParameterLoader(PrimitiveParameter(1, element_type=(bool, int)))
+    lazy_repodata = ParameterLoader(PrimitiveParameter(False))
+    repodata_jlap_enabled = ParameterLoader(PrimitiveParameter(False))
+    repodata_shards_enabled = ParameterLoader(PrimitiveParameter(False))
+    repodata_processes = ParameterLoader(PrimitiveParameter(0, element_type=int))
+    reduced_index_cache = ParameterLoader(PrimitiveParameter(False))
+    reduced_index_cache_max_entries = ParameterLoader(PrimitiveParameter(100, element_type=int))
+    parsed_specs_cache = ParameterLoader(PrimitiveParameter(False))
     # number of seconds to cache repodata locally
     #   True/1: respect Cache-Control max-age header
     #   False/0: always fetch remote repodata (HTTP 304 responses respected)
@@ -305,6 +324,8 @@ class Context(Configuration):
     update_modifier = ParameterLoader(PrimitiveParameter(UpdateModifier.UPDATE_SPECS))
     sat_solver = ParameterLoader(PrimitiveParameter(SatSolverChoice.PYCOSAT))
     solver_ignore_timestamps = ParameterLoader(PrimitiveParameter(False))
+    solve_cache = ParameterLoader(PrimitiveParameter(False))
+    solve_cache_max_entries = ParameterLoader(PrimitiveParameter(100, element_type=int))
 
     # # CLI-only
     # no_deps = ParameterLoader(PrimitiveParameter(NULL, element_type=(type(NULL), bool)))
@@ -457,6 +478,16 @@ class Context(Configuration):
             threads = 1
         return threads
 
+    @property
+    def fetch_threads(self):
+        if self._fetch_threads:
+            threads = self._fetch_threads
+        elif self.default_threads:
+            threads = self.default_threads
+        else:
+            threads = 5
+        return threads
+
     @property
     def subdir(self):
         if self._subdir:
@@ -868,6 +899,13 @@ class Context(Configuration):
                 'repodata_fns',
                 'use_only_tar_bz2',
                 'repodata_threads',
+                'lazy_repodata',
+                'repodata_jlap_enabled',
+                'repodata_shards_enabled',
+                'repodata_processes',
+                'reduced_index_cache',
+                'reduced_index_cache_max_entries',
+                'parsed_specs_cache',
             )),
             ('Basic Conda Configuration', (  # TODO: Is there a better category name here?
                 'envs_dirs',
@@ -885,6 +923,9 @@ class Context(Configuration):
                 'remote_backoff_factor',
                 'remote_read_timeout_secs',
                 'ssl_verify',
+                'fetch_threads',
+                'download_segments',
+                'download_segment_size',
             )),
             ('Solver Configuration', (
                 'aggressive_update_packages',
@@ -895,6 +936,8 @@ class Context(Configuration):
                 'force_reinstall',
                 'pinned_packages',
                 'pip_interop_enabled',
+                'solve_cache',
+                'solve_cache_max_entries',
                 'track_features',
             )),
             ('Package Linking and Install-time Configuration', (
@@ -910,7 +953,14 @@ class Context(Configuration):
                 'non_admin_enabled',
                 'separate_format_cache',
                 'verify_threads',
+                'verify_processes',
                 'execute_threads',
+                'extract_processes',
+                'streaming_extract',
+                'deduplicate_package_cache',
+                'package_cache_manifest',
+                'index_placeholder_offsets',
+                'prefix_database',
             )),
             ('Conda-build Configuration', (
                 'bld_path',
@@ -1003,7 +1053,8 @@ class Context(Configuration):
                 """),
             'always_copy': dals("""
                 Register a preference that files be copied into a prefix during install rather
-                than hard-linked.
+                than hard-linked. On file systems that support it, such as btrfs, XFS and APFS,
+                the copies are copy-on-write clones (reflinks).
                 """),
             'always_softlink': dals("""
                 Register a preference that files be soft-linked (symlinked) into a prefix during
@@ -1110,6 +1161,12 @@ class Context(Configuration):
             #     version of Python (2/3) to be used in new environments. Defaults to
             #     the version used by conda itself.
             #     """),
+            'deduplicate_package_cache': dals("""
+                Keep each distinct file of the packages extracted into a package cache on disk
+                only once, in a content-addressed store (the .blobs directory of the package
+                cache) that the extracted packages are hard-linked to. 'conda clean --packages'
+                removes the stored files no package uses anymore.
+                """),
             'default_threads': dals("""
                 Threads to use by default for parallel operations.  Default is None,
                 which allows operations to choose themselves.  For more specific
@@ -1145,10 +1202,37 @@ class Context(Configuration):
                 defaults to 1.  This step is pretty strongly I/O limited, and you may not
                 see much benefit here.
             """),
+            'download_segment_size': dals("""
+                The smallest number of bytes worth downloading as a separate segment when
+                download_segments is greater than 1.
+                """),
+            'download_segments': dals("""
+                Download each large package in up to this many parallel HTTP byte ranges,
+                with at least download_segment_size bytes per range. Servers that don't
+                support range requests are downloaded from in one piece. The default of 1
+                disables segmented downloads.
+                """),
+            'extract_processes': dals("""
+                Worker processes to use for decompressing downloaded packages into the package
+                cache. Extraction runs alongside the downloads either way; the default of 0
+                extracts one package at a time in a thread of the conda process.
+                """),
+            'fetch_threads': dals("""
+                Threads to use for downloading packages. When not set, defaults to
+                default_threads if that is set, and to 5 otherwise. The largest packages are
+                started first, and each package is handed off for extraction as soon as its
+                download finishes.
+                """),
             'force_reinstall': dals("""
                 Ensure that any user-requested package for the current operation is uninstalled
                 and reinstalled, even if that package already exists in the environment.
                 """),
+            'index_placeholder_offsets': dals("""
+                When extracting a package into the package cache, record where the prefix
+                placeholders are in its binary files, so that linking the package doesn't have
+                to search those files for them. Extraction pays for one search of every such
+                file; this pays off for packages linked into several environments.
+                """),
             # 'force': dals("""
             #     Override any of conda's objections and safeguards for installing packages and
             #     potentially breaking environments. Also re-installs the package, even if the
@@ -1162,6 +1246,14 @@ class Context(Configuration):
             'json': dals("""
                 Ensure all output written to stdout is structured json.
                 """),
+            'lazy_repodata': dals("""
+                Index repodata by package name without building a record for every package
+                in a channel subdir. Records are created only for the package names a command
+                actually looks up, which greatly reduces memory use for large channels.
+                Repodata read back from conda's binary repodata cache is always indexed this
+                way; this setting only applies to repodata that has just been downloaded or
+                has no valid binary cache.
+                """),
             'local_repodata_ttl': dals("""
                 For a value of False or 0, always fetch remote repodata (HTTP 304 responses
                 respected). For a value of True or 1, respect the HTTP Cache-Control max-age
@@ -1194,6 +1286,17 @@ class Context(Configuration):
             'override_channels_enabled': dals("""
                 Permit use of the --overide-channels command-line flag.
                 """),
+            'package_cache_manifest': dals("""
+                Keep an index of the packages in each writable package cache (in its cache
+                directory), so that conda doesn't have to read the metadata of every cached
+                package each time it starts. Entries are checked against the modification
+                times of the package cache and its packages.
+                """),
+            'parsed_specs_cache': dals("""
+                Keep the parsed dependency specs of the packages taking part in a solve with
+                the binary repodata cache of their channel subdir, so that later solves over
+                the same repodata don't parse those specs again.
+                """),
             'path_conflict': dals("""
                 The method by which conda handle's conflicting/overlapping paths during a
                 create, install, or update operation. The value must be one of 'clobber',
@@ -1212,6 +1315,12 @@ class Context(Configuration):
                 install time. Packages not locally available are downloaded and extracted
                 into the first writable directory.
                 """),
+            'prefix_database': dals("""
+                Keep a copy of the conda-meta records of each environment in a single database
+                file (conda-meta/.cache/prefix.sqlite), so that conda doesn't have to parse every
+                record each time it starts. The file lists of the packages are only read when
+                needed. The conda-meta json files are still written, and stay authoritative.
+                """),
             'proxy_servers': dals("""
                 A mapping to enable proxy settings. Keys can be either (1) a scheme://hostname
                 form, which will match any request to the given scheme and exact hostname, or
@@ -1238,6 +1347,35 @@ class Context(Configuration):
                 read timeout is the number of seconds conda will wait for the server to send
                 a response.
                 """),
+            'repodata_jlap_enabled': dals("""
+                Update cached repodata.json files by downloading the channel's repodata.jlap
+                patch series and applying the patches made since the cached copy, instead of
+                downloading the whole repodata.json again. Conda falls back to a full
+                download when the channel has no repodata.jlap or the cached copy is too old.
+                """),
+            'reduced_index_cache': dals("""
+                Cache the set of packages the solver is given for a set of specs on disk, in
+                the package cache's index cache. A repeated solve with the same specs, the same
+                packages installed in the target environment, and unchanged repodata (same
+                etag or last-modified value for every channel subdir) reuses it instead of
+                walking the dependencies of every candidate package again.
+                """),
+            'reduced_index_cache_max_entries': dals("""
+                The number of package sets kept when reduced_index_cache is enabled. The least
+                recently used ones are removed first.
+                """),
+            'repodata_processes': dals("""
+                Worker processes to use for indexing downloaded repodata when many channel
+                subdirs have to be read at once. Indexing a large repodata.json is CPU-bound,
+                so it is moved out of the threads that do the downloading. The default of 0
+                indexes repodata in those threads.
+                """),
+            'repodata_shards_enabled': dals("""
+                Use per-package-name repodata shards for channels that publish a
+                repodata_shards.json index, instead of their repodata.json. Only the shards of
+                packages the solver actually reaches are downloaded, and downloaded shards are
+                cached by content hash.
+                """),
             'repodata_threads': dals("""
                 Threads to use when downloading and reading repodata.  When not set,
                 defaults to None, which uses the default ThreadPoolExecutor behavior.
@@ -1282,6 +1420,23 @@ class Context(Configuration):
             'show_channel_urls': dals("""
                 Show channel URLs when displaying what is going to be downloaded.
                 """),
+            'solve_cache': dals("""
+                Remember solutions in the package cache's index cache. A solve of the same
+                problem (specs, installed packages, pins, history, candidate packages and
+                solver configuration) reuses the stored solution instead of running the
+                solver. `conda clean --solve-cache` removes stored solutions.
+                """),
+            'solve_cache_max_entries': dals("""
+                The number of solutions kept when solve_cache is enabled. The least recently
+                used solutions are removed first.
+                """),
+            'streaming_extract': dals("""
+                Extract .conda and .tar.bz2 packages into the package cache while they are
+                downloaded, instead of after the download is complete. The extracted package
+                is only put in place once the download has been verified; packages that can't
+                be streamed are extracted after their download as usual. Requires the
+                conda-package-streaming package.
+                """),
             'ssl_verify': dals("""
                 Conda verifies SSL certificates for HTTPS requests, just like a web
                 browser. By default, SSL verification is enabled, and conda operations will
@@ -1312,6 +1467,11 @@ class Context(Configuration):
             'verbosity': dals("""
                 Sets output log level. 0 is warn. 1 is info. 2 is debug. 3 is trace.
                 """),
+            'verify_processes': dals("""
+                Worker processes to use for rewriting the prefix placeholders of the files
+                being linked, during the transaction verification step. The default of 0
+                rewrites them in the verify_threads threads.
+                """),
             'verify_threads': dals("""
                 Threads to use when performing the transaction verification step.  When not set,
                 defaults to 1.
@@ -5,6 +5,7 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 
 from argparse import (ArgumentParser as ArgumentParserBase, REMAINDER, RawDescriptionHelpFormatter,
                       SUPPRESS, _CountAction, _HelpAction)
+from functools import partial
 from logging import getLogger
 import os
 from os.path import abspath, expanduser, join
@@ -25,7 +26,12 @@ escaped_user_rc_path = user_rc_path.replace("%", "%%")
 escaped_sys_rc_path = abspath(join(sys.prefix, '.condarc')).replace("%", "%%")
 
 
-def generate_parser():
+def generate_parser(command=None):
+    """Build the argument parser for the conda command line.
+
+    With ``command`` the name of a builtin subcommand, only that subcommand's parser is
+    added, which is all that's needed to parse a command line starting with it.
+    """
     p = ArgumentParser(
         description='conda is a tool for managing and deploying applications,'
                     ' environments and packages.',
@@ -54,22 +60,31 @@ def generate_parser():
     # http://stackoverflow.com/a/18283730/1599393
     sub_parsers.required = True
 
-    configure_parser_clean(sub_parsers)
-    configure_parser_compare(sub_parsers)
-    configure_parser_config(sub_parsers)
-    configure_parser_create(sub_parsers)
-    configure_parser_help(sub_parsers)
-    configure_parser_info(sub_parsers)
-    configure_parser_init(sub_parsers)
-    configure_parser_install(sub_parsers)
-    configure_parser_list(sub_parsers)
-    configure_parser_package(sub_parsers)
-    configure_parser_remove(sub_parsers)
-    configure_parser_remove(sub_parsers, name='uninstall')
-    configure_parser_run(sub_parsers)
-    configure_parser_search(sub_parsers)
-    configure_parser_update(sub_parsers)
-    configure_parser_update(sub_parsers, name='upgrade')
+    configure_parsers = (
+        ('clean', configure_parser_clean),
+        ('compare', configure_parser_compare),
+        ('config', configure_parser_config),
+        ('create', configure_parser_create),
+        ('help', configure_parser_help),
+        ('info', configure_parser_info),
+        ('init', configure_parser_init),
+        ('install', configure_parser_install),
+        ('list', configure_parser_list),
+        ('package', configure_parser_package),
+        ('remove', configure_parser_remove),
+        ('uninstall', partial(configure_parser_remove, name='uninstall')),
+        ('run', configure_parser_run),
+        ('search', configure_parser_search),
+        ('update', configure_parser_update),
+        ('upgrade', partial(configure_parser_update, name='upgrade')),
+    )
+    # `conda help` prints the help of the full parser, and anything other than a builtin
+    # subcommand needs all of them to produce the right error or find an external command
+    if command != 'help':
+        configure_parsers = (tuple(c for c in configure_parsers if c[0] == command)
+                             or configure_parsers)
+    for _, configure_parser in configure_parsers:
+        configure_parser(sub_parsers)
 
     return p
 
@@ -221,7 +236,8 @@ def configure_parser_clean(sub_parsers):
     removal_target_options.add_argument(
         "-a", "--all",
         action="store_true",
-        help="Remove index cache, lock files, unused cache packages, and tarballs.",
+        help="Remove index cache, lock files, unused cache packages, tarballs, and "
+             "cached solutions.",
     )
     removal_target_options.add_argument(
         "-i", "--index-cache",
@@ -231,7 +247,8 @@ def configure_parser_clean(sub_parsers):
     removal_target_options.add_argument(
         '-p', '--packages',
         action='store_true',
-        help="Remove unused packages from writable package caches. "
+        help="Remove unused packages from writable package caches, and the files no "
+             "package uses anymore from their file stores (see deduplicate_package_cache). "
              "WARNING: This does not check for packages installed using "
              "symlinks back to the package cache.",
     )
@@ -242,6 +259,11 @@ def configure_parser_clean(sub_parsers):
         help=SUPPRESS,
         # TODO: Deprecation warning issued. Remove in future release.
     )
+    removal_target_options.add_argument(
+        "--solve-cache",
+        action="store_true",
+        help="Remove cached solutions.",
+    )
     removal_target_options.add_argument(
         "-t", "--tarballs",
         action="store_true",
@@ -39,7 +39,7 @@ import sys
 PARSER = None
 
 
-def generate_parser():
+def generate_parser(command=None):
     # Generally using `global` is an anti-pattern.  But it's the lightest-weight way to memoize
     # or do a singleton.  I'd normally use the `@memoize` decorator here, but I don't want
     # to copy in the code or take the import hit.
@@ -47,6 +47,9 @@ def generate_parser():
     if PARSER is not None:
         return PARSER
     from .conda_argparse import generate_parser
+    if command is not None:
+        # a parser for `conda <command>` only, built for a single command line and not kept
+        return generate_parser(command)
     PARSER = generate_parser()
     return PARSER
 
@@ -68,7 +71,7 @@ def _main(*args, **kwargs):
     if len(args) == 1:
         args = args + ('-h',)
 
-    p = generate_parser()
+    p = generate_parser(args[1])
     args = p.parse_args(args[1:])
 
     from ..base.context import context
@@ -10,8 +10,10 @@ from os import listdir, lstat, unlink, walk
 from os.path import exists, getsize, isdir, join
 import sys
 
-from ..base.constants import CONDA_PACKAGE_EXTENSIONS, CONDA_TEMP_EXTENSION
+from ..base.constants import (CONDA_PACKAGE_EXTENSIONS, CONDA_TEMP_EXTENSION,
+                              PACKAGE_CACHE_BLOB_STORE)
 from ..base.context import context
+from ..common.compat import iteritems
 
 log = getLogger(__name__)
 
@@ -86,8 +88,6 @@ def rm_tarballs(args, pkgs_dirs, totalsize, verbose=True):
 
 
 def find_pkgs():
-    # TODO: This doesn't handle packages that have hard links to files within
-    # themselves, like bin/python3.3 and bin/python3.3m in the Python package
     warnings = []
 
     from ..gateways.disk.link import CrossPlatformStLink
@@ -99,23 +99,34 @@ def find_pkgs():
                 print("WARNING: {0} does not exist".format(pkgs_dir))
             continue
         pkgs = [i for i in listdir(pkgs_dir) if isdir(join(pkgs_dir, i, 'info'))]
+        # A package is in use if any of its files has more hard links than there are within
+        #   the package cache itself; packages can hard link files within themselves (like
+        #   bin/python3.3 and bin/python3.3m in the Python package), and to the files of other
+        #   packages through the package cache's blob store.
+        internal_links = defaultdict(int)
+        pkg_files = {}
         for pkg in pkgs:
-            breakit = False
+            pkg_files[pkg] = files_st = []
             for root, dir, files in walk(join(pkgs_dir, pkg)):
                 for fn in files:
+                    path = join(root, fn)
                     try:
-                        st_nlink = cross_platform_st_nlink(join(root, fn))
+                        st_nlink = cross_platform_st_nlink(path)
+                        inode = _inode(lstat(path))
                     except OSError as e:
                         warnings.append((fn, e))
                         continue
-                    if st_nlink > 1:
-                        # print('%s is installed: %s' % (pkg, join(root, fn)))
-                        breakit = True
-                        break
-
-                if breakit:
-                    break
-            else:
+                    files_st.append((st_nlink, inode))
+                    internal_links[inode] += 1
+        for root, dir, files in walk(join(pkgs_dir, PACKAGE_CACHE_BLOB_STORE)):
+            for fn in files:
+                try:
+                    internal_links[_inode(lstat(join(root, fn)))] += 1
+                except OSError:
+                    pass
+        for pkg in pkgs:
+            if all(st_nlink <= (internal_links[inode] if inode else 1)
+                   for st_nlink, inode in pkg_files[pkg]):
                 pkgs_dirs[pkgs_dir].append(pkg)
 
     totalsize = 0
@@ -125,8 +136,8 @@ def find_pkgs():
             pkgsize = 0
             for root, dir, files in walk(join(pkgs_dir, pkg)):
                 for fn in files:
-                    # We don't have to worry about counting things twice:  by
-                    # definition these files all have a link count of 1!
+                    # Files hard linked within the package cache are counted for each
+                    #   link, so this is an upper bound.
                     size = lstat(join(root, fn)).st_size
                     totalsize += size
                     pkgsize += size
@@ -176,6 +187,33 @@ def rm_pkgs(args, pkgs_dirs, warnings, totalsize, pkgsizes, verbose=True):
             rm_rf(join(pkgs_dir, pkg))
 
 
+def _inode(st):
+    # some file systems don't have inode numbers; files there can't be told apart
+    return (st.st_dev, st.st_ino) if st.st_ino else None
+
+
+def rm_unused_blobs(args, verbose=True):
+    from ..core.package_cache_data import PackageBlobStore, PackageCacheData
+    from ..utils import human_bytes
+    removed = {}
+    for package_cache in PackageCacheData.writable_caches(context.pkgs_dirs):
+        blobs = PackageBlobStore(package_cache.pkgs_dir).collect_garbage(dry_run=args.dry_run)
+        if blobs:
+            removed[package_cache.pkgs_dir] = blobs
+            if verbose:
+                print("%s %d unused files (%s) from the file store of %s"
+                      % ("Would remove" if args.dry_run else "Removed", len(blobs),
+                         human_bytes(sum(size for _, size in blobs)), package_cache.pkgs_dir))
+    return removed
+
+
+def rm_solve_cache():
+    from ..gateways.disk.delete import rm_rf
+    from ..core.package_cache_data import PackageCacheData
+    for package_cache in PackageCacheData.writable_caches():
+        rm_rf(join(package_cache.pkgs_dir, 'cache', 'solve'))
+
+
 def rm_index_cache():
     from ..gateways.disk.delete import rm_rf
     from ..core.package_cache_data import PackageCacheData
@@ -255,6 +293,13 @@ def _execute(args, parser):
         rm_index_cache()
         one_target_ran = True
 
+    if args.solve_cache or args.all:
+        json_result['solve_cache'] = {
+            'files': [join(context.pkgs_dirs[0], 'cache', 'solve')]
+        }
+        rm_solve_cache()
+        one_target_ran = True
+
     if args.packages or args.all:
         pkgs_dirs, warnings, totalsize, pkgsizes = find_pkgs()
         first = sorted(pkgs_dirs)[0] if pkgs_dirs else ''
@@ -268,6 +313,10 @@ def _execute(args, parser):
         }
         rm_pkgs(args, pkgs_dirs,  warnings, totalsize, pkgsizes,
                 verbose=not (context.json or context.quiet))
+        blobs = rm_unused_blobs(args, verbose=not (context.json or context.quiet))
+        json_result['packages']['blobs'] = {
+            pkgs_dir: [path for path, _ in removed] for pkgs_dir, removed in iteritems(blobs)
+        }
         one_target_ran = True
 
     if args.all:
@@ -21,7 +21,7 @@ from ..common.compat import (Mapping, Sequence, isiterable, iteritems, itervalue
                              text_type)
 from ..common.configuration import pretty_list, pretty_map
 from ..common.io import timeout
-from ..common.serialize import yaml, yaml_round_trip_dump, yaml_round_trip_load
+from ..common.serialize import get_yaml, yaml_round_trip_dump, yaml_round_trip_load
 
 
 def execute(args, parser):
@@ -385,6 +385,7 @@ def execute_config(args, parser):
         def enum_representer(dumper, data):
             return dumper.represent_str(str(data))
 
+        yaml = get_yaml()
         yaml.representer.RoundTripRepresenter.add_representer(SafetyChecks, enum_representer)
         yaml.representer.RoundTripRepresenter.add_representer(PathConflict, enum_representer)
         yaml.representer.RoundTripRepresenter.add_representer(DepsModifier, enum_representer)
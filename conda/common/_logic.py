@@ -54,6 +54,10 @@ class _ClauseList(object):
         len_clauses = saved_state
         self._clause_list[len_clauses:] = []
 
+    def iter_clauses(self, start=0, end=None):
+        """Iterate over the clauses with indices in [start, end)."""
+        return iter(self._clause_list[start:end])
+
     def as_list(self):
         """Return clauses as a list of tuples of ints."""
         return self._clause_list
@@ -71,64 +75,89 @@ class _ClauseList(object):
 
 class _ClauseArray(object):
     """
-    Storage for the CNF clauses, represented as a flat int array.
-    Each clause is terminated by int(0).
+    Storage for the CNF clauses, represented as a flat int32 array holding the literals of
+    all clauses back to back, plus an array of the offsets at which each clause ends.
+    No Python object is kept per clause, and the clause count is simply the number of
+    offsets.  Clauses are handed to the SAT solvers as memoryview slices of the literal
+    array, so they are never copied back into Python tuples or lists.
     """
     def __init__(self):
-        self._clause_array = array('i')
+        self._literals = array('i')
+        self._ends = array('q')
         # Methods append and extend are directly bound for performance reasons,
         # to avoid call overhead and lookups.
-        self._array_append = self._clause_array.append
-        self._array_extend = self._clause_array.extend
+        self._literals_extend = self._literals.extend
+        self._ends_append = self._ends.append
 
     def extend(self, clauses):
+        literals = self._literals
+        literals_extend = self._literals_extend
+        ends_append = self._ends_append
         for clause in clauses:
-            self.append(clause)
+            literals_extend(clause)
+            ends_append(len(literals))
 
     def append(self, clause):
-        self._array_extend(clause)
-        self._array_append(0)
+        self._literals_extend(clause)
+        self._ends_append(len(self._literals))
 
     def get_clause_count(self):
         """
         Return number of stored clauses.
-        This is an O(n) operation since we don't store the number of clauses
-        explicitly due to performance reasons (Python interpreter overhead in
-        self.append).
         """
-        return self._clause_array.count(0)
+        return len(self._ends)
 
     def save_state(self):
         """
         Get state information to be able to revert temporary additions of
-        supplementary clauses. _ClauseArray: state is the length of the int
-        array, NOT number of clauses.
+        supplementary clauses.  _ClauseArray: state is the number of clauses, which
+        determines the length of the literal array as well.
         """
-        return len(self._clause_array)
+        return len(self._ends)
 
     def restore_state(self, saved_state):
         """
         Restore state saved via `save_state`.
-        Removes clauses that were added after the sate has been saved.
+        Removes clauses that were added after the sate has been saved.  Both arrays are
+        only truncated, so this does not depend on the number of clauses kept.
+        """
+        len_clauses = saved_state
+        if len_clauses < len(self._ends):
+            del self._literals[self._ends[len_clauses - 1] if len_clauses else 0:]
+            del self._ends[len_clauses:]
+
+    def iter_clauses(self, start=0, end=None):
+        """
+        Iterate over the clauses with indices in [start, end), each one as a memoryview
+        slice of the literal array.
+
+        The slices share the buffer of the literal array, which cannot grow or shrink
+        while any of them is alive, so they must not be kept beyond the iteration.
         """
-        len_clause_array = saved_state
-        self._clause_array[len_clause_array:] = array('i')
+        ends = self._ends
+        if end is None:
+            end = len(ends)
+        if start >= end:
+            return
+        with memoryview(self._literals) as literals:
+            begin = ends[start - 1] if start else 0
+            for clause_end in ends[start:end]:
+                yield literals[begin:clause_end]
+                begin = clause_end
 
     def as_list(self):
         """Return clauses as a list of tuples of ints."""
-        clause = []
-        for v in self._clause_array:
-            if v == 0:
-                yield tuple(clause)
-                clause.clear()
-            else:
-                clause.append(v)
+        return [tuple(clause) for clause in self.iter_clauses()]
 
     def as_array(self):
         """
         Return clauses as a flat int array, each clause being terminated by 0.
         """
-        return self._clause_array
+        clause_array = array('i')
+        for clause in self.iter_clauses():
+            clause_array.extend(clause)
+            clause_array.append(0)
+        return clause_array
 
 
 class _SatSolver(object):
@@ -138,7 +167,7 @@ class _SatSolver(object):
 
     def __init__(self, **run_kwargs):
         self._run_kwargs = run_kwargs or {}
-        self._clauses = _ClauseList()
+        self._clauses = _ClauseArray()
         # Bind some methods of _clauses to reduce lookups and call overhead.
         self.add_clause = self._clauses.append
         self.add_clauses = self._clauses.extend
@@ -149,6 +178,9 @@ class _SatSolver(object):
     def as_list(self):
         return self._clauses.as_list()
 
+    def iter_clauses(self, start=0, end=None):
+        return self._clauses.iter_clauses(start, end)
+
     def save_state(self):
         return self._clauses.save_state()
 
@@ -185,10 +217,7 @@ class _PycoSatSolver(_SatSolver):
 
         # NOTE: The iterative solving isn't actually used here, we just call
         #       itersolve to separate setup from the actual run.
-        return itersolve(self._clauses.as_list(), vars=m, prop_limit=limit)
-        # If we add support for passing the clauses as an integer stream to the
-        # solvers, we could also use self._clauses.as_array like this:
-        # return itersolve(self._clauses.as_array(), vars=m, prop_limit=limit)
+        return itersolve(self._clauses.iter_clauses(), vars=m, prop_limit=limit)
 
     def invoke(self, iter_sol):
         try:
@@ -209,7 +238,7 @@ class _PyCryptoSatSolver(_SatSolver):
         from pycryptosat import Solver
 
         solver = Solver(threads=threads)
-        solver.add_clauses(self._clauses.as_list())
+        solver.add_clauses(self._clauses.iter_clauses())
         return solver
 
     def invoke(self, solver):
@@ -231,7 +260,7 @@ class _PySatSolver(_SatSolver):
         from pysat.solvers import Glucose4
 
         solver = Glucose4()
-        solver.append_formula(self._clauses.as_list())
+        solver.append_formula(self._clauses.iter_clauses())
         return solver
 
     def invoke(self, solver):
@@ -250,10 +279,79 @@ class _PySatSolver(_SatSolver):
         return solution
 
 
+class _PySatIncrementalSolver(_SatSolver):
+    """
+    Keeps one pysat solver alive across runs, so that what it learned while solving is
+    reused by the next run, e.g. in the passes of Resolve.solve over the same Clauses.
+
+    Clauses are passed on in batches as they are first needed, each batch guarded by a
+    fresh selector variable which is assumed true while solving.  Clauses dropped again via
+    restore_state (like the bound constraints of minimize) are switched off permanently by
+    asserting the negation of their selector, which keeps all learned clauses valid.  To keep
+    selectors apart from the variables of the problem, variable v is passed on as 2 * v and
+    selectors are odd.
+    """
+
+    def __init__(self, **run_kwargs):
+        super(_PySatIncrementalSolver, self).__init__(**run_kwargs)
+        self._solver = None
+        self._batches = []  # (start, end, selector) for every active batch, in order
+        self._next_selector = 1
+
+    def restore_state(self, saved_state):
+        super(_PySatIncrementalSolver, self).restore_state(saved_state)
+        while self._batches and self._batches[-1][1] > saved_state:
+            start, end, selector = self._batches.pop()
+            self._solver.add_clause((-selector,))
+            if start < saved_state:
+                # the head of this batch survives; pass it on again under a new selector
+                self._add_batch(start, saved_state)
+
+    def _add_batch(self, start, end):
+        selector = self._next_selector
+        self._next_selector += 2
+        add_clause = self._solver.add_clause
+        for clause in self._clauses.iter_clauses(start, end):
+            add_clause([lit + lit for lit in clause] + [-selector])
+        self._batches.append((start, end, selector))
+
+    def setup(self, m, limit=0, **kwargs):
+        if self._solver is None:
+            from pysat.solvers import Glucose4
+
+            self._solver = Glucose4()
+        sent = self._batches[-1][1] if self._batches else 0
+        clause_count = self._clauses.get_clause_count()
+        if sent < clause_count:
+            self._add_batch(sent, clause_count)
+        return m, limit
+
+    def invoke(self, setup):
+        m, limit = setup
+        solver = self._solver
+        assumptions = [selector for _, _, selector in self._batches]
+        if limit:
+            solver.prop_budget(limit)
+            sat = solver.solve_limited(assumptions=assumptions)
+        else:
+            sat = solver.solve(assumptions=assumptions)
+        if not sat:
+            return None
+        return m, solver.get_model()
+
+    def process_solution(self, sat_solution):
+        if sat_solution is None:
+            return None
+        m, model = sat_solution
+        true_vars = {lit >> 1 for lit in model if lit > 0 and not lit & 1}
+        return [v if v in true_vars else -v for v in range(1, m + 1)]
+
+
 _sat_solver_str_to_cls = {
     "pycosat": _PycoSatSolver,
     "pycryptosat": _PyCryptoSatSolver,
     "pysat": _PySatSolver,
+    "pysat-incremental": _PySatIncrementalSolver,
 }
 
 _sat_solver_cls_to_str = {cls: string for string, cls in _sat_solver_str_to_cls.items()}
@@ -34,7 +34,7 @@ from .compat import (binary_type, isiterable, iteritems, itervalues, odict, prim
                      scandir, string_types, text_type, with_metaclass)
 from .constants import NULL
 from .path import expand
-from .serialize import yaml_round_trip_load
+from .serialize import get_yaml, yaml_round_trip_load
 from .. import CondaError, CondaMultiError
 from .._vendor.auxlib.collection import AttrDict, first, last, make_immutable
 from .._vendor.auxlib.exceptions import ThisShouldNeverHappenError
@@ -43,15 +43,6 @@ from .._vendor.frozendict import frozendict
 from .._vendor.boltons.setutils import IndexedSet
 from .._vendor.toolz import concat, concatv, excepts, merge, merge_with, unique
 
-try:  # pragma: no cover
-    from ruamel_yaml.comments import CommentedSeq, CommentedMap
-    from ruamel_yaml.reader import ReaderError
-    from ruamel_yaml.scanner import ScannerError
-except ImportError:  # pragma: no cover
-    from ruamel.yaml.comments import CommentedSeq, CommentedMap  # pragma: no cover
-    from ruamel.yaml.reader import ReaderError
-    from ruamel.yaml.scanner import ScannerError
-
 log = getLogger(__name__)
 
 EMPTY_MAP = frozendict()
@@ -284,7 +275,8 @@ class YamlRawParameter(RawParameter):
         self._key_comment = key_comment
         super(YamlRawParameter, self).__init__(source, key, raw_value)
 
-        if isinstance(self._raw_value, CommentedSeq):
+        comments = get_yaml().comments
+        if isinstance(self._raw_value, comments.CommentedSeq):
             value_comments = self._get_yaml_list_comments(self._raw_value)
             self._value_flags = tuple(ParameterFlag.from_string(s) for s in value_comments)
             children_values = []
@@ -292,7 +284,7 @@ class YamlRawParameter(RawParameter):
                 children_values.append(YamlRawParameter(
                     self.source, self.key, self._raw_value[i], value_comments[i]))
             self._value = tuple(children_values)
-        elif isinstance(self._raw_value, CommentedMap):
+        elif isinstance(self._raw_value, comments.CommentedMap):
             value_comments = self._get_yaml_map_comments(self._raw_value)
             self._value_flags = dict((k, ParameterFlag.from_string(v))
                                      for k, v in iteritems(value_comments) if v is not None)
@@ -361,10 +353,11 @@ class YamlRawParameter(RawParameter):
 
     @classmethod
     def make_raw_parameters_from_file(cls, filepath):
+        yaml = get_yaml()
         with open(filepath, 'r') as fh:
             try:
                 yaml_obj = yaml_round_trip_load(fh)
-            except ScannerError as err:
+            except yaml.scanner.ScannerError as err:
                 mark = err.problem_mark
                 raise ConfigurationLoadError(
                     filepath,
@@ -372,7 +365,7 @@ class YamlRawParameter(RawParameter):
                     line=mark.line,
                     column=mark.column
                 )
-            except ReaderError as err:
+            except yaml.reader.ReaderError as err:
                 raise ConfigurationLoadError(filepath,
                                              "  reason: invalid yaml at position %(position)s",
                                              position=err.position)
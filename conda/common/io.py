@@ -4,7 +4,7 @@
 from __future__ import absolute_import, division, print_function, unicode_literals
 
 from collections import defaultdict
-from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, Executor, Future, _base, as_completed  # NOQA
+from concurrent.futures import ThreadPoolExecutor, Executor, Future, _base, as_completed  # NOQA
 from concurrent.futures.thread import _WorkItem
 from contextlib import contextmanager
 from enum import Enum
@@ -27,10 +27,8 @@ from time import sleep, time
 from .compat import StringIO, iteritems, on_win, encode_environment
 from .constants import NULL
 from .path import expand
-from .._vendor.auxlib.decorators import memoizemethod
 from .._vendor.auxlib.logz import NullHandler
 from .._vendor.auxlib.type_coercion import boolify
-from .._vendor.tqdm import tqdm
 
 log = getLogger(__name__)
 
@@ -462,6 +460,8 @@ class ProgressBar(object):
         if json:
             pass
         elif enabled:
+            # tqdm is only imported once a progress bar is shown, to keep it off startup paths
+            from .._vendor.tqdm import tqdm
             bar_format = "{desc}{bar} | {percentage:3.0f}% "
             try:
                 self.pbar = tqdm(desc=description, bar_format=bar_format, ascii=True, total=1,
@@ -602,29 +602,35 @@ class time_recorder(ContextDecorator):  # pragma: no cover
         return super(time_recorder, self).__call__(f)
 
     def __enter__(self):
-        enabled = os.environ.get('CONDA_INSTRUMENTATION_ENABLED')
-        if enabled and boolify(enabled):
+        if self.is_enabled():
             self.start_time = time()
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         if self.start_time:
-            entry_name = self.entry_name
-            end_time = time()
-            run_time = end_time - self.start_time
-            self.total_call_num[entry_name] += 1
-            self.total_run_time[entry_name] += run_time
-            self._ensure_dir()
-            with open(self.record_file, 'a') as fh:
-                fh.write("%s,%f\n" % (entry_name, run_time))
+            self.record(self.entry_name, time() - self.start_time)
             # total_call_num = self.total_call_num[entry_name]
             # total_run_time = self.total_run_time[entry_name]
             # log.debug('%s %9.3f %9.3f %d', entry_name, run_time, total_run_time, total_call_num)
 
+    @staticmethod
+    def is_enabled():
+        enabled = os.environ.get('CONDA_INSTRUMENTATION_ENABLED')
+        return bool(enabled and boolify(enabled))
+
+    @classmethod
+    def record(cls, entry_name, run_time):
+        """Record a run time measured outside of a time_recorder context."""
+        cls.total_call_num[entry_name] += 1
+        cls.total_run_time[entry_name] += run_time
+        if not isdir(dirname(cls.record_file)):
+            os.makedirs(dirname(cls.record_file))
+        with open(cls.record_file, 'a') as fh:
+            fh.write("%s,%f\n" % (entry_name, run_time))
+
     @classmethod
     def log_totals(cls):
-        enabled = os.environ.get('CONDA_INSTRUMENTATION_ENABLED')
-        if not (enabled and boolify(enabled)):
+        if not cls.is_enabled():
             return
         log.info('=== time_recorder total time and calls ===')
         for entry_name in sorted(cls.total_run_time.keys()):
@@ -635,11 +641,6 @@ class time_recorder(ContextDecorator):  # pragma: no cover
                 entry_name,
             )
 
-    @memoizemethod
-    def _ensure_dir(self):
-        if not isdir(dirname(self.record_file)):
-            os.makedirs(dirname(self.record_file))
-
 
 def print_instrumentation_data():  # pragma: no cover
     record_file = get_instrumentation_record_file()
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2012 Anaconda, Inc
+# SPDX-License-Identifier: BSD-3-Clause
+"""
+Reading and writing of ``.jlap`` patch series for repodata.json.
+
+A jlap file is a sequence of newline-separated lines.  The first line is a hex encoded
+initialization vector; every following line but the last is a JSON document, and the last
+line is the hex encoded checksum of the JSON lines, chained with blake2b as
+
+    checksum[0] = iv
+    checksum[n] = blake2b(line[n], key=checksum[n - 1], digest_size=32)
+
+The JSON lines are patches of the form ``{"from": <hash>, "to": <hash>, "patch": [...]}``,
+where the hashes are blake2b-256 hex digests of the repodata.json documents before and after
+the RFC 6902 JSON patch is applied, followed by one metadata line
+``{"url": "repodata.json", "latest": <hash>}`` naming the hash of the current document.
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from copy import deepcopy
+from hashlib import blake2b
+import json
+
+DIGEST_SIZE = 32  # blake2b-256
+ZERO_IV = "0" * DIGEST_SIZE * 2
+
+
+def content_hash(data):
+    """The blake2b-256 hex digest jlap files use to identify repodata.json documents."""
+    return blake2b(data, digest_size=DIGEST_SIZE).hexdigest()
+
+
+def _chain(iv, lines):
+    checksum = bytes.fromhex(iv)
+    for line in lines:
+        checksum = blake2b(line, key=checksum, digest_size=DIGEST_SIZE).digest()
+    return checksum.hex()
+
+
+def parse_jlap(data):
+    """
+    Verify the checksum chain of the jlap document ``data`` (bytes).
+
+    Returns a tuple of (patches, metadata), where patches is the list of patch documents in
+    file order and metadata is the trailing metadata document.
+    """
+    lines = data.rstrip(b"\n").split(b"\n")
+    if len(lines) < 3:
+        raise ValueError("jlap document is too short")
+    iv, json_lines, checksum = lines[0].decode("ascii"), lines[1:-1], lines[-1].decode("ascii")
+    if _chain(iv, json_lines) != checksum:
+        raise ValueError("jlap checksum mismatch")
+    documents = [json.loads(line) for line in json_lines]
+    metadata = documents.pop()
+    if "latest" not in metadata:
+        raise ValueError("jlap document has no trailing metadata line")
+    return documents, metadata
+
+
+def dump_jlap(patches, latest, url="repodata.json", iv=ZERO_IV):
+    """The inverse of parse_jlap; returns the jlap document as bytes."""
+    documents = list(patches) + [{"url": url, "latest": latest}]
+    json_lines = [json.dumps(doc, sort_keys=True, separators=(",", ":")).encode("utf-8")
+                  for doc in documents]
+    lines = [iv.encode("ascii")] + json_lines + [_chain(iv, json_lines).encode("ascii")]
+    return b"\n".join(lines) + b"\n"
+
+
+def resume_offset(data):
+    """
+    The offset up to which an updated copy of the jlap document ``data`` is the same as
+    ``data``: servers append patches by rewriting everything from the metadata line on.
+    """
+    lines = data.rstrip(b"\n").split(b"\n")
+    if len(lines) < 3:
+        return 0
+    return len(b"\n".join(lines[:-2])) + 1
+
+
+def find_patch_chain(patches, have, want):
+    """
+    Return the patches that lead from the document hashed ``have`` to the one hashed ``want``,
+    in the order they must be applied, or None if ``have`` is not an ancestor of ``want``.
+    """
+    patches_by_to = {patch["to"]: patch for patch in patches}
+    chain = []
+    current = want
+    while current != have:
+        patch = patches_by_to.get(current)
+        if patch is None or len(chain) > len(patches):
+            return None
+        chain.append(patch)
+        current = patch["from"]
+    chain.reverse()
+    return chain
+
+
+def split_json_pointer(pointer):
+    """The unescaped reference tokens of the JSON pointer ``pointer``."""
+    if pointer == "":
+        return []
+    if not pointer.startswith("/"):
+        raise ValueError("invalid JSON pointer %r" % pointer)
+    return [part.replace("~1", "/").replace("~0", "~") for part in pointer[1:].split("/")]
+
+
+def _resolve_parent(doc, pointer):
+    parts = split_json_pointer(pointer)
+    if not parts:
+        raise ValueError("cannot operate on the document root")
+    parent = doc
+    for part in parts[:-1]:
+        parent = parent[int(part)] if isinstance(parent, list) else parent[part]
+    return parent, parts[-1]
+
+
+def _get(doc, pointer):
+    for part in split_json_pointer(pointer):
+        doc = doc[int(part)] if isinstance(doc, list) else doc[part]
+    return doc
+
+
+def _add(doc, pointer, value):
+    parent, key = _resolve_parent(doc, pointer)
+    if isinstance(parent, list):
+        if key == "-":
+            parent.append(value)
+        else:
+            parent.insert(int(key), value)
+    else:
+        parent[key] = value
+
+
+def _remove(doc, pointer):
+    parent, key = _resolve_parent(doc, pointer)
+    if isinstance(parent, list):
+        return parent.pop(int(key))
+    return parent.pop(key)
+
+
+def apply_json_patch(doc, patch):
+    """Apply the RFC 6902 JSON ``patch`` operations to ``doc`` in place, and return ``doc``."""
+    try:
+        for operation in patch:
+            op, path = operation["op"], operation["path"]
+            if op == "add":
+                _add(doc, path, deepcopy(operation["value"]))
+            elif op == "remove":
+                _remove(doc, path)
+            elif op == "replace":
+                _remove(doc, path)
+                _add(doc, path, deepcopy(operation["value"]))
+            elif op == "move":
+                _add(doc, path, _remove(doc, operation["from"]))
+            elif op == "copy":
+                _add(doc, path, deepcopy(_get(doc, operation["from"])))
+            elif op == "test":
+                if _get(doc, path) != operation["value"]:
+                    raise ValueError("JSON patch test failed for %r" % path)
+            else:
+                raise ValueError("unknown JSON patch operation %r" % op)
+    except (KeyError, IndexError, TypeError) as e:
+        raise ValueError("cannot apply JSON patch: %r" % e)
+    return doc
@@ -46,6 +46,7 @@ FALSE = FALSE
 PycoSatSolver = "pycosat"
 PyCryptoSatSolver = "pycryptosat"
 PySatSolver = "pysat"
+PySatIncrementalSolver = "pysat-incremental"
 
 
 class Clauses(object):
@@ -14,7 +14,6 @@ from .compat import on_win, string_types
 from .. import CondaError
 from .._vendor.auxlib.decorators import memoize
 from .._vendor.toolz import accumulate, concat
-from distutils.spawn import find_executable
 
 try:
     # Python 3
@@ -332,6 +331,8 @@ def win_path_to_unix(path, root_prefix=""):
 
 
 def which(executable):
+    # distutils is slow to import, and is only needed here
+    from distutils.spawn import find_executable
     return find_executable(executable)
 
 
@@ -13,23 +13,6 @@ from .._vendor.auxlib.entity import EntityEncoder
 log = getLogger(__name__)
 
 
-@memoize
-def get_yaml():
-    try:
-        import ruamel_yaml as yaml
-    except ImportError:  # pragma: no cover
-        try:
-            import ruamel.yaml as yaml
-        except ImportError:
-            raise ImportError("No yaml library available.\n"
-                              "To proceed, conda install "
-                              "ruamel_yaml")
-    return yaml
-
-
-yaml = get_yaml()
-
-
 def represent_ordereddict(dumper, data):
     value = []
 
@@ -39,22 +22,37 @@ def represent_ordereddict(dumper, data):
 
         value.append((node_key, node_value))
 
-    return yaml.nodes.MappingNode(u'tag:yaml.org,2002:map', value)
-
+    return get_yaml().nodes.MappingNode(u'tag:yaml.org,2002:map', value)
 
-yaml.representer.RoundTripRepresenter.add_representer(odict, represent_ordereddict)
-yaml.representer.SafeRepresenter.add_representer(odict, represent_ordereddict)
 
 if PY2:
     def represent_unicode(self, data):
         return self.represent_str(data.encode('utf-8'))
 
 
-    yaml.representer.RoundTripRepresenter.add_representer(unicode, represent_unicode)  # NOQA
+@memoize
+def get_yaml():
+    # ruamel is slow to import and isn't needed when no yaml is read or written, e.g. by
+    # `conda shell.<shell> hook` without any condarc file, so it's only imported here
+    try:
+        import ruamel_yaml as yaml
+    except ImportError:  # pragma: no cover
+        try:
+            import ruamel.yaml as yaml
+        except ImportError:
+            raise ImportError("No yaml library available.\n"
+                              "To proceed, conda install "
+                              "ruamel_yaml")
+
+    yaml.representer.RoundTripRepresenter.add_representer(odict, represent_ordereddict)
+    yaml.representer.SafeRepresenter.add_representer(odict, represent_ordereddict)
+    if PY2:
+        yaml.representer.RoundTripRepresenter.add_representer(unicode, represent_unicode)  # NOQA
+    return yaml
 
 
 def yaml_round_trip_load(string):
-    return yaml.round_trip_load(string, version="1.2")
+    return get_yaml().round_trip_load(string, version="1.2")
 
 
 def yaml_safe_load(string):
@@ -64,19 +62,19 @@ def yaml_safe_load(string):
         {'key': 'value'}
 
     """
-    return yaml.safe_load(string, version="1.2")
+    return get_yaml().safe_load(string, version="1.2")
 
 
 def yaml_round_trip_dump(object):
     """dump object to string"""
-    return yaml.round_trip_dump(
+    return get_yaml().round_trip_dump(
         object, block_seq_indent=2, default_flow_style=False, indent=2
     )
 
 
 def yaml_safe_dump(object):
     """dump object to string"""
-    return yaml.safe_dump(
+    return get_yaml().safe_dump(
         object, block_seq_indent=2, default_flow_style=False, indent=2
     )
 
@@ -58,7 +58,10 @@ def unregister_env(location):
     if isdir(location):
         meta_dir = join(location, 'conda-meta')
         if isdir(meta_dir):
-            meta_dir_contents = tuple(entry.name for entry in scandir(meta_dir))
+            # conda-meta/.cache only holds data derived from the other files (the
+            #   PrefixDatabase of prefix_data)
+            meta_dir_contents = tuple(entry.name for entry in scandir(meta_dir)
+                                      if entry.name != '.cache')
             if len(meta_dir_contents) > 1:
                 # if there are any files left other than 'conda-meta/history'
                 #   then don't unregister
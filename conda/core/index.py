@@ -3,22 +3,30 @@
 # SPDX-License-Identifier: BSD-3-Clause
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+import hashlib
+import json
 import os
+from os.path import dirname, join
 import re
 from itertools import chain
 from logging import getLogger
 import platform
 import sys
+from uuid import uuid4
 
 from .package_cache_data import PackageCacheData
 from .prefix_data import PrefixData
-from .subdir_data import SubdirData, make_feature_record
+from .subdir_data import SubdirData, create_cache_dir, make_feature_record
+from .. import __version__ as CONDA_VERSION
 from .._vendor.boltons.setutils import IndexedSet
-from .._vendor.toolz import concat, concatv
+from .._vendor.toolz import concat, concatv, groupby
 from ..base.context import context
-from ..common.compat import itervalues
+from ..common.compat import itervalues, text_type
 from ..common.io import ThreadLimitedThreadPoolExecutor, time_recorder
 from ..exceptions import ChannelNotAllowed, InvalidSpec
+from ..gateways.disk import mkdir_p
+from ..gateways.disk.delete import rm_least_recently_used, rm_rf
+from ..gateways.disk.update import touch
 from ..gateways.logging import initialize_logging
 from ..models.channel import Channel, all_channel_urls
 from ..models.enums import PackageType
@@ -27,6 +35,8 @@ from ..models.records import EMPTY_LINK, PackageCacheRecord, PackageRecord, Pref
 
 log = getLogger(__name__)
 
+REDUCED_INDEX_CACHE_VERSION = 1
+
 
 def check_whitelist(channel_urls):
     if context.whitelist_channels:
@@ -244,6 +254,53 @@ def calculate_channel_urls(channel_urls=(), prepend=True, platform=None, use_loc
 
 
 def get_reduced_index(prefix, channels, subdirs, specs, repodata_fn):
+    records = None
+    cache_path = None
+    if context.reduced_index_cache or context.parsed_specs_cache:
+        subdir_datas = SubdirData.load_channels(channels, subdirs, repodata_fn)
+    if context.parsed_specs_cache:
+        for subdir_data in subdir_datas:
+            subdir_data.load_parsed_specs()
+    if context.reduced_index_cache:
+        cache_path = _reduced_index_cache_path(prefix, subdir_datas, specs)
+        if cache_path:
+            records = _read_reduced_index_cache(cache_path, subdir_datas)
+    if records is None:
+        records = _collect_reduced_index_records(prefix, channels, subdirs, specs, repodata_fn)
+        if cache_path:
+            _write_reduced_index_cache(cache_path, records, subdir_datas)
+    if context.parsed_specs_cache:
+        _save_parsed_specs(records, subdir_datas)
+
+    reduced_index = {rec: rec for rec in records}
+
+    if prefix is not None:
+        _supplement_index_with_prefix(reduced_index, prefix)
+
+    if context.offline or ('unknown' in context._argparse_args
+                           and context._argparse_args.unknown):
+        # This is really messed up right now.  Dates all the way back to
+        # https://github.com/conda/conda/commit/f761f65a82b739562a0d997a2570e2b8a0bdc783
+        # TODO: revisit this later
+        _supplement_index_with_cache(reduced_index)
+
+    # add feature records for the solver
+    known_features = set()
+    for rec in itervalues(reduced_index):
+        known_features.update(concatv(rec.track_features, rec.features))
+    known_features.update(context.track_features)
+    for ftr_str in known_features:
+        rec = make_feature_record(ftr_str)
+        reduced_index[rec] = rec
+
+    _supplement_index_with_system(reduced_index)
+
+    return reduced_index
+
+
+def _collect_reduced_index_records(prefix, channels, subdirs, specs, repodata_fn):
+    # The records of every package name reachable from specs and from the records already
+    # installed in prefix, by following dependencies and track_features.
     records = IndexedSet()
     collected_names = set()
     collected_track_features = set()
@@ -282,14 +339,19 @@ def get_reduced_index(prefix, channels, subdirs, specs, repodata_fn):
 
     while pending_names or pending_track_features:
         while pending_names:
-            name = pending_names.pop()
-            collected_names.add(name)
-            spec = MatchSpec(name)
-            new_records = SubdirData.query_all(spec, channels=channels, subdirs=subdirs,
-                                               repodata_fn=repodata_fn)
-            for record in new_records:
-                push_record(record)
-            records.update(new_records)
+            # Names are collected a dependency level at a time, so sharded repodata can fetch
+            #   the shards of a whole level concurrently.
+            batch = tuple(pending_names)
+            pending_names.clear()
+            collected_names.update(batch)
+            SubdirData.prefetch_all(batch, channels, subdirs, repodata_fn)
+            for name in batch:
+                spec = MatchSpec(name)
+                new_records = SubdirData.query_all(spec, channels=channels, subdirs=subdirs,
+                                                   repodata_fn=repodata_fn)
+                for record in new_records:
+                    push_record(record)
+                records.update(new_records)
 
         while pending_track_features:
             feature_name = pending_track_features.pop()
@@ -301,27 +363,93 @@ def get_reduced_index(prefix, channels, subdirs, specs, repodata_fn):
                 push_record(record)
             records.update(new_records)
 
-    reduced_index = {rec: rec for rec in records}
-
-    if prefix is not None:
-        _supplement_index_with_prefix(reduced_index, prefix)
-
-    if context.offline or ('unknown' in context._argparse_args
-                           and context._argparse_args.unknown):
-        # This is really messed up right now.  Dates all the way back to
-        # https://github.com/conda/conda/commit/f761f65a82b739562a0d997a2570e2b8a0bdc783
-        # TODO: revisit this later
-        _supplement_index_with_cache(reduced_index)
-
-    # add feature records for the solver
-    known_features = set()
-    for rec in itervalues(reduced_index):
-        known_features.update(concatv(rec.track_features, rec.features))
-    known_features.update(context.track_features)
-    for ftr_str in known_features:
-        rec = make_feature_record(ftr_str)
-        reduced_index[rec] = rec
-
-    _supplement_index_with_system(reduced_index)
-
-    return reduced_index
+    return records
+
+
+def _save_parsed_specs(records, subdir_datas):
+    # Persist the parsed depends of the records taking part in this solve with their subdir's
+    # repodata, so the next solve over the same repodata doesn't parse them again.
+    records_by_url = groupby(lambda rec: rec.channel.url(with_credentials=True), records)
+    for subdir_data in subdir_datas:
+        precs = records_by_url.get(subdir_data.url_w_credentials)
+        if precs:
+            subdir_data.save_parsed_specs(precs)
+
+
+def _reduced_index_cache_path(prefix, subdir_datas, specs):
+    # The records collected by _collect_reduced_index_records only depend on the specs, the
+    # records installed in prefix, and the repodata of each channel subdir, which is
+    # identified by its url and the etag/last-modified it was served with.  Returns None if
+    # some subdir's repodata can't be identified that way.
+    subdir_fingerprints = []
+    for subdir_data in subdir_datas:
+        state = subdir_data._internal_state
+        if not (state.get('_etag') or state.get('_mod')):
+            return None
+        subdir_fingerprints.append((subdir_data.url_w_credentials, subdir_data.repodata_fn,
+                                    state.get('_etag'), state.get('_mod')))
+    prefix_state = (sorted(prefix_rec.dist_str() for prefix_rec in
+                           PrefixData(prefix).iter_records())
+                    if prefix else None)
+    key = json.dumps({
+        'version': REDUCED_INDEX_CACHE_VERSION,
+        'conda': CONDA_VERSION,
+        'specs': sorted(text_type(spec) for spec in specs),
+        'prefix': prefix_state,
+        'subdirs': subdir_fingerprints,
+        'use_only_tar_bz2': context.use_only_tar_bz2,
+        'add_pip_as_python_dependency': context.add_pip_as_python_dependency,
+    }, sort_keys=True)
+    return join(create_cache_dir(), 'reduced_index',
+                hashlib.sha256(key.encode('utf-8')).hexdigest() + '.json')
+
+
+def _read_reduced_index_cache(cache_path, subdir_datas):
+    # The cache holds (subdir position, name, fn) for every record; look them up again in the
+    # loaded repodata.  Returns None on a miss, or if any record can't be found.
+    try:
+        with open(cache_path) as fh:
+            record_ids = json.load(fh)['records']
+    except (IOError, OSError, ValueError, KeyError):
+        return None
+    records = IndexedSet()
+    records_by_name = {}
+    for position, name, fn in record_ids:
+        key = position, name
+        if key not in records_by_name:
+            records_by_name[key] = {prec.fn: prec
+                                    for prec in subdir_datas[position].query(MatchSpec(name))}
+        prec = records_by_name[key].get(fn)
+        if prec is None:
+            log.debug("Stale reduced index cache %s: no %s in %s", cache_path, fn,
+                      subdir_datas[position].url_w_subdir)
+            return None
+        records.add(prec)
+    log.debug("Using reduced index cache %s", cache_path)
+    # the modification time orders entries for eviction
+    touch(cache_path)
+    return records
+
+
+def _write_reduced_index_cache(cache_path, records, subdir_datas):
+    positions = {subdir_data.url_w_credentials: position
+                 for position, subdir_data in enumerate(subdir_datas)}
+    try:
+        record_ids = [(positions[rec.channel.url(with_credentials=True)], rec.name, rec.fn)
+                      for rec in records]
+    except KeyError:
+        log.debug("Not caching reduced index: record from an unknown channel subdir")
+        return
+    tmp_path = "%s.%s.tmp" % (cache_path, uuid4().hex[:8])
+    try:
+        mkdir_p(dirname(cache_path))
+        with open(tmp_path, 'w') as fh:
+            json.dump({'records': record_ids}, fh)
+        os.replace(tmp_path, cache_path)
+    except (IOError, OSError):
+        log.debug("Failed to write reduced index cache %s", cache_path, exc_info=True)
+        return
+    finally:
+        rm_rf(tmp_path)
+    rm_least_recently_used(dirname(cache_path), context.reduced_index_cache_max_entries,
+                           '.json')
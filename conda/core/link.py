@@ -4,7 +4,9 @@
 from __future__ import absolute_import, division, print_function, unicode_literals
 
 from collections import defaultdict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
 from logging import getLogger
+from multiprocessing import get_context as get_mp_context
 import os
 from os.path import basename, dirname, isdir, join
 import sys
@@ -14,17 +16,18 @@ import warnings
 from .package_cache_data import PackageCacheData
 from .path_actions import (CompileMultiPycAction, CreateNonadminAction, CreatePrefixRecordAction,
                            CreatePythonEntryPointAction, LinkPathAction, MakeMenuAction,
-                           RegisterEnvironmentLocationAction, RemoveLinkedPackageRecordAction,
-                           RemoveMenuAction, UnlinkPathAction, UnregisterEnvironmentLocationAction,
-                           UpdateHistoryAction, AggregateCompileMultiPycAction)
+                           PrefixReplaceLinkAction, RegisterEnvironmentLocationAction,
+                           RemoveLinkedPackageRecordAction, RemoveMenuAction, UnlinkPathAction,
+                           UnregisterEnvironmentLocationAction, UpdateHistoryAction,
+                           AggregateCompileMultiPycAction)
 from .prefix_data import PrefixData, get_python_version_for_prefix
 from .. import CondaError, CondaMultiError, conda_signal_handler
-from .._vendor.auxlib.collection import first
 from .._vendor.auxlib.ish import dals
 from .._vendor.toolz import concat, concatv, interleave
 from ..base.constants import DEFAULTS_CHANNEL_NAME, PREFIX_MAGIC_FILE, SafetyChecks
 from ..base.context import context
-from ..common.compat import ensure_text_type, iteritems, itervalues, odict, on_win, text_type
+from ..common.compat import (ensure_text_type, iteritems, itervalues, odict, on_mac, on_win,
+                             text_type)
 from ..common.io import Spinner, dashlist, time_recorder
 from ..common.io import DummyExecutor, ThreadLimitedThreadPoolExecutor
 from ..common.path import (explode_directories, get_all_directories, get_major_minor_version,
@@ -36,7 +39,8 @@ from ..exceptions import (DisallowedPackageError, EnvironmentNotWritableError,
 from ..gateways.disk import mkdir_p
 from ..gateways.disk.delete import rm_rf
 from ..gateways.disk.read import isfile, lexists, read_package_info
-from ..gateways.disk.test import hardlink_supported, is_conda_environment, softlink_supported
+from ..gateways.disk.test import (hardlink_supported, is_conda_environment, reflink_supported,
+                                  softlink_supported)
 from ..gateways.subprocess import subprocess_call
 from ..models.enums import LinkType
 from ..models.enums import MetadataSignatureStatus
@@ -50,13 +54,21 @@ log = getLogger(__name__)
 def determine_link_type(extracted_package_dir, target_prefix):
     source_test_file = join(extracted_package_dir, 'info', 'index.json')
     if context.always_copy:
-        return LinkType.copy
+        return _copy_link_type(source_test_file, target_prefix)
     if context.always_softlink:
         return LinkType.softlink
     if hardlink_supported(source_test_file, target_prefix):
         return LinkType.hardlink
     if context.allow_softlinks and softlink_supported(source_test_file, target_prefix):
         return LinkType.softlink
+    return _copy_link_type(source_test_file, target_prefix)
+
+
+def _copy_link_type(source_test_file, target_prefix):
+    # copy-on-write clones share the data blocks of the package cache until they're written
+    #   to, where the file system allows
+    if reflink_supported(source_test_file, target_prefix):
+        return LinkType.reflink
     return LinkType.copy
 
 
@@ -153,6 +165,37 @@ ChangeReport = namedtuple("ChangeReport", (
 ))
 
 
+def _existing_paths(target_prefix, short_paths):
+    """
+    Return the set of those short_paths that exist in target_prefix.  Each parent directory is
+    listed once, instead of testing every path on its own.
+    """
+    paths_by_dir = defaultdict(list)
+    for short_path in short_paths:
+        paths_by_dir[dirname(short_path)].append(short_path)
+
+    existing = set()
+    for short_dir, dir_paths in iteritems(paths_by_dir):
+        try:
+            names = os.listdir(join(target_prefix, short_dir))
+        except EnvironmentError:
+            # the directory doesn't exist (or isn't a directory), so neither do its paths
+            continue
+        if on_win:
+            # paths are already lower-cased on windows
+            names = set(name.lower() for name in names)
+        else:
+            names = set(names)
+        # macOS file systems are usually, but not always, case-insensitive
+        folded_names = set(name.lower() for name in names) if on_mac else ()
+        for short_path in dir_paths:
+            name = basename(short_path)
+            if name in names or (name.lower() in folded_names
+                                 and lexists(join(target_prefix, short_path))):
+                existing.add(short_path)
+    return existing
+
+
 class UnlinkLinkTransaction(object):
 
     def __init__(self, *setups):
@@ -416,6 +459,26 @@ class UnlinkLinkTransaction(object):
                 error_results.append(error_result)
         return error_results
 
+    @staticmethod
+    def _verify_prefix_replacements(prefix_action_groups, executor):
+        # the prefix replacement of the files is the CPU-bound part of verification; start all
+        #   of them in the process pool before waiting on any.  Actions that fail their checks
+        #   are left unverified, for _verify_individual_level to report.
+        prefix_replace_actions = (axn for prefix_action_group in prefix_action_groups
+                                  for action_groups in prefix_action_group
+                                  for axngroup in action_groups
+                                  for axn in axngroup.actions
+                                  if isinstance(axn, PrefixReplaceLinkAction)
+                                  and not axn.verified)
+        started = [axn for axn in prefix_replace_actions if not axn.start_verify(executor)]
+        for axn in started:
+            axn.finish_verify()
+        if started:
+            slowest = max(started, key=lambda axn: axn.prefix_replace_time)
+            log.debug("rewrote prefixes in %d files in %.3f s; slowest %s in %.3f s",
+                      len(started), sum(axn.prefix_replace_time for axn in started),
+                      slowest.target_short_path, slowest.prefix_replace_time)
+
     @staticmethod
     def _verify_prefix_level(target_prefix_AND_prefix_action_group_tuple):
         # further verification of the whole transaction
@@ -462,28 +525,30 @@ class UnlinkLinkTransaction(object):
                                           link_path_action.link_type != LinkType.directory
                                           else tuple())
                 for path in target_short_paths:
-                    path = lower_on_win(path)
-                    link_paths_dict[path].append(axn)
-                    if path not in unlink_paths and lexists(join(target_prefix, path)):
-                        # we have a collision; at least try to figure out where it came from
-                        colliding_prefix_rec = first(
-                            (prefix_rec for prefix_rec in
-                             PrefixData(target_prefix).iter_records()),
-                            key=lambda prefix_rec: path in prefix_rec.files
-                        )
-                        if colliding_prefix_rec:
-                            error_results.append(KnownPackageClobberError(
-                                path,
-                                axn.package_info.repodata_record.dist_str(),
-                                colliding_prefix_rec.dist_str(),
-                                context,
-                            ))
-                        else:
-                            error_results.append(UnknownPackageClobberError(
-                                path,
-                                axn.package_info.repodata_record.dist_str(),
-                                context,
-                            ))
+                    link_paths_dict[lower_on_win(path)].append(axn)
+
+        colliding_paths = _existing_paths(target_prefix, (path for path in link_paths_dict
+                                                          if path not in unlink_paths))
+        prefix_data = PrefixData(target_prefix)
+        for path, axns in iteritems(link_paths_dict):
+            if path not in colliding_paths:
+                continue
+            # we have a collision; at least try to figure out where it came from
+            colliding_prefix_rec = prefix_data.get_path_owner(path)
+            for axn in axns:
+                if colliding_prefix_rec:
+                    error_results.append(KnownPackageClobberError(
+                        path,
+                        axn.package_info.repodata_record.dist_str(),
+                        colliding_prefix_rec.dist_str(),
+                        context,
+                    ))
+                else:
+                    error_results.append(UnknownPackageClobberError(
+                        path,
+                        axn.package_info.repodata_record.dist_str(),
+                        context,
+                    ))
 
         # Verification 2. there's only a single instance of each path
         for path, axns in iteritems(link_paths_dict):
@@ -588,6 +653,14 @@ class UnlinkLinkTransaction(object):
             return transaction_exceptions
 
         exceptions = []
+        if context.verify_processes > 0:
+            executor = ProcessPoolExecutor(context.verify_processes,
+                                           mp_context=get_mp_context('spawn'))
+            try:
+                UnlinkLinkTransaction._verify_prefix_replacements(
+                    itervalues(prefix_action_groups), executor)
+            finally:
+                executor.shutdown()
         for exc in self.verify_executor.map(UnlinkLinkTransaction._verify_individual_level,
                                             itervalues(prefix_action_groups)):
             if exc:
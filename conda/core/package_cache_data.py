@@ -5,11 +5,18 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 
 import codecs
 from collections import defaultdict
+from concurrent.futures import Future, ProcessPoolExecutor
 from errno import EACCES, ENOENT, EPERM, EROFS
+import json
 from logging import getLogger
+from multiprocessing import get_context as get_mp_context
+import os
+from os import lstat
 from os.path import basename, dirname, getsize, join
+from stat import S_ISREG
 from sys import platform
 from tarfile import ReadError
+from time import time
 
 from .path_actions import CacheUrlAction, ExtractPackageAction
 from .. import CondaError, CondaMultiError, conda_signal_handler
@@ -17,23 +24,27 @@ from .._vendor.auxlib.collection import first
 from .._vendor.auxlib.decorators import memoizemethod
 from .._vendor.toolz import concat, concatv, groupby
 from ..base.constants import (CONDA_PACKAGE_EXTENSIONS, CONDA_PACKAGE_EXTENSION_V1,
-                              CONDA_PACKAGE_EXTENSION_V2, PACKAGE_CACHE_MAGIC_FILE)
+                              CONDA_PACKAGE_EXTENSION_V2, CONDA_TEMP_EXTENSION,
+                              PACKAGE_CACHE_BLOB_STORE, PACKAGE_CACHE_MAGIC_FILE)
 from ..base.context import context
 from ..common.compat import (JSONDecodeError, iteritems, itervalues, odict, scandir,
                              string_types, text_type, with_metaclass)
 from ..common.constants import NULL
-from ..common.io import ProgressBar, time_recorder
-from ..common.path import expand, strip_pkg_extension, url_to_path
+from ..common.io import ProgressBar, ThreadLimitedThreadPoolExecutor, time_recorder
+from ..common.path import expand, strip_pkg_extension, url_to_path, win_path_ok
 from ..common.signals import signal_handler
 from ..common.url import path_to_url
 from ..exceptions import NoWritablePkgsDirError, NotWritableError
-from ..gateways.disk.create import (create_package_cache_directory, extract_tarball,
-                                    write_as_json_to_file)
+from ..gateways.disk.create import (StreamingExtractor, create_package_cache_directory,
+                                    extract_tarball, write_as_json_to_file)
+from ..gateways.disk import mkdir_p
 from ..gateways.disk.delete import rm_rf
-from ..gateways.disk.read import (compute_md5sum, isdir, isfile, islink,
+from ..gateways.disk.link import link
+from ..gateways.disk.read import (compute_md5sum, compute_sha256sum, isdir, isfile, islink,
                                   read_index_json, read_index_json_from_tarball,
-                                  read_repodata_json)
+                                  read_paths_json, read_repodata_json)
 from ..gateways.disk.test import file_path_is_writable
+from ..models.enums import PathType
 from ..models.match_spec import MatchSpec
 from ..models.records import PackageCacheRecord, PackageRecord
 from ..utils import human_bytes
@@ -67,6 +78,9 @@ class PackageCacheData(object):
     def __init__(self, pkgs_dir):
         self.pkgs_dir = pkgs_dir
         self.__package_cache_records = None
+        # records listed in the manifest that haven't been turned into PackageCacheRecords yet,
+        #   as {name: [(base_name, record_json)]}
+        self.__manifest_records = {}
         self.__is_writable = NULL
 
         self._urls_data = UrlsData(pkgs_dir)
@@ -74,17 +88,36 @@ class PackageCacheData(object):
     def insert(self, package_cache_record):
 
         meta = join(package_cache_record.extracted_package_dir, 'info', 'repodata_record.json')
-        write_as_json_to_file(meta, PackageRecord.from_objects(package_cache_record))
+        repodata_record = PackageRecord.from_objects(package_cache_record)
+        write_as_json_to_file(meta, repodata_record)
 
-        self._package_cache_records[package_cache_record] = package_cache_record
+        self._records_named(package_cache_record.name)[package_cache_record] = package_cache_record
+        if context.package_cache_manifest and self.is_writable:
+            manifest = PackageCacheManifest(self.pkgs_dir)
+            base_name = self._entry_base_name(package_cache_record)
+            manifest.update({base_name: manifest.make_entry(base_name, repodata_record)})
 
     def load(self):
         self.__package_cache_records = _package_cache_records = {}
+        self.__manifest_records = manifest_records = defaultdict(list)
         self._check_writable()  # called here to create the cache if it doesn't exist
         if not isdir(self.pkgs_dir):
             # no directory exists, and we didn't have permissions to create it
             return
 
+        manifest = manifest_entries = None
+        if context.package_cache_manifest:
+            manifest = PackageCacheManifest(self.pkgs_dir)
+            pkgs_dir_mtime, manifest_entries = manifest.read(self.is_writable)
+            if (manifest_entries is not None and pkgs_dir_mtime is not None
+                    and pkgs_dir_mtime == manifest.pkgs_dir_mtime()):
+                # no package has been added or removed since the manifest was written
+                for base_name, (_, name, record_json) in iteritems(manifest_entries):
+                    manifest_records[name].append((base_name, record_json))
+                return
+            pkgs_dir_mtime = manifest.pkgs_dir_mtime()
+        fresh_entries = {}
+
         _CONDA_TARBALL_EXTENSIONS = CONDA_PACKAGE_EXTENSIONS
         pkgs_dir_contents = tuple(entry.name for entry in scandir(self.pkgs_dir))
         for base_name in self._dedupe_pkgs_dir_contents(pkgs_dir_contents):
@@ -93,9 +126,24 @@ class PackageCacheData(object):
                 continue
             elif (isdir(full_path) and isfile(join(full_path, 'info', 'index.json'))
                   or isfile(full_path) and full_path.endswith(_CONDA_TARBALL_EXTENSIONS)):
+                if manifest:
+                    stat_key = manifest.stat_key(base_name)
+                    entry = manifest_entries and manifest_entries.get(base_name)
+                    if not entry or entry[0] != stat_key:
+                        entry = self._read_manifest_entry(base_name, stat_key)
+                    if entry:
+                        manifest_records[entry[1]].append((base_name, entry[2]))
+                        fresh_entries[base_name] = entry
+                        continue
                 package_cache_record = self._make_single_record(base_name)
                 if package_cache_record:
                     _package_cache_records[package_cache_record] = package_cache_record
+                    if manifest:
+                        fresh_entries[base_name] = manifest.make_entry(
+                            base_name, package_cache_record, stat_key)
+
+        if manifest and self.is_writable:
+            manifest.write(pkgs_dir_mtime, fresh_entries)
 
     def reload(self):
         self.load()
@@ -104,7 +152,7 @@ class PackageCacheData(object):
     def get(self, package_ref, default=NULL):
         assert isinstance(package_ref, PackageRecord)
         try:
-            return self._package_cache_records[package_ref]
+            return self._records_named(package_ref.name)[package_ref]
         except KeyError:
             if default is not NULL:
                 return default
@@ -112,10 +160,11 @@ class PackageCacheData(object):
                 raise
 
     def remove(self, package_ref, default=NULL):
+        _package_cache_records = self._records_named(package_ref.name)
         if default is NULL:
-            return self._package_cache_records.pop(package_ref)
+            return _package_cache_records.pop(package_ref)
         else:
-            return self._package_cache_records.pop(package_ref, default)
+            return _package_cache_records.pop(package_ref, default)
 
     def query(self, package_ref_or_match_spec):
         # returns a generator
@@ -123,11 +172,13 @@ class PackageCacheData(object):
         if isinstance(param, string_types):
             param = MatchSpec(param)
         if isinstance(param, MatchSpec):
-            return (pcrec for pcrec in itervalues(self._package_cache_records)
+            _package_cache_records = self._records_named(param.get_exact_value('name'))
+            return (pcrec for pcrec in itervalues(_package_cache_records)
                     if param.match(pcrec))
         else:
             assert isinstance(param, PackageRecord)
-            return (pcrec for pcrec in itervalues(self._package_cache_records) if pcrec == param)
+            _package_cache_records = self._records_named(param.name)
+            return (pcrec for pcrec in itervalues(_package_cache_records) if pcrec == param)
 
     def iter_records(self):
         return iter(self._package_cache_records)
@@ -240,10 +291,51 @@ class PackageCacheData(object):
     @property
     def _package_cache_records(self):
         # don't actually populate _package_cache_records until we need it
+        return self._records_named(None)
+
+    def _records_named(self, name):
+        # Returns the records dict, making sure all records with the given name are in it; all
+        #   records are if name is None.
         if self.__package_cache_records is None:
             self.load()
+        manifest_records = self.__manifest_records
+        if manifest_records:
+            if name is None:
+                entries = concat(itervalues(manifest_records))
+                self.__manifest_records = {}
+            else:
+                entries = manifest_records.pop(name, ())
+            for base_name, record_json in entries:
+                package_cache_record = self._make_manifest_record(base_name, record_json)
+                self.__package_cache_records[package_cache_record] = package_cache_record
         return self.__package_cache_records
 
+    def _read_manifest_entry(self, base_name, stat_key):
+        # A manifest entry for the package's info/repodata_record.json, or None if there is
+        #   no valid one; the record itself is only made once it is needed.
+        extracted_package_dir, _ = strip_pkg_extension(join(self.pkgs_dir, base_name))
+        try:
+            with open(join(extracted_package_dir, 'info', 'repodata_record.json')) as fh:
+                record_json = fh.read()
+            return stat_key, json.loads(record_json)['name'], record_json
+        except (EnvironmentError, ValueError, KeyError, TypeError):
+            return None
+
+    def _make_manifest_record(self, base_name, record_json):
+        package_tarball_full_path = join(self.pkgs_dir, base_name)
+        extracted_package_dir, _ = strip_pkg_extension(package_tarball_full_path)
+        return PackageCacheRecord.from_objects(
+            json.loads(record_json),
+            package_tarball_full_path=package_tarball_full_path,
+            extracted_package_dir=extracted_package_dir,
+        )
+
+    def _entry_base_name(self, package_cache_record):
+        # the pkgs_dir entry load() makes the record from; tarballs take precedence
+        if isfile(package_cache_record.package_tarball_full_path):
+            return basename(package_cache_record.package_tarball_full_path)
+        return basename(package_cache_record.extracted_package_dir)
+
     @property
     def is_writable(self):
         # returns None if package cache directory does not exist / has not been created
@@ -421,6 +513,134 @@ class PackageCacheData(object):
         ))
 
 
+class PackageCacheManifest(object):
+    """
+    An index of the package records in a package cache, kept in an sqlite database in
+    <pkgs_dir>/cache, so that PackageCacheData.load doesn't have to read the metadata of every
+    package in the cache each time.
+
+    Each entry maps the name of a package tarball or extracted package directory in pkgs_dir
+    to its repodata record, together with the modification times and sizes the entry had when
+    the record was read.  As long as the modification time of pkgs_dir itself matches the one
+    stored with the manifest, no package was added or removed, and the manifest is used
+    as is.  Otherwise, each entry is only read again if its own modification time or size
+    changed.
+    """
+    # in this class I'm breaking the rule that all disk access goes through conda.gateways
+
+    schema_version = 1
+
+    def __init__(self, pkgs_dir):
+        self.pkgs_dir = pkgs_dir
+        self.manifest_path = join(pkgs_dir, 'cache', 'package_cache.sqlite')
+
+    def pkgs_dir_mtime(self):
+        mtime = os.stat(self.pkgs_dir).st_mtime_ns
+        if time() - mtime / 1e9 < 2:
+            # Changes made within the file system's timestamp granularity of this one may
+            #   leave the modification time as it is; don't trust it yet.
+            return None
+        return mtime
+
+    def stat_key(self, base_name):
+        full_path = join(self.pkgs_dir, base_name)
+        extracted_package_dir, _ = strip_pkg_extension(full_path)
+        keys = []
+        for path in (full_path, extracted_package_dir) if extracted_package_dir != full_path \
+                else (full_path,):
+            try:
+                st = os.stat(path)
+            except (IOError, OSError):
+                keys.append('-')
+            else:
+                keys.append('%d:%d' % (st.st_mtime_ns, st.st_size))
+        return ' '.join(keys)
+
+    def make_entry(self, base_name, record, stat_key=None):
+        if stat_key is None:
+            stat_key = self.stat_key(base_name)
+        record_json = json.dumps(PackageRecord.from_objects(record).dump(), sort_keys=True)
+        return stat_key, record.name, record_json
+
+    def _connect(self, writable):
+        import sqlite3
+        if writable:
+            mkdir_p(dirname(self.manifest_path))
+            connection = sqlite3.connect(self.manifest_path, timeout=30)
+        elif isfile(self.manifest_path):
+            connection = sqlite3.connect(path_to_url(self.manifest_path) + '?mode=ro',
+                                         timeout=30, uri=True)
+        else:
+            return None
+        if writable:
+            with connection:
+                version = connection.execute("PRAGMA user_version").fetchone()[0]
+                if version != self.schema_version:
+                    connection.execute("DROP TABLE IF EXISTS entries")
+                    connection.execute("DROP TABLE IF EXISTS meta")
+                    connection.execute("PRAGMA user_version = %d" % self.schema_version)
+                connection.execute("CREATE TABLE IF NOT EXISTS entries ("
+                                   "base_name TEXT PRIMARY KEY, stat_key TEXT, name TEXT,"
+                                   " record TEXT)")
+                connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY,"
+                                   " value INTEGER)")
+        return connection
+
+    def read(self, writable):
+        """
+        Returns (pkgs_dir_mtime, {base_name: (stat_key, name, record_json)}), or (None, None)
+        if there is no usable manifest.
+        """
+        import sqlite3
+        connection = None
+        try:
+            connection = self._connect(writable)
+            if connection is None:
+                return None, None
+            row = connection.execute(
+                "SELECT value FROM meta WHERE key = 'pkgs_dir_mtime'").fetchone()
+            entries = {base_name: (stat_key, name, record_json) for base_name, stat_key, name,
+                       record_json in connection.execute("SELECT * FROM entries")}
+            return row and row[0], entries
+        except sqlite3.Error as e:
+            log.debug("cannot read package cache manifest %s: %r", self.manifest_path, e)
+            return None, None
+        finally:
+            if connection is not None:
+                connection.close()
+
+    def write(self, pkgs_dir_mtime, entries):
+        """Replace all entries, and record the pkgs_dir modification time they go with."""
+        self._execute(lambda connection: (
+            connection.execute("DELETE FROM entries"),
+            connection.executemany("INSERT INTO entries VALUES (?, ?, ?, ?)",
+                                   ((base_name,) + entry for base_name, entry in
+                                    iteritems(entries))),
+            connection.execute("INSERT OR REPLACE INTO meta VALUES ('pkgs_dir_mtime', ?)",
+                               (pkgs_dir_mtime,)),
+        ))
+
+    def update(self, entries):
+        """Add or replace the given entries."""
+        self._execute(lambda connection: connection.executemany(
+            "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)",
+            ((base_name,) + entry for base_name, entry in iteritems(entries))))
+
+    def _execute(self, statements):
+        # runs statements(connection) in one transaction
+        import sqlite3
+        connection = None
+        try:
+            connection = self._connect(True)
+            with connection:
+                statements(connection)
+        except (sqlite3.Error, IOError, OSError) as e:
+            log.debug("cannot update package cache manifest %s: %r", self.manifest_path, e)
+        finally:
+            if connection is not None:
+                connection.close()
+
+
 class UrlsData(object):
     # this is a class to manage urls.txt
     # it should basically be thought of as a sequence
@@ -462,6 +682,90 @@ class UrlsData(object):
         return first(self, lambda url: basename(url) == package_path)
 
 
+class PackageBlobStore(object):
+    """
+    A content-addressed store of the files of the extracted packages in a package cache.
+
+    Every regular file listed in a package's info/paths.json is hard-linked as
+    <pkgs_dir>/.blobs/<sha256[:2]>/<sha256>, with an "-x" suffix for executables.  Extracting
+    a package whose file already is in the store replaces that file with another hard link to
+    the stored copy, so that identical files of different builds and formats of a package are
+    only kept on disk once.  A stored file whose only link is the one in the store is no
+    longer used by any package, and is removed by `collect_garbage`.
+    """
+
+    def __init__(self, pkgs_dir):
+        self.pkgs_dir = pkgs_dir
+        self.blobs_dir = join(pkgs_dir, PACKAGE_CACHE_BLOB_STORE)
+
+    def blob_path(self, sha256, executable=False):
+        key = sha256 + '-x' if executable else sha256
+        return join(self.blobs_dir, key[:2], key)
+
+    def deduplicate(self, extracted_package_dir):
+        """
+        Add the files of the extracted package to the store, or replace them with the stored
+        copies.  Returns the number of bytes the package no longer takes on disk.
+        """
+        try:
+            paths_data = read_paths_json(extracted_package_dir)
+        except (IOError, OSError, JSONDecodeError) as e:
+            log.debug("cannot deduplicate %s: %r", extracted_package_dir, e)
+            return 0
+        saved = 0
+        for path_data in paths_data.paths:
+            if path_data.path_type != PathType.hardlink or not path_data.sha256:
+                continue
+            path = join(extracted_package_dir, win_path_ok(path_data.path))
+            try:
+                st = lstat(path)
+            except (IOError, OSError):
+                continue
+            if not S_ISREG(st.st_mode) or path_data.size_in_bytes not in (None, st.st_size):
+                continue
+            blob_path = self.blob_path(path_data.sha256, bool(st.st_mode & 0o111))
+            try:
+                blob_st = lstat(blob_path)
+            except (IOError, OSError):
+                blob_st = None
+            try:
+                if blob_st is None:
+                    # the file's content is vouched for here once, when it is first stored
+                    if compute_sha256sum(path) == path_data.sha256:
+                        mkdir_p(dirname(blob_path))
+                        link(path, blob_path)
+                elif ((blob_st.st_dev, blob_st.st_ino) != (st.st_dev, st.st_ino)
+                      and blob_st.st_size == st.st_size):
+                    temp_path = path + CONDA_TEMP_EXTENSION
+                    link(blob_path, temp_path)
+                    os.replace(temp_path, path)
+                    saved += st.st_size
+            except (IOError, OSError) as e:
+                # e.g. a file system without hard links; the package stays as it was extracted
+                log.debug("cannot deduplicate %s: %r", path, e)
+                return saved
+        return saved
+
+    def collect_garbage(self, dry_run=False):
+        """
+        Remove the stored files that no package in the cache links to anymore.  Returns
+        the list of (path, size) of the files removed.
+        """
+        removed = []
+        if not isdir(self.blobs_dir):
+            return removed
+        for entry in scandir(self.blobs_dir):
+            if not entry.is_dir(follow_symlinks=False):
+                continue
+            for blob in scandir(entry.path):
+                st = blob.stat(follow_symlinks=False)
+                if S_ISREG(st.st_mode) and st.st_nlink == 1:
+                    if not dry_run:
+                        rm_rf(blob.path)
+                    removed.append((blob.path, st.st_size))
+        return removed
+
+
 # ##############################
 # downloading
 # ##############################
@@ -643,24 +947,102 @@ class ProgressiveFetchExtract(object):
                       '\n    '.join(text_type(ca) for ca in self.cache_actions),
                       '\n    '.join(text_type(ea) for ea in self.extract_actions))
 
-        exceptions = []
         with signal_handler(conda_signal_handler), time_recorder("fetch_extract_execute"):
-            for prec_or_spec, prec_actions in iteritems(self.paired_actions):
-                exc = self._execute_actions(prec_or_spec, prec_actions)
-                if exc:
-                    log.debug('%r'.encode('utf-8'), exc, exc_info=True)
-                    exceptions.append(exc)
+            exceptions = self._execute_pipelined()
 
         if exceptions:
             raise CondaMultiError(exceptions)
         self._executed = True
 
-    @staticmethod
-    def _execute_actions(prec_or_spec, actions):
+    def _execute_pipelined(self):
+        """
+        Run the actions of all packages as a two-stage pipeline: up to context.fetch_threads
+        downloads at a time, each handing its package to the extraction stage as soon as it
+        is done.  Extraction runs in max(context.extract_processes, 1) threads, and with
+        context.extract_processes set, the decompression itself runs in a process pool of
+        that size.  Returns the exceptions of the packages that failed, in the order of
+        self.paired_actions.
+        """
+        # start the largest packages first, so they don't end up as the stragglers
+        pending = sorted(
+            ((prec_or_spec, actions) for prec_or_spec, actions in iteritems(self.paired_actions)
+             if actions[0] is not None or actions[1] is not None),
+            key=lambda item: getattr(item[0], 'size', None) or 0,
+            reverse=True,
+        )
+        if not pending:
+            return []
+        extract_processes = context.extract_processes
+        process_executor = (ProcessPoolExecutor(extract_processes,
+                                                mp_context=get_mp_context('spawn'))
+                            if extract_processes > 0 else None)
+        fetch_executor = ThreadLimitedThreadPoolExecutor(min(context.fetch_threads,
+                                                             len(pending)))
+        extract_executor = ThreadLimitedThreadPoolExecutor(max(extract_processes, 1))
+
+        def extract(actions, progress_bar, download_total, streamed):
+            try:
+                self._execute_extract_action(actions[1], progress_bar, download_total,
+                                             process_executor, streamed)
+            except Exception as e:
+                return self._finish_actions(actions, progress_bar, e)
+            return self._finish_actions(actions, progress_bar)
+
+        def fetch(prec_or_spec, actions):
+            progress_bar = self._make_progress_bar(prec_or_spec)
+            extractor = self._make_streaming_extractor(actions)
+            try:
+                download_total = self._execute_cache_action(
+                    actions[0], progress_bar, extractor and extractor.feed)
+            except Exception as e:
+                if extractor:
+                    extractor.abort()
+                return self._finish_actions(actions, progress_bar, e)
+            streamed = bool(extractor and extractor.finish())
+            return extract_executor.submit(extract, actions, progress_bar, download_total,
+                                           streamed)
+
+        futures = {}
+        try:
+            for prec_or_spec, actions in pending:
+                futures[prec_or_spec] = fetch_executor.submit(fetch, prec_or_spec, actions)
+            exceptions = []
+            for prec_or_spec in self.paired_actions:
+                if prec_or_spec not in futures:
+                    continue
+                result = futures[prec_or_spec].result()
+                if isinstance(result, Future):
+                    result = result.result()
+                if result:
+                    log.debug('%r'.encode('utf-8'), result, exc_info=True)
+                    exceptions.append(result)
+            return exceptions
+        except BaseException:
+            for future in itervalues(futures):
+                future.cancel()
+            raise
+        finally:
+            fetch_executor.shutdown()
+            extract_executor.shutdown()
+            if process_executor is not None:
+                process_executor.shutdown()
+
+    @classmethod
+    def _execute_actions(cls, prec_or_spec, actions):
         cache_axn, extract_axn = actions
         if cache_axn is None and extract_axn is None:
             return
 
+        progress_bar = cls._make_progress_bar(prec_or_spec)
+        try:
+            download_total = cls._execute_cache_action(cache_axn, progress_bar)
+            cls._execute_extract_action(extract_axn, progress_bar, download_total)
+        except Exception as e:
+            return cls._finish_actions(actions, progress_bar, e)
+        return cls._finish_actions(actions, progress_bar)
+
+    @staticmethod
+    def _make_progress_bar(prec_or_spec):
         desc = ''
         if prec_or_spec.name and prec_or_spec.version:
             desc = "%s-%s" % (prec_or_spec.name or '', prec_or_spec.version or '')
@@ -671,40 +1053,68 @@ class ProgressiveFetchExtract(object):
         if len(size_str) > 0:
             desc += "%-9s | " % size_str
 
-        progress_bar = ProgressBar(desc, not context.verbosity and not context.quiet, context.json)
+        return ProgressBar(desc, not context.verbosity and not context.quiet, context.json)
 
-        download_total = 1.0  # fraction of progress for download; the rest goes to extract
-        try:
-            if cache_axn:
-                cache_axn.verify()
+    @staticmethod
+    def _make_streaming_extractor(actions):
+        # with context.streaming_extract, a package that is downloaded straight into the
+        #   tarball its extract action reads is extracted while it downloads
+        cache_axn, extract_axn = actions
+        if not (context.streaming_extract and cache_axn and extract_axn):
+            return None
+        if (cache_axn.url.startswith('file:/')
+                or cache_axn.target_full_path != extract_axn.source_full_path
+                or not cache_axn.target_package_basename.endswith(CONDA_PACKAGE_EXTENSIONS)
+                or not StreamingExtractor.available()):
+            return None
+        rm_rf(extract_axn.streaming_path)
+        return StreamingExtractor(cache_axn.target_package_basename,
+                                  extract_axn.streaming_path)
 
-                if not cache_axn.url.startswith('file:/'):
-                    def progress_update_cache_axn(pct_completed):
-                        progress_bar.update_to(pct_completed * download_total)
-                else:
-                    download_total = 0
-                    progress_update_cache_axn = None
+    @staticmethod
+    def _execute_cache_action(cache_axn, progress_bar, chunk_consumer=None):
+        # returns the fraction of progress for download; the rest goes to extract
+        download_total = 1.0
+        if cache_axn:
+            cache_axn.verify()
+
+            if not cache_axn.url.startswith('file:/'):
+                def progress_update_cache_axn(pct_completed):
+                    progress_bar.update_to(pct_completed * download_total)
+            else:
+                download_total = 0
+                progress_update_cache_axn = None
 
-                cache_axn.execute(progress_update_cache_axn)
+            cache_axn.execute(progress_update_cache_axn, chunk_consumer=chunk_consumer)
+        return download_total
 
-            if extract_axn:
-                extract_axn.verify()
+    @staticmethod
+    def _execute_extract_action(extract_axn, progress_bar, download_total,
+                                extract_executor=None, streamed=False):
+        if extract_axn:
+            extract_axn.verify()
 
-                # this is doing nothing right now. I'm not sure how to do any
-                #   sort of progress update with libarchive.
-                def progress_update_extract_axn(pct_completed):
-                    progress_bar.update_to((1 - download_total) * pct_completed + download_total)
+            # this is doing nothing right now. I'm not sure how to do any
+            #   sort of progress update with libarchive.
+            def progress_update_extract_axn(pct_completed):
+                progress_bar.update_to((1 - download_total) * pct_completed + download_total)
 
-                extract_axn.execute(progress_update_extract_axn)
-                progress_bar.update_to(1.0)
+            extract_axn.execute(progress_update_extract_axn, extract_executor=extract_executor,
+                                streamed=streamed)
+            progress_bar.update_to(1.0)
 
-        except Exception as e:
-            if extract_axn:
-                extract_axn.reverse()
-            if cache_axn:
-                cache_axn.reverse()
-            return e
-        else:
+    @staticmethod
+    def _finish_actions(actions, progress_bar, exc=None):
+        # reverse the actions of a failed package, clean up after a successful one; returns
+        #   the exception, if any
+        cache_axn, extract_axn = actions
+        try:
+            if exc is not None:
+                if extract_axn:
+                    extract_axn.reverse()
+                if cache_axn:
+                    cache_axn.reverse()
+                return exc
             if cache_axn:
                 cache_axn.cleanup()
             if extract_axn:
@@ -8,10 +8,11 @@ from logging import getLogger
 from os.path import basename, dirname, getsize, isdir, join
 import re
 import sys
+from time import time
 from uuid import uuid4
 
 from .envs_manager import get_user_environments_txt_file, register_env, unregister_env
-from .portability import _PaddingError, update_prefix
+from .portability import _PaddingError, index_package_placeholders, update_prefix
 from .prefix_data import PrefixData
 from .. import CondaError
 from .._vendor.auxlib.compat import with_metaclass
@@ -20,6 +21,7 @@ from .._vendor.toolz import concat
 from ..base.constants import CONDA_TEMP_EXTENSION
 from ..base.context import context
 from ..common.compat import iteritems, on_win, text_type, JSONDecodeError
+from ..common.io import DummyExecutor
 from ..common.path import (get_bin_directory_short_path, get_leaf_directories,
                            get_python_noarch_target_path, get_python_short_path,
                            parse_entry_point_def,
@@ -36,6 +38,7 @@ from ..gateways.disk.delete import rm_rf
 from ..gateways.disk.permissions import make_writable
 from ..gateways.disk.read import (compute_md5sum, compute_sha256sum, islink, lexists,
                                   read_index_json)
+from ..gateways.disk.test import reflink_supported
 from ..gateways.disk.update import backoff_rename, touch
 from ..history import History
 from ..models.channel import Channel
@@ -189,16 +192,29 @@ class LinkPathAction(CreateInPrefixPathAction):
     @classmethod
     def create_file_link_actions(cls, transaction_context, package_info, target_prefix,
                                  requested_link_type):
+        # files that have to be copies are cloned instead, where the file system supports it
+        copy_link_types = []
+
+        def get_copy_link_type():
+            # only checked once a file of the package actually has to be copied
+            if not copy_link_types:
+                source_test_file = join(package_info.extracted_package_dir, 'info', 'index.json')
+                copy_link_types.append(LinkType.reflink
+                                       if requested_link_type == LinkType.reflink
+                                       or reflink_supported(source_test_file, target_prefix)
+                                       else LinkType.copy)
+            return copy_link_types[0]
+
         def get_prefix_replace(source_path_data):
             if source_path_data.path_type == PathType.softlink:
                 link_type = LinkType.copy
                 prefix_placehoder, file_mode = '', None
             elif source_path_data.prefix_placeholder:
-                link_type = LinkType.copy
+                link_type = get_copy_link_type()
                 prefix_placehoder = source_path_data.prefix_placeholder
                 file_mode = source_path_data.file_mode
             elif source_path_data.no_link:
-                link_type = LinkType.copy
+                link_type = get_copy_link_type()
                 prefix_placehoder, file_mode = '', None
             else:
                 link_type = requested_link_type
@@ -391,7 +407,8 @@ class PrefixReplaceLinkAction(LinkPathAction):
                  link_type,
                  prefix_placeholder, file_mode, source_path_data):
         # This link_type used in execute(). Make sure we always respect LinkType.copy request.
-        link_type = LinkType.copy if link_type == LinkType.copy else LinkType.hardlink
+        link_type = (link_type if link_type in (LinkType.copy, LinkType.reflink)
+                     else LinkType.hardlink)
         super(PrefixReplaceLinkAction, self).__init__(transaction_context, package_info,
                                                       extracted_package_dir, source_short_path,
                                                       target_prefix, target_short_path,
@@ -399,8 +416,21 @@ class PrefixReplaceLinkAction(LinkPathAction):
         self.prefix_placeholder = prefix_placeholder
         self.file_mode = file_mode
         self.intermediate_path = None
+        self.prefix_replace_time = None
+        self._prefix_replace_future = None
 
     def verify(self):
+        validation_error = self.start_verify()
+        if validation_error:
+            return validation_error
+        self.finish_verify()
+
+    def start_verify(self, prefix_replace_executor=None):
+        """
+        The first half of verify(): copy the source file to an intermediate path and submit the
+        prefix replacement to ``prefix_replace_executor``, which may be a process pool.
+        finish_verify() waits for the result.
+        """
         validation_error = super(PrefixReplaceLinkAction, self).verify()
         if validation_error:
             return validation_error
@@ -415,20 +445,38 @@ class PrefixReplaceLinkAction(LinkPathAction):
         self.intermediate_path = join(self.transaction_context['temp_dir'], text_type(uuid4()))
 
         log.trace("copying %s => %s", self.source_full_path, self.intermediate_path)
-        create_link(self.source_full_path, self.intermediate_path, LinkType.copy)
+        # where reflinks are supported, a clone only copies the blocks that the prefix
+        #   replacement writes to
+        create_link(self.source_full_path, self.intermediate_path,
+                    LinkType.reflink if self.link_type == LinkType.reflink else LinkType.copy)
         make_writable(self.intermediate_path)
 
+        log.trace("rewriting prefixes in %s", self.target_full_path)
+        executor = prefix_replace_executor or DummyExecutor()
+        self._prefix_replace_future = executor.submit(
+            _timed_update_prefix, self.intermediate_path,
+            context.target_prefix_override or self.target_prefix, self.prefix_placeholder,
+            self.file_mode, self.package_info.repodata_record.subdir,
+            self._placeholder_offsets())
+
+    def _placeholder_offsets(self):
+        # the offsets recorded when the package was extracted, if they still apply
+        entry = (self.package_info.placeholder_offsets or {}).get(self.source_short_path)
+        if (entry and entry['placeholder'] == self.prefix_placeholder
+                and entry['size_in_bytes'] == getsize(self.intermediate_path)):
+            return tuple(tuple(span) for span in entry['offsets'])
+        return None
+
+    def finish_verify(self):
         try:
-            log.trace("rewriting prefixes in %s", self.target_full_path)
-            update_prefix(self.intermediate_path,
-                          context.target_prefix_override or self.target_prefix,
-                          self.prefix_placeholder,
-                          self.file_mode, subdir=self.package_info.repodata_record.subdir)
+            sha256_in_prefix, self.prefix_replace_time = self._prefix_replace_future.result()
         except _PaddingError:
             raise PaddingError(self.target_full_path, self.prefix_placeholder,
                                len(self.prefix_placeholder))
-
-        sha256_in_prefix = compute_sha256sum(self.intermediate_path)
+        finally:
+            self._prefix_replace_future = None
+        log.trace("rewrote prefixes in %s in %.4f s", self.target_full_path,
+                  self.prefix_replace_time)
 
         self.prefix_path_data = PathDataV1.from_objects(
             self.prefix_path_data,
@@ -449,6 +497,16 @@ class PrefixReplaceLinkAction(LinkPathAction):
         self._execute_successful = True
 
 
+def _timed_update_prefix(path, new_prefix, placeholder, mode, subdir, placeholder_offsets):
+    # module level, so that it can be pickled for a ProcessPoolExecutor; the import sets up
+    #   log.trace() in freshly spawned worker processes
+    from ..gateways import logging  # NOQA
+    start_time = time()
+    sha256_in_prefix = update_prefix(path, new_prefix, placeholder, mode, subdir=subdir,
+                                     placeholder_offsets=placeholder_offsets)
+    return sha256_in_prefix, time() - start_time
+
+
 class MakeMenuAction(CreateInPrefixPathAction):
 
     @classmethod
@@ -852,9 +910,11 @@ class CreatePrefixRecordAction(CreateInPrefixPathAction):
         self._execute_successful = False
 
     def execute(self):
+        # older versions of conda don't know reflinks; to them they're copies like any other
         link = Link(
             source=self.package_info.extracted_package_dir,
-            type=self.requested_link_type,
+            type=(LinkType.copy if self.requested_link_type == LinkType.reflink
+                  else self.requested_link_type),
         )
         extracted_package_dir = self.package_info.extracted_package_dir
         package_tarball_full_path = self.package_info.package_tarball_full_path
@@ -1113,7 +1173,7 @@ class CacheUrlAction(PathAction):
         assert '::' not in self.url
         self._verified = True
 
-    def execute(self, progress_update_callback=None):
+    def execute(self, progress_update_callback=None, chunk_consumer=None):
         # I hate inline imports, but I guess it's ok since we're importing from the conda.core
         # The alternative is passing the PackageCache class to CacheUrlAction __init__
         from .package_cache_data import PackageCacheData
@@ -1135,7 +1195,8 @@ class CacheUrlAction(PathAction):
             source_path = url_to_path(self.url)
             self._execute_local(source_path, target_package_cache, progress_update_callback)
         else:
-            self._execute_channel(target_package_cache, progress_update_callback)
+            self._execute_channel(target_package_cache, progress_update_callback,
+                                  chunk_consumer)
 
     def _execute_local(self, source_path, target_package_cache, progress_update_callback=None):
         from .package_cache_data import PackageCacheData
@@ -1184,7 +1245,8 @@ class CacheUrlAction(PathAction):
             else:
                 target_package_cache._urls_data.add_url(self.url)
 
-    def _execute_channel(self, target_package_cache, progress_update_callback=None):
+    def _execute_channel(self, target_package_cache, progress_update_callback=None,
+                         chunk_consumer=None):
         kwargs = {}
         if self.size is not None:
             kwargs["size"] = self.size
@@ -1196,6 +1258,7 @@ class CacheUrlAction(PathAction):
             self.url,
             self.target_full_path,
             progress_update_callback=progress_update_callback,
+            chunk_consumer=chunk_consumer,
             **kwargs
         )
         target_package_cache._urls_data.add_url(self.url)
@@ -1232,17 +1295,27 @@ class ExtractPackageAction(PathAction):
     def verify(self):
         self._verified = True
 
-    def execute(self, progress_update_callback=None):
+    def execute(self, progress_update_callback=None, extract_executor=None, streamed=False):
         # I hate inline imports, but I guess it's ok since we're importing from the conda.core
         # The alternative is passing the the classes to ExtractPackageAction __init__
-        from .package_cache_data import PackageCacheData
+        from .package_cache_data import PackageBlobStore, PackageCacheData
         log.trace("extracting %s => %s", self.source_full_path, self.target_full_path)
 
         if lexists(self.target_full_path):
             rm_rf(self.target_full_path)
 
-        extract_tarball(self.source_full_path, self.target_full_path,
-                        progress_update_callback=progress_update_callback)
+        if streamed:
+            # the package was extracted to streaming_path while it was downloaded, and the
+            #   download has been verified since
+            backoff_rename(self.streaming_path, self.target_full_path)
+        elif extract_executor is None:
+            extract_tarball(self.source_full_path, self.target_full_path,
+                            progress_update_callback=progress_update_callback)
+        else:
+            # only the decompression is handed to the executor (typically a process pool);
+            #   the package cache bookkeeping below has to happen in this process
+            extract_executor.submit(extract_tarball, self.source_full_path,
+                                    self.target_full_path).result()
 
         try:
             raw_index_json = read_index_json(self.target_full_path)
@@ -1270,6 +1343,17 @@ class ExtractPackageAction(PathAction):
         else:
             repodata_record = PackageRecord.from_objects(self.record_or_spec, raw_index_json)
 
+        if context.index_placeholder_offsets:
+            try:
+                index_package_placeholders(self.target_full_path)
+            except (IOError, OSError, ValueError):
+                # linking searches the files for the placeholders instead
+                log.debug("Failed to index the prefix placeholders of %s",
+                          self.target_full_path, exc_info=True)
+
+        if context.deduplicate_package_cache:
+            PackageBlobStore(self.target_pkgs_dir).deduplicate(self.target_full_path)
+
         repodata_record_path = join(self.target_full_path, 'info', 'repodata_record.json')
         write_as_json_to_file(repodata_record_path, repodata_record)
 
@@ -1283,6 +1367,7 @@ class ExtractPackageAction(PathAction):
 
     def reverse(self):
         rm_rf(self.target_full_path)
+        rm_rf(self.streaming_path)
         if lexists(self.hold_path):
             log.trace("moving %s => %s", self.hold_path, self.target_full_path)
             rm_rf(self.target_full_path)
@@ -1295,6 +1380,11 @@ class ExtractPackageAction(PathAction):
     def target_full_path(self):
         return join(self.target_pkgs_dir, self.target_extracted_dirname)
 
+    @property
+    def streaming_path(self):
+        # where the package is extracted to while it is downloaded, see StreamingExtractor
+        return self.target_full_path + '.stream' + CONDA_TEMP_EXTENSION
+
     def __str__(self):
         return ('ExtractPackageAction<source_full_path=%r, target_full_path=%r>'
                 % (self.source_full_path, self.target_full_path))
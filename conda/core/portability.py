@@ -3,17 +3,23 @@
 # SPDX-License-Identifier: BSD-3-Clause
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+from contextlib import closing
+from hashlib import sha256
 from logging import getLogger
-from os.path import realpath
+import mmap
+import os
+from os.path import join, realpath
 import re
 import struct
 import subprocess
 import sys
 
-from ..base.constants import PREFIX_PLACEHOLDER
+from ..base.constants import PACKAGE_PLACEHOLDER_OFFSETS_FILE, PREFIX_PLACEHOLDER
 from ..base.context import context
 from ..common.compat import on_win
 from ..exceptions import CondaIOError, BinaryPrefixReplacementError
+from ..gateways.disk.create import write_as_json_to_file
+from ..gateways.disk.read import compute_sha256sum, read_paths_json
 from ..gateways.disk.update import CancelOperation, update_file_in_place_as_binary
 from ..models.enums import FileMode
 
@@ -33,38 +39,155 @@ class _PaddingError(Exception):
 
 
 def update_prefix(path, new_prefix, placeholder=PREFIX_PLACEHOLDER, mode=FileMode.text,
-                  subdir=context.subdir):
+                  subdir=context.subdir, placeholder_offsets=None):
+    """
+    Replace ``placeholder`` with ``new_prefix`` in the file at ``path``, in place.  Returns the
+    sha256 hex digest of the file's content afterwards, computed from the data already in
+    memory rather than by reading the file back.
+
+    For binary files, ``placeholder_offsets`` may give the spans recorded by
+    index_package_placeholders(), so that the file doesn't have to be searched.
+    """
+    real_path = realpath(path)
     if on_win and mode == FileMode.text:
         # force all prefix replacements to forward slashes to simplify need to escape backslashes
         # replace with unix-style path separators
         new_prefix = new_prefix.replace('\\', '/')
 
-    def _update_prefix(original_data):
+    if mode == FileMode.binary and not on_win:
+        # binary replacement never changes the size of the file, so patch it through a memory
+        #   map instead of reading and rewriting all of it
+        updated, sha256_in_prefix = update_binary_prefix_in_place(
+            real_path, placeholder.encode('utf-8'), new_prefix.encode('utf-8'),
+            placeholder_offsets)
+    else:
+        final_data = []
+
+        def _update_prefix(original_data):
+            final_data.append(original_data)
 
-        # Step 1. do all prefix replacement
-        data = replace_prefix(mode, original_data, placeholder, new_prefix)
+            # Step 1. do all prefix replacement
+            data = replace_prefix(mode, original_data, placeholder, new_prefix)
 
-        # Step 2. if the shebang is too long, shorten it using /usr/bin/env trick
-        if not on_win:
-            data = replace_long_shebang(mode, data)
+            # Step 2. if the shebang is too long, shorten it using /usr/bin/env trick
+            if not on_win:
+                data = replace_long_shebang(mode, data)
 
-        # Step 3. if the before and after content is the same, skip writing
-        if data == original_data:
-            raise CancelOperation()
+            # Step 3. if the before and after content is the same, skip writing
+            if data == original_data:
+                raise CancelOperation()
 
-        # Step 4. if we have a binary file, make sure the byte size is the same before
-        #         and after the update
-        if mode == FileMode.binary and len(data) != len(original_data):
-            raise BinaryPrefixReplacementError(path, placeholder, new_prefix,
-                                               len(original_data), len(data))
+            # Step 4. if we have a binary file, make sure the byte size is the same before
+            #         and after the update
+            if mode == FileMode.binary and len(data) != len(original_data):
+                raise BinaryPrefixReplacementError(path, placeholder, new_prefix,
+                                                   len(original_data), len(data))
 
-        return data
+            final_data[0] = data
+            return data
 
-    updated = update_file_in_place_as_binary(realpath(path), _update_prefix)
+        updated = update_file_in_place_as_binary(real_path, _update_prefix)
+        sha256_in_prefix = sha256(final_data[0]).hexdigest()
 
     if updated and mode == FileMode.binary and subdir == "osx-arm64" and sys.platform == "darwin":
         # Apple arm64 needs signed executables
-        subprocess.run(['/usr/bin/codesign', '-s', '-', '-f', realpath(path)], capture_output=True)
+        subprocess.run(['/usr/bin/codesign', '-s', '-', '-f', real_path], capture_output=True)
+        sha256_in_prefix = compute_sha256sum(real_path)
+    return sha256_in_prefix
+
+
+def update_binary_prefix_in_place(path, a, b, offsets=None):
+    """
+    The in-place equivalent of ``binary_replace``: memory-map the file at ``path`` and patch
+    every null-terminated string containing the placeholder ``a``.  Returns a tuple of whether
+    anything was replaced and the sha256 hex digest of the resulting content.
+
+    ``offsets`` are the (start, end) spans of those strings, as found by
+    find_binary_placeholders() ahead of time.  They are only used if every span still starts
+    with the placeholder and ends with a null; otherwise the file is searched.
+    """
+    with open(path, 'rb+') as fh:
+        if not os.fstat(fh.fileno()).st_size:
+            # empty files can't be memory-mapped
+            return False, sha256(b'').hexdigest()
+        with closing(mmap.mmap(fh.fileno(), 0)) as data:
+            if offsets is None or not _offsets_match(data, offsets, a):
+                offsets = find_binary_placeholders(data, a)
+            replaced = 0
+            for start, end in offsets:
+                replaced += patch_binary_placeholder(data, start, end, a, b)
+            if replaced:
+                data.flush()
+            return bool(replaced), sha256(data).hexdigest()
+
+
+def _offsets_match(data, offsets, a):
+    size = len(data)
+    return all(0 <= start and start + len(a) < end <= size
+               and data[start:start + len(a)] == a and data[end - 1:end] == b'\0'
+               for start, end in offsets)
+
+
+def find_binary_placeholders(data, a):
+    """
+    Yield the (start, end) offsets of the null-terminated strings in ``data`` that the
+    placeholder ``a`` begins, end including the terminating null, in the same places as the
+    ``binary_replace`` regular expression matches.
+    """
+    start = data.find(a)
+    while start >= 0:
+        end = data.find(b'\0', start + len(a))
+        if end < 0:
+            return
+        yield start, end + 1
+        start = data.find(a, end + 1)
+
+
+def patch_binary_placeholder(data, start, end, a, b):
+    """
+    Replace ``a`` with ``b`` in the mutable buffer ``data`` between ``start`` and ``end``, as
+    found by ``find_binary_placeholders``, null-padding the string to its original length.
+    Returns the number of replacements made.
+    """
+    segment = data[start:end]
+    occurances = segment.count(a)
+    padding = (len(a) - len(b)) * occurances
+    if padding < 0:
+        raise _PaddingError
+    data[start:end] = segment.replace(a, b) + b'\0' * padding
+    return occurances
+
+
+def index_package_placeholders(extracted_package_dir):
+    """
+    Record the spans of the placeholders in all binary files of an extracted package, to be
+    read back by read_placeholder_offsets() and passed to update_prefix() when linking.  The
+    placeholders are at the same offsets in every prefix the package is linked into, so this
+    saves searching each file on every install.
+    """
+    if on_win:
+        # no binary prefix replacement is done on windows
+        return
+    placeholder_offsets = {}
+    for path_data in read_paths_json(extracted_package_dir).paths:
+        if not path_data.prefix_placeholder or path_data.file_mode != FileMode.binary:
+            continue
+        placeholder = path_data.prefix_placeholder.encode('utf-8')
+        with open(join(extracted_package_dir, path_data.path), 'rb') as fh:
+            size = os.fstat(fh.fileno()).st_size
+            if not size:
+                continue
+            with closing(mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)) as data:
+                offsets = list(find_binary_placeholders(data, placeholder))
+        placeholder_offsets[path_data.path] = {
+            'placeholder': path_data.prefix_placeholder,
+            'size_in_bytes': size,
+            'offsets': offsets,
+        }
+    write_as_json_to_file(join(extracted_package_dir, PACKAGE_PLACEHOLDER_OFFSETS_FILE), {
+        'placeholder_offsets_version': 1,
+        'paths': placeholder_offsets,
+    })
 
 
 def replace_prefix(mode, data, placeholder, new_prefix):
@@ -6,30 +6,35 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 from collections import OrderedDict
 import json
 from logging import getLogger
-from os.path import basename, isdir, isfile, join, lexists
+import os
+from os.path import basename, dirname, isdir, isfile, join, lexists
 import re
+from time import time
 
 from ..base.constants import PREFIX_STATE_FILE
+from .._vendor.auxlib.entity import ComposableField, ListField
 from .._vendor.auxlib.exceptions import ValidationError
 from ..base.constants import CONDA_PACKAGE_EXTENSIONS, PREFIX_MAGIC_FILE, CONDA_ENV_VARS_UNSET_VAR
 from ..base.context import context
-from ..common.compat import (JSONDecodeError, itervalues, odict, scandir,
+from ..common.compat import (JSONDecodeError, iteritems, itervalues, odict, on_win, scandir,
                              string_types, with_metaclass)
 from ..common.constants import NULL
 from ..common.io import time_recorder
 from ..common.path import get_python_site_packages_short_path, win_path_ok
 from ..common.pkg_formats.python import get_site_packages_anchor_files
 from ..common.serialize import json_load
+from ..common.url import path_to_url
 from ..exceptions import (
     BasicClobberError, CondaDependencyError, CorruptedEnvironmentError, maybe_raise,
 )
+from ..gateways.disk import mkdir_p
 from ..gateways.disk.create import write_as_json_to_file
 from ..gateways.disk.delete import rm_rf
 from ..gateways.disk.read import read_python_record
 from ..gateways.disk.test import file_path_is_writable
 from ..models.match_spec import MatchSpec
 from ..models.prefix_graph import PrefixGraph
-from ..models.records import PackageRecord, PrefixRecord
+from ..models.records import PackageRecord, PathsData, PrefixRecord
 
 log = getLogger(__name__)
 
@@ -58,6 +63,10 @@ class PrefixData(object):
         # TODO: when removing pip_interop_enabled, also remove from meta class
         self.prefix_path = prefix_path
         self.__prefix_records = None
+        self.__path_owners = None
+        # records loaded from the PrefixDatabase whose files and paths_data haven't been read
+        #   yet, as {json_fn: prefix_record}
+        self.__deferred_records = {}
         self.__is_writable = NULL
         self._pip_interop_enabled = (pip_interop_enabled
                                      if pip_interop_enabled is not None
@@ -66,18 +75,83 @@ class PrefixData(object):
     @time_recorder(module_name=__name__)
     def load(self):
         self.__prefix_records = {}
+        self.__path_owners = None
+        self.__deferred_records = {}
         _conda_meta_dir = join(self.prefix_path, 'conda-meta')
         if lexists(_conda_meta_dir):
-            conda_meta_json_paths = (
-                p for p in
-                (entry.path for entry in scandir(_conda_meta_dir))
-                if p[-5:] == ".json"
-            )
-            for meta_file in conda_meta_json_paths:
-                self._load_single_record(meta_file)
+            if context.prefix_database:
+                self._load_from_database(_conda_meta_dir)
+            else:
+                conda_meta_json_paths = (
+                    p for p in
+                    (entry.path for entry in scandir(_conda_meta_dir))
+                    if p[-5:] == ".json"
+                )
+                for meta_file in conda_meta_json_paths:
+                    self._load_single_record(meta_file)
         if self._pip_interop_enabled:
             self._load_site_packages()
 
+    def _load_from_database(self, conda_meta_dir):
+        database = PrefixDatabase(self.prefix_path)
+        writable = bool(self.is_writable)
+        # taken before the database is opened, so that nothing done to it can show up here
+        conda_meta_mtime = database.conda_meta_mtime()
+        stored_mtime, entries = database.read(writable)
+        if (entries is not None and stored_mtime is not None
+                and stored_mtime == conda_meta_mtime):
+            # no record has been added or removed since the database was written
+            for json_fn, (_, header_json) in iteritems(entries):
+                self._add_deferred_record(json_fn, header_json)
+            return
+
+        entries = entries or {}
+        kept_json_fns = set()
+        changed_entries = {}
+        for entry in scandir(conda_meta_dir):
+            if entry.name[-5:] != ".json":
+                continue
+            stat_key = database.stat_key(entry.path)
+            database_entry = entries.get(entry.name)
+            if database_entry and database_entry[0] == stat_key:
+                self._add_deferred_record(entry.name, database_entry[1])
+                kept_json_fns.add(entry.name)
+                continue
+            with open(entry.path) as fh:
+                record_json = fh.read()
+            prefix_record = self._make_single_record(entry.path, record_json)
+            if prefix_record:
+                changed_entries[entry.name] = database.make_entry(stat_key, record_json)
+                kept_json_fns.add(entry.name)
+        removed_json_fns = [json_fn for json_fn in entries if json_fn not in kept_json_fns]
+        if writable and (changed_entries or removed_json_fns
+                         or conda_meta_mtime not in (None, stored_mtime)):
+            database.write(conda_meta_mtime, changed_entries, removed_json_fns)
+
+    def _add_deferred_record(self, json_fn, header_json):
+        prefix_record = _DeferredPrefixRecord(**json_load(header_json))
+        prefix_record.__dict__['_load_deferred'] = self._load_deferred_records
+        self.__deferred_records[json_fn] = prefix_record
+        self.__prefix_records[prefix_record.name] = prefix_record
+
+    def _load_deferred_records(self):
+        # fill in the files and paths_data of all deferred records at once, the first time
+        #   any of them is needed
+        deferred_records, self.__deferred_records = self.__deferred_records, {}
+        records_json = PrefixDatabase(self.prefix_path).read_records(deferred_records)
+        for json_fn, prefix_record in iteritems(deferred_records):
+            prefix_record.__dict__.pop('_load_deferred', None)
+            record_json = records_json.get(json_fn)
+            if record_json is None:
+                # the database changed underneath us; the json file has the same information
+                with open(join(self.prefix_path, 'conda-meta', json_fn)) as fh:
+                    record_json = fh.read()
+            json_data = json_load(record_json)
+            if 'files' in json_data:
+                prefix_record.files = json_data['files']
+            if json_data.get('paths_data') is not None:
+                prefix_record.paths_data = json_data['paths_data']
+
     def reload(self):
         self.load()
         return self
@@ -111,8 +185,16 @@ class PrefixData(object):
             rm_rf(prefix_record_json_path)
 
         write_as_json_to_file(prefix_record_json_path, prefix_record)
+        if context.prefix_database and self.is_writable:
+            database = PrefixDatabase(self.prefix_path)
+            with open(prefix_record_json_path) as fh:
+                record_json = fh.read()
+            database.update({basename(prefix_record_json_path): database.make_entry(
+                database.stat_key(prefix_record_json_path), record_json)})
 
         self._prefix_records[prefix_record.name] = prefix_record
+        if self.__path_owners is not None:
+            self._index_path_owners(prefix_record)
 
     def remove(self, package_name):
         assert package_name in self._prefix_records
@@ -124,8 +206,11 @@ class PrefixData(object):
         conda_meta_full_path = join(self.prefix_path, 'conda-meta', prefix_record_json_path)
         if self.is_writable:
             rm_rf(conda_meta_full_path)
+            if context.prefix_database:
+                PrefixDatabase(self.prefix_path).delete(basename(prefix_record_json_path))
 
         del self._prefix_records[package_name]
+        self.__path_owners = None
 
     def get(self, package_name, default=NULL):
         try:
@@ -139,6 +224,23 @@ class PrefixData(object):
     def iter_records(self):
         return itervalues(self._prefix_records)
 
+    def get_path_owner(self, path):
+        """
+        Return the record of the package that installed the file at ``path``, relative to the
+        prefix, or None.  Paths are compared case-insensitively on Windows.
+        """
+        if self.__path_owners is None:
+            self.__path_owners = {}
+            for prefix_record in self.iter_records():
+                self._index_path_owners(prefix_record)
+        return self.__path_owners.get(path.lower() if on_win else path)
+
+    def _index_path_owners(self, prefix_record):
+        # the first record claiming a path owns it
+        path_owners = self.__path_owners
+        for path in prefix_record.files:
+            path_owners.setdefault(path.lower() if on_win else path, prefix_record)
+
     def iter_records_sorted(self):
         prefix_graph = PrefixGraph(self.iter_records())
         return iter(prefix_graph.graph)
@@ -171,27 +273,32 @@ class PrefixData(object):
     def _load_single_record(self, prefix_record_json_path):
         log.debug("loading prefix record %s", prefix_record_json_path)
         with open(prefix_record_json_path) as fh:
-            try:
-                json_data = json_load(fh.read())
-            except JSONDecodeError:
-                raise CorruptedEnvironmentError(self.prefix_path, prefix_record_json_path)
+            self._make_single_record(prefix_record_json_path, fh.read())
+
+    def _make_single_record(self, prefix_record_json_path, record_json):
+        # adds the record to the prefix records, and returns it unless it's malformed
+        try:
+            json_data = json_load(record_json)
+        except JSONDecodeError:
+            raise CorruptedEnvironmentError(self.prefix_path, prefix_record_json_path)
 
-            # TODO: consider, at least in memory, storing prefix_record_json_path as part
-            #       of PrefixRecord
-            prefix_record = PrefixRecord(**json_data)
+        # TODO: consider, at least in memory, storing prefix_record_json_path as part
+        #       of PrefixRecord
+        prefix_record = PrefixRecord(**json_data)
 
-            # check that prefix record json filename conforms to name-version-build
-            # apparently implemented as part of #2638 to resolve #2599
-            try:
-                n, v, b = basename(prefix_record_json_path)[:-5].rsplit('-', 2)
-                if (n, v, b) != (prefix_record.name, prefix_record.version, prefix_record.build):
-                    raise ValueError()
-            except ValueError:
-                log.warn("Ignoring malformed prefix record at: %s", prefix_record_json_path)
-                # TODO: consider just deleting here this record file in the future
-                return
+        # check that prefix record json filename conforms to name-version-build
+        # apparently implemented as part of #2638 to resolve #2599
+        try:
+            n, v, b = basename(prefix_record_json_path)[:-5].rsplit('-', 2)
+            if (n, v, b) != (prefix_record.name, prefix_record.version, prefix_record.build):
+                raise ValueError()
+        except ValueError:
+            log.warn("Ignoring malformed prefix record at: %s", prefix_record_json_path)
+            # TODO: consider just deleting here this record file in the future
+            return None
 
-            self.__prefix_records[prefix_record.name] = prefix_record
+        self.__prefix_records[prefix_record.name] = prefix_record
+        return prefix_record
 
     @property
     def is_writable(self):
@@ -346,6 +453,176 @@ class PrefixData(object):
         return env_state_file.get('env_vars')
 
 
+def _deferred(field_class):
+    # a field of _DeferredPrefixRecord that is read from the PrefixDatabase on first access
+    class DeferredField(field_class):
+        def __get__(self, instance, instance_type):
+            if instance is not None and self.name not in instance.__dict__:
+                load_deferred = instance.__dict__.get('_load_deferred')
+                if load_deferred is not None:
+                    load_deferred()
+            return super(DeferredField, self).__get__(instance, instance_type)
+    return DeferredField
+
+
+class _DeferredPrefixRecord(PrefixRecord):
+    # A PrefixRecord made from the header the PrefixDatabase stores for it.  The files and
+    #   paths_data of a package are most of its conda-meta record, and most commands never look
+    #   at them, so they are only read when first needed.
+    files = _deferred(ListField)(string_types, default=(), required=False)
+    paths_data = _deferred(ComposableField)(PathsData, required=False, nullable=True,
+                                            default_in_dump=False)
+
+
+class PrefixDatabase(object):
+    """
+    A copy of the conda-meta/*.json records of a prefix, kept in the sqlite database
+    conda-meta/.cache/prefix.sqlite, so that PrefixData.load doesn't have to parse all of them
+    each time.  The json files stay the authoritative record, and are always written as well.
+
+    Each entry maps the name of a json file to its modification time and size when it was
+    read, a header holding everything but the large files and paths_data fields, and the
+    whole record, which is only read when those are needed.  As long as the modification time
+    of conda-meta itself matches the one stored with the database, no record was added or
+    removed, and the entries are used as they are.  Otherwise, each entry is only read again if
+    its json file changed.  The database lives in a directory of its own, so that writing it
+    (and its journal) doesn't change the modification time of conda-meta.
+    """
+    # in this class I'm breaking the rule that all disk access goes through conda.gateways
+
+    schema_version = 1
+    deferred_fields = ('files', 'paths_data')
+
+    def __init__(self, prefix_path):
+        self.conda_meta_dir = join(prefix_path, 'conda-meta')
+        self.database_path = join(self.conda_meta_dir, '.cache', 'prefix.sqlite')
+
+    def conda_meta_mtime(self):
+        mtime = os.stat(self.conda_meta_dir).st_mtime_ns
+        if time() - mtime / 1e9 < 2:
+            # Changes made within the file system's timestamp granularity of this one may
+            #   leave the modification time as it is; don't trust it yet.
+            return None
+        return mtime
+
+    @staticmethod
+    def stat_key(path):
+        st = os.stat(path)
+        return '%d:%d' % (st.st_mtime_ns, st.st_size)
+
+    def make_entry(self, stat_key, record_json):
+        header = json.loads(record_json)
+        for field in self.deferred_fields:
+            header.pop(field, None)
+        return stat_key, json.dumps(header), record_json
+
+    def _connect(self, writable):
+        import sqlite3
+        if writable:
+            mkdir_p(dirname(self.database_path))
+            connection = sqlite3.connect(self.database_path, timeout=30)
+        elif isfile(self.database_path):
+            connection = sqlite3.connect(path_to_url(self.database_path) + '?mode=ro',
+                                         timeout=30, uri=True)
+        else:
+            return None
+        if writable:
+            # the json files are the durable copy; a database lost in a crash is just rebuilt
+            connection.execute("PRAGMA synchronous = OFF")
+            with connection:
+                version = connection.execute("PRAGMA user_version").fetchone()[0]
+                if version != self.schema_version:
+                    connection.execute("DROP TABLE IF EXISTS records")
+                    connection.execute("DROP TABLE IF EXISTS meta")
+                    connection.execute("PRAGMA user_version = %d" % self.schema_version)
+                connection.execute("CREATE TABLE IF NOT EXISTS records (json_fn TEXT PRIMARY KEY,"
+                                   " stat_key TEXT, header TEXT, record TEXT)")
+                connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY,"
+                                   " value INTEGER)")
+        return connection
+
+    def read(self, writable):
+        """
+        Returns (conda_meta_mtime, {json_fn: (stat_key, header_json)}), or (None, None) if
+        there is no usable database.
+        """
+        import sqlite3
+        connection = None
+        try:
+            connection = self._connect(writable)
+            if connection is None:
+                return None, None
+            row = connection.execute(
+                "SELECT value FROM meta WHERE key = 'conda_meta_mtime'").fetchone()
+            entries = {json_fn: (stat_key, header_json) for json_fn, stat_key, header_json
+                       in connection.execute("SELECT json_fn, stat_key, header FROM records")}
+            return row and row[0], entries
+        except (sqlite3.Error, IOError, OSError) as e:
+            log.debug("cannot read prefix database %s: %r", self.database_path, e)
+            return None, None
+        finally:
+            if connection is not None:
+                connection.close()
+
+    def read_records(self, json_fns):
+        """Returns {json_fn: record_json} for those of json_fns that are in the database."""
+        import sqlite3
+        connection = None
+        try:
+            connection = self._connect(False)
+            if connection is None:
+                return {}
+            json_fns = set(json_fns)
+            return {json_fn: record_json for json_fn, record_json
+                    in connection.execute("SELECT json_fn, record FROM records")
+                    if json_fn in json_fns}
+        except sqlite3.Error as e:
+            log.debug("cannot read prefix database %s: %r", self.database_path, e)
+            return {}
+        finally:
+            if connection is not None:
+                connection.close()
+
+    def write(self, conda_meta_mtime, entries, removed_json_fns):
+        """
+        Add or replace entries, delete those of removed_json_fns, and record the conda-meta
+        modification time they now go with.
+        """
+        self._execute(lambda connection: (
+            connection.executemany("DELETE FROM records WHERE json_fn = ?",
+                                   ((json_fn,) for json_fn in removed_json_fns)),
+            connection.executemany("INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?)",
+                                   ((json_fn,) + entry for json_fn, entry in
+                                    iteritems(entries))),
+            connection.execute("INSERT OR REPLACE INTO meta VALUES ('conda_meta_mtime', ?)",
+                               (conda_meta_mtime,)),
+        ))
+
+    def update(self, entries):
+        """Add or replace the given entries."""
+        self._execute(lambda connection: connection.executemany(
+            "INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?)",
+            ((json_fn,) + entry for json_fn, entry in iteritems(entries))))
+
+    def delete(self, json_fn):
+        self._execute(lambda connection: connection.execute(
+            "DELETE FROM records WHERE json_fn = ?", (json_fn,)))
+
+    def _execute(self, statements):
+        # runs statements(connection) in one transaction
+        import sqlite3
+        connection = None
+        try:
+            connection = self._connect(True)
+            with connection:
+                statements(connection)
+        except (sqlite3.Error, IOError, OSError) as e:
+            log.debug("cannot update prefix database %s: %r", self.database_path, e)
+        finally:
+            if connection is not None:
+                connection.close()
+
+
 def get_conda_anchor_files_and_records(site_packages_short_path, python_records):
     """Return the anchor files for the conda records of python packages."""
     anchor_file_endings = ('.egg-info/PKG-INFO', '.dist-info/RECORD', '.egg-info')
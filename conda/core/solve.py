@@ -5,15 +5,19 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 
 import copy
 from genericpath import exists
+import hashlib
+import json
 from logging import DEBUG, getLogger
+import os
 from os.path import join
 import sys
 from textwrap import dedent
+from uuid import uuid4
 
 from .index import get_reduced_index, _supplement_index_with_system
 from .link import PrefixSetup, UnlinkLinkTransaction
 from .prefix_data import PrefixData
-from .subdir_data import SubdirData
+from .subdir_data import SubdirData, create_cache_dir
 from .. import CondaError, __version__ as CONDA_VERSION
 from .._vendor.auxlib.decorators import memoizedproperty
 from .._vendor.auxlib.ish import dals
@@ -26,16 +30,21 @@ from ..common.constants import NULL
 from ..common.io import Spinner, dashlist, time_recorder
 from ..common.path import get_major_minor_version, paths_equal
 from ..exceptions import PackagesNotFoundError, SpecsConfigurationConflictError, UnsatisfiableError
+from ..gateways.disk import mkdir_p
+from ..gateways.disk.delete import rm_least_recently_used, rm_rf
+from ..gateways.disk.update import touch
 from ..history import History
 from ..models.channel import Channel
 from ..models.enums import NoarchType
 from ..models.match_spec import MatchSpec
 from ..models.prefix_graph import PrefixGraph
-from ..models.version import VersionOrder
+from ..models.version import VersionOrder, version_cache_info
 from ..resolve import Resolve
 
 log = getLogger(__name__)
 
+SOLVE_CACHE_VERSION = 3
+
 
 class Solver(object):
     """
@@ -269,6 +278,21 @@ class Solver(object):
         else:
             fail_message = "failed\n"
 
+        solve_cache_key = self._solve_cache_key(ssc) if context.solve_cache else None
+        initial_specs_to_add = self.specs_to_add
+        if solve_cache_key:
+            cached_solution = read_cached_solution(solve_cache_key, ssc.index)
+            if cached_solution is not None:
+                log.debug("using cached solution %s for prefix %s", solve_cache_key,
+                          self.prefix)
+                (ssc.solution_precs, self.neutered_specs, specs_to_add,
+                 constricted_specs) = cached_solution
+                if specs_to_add is not None:
+                    self.specs_to_add = specs_to_add
+                for spec in constricted_specs:
+                    self.determine_constricting_specs(spec, ssc.solution_precs)
+                return ssc.solution_precs
+
         with Spinner("Solving environment", not context.verbosity and not context.quiet,
                      context.json, fail_message=fail_message):
             ssc = self._remove_specs(ssc)
@@ -281,6 +305,7 @@ class Solver(object):
             ssc = self._run_sat(ssc)
             post_packages = self.get_request_package_in_solution(ssc.solution_precs, ssc.specs_map)
 
+            constrained = ()
             if ssc.update_modifier == UpdateModifier.UPDATE_SPECS:
                 constrained = self.get_constrained_packages(
                     pre_packages, post_packages, ssc.index.keys())
@@ -301,6 +326,10 @@ class Solver(object):
             ssc = self._post_sat_handling(ssc)
 
         time_recorder.log_totals()
+        if time_recorder.is_enabled():
+            for cache_name, cache_info in sorted(iteritems(version_cache_info())):
+                log.info("%s cache: %s", cache_name, cache_info)
+            log.info("MatchSpec cache: %s", MatchSpec._INTERN_CACHE.info())
 
         ssc.solution_precs = IndexedSet(PrefixGraph(ssc.solution_precs).graph)
         log.debug("solved prefix %s\n"
@@ -308,8 +337,53 @@ class Solver(object):
                   "    %s\n",
                   self.prefix, "\n    ".join(prec.dist_str() for prec in ssc.solution_precs))
 
+        if solve_cache_key:
+            # _post_sat_handling may have replaced specs_to_add, which goes into the history
+            write_cached_solution(solve_cache_key, ssc.solution_precs, self.neutered_specs,
+                                  (None if self.specs_to_add is initial_specs_to_add
+                                   else self.specs_to_add),
+                                  constrained)
         return ssc.solution_precs
 
+    def _solve_cache_key(self, ssc):
+        # A hash of everything the solution computed by the rest of solve_final_state depends
+        # on: the solver state after metadata collection, the candidate records, and the
+        # configuration consulted while adding specs and running the SAT solver.
+        def dump_specs(specs):
+            return sorted(text_type(spec) for spec in specs)
+
+        def record_fingerprint(prec):
+            return (type(prec).__name__, prec.dist_str(), prec.md5, prec.build_number,
+                    prec.timestamp, prec.depends, prec.constrains, sorted(prec.track_features),
+                    sorted(prec.features))
+
+        problem = {
+            'version': SOLVE_CACHE_VERSION,
+            'conda': CONDA_VERSION,
+            'specs_to_add': dump_specs(self.specs_to_add),
+            'specs_to_remove': dump_specs(self.specs_to_remove),
+            'specs_map': sorted((name, text_type(spec))
+                                for name, spec in iteritems(ssc.specs_map)),
+            'history_specs': sorted((name, text_type(spec))
+                                    for name, spec in iteritems(ssc.specs_from_history_map)),
+            'pinned_specs': dump_specs(ssc.pinned_specs),
+            'installed': sorted(prec.dist_str() for prec in ssc.solution_precs),
+            'add_back': sorted(ssc.add_back_map),
+            'modifiers': (ssc.update_modifier, ssc.deps_modifier, ssc.prune, ssc.ignore_pinned),
+            'channels': [channel.canonical_name for channel in self.channels],
+            'subdirs': list(self.subdirs),
+            'repodata_fn': self._repodata_fn,
+            'command': self._command,
+            'context': (context.channel_priority, context.solver_ignore_timestamps,
+                        context.sat_solver, dump_specs(context.aggressive_update_packages),
+                        context.auto_update_conda, context.offline,
+                        sorted(context.track_features),
+                        paths_equal(self.prefix, context.conda_prefix)),
+            'index': sorted(record_fingerprint(prec) for prec in ssc.index),
+        }
+        key = json.dumps(problem, sort_keys=True, default=text_type)
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
     def determine_constricting_specs(self, spec, solution_precs):
         highest_version = [VersionOrder(sp.version) for sp in solution_precs
                            if sp.name == spec.name][0]
@@ -467,7 +541,11 @@ class Solver(object):
                 rec_has_a_feature = set(rec.features or ()) & feature_names
                 if rec_has_a_feature and rec.name in ssc.specs_from_history_map:
                     spec = ssc.specs_map.get(rec.name, MatchSpec(rec.name))
-                    spec._match_components.pop('features', None)
+                    # MatchSpecs parsed from strings are shared, so build a copy rather
+                    # than mutating the components in place
+                    spec_kwargs = dict(spec._match_components)
+                    spec_kwargs.pop('features', None)
+                    spec = MatchSpec(optional=spec.optional, target=spec.target, **spec_kwargs)
                     ssc.specs_map[spec.name] = spec
                 else:
                     ssc.specs_map.pop(rec.name, None)
@@ -1093,6 +1171,72 @@ class SolverStateContainer(object):
         self.final_environment_specs = None
 
 
+def get_solve_cache_dir():
+    return join(create_cache_dir(), 'solve')
+
+
+def read_cached_solution(key, index):
+    """
+    Return the solution stored under ``key`` as records of ``index``, or None if there is
+    none (or it refers to records that are not in ``index``).
+
+    The solution is returned as a tuple of the solution records, the neutered specs, the
+    specs_to_add the solve ended up with (None if it kept the ones it started with), and the
+    specs whose update was found to be constricted, as stored by write_cached_solution.
+    """
+    path = join(get_solve_cache_dir(), key + '.json')
+    try:
+        with open(path) as fh:
+            cached = json.load(fh)
+        dist_strs = cached['solution']
+        neutered_specs, constricted_specs = (
+            tuple(MatchSpec(spec_str) for spec_str in cached[field])
+            for field in ('neutered_specs', 'constricted_specs'))
+        specs_to_add = cached['specs_to_add']
+        if specs_to_add is not None:
+            specs_to_add = tuple(MatchSpec(spec_str) for spec_str in specs_to_add)
+    except (IOError, OSError, ValueError, KeyError):
+        return None
+    precs_by_dist_str = {prec.dist_str(): prec for prec in index}
+    try:
+        solution_precs = IndexedSet(precs_by_dist_str[dist_str] for dist_str in dist_strs)
+    except KeyError:
+        return None
+    # the modification time orders entries for eviction
+    touch(path)
+    return solution_precs, neutered_specs, specs_to_add, constricted_specs
+
+
+def write_cached_solution(key, solution_precs, neutered_specs, specs_to_add,
+                          constricted_specs):
+    """
+    Store ``solution_precs``, together with the other results of the solve that callers use,
+    under ``key``, then evict the least recently used solutions beyond
+    ``solve_cache_max_entries``.
+    """
+    cache_dir = get_solve_cache_dir()
+    path = join(cache_dir, key + '.json')
+    tmp_path = "%s.%s.tmp" % (path, uuid4().hex[:8])
+    try:
+        mkdir_p(cache_dir)
+        with open(tmp_path, 'w') as fh:
+            json.dump({
+                'solution': [prec.dist_str() for prec in solution_precs],
+                'neutered_specs': [text_type(spec) for spec in neutered_specs],
+                'specs_to_add': (None if specs_to_add is None
+                                 else [text_type(spec) for spec in specs_to_add]),
+                'constricted_specs': [text_type(spec) for spec in constricted_specs],
+            }, fh)
+        os.replace(tmp_path, path)
+    except (IOError, OSError):
+        log.debug("Failed to write solve cache %s", path, exc_info=True)
+        return
+    finally:
+        rm_rf(tmp_path)
+
+    rm_least_recently_used(cache_dir, context.solve_cache_max_entries, '.json')
+
+
 def get_pinned_specs(prefix):
     """Find pinned specs from file and return a tuple of MatchSpec."""
     pinfile = join(prefix, 'conda-meta', 'pinned')
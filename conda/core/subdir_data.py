@@ -4,39 +4,52 @@
 from __future__ import absolute_import, division, print_function, unicode_literals
 
 import bz2
-from collections import defaultdict
+from collections import defaultdict, namedtuple
 from contextlib import closing
 from errno import EACCES, ENODEV, EPERM, EROFS
+from concurrent.futures import ProcessPoolExecutor
 from functools import partial
 from genericpath import getmtime, isfile
 from glob import iglob
 import hashlib
 from io import open as io_open
 import json
+from json.decoder import WHITESPACE as JSON_WHITESPACE, scanstring as json_scanstring
 from logging import DEBUG, getLogger
 from mmap import ACCESS_READ, mmap
+from multiprocessing import get_context as get_mp_context
+import os
 from os import makedirs
 from os.path import basename, dirname, isdir, join, splitext, exists
 import re
+import struct
 from time import time
+from uuid import uuid4
 import warnings
 
-from .. import CondaError
+from .. import CondaError, __version__ as CONDA_VERSION
 from .._vendor.auxlib.ish import dals
 from .._vendor.auxlib.logz import stringify
 from .._vendor.boltons.setutils import IndexedSet
-from .._vendor.toolz import concat, take, groupby
-from ..base.constants import CONDA_HOMEPAGE_URL, CONDA_PACKAGE_EXTENSION_V1, REPODATA_FN
+from .._vendor.toolz import concat, concatv, take, groupby
+from ..base.constants import (CONDA_HOMEPAGE_URL, CONDA_PACKAGE_EXTENSION_V1,
+                              CONDA_PACKAGE_EXTENSION_V2, REPODATA_FN, REPODATA_JLAP_FN,
+                              REPODATA_SHARDS_FN)
 from ..base.constants import INITIAL_TRUST_ROOT    # Where root.json is currently.
 from ..base.context import context
-from ..common.compat import (ensure_binary, ensure_text_type, ensure_unicode, iteritems, iterkeys,
-                             string_types, text_type, with_metaclass)
-from ..common.io import ThreadLimitedThreadPoolExecutor, DummyExecutor, dashlist
+from ..common.compat import (Mapping, ensure_binary, ensure_text_type, ensure_unicode,
+                             iteritems, itervalues, odict, string_types, text_type,
+                             with_metaclass)
+from ..common.io import (ThreadLimitedThreadPoolExecutor, as_completed, dashlist,
+                         time_recorder)
+from ..common.jlap import (apply_json_patch, content_hash, find_patch_chain, parse_jlap,
+                           resume_offset, split_json_pointer)
 from ..common.path import url_to_path
 from ..common.url import join_url, maybe_unquote
 from ..core.package_cache_data import PackageCacheData
-from ..exceptions import (CondaDependencyError, CondaHTTPError, CondaUpgradeError,
-                          NotWritableError, UnavailableInvalidChannel, ProxyError)
+from ..exceptions import (ChecksumMismatchError, CondaDependencyError, CondaHTTPError,
+                          CondaUpgradeError, InvalidSpec, NotWritableError,
+                          UnavailableInvalidChannel, ProxyError)
 from ..gateways.connection import (ConnectionError, HTTPError, InsecureRequestWarning,
                                    InvalidSchema, SSLError, RequestsProxyError)
 from ..gateways.connection.session import CondaSession
@@ -44,7 +57,7 @@ from ..gateways.disk import mkdir_p, mkdir_p_sudo_safe
 from ..gateways.disk.delete import rm_rf
 from ..gateways.disk.update import touch
 from ..models.channel import Channel, all_channel_urls
-from ..models.match_spec import MatchSpec
+from ..models.match_spec import MatchSpec, dump_parsed_spec_strs, load_parsed_spec_strs
 from ..models.records import PackageRecord
 from ..models.enums import MetadataSignatureStatus
 
@@ -64,17 +77,21 @@ try:
 except ImportError:
     cct = None
 
-try:
-    import cPickle as pickle
-except ImportError:  # pragma: no cover
-    import pickle  # NOQA
-
 log = getLogger(__name__)
 stderrlog = getLogger('conda.stderrlog')
 
-REPODATA_PICKLE_VERSION = 28
+REPODATA_PICKLE_VERSION = 29
 MAX_REPODATA_VERSION = 1
 REPODATA_HEADER_RE = b'"(_etag|_mod|_cache_control)":[ ]?"(.*?[^\\\\])"[,}\\s]'  # NOQA
+CONTENT_HASH_RE = b'"_content_hash":[ ]?"([0-9a-f]+)"'
+# the fields added to cached repodata by fetch_repodata_remote_request all come first
+REPODATA_HEADER_SIZE = 4096
+BINARY_CACHE_MAGIC = b'CONDARDX'
+BINARY_CACHE_PREAMBLE = struct.Struct('<8sQQ')  # magic, header offset, header length
+BINARY_CACHE_COPY_CHUNK_SIZE = 1 << 20
+BINARY_CACHE_VALIDATION_KEYS = ('_url', '_schannel', '_add_pip', '_mod', '_etag',
+                                '_pickle_version', 'fn')
+REPODATA_PROCESS_MIN_SUBDIRS = 4  # parse in worker processes only when there are this many
 
 
 class SubdirDataType(type):
@@ -113,6 +130,27 @@ class SubdirData(object):
     @staticmethod
     def query_all(package_ref_or_match_spec, channels=None, subdirs=None,
                   repodata_fn=REPODATA_FN):
+        subdir_datas = SubdirData.load_channels(channels, subdirs, repodata_fn)
+        return tuple(concat(subdir_data.query(package_ref_or_match_spec)
+                            for subdir_data in subdir_datas))
+
+    @staticmethod
+    def prefetch_all(package_names, channels=None, subdirs=None, repodata_fn=REPODATA_FN):
+        """
+        Get the records of every one of ``package_names`` ready for querying.  Channels that
+        publish sharded repodata fetch the shards of all those names concurrently.
+        """
+        for subdir_data in SubdirData.load_channels(channels, subdirs, repodata_fn):
+            if isinstance(subdir_data._package_records, ShardedRecordIndex):
+                subdir_data._package_records.prefetch(package_names,
+                                                      context.repodata_threads or None)
+
+    @staticmethod
+    def load_channels(channels=None, subdirs=None, repodata_fn=REPODATA_FN):
+        """
+        Return the loaded SubdirData for every channel url of ``channels`` x ``subdirs``, in
+        channel priority order.
+        """
         from .index import check_whitelist  # TODO: fix in-line import
         # ensure that this is not called by threaded code
         create_cache_dir()
@@ -129,16 +167,59 @@ class SubdirData(object):
                          dashlist(ignored_urls))
             channel_urls = IndexedSet(grouped_urls.get(True, ()))
         check_whitelist(channel_urls)
-        subdir_query = lambda url: tuple(SubdirData(Channel(url), repodata_fn=repodata_fn).query(
-            package_ref_or_match_spec))
+        subdir_datas = tuple(SubdirData(Channel(url), repodata_fn=repodata_fn)
+                             for url in channel_urls)
+        SubdirData.load_all(subdir_datas)
+        return subdir_datas
 
-        # TODO test timing with ProcessPoolExecutor
-        Executor = (DummyExecutor if context.debug or context.repodata_threads == 1
-                    else partial(ThreadLimitedThreadPoolExecutor,
-                                 max_workers=context.repodata_threads))
-        with Executor() as executor:
-            result = tuple(concat(executor.map(subdir_query, channel_urls)))
-        return result
+    @staticmethod
+    def load_all(subdir_datas):
+        """
+        Load every not yet loaded SubdirData in ``subdir_datas`` concurrently.
+
+        All conditional repodata requests are started at once, one thread each, and share
+        the connection pools of CondaSession.  With ``repodata_processes`` configured and at
+        least REPODATA_PROCESS_MIN_SUBDIRS downloads to index, freshly downloaded repodata is
+        indexed into the binary cache by worker processes as soon as each download finishes,
+        so that indexing overlaps the remaining downloads instead of contending for the GIL.
+        This process then builds records from that binary cache lazily, as it always does, so
+        the repodata isn't indexed a second time here.
+        """
+        pending = tuple(IndexedSet(sd for sd in subdir_datas if not sd._loaded))
+        if not pending:
+            return
+        if context.debug or context.repodata_threads == 1 or len(pending) == 1:
+            for subdir_data in pending:
+                subdir_data.load()
+            return
+
+        use_processes = (context.repodata_processes > 0
+                         and len(pending) >= REPODATA_PROCESS_MIN_SUBDIRS)
+        process_executor = (ProcessPoolExecutor(context.repodata_processes,
+                                                mp_context=get_mp_context('spawn'))
+                            if use_processes else None)
+        try:
+            with ThreadLimitedThreadPoolExecutor(context.repodata_threads
+                                                 or len(pending)) as executor:
+                fetch_futures = {}
+                for subdir_data in pending:
+                    subdir_data._start_load()
+                    future = executor.submit(subdir_data._load, defer_parse=use_processes)
+                    fetch_futures[future] = subdir_data
+                index_futures = {}
+                for future in as_completed(fetch_futures):
+                    subdir_data = fetch_futures[future]
+                    _internal_state = future.result()
+                    if _internal_state is None:
+                        index_futures[subdir_data._submit_binary_cache_build(
+                            process_executor)] = subdir_data
+                    else:
+                        subdir_data._finish_load(_internal_state)
+                for future in as_completed(index_futures):
+                    index_futures[future]._finish_deferred_load(future)
+        finally:
+            if process_executor is not None:
+                process_executor.shutdown(wait=False)
 
     def query(self, package_ref_or_match_spec):
         if not self._loaded:
@@ -182,6 +263,8 @@ class SubdirData(object):
         self.repodata_fn = repodata_fn
         self._loaded = False
         self._key_mgr = None
+        self._timing = None
+        self._parsed_spec_strs = None
 
     def reload(self):
         self._loaded = False
@@ -203,11 +286,28 @@ class SubdirData(object):
         return self.cache_path_base + ('1' if context.use_only_tar_bz2 else '') + '.json'
 
     @property
-    def cache_path_pickle(self):
-        return self.cache_path_base + ('1' if context.use_only_tar_bz2 else '') + '.q'
+    def cache_path_shards(self):
+        return self.cache_path_base + ('1' if context.use_only_tar_bz2 else '') + '.shards.json'
+
+    @property
+    def cache_path_binary(self):
+        return self.cache_path_base + ('1' if context.use_only_tar_bz2 else '') + '.bin'
+
+    @property
+    def cache_path_jlap(self):
+        return self.cache_path_base + '.jlap'
 
     def load(self):
-        _internal_state = self._load()
+        self._start_load()
+        self._finish_load(self._load())
+        return self
+
+    def _start_load(self):
+        self._load_start_time = time()
+        self._timing = (dict(ttfb=0.0, transfer=0.0, parse=None, status='cached')
+                        if repodata_timing_enabled() else None)
+
+    def _finish_load(self, _internal_state):
         if _internal_state.get("repodata_version", 0) > MAX_REPODATA_VERSION:
             raise CondaUpgradeError(dals("""
                 The current version of conda is too old to read repodata from
@@ -222,14 +322,104 @@ class SubdirData(object):
         self._package_records = _internal_state['_package_records']
         self._names_index = _internal_state['_names_index']
         self._track_features_index = _internal_state['_track_features_index']
+        # the binary cache may have been rewritten without the parsed specs
+        self._parsed_spec_strs = None
         self._loaded = True
-        return self
+        timing = self._timing
+        if timing is not None:
+            if timing['parse'] is None:
+                network_time = timing['ttfb'] + timing['transfer']
+                timing['parse'] = max(time() - self._load_start_time - network_time, 0.0)
+            report_repodata_timing(RepodataTiming(url=self.url_w_repodata_fn, **timing))
+
+    def _submit_binary_cache_build(self, process_executor):
+        # The fetch stage left freshly downloaded repodata in cache_path_json; index it into
+        # the binary cache in a worker process.  The worker can't see this process's context,
+        # so everything that goes into the validation state is passed explicitly.
+        base_state = {
+            '_schannel': self.channel.canonical_name,
+            '_add_pip': context.add_pip_as_python_dependency,
+            '_pickle_version': REPODATA_PICKLE_VERSION,
+            'fn': self.repodata_fn,
+        }
+        return process_executor.submit(build_binary_repodata_cache, self.cache_path_json,
+                                       self.cache_path_binary, base_state,
+                                       context.use_only_tar_bz2)
+
+    def _finish_deferred_load(self, future):
+        start = time()
+        try:
+            index_time = future.result()
+        except Exception:
+            # fall back to indexing in this process
+            log.debug("Failed to index repodata for %s in a worker process.",
+                      self.url_w_repodata_fn, exc_info=True)
+            index_time = 0.0
+        mod_etag_headers = read_mod_and_etag(self.cache_path_json)
+        _internal_state = self._read_local_repdata(mod_etag_headers.get('_etag'),
+                                                   mod_etag_headers.get('_mod'))
+        if self._timing is not None:
+            self._timing['parse'] = index_time + time() - start
+        self._finish_load(_internal_state)
 
     def iter_records(self):
         if not self._loaded:
             self.load()
         return iter(self._package_records)
 
+    def load_parsed_specs(self):
+        """Have the spec strings that earlier solves parsed from the depends and constrains of
+        this subdir's records take their components from the binary repodata cache.
+        """
+        if self._parsed_spec_strs is not None:
+            return
+        self._parsed_spec_strs = frozenset()
+        if not isfile(self.cache_path_binary):
+            return
+        try:
+            binary_cache = read_binary_repodata_cache(self.cache_path_binary)
+            try:
+                parsed_specs = binary_cache.read_parsed_specs()
+            finally:
+                binary_cache.close()
+        except Exception:
+            log.debug("Failed to load parsed specs from %s", self.cache_path_binary,
+                      exc_info=True)
+            return
+        # components are only good for the conda version that parsed them
+        if parsed_specs and parsed_specs['conda'] == CONDA_VERSION:
+            load_parsed_spec_strs(parsed_specs['specs'])
+            self._parsed_spec_strs = frozenset(concatv(parsed_specs['specs'],
+                                                       parsed_specs['skipped']))
+
+    def save_parsed_specs(self, precs):
+        """Store the parsed depends and constrains of ``precs``, records of this subdir, with
+        the binary repodata cache, for load_parsed_specs in later solves.
+        """
+        if not isfile(self.cache_path_binary):
+            return
+        self.load_parsed_specs()
+        spec_strs = set(concat(concatv(prec.depends, prec.constrains or ()) for prec in precs))
+        if spec_strs <= self._parsed_spec_strs:
+            return
+        spec_strs.update(self._parsed_spec_strs)
+        try:
+            dumped = dump_parsed_spec_strs(spec_strs)
+        except InvalidSpec as e:
+            log.debug("Not caching parsed specs for %s: %r", self.url_w_repodata_fn, e)
+            return
+        try:
+            write_binary_cache_parsed_specs(self.cache_path_binary, {
+                'conda': CONDA_VERSION,
+                'specs': dumped,
+                'skipped': sorted(spec_strs.difference(dumped)),
+            })
+        except Exception:
+            log.debug("Failed to store parsed specs in %s", self.cache_path_binary,
+                      exc_info=True)
+        else:
+            self._parsed_spec_strs = frozenset(spec_strs)
+
     def _refresh_signing_metadata(self):
         if not isdir(context.av_data_dir):
             log.info("creating directory for artifact verification metadata")
@@ -314,7 +504,14 @@ class SubdirData(object):
         if self._key_mgr is None and exists(key_mgr_path):
             self._key_mgr = load_trust_metadata_from_file(key_mgr_path)
 
-    def _load(self):
+    def _load(self, defer_parse=False):
+        # With defer_parse, freshly downloaded repodata is only written to cache_path_json
+        # and None is returned; the caller is responsible for indexing it.
+        if context.repodata_shards_enabled and self.repodata_fn == REPODATA_FN:
+            _internal_state = self._load_shards()
+            if _internal_state is not None:
+                return _internal_state
+
         try:
             mtime = getmtime(self.cache_path_json)
         except (IOError, OSError):
@@ -372,18 +569,26 @@ class SubdirData(object):
                 self._refresh_signing_metadata()
 
         try:
-            raw_repodata_str = fetch_repodata_remote_request(
-                self.url_w_credentials,
-                mod_etag_headers.get('_etag'),
-                mod_etag_headers.get('_mod'),
-                repodata_fn=self.repodata_fn)
+            raw_repodata_str = repodata_index = None
+            if (context.repodata_jlap_enabled and self.repodata_fn == REPODATA_FN
+                    and mod_etag_headers.get('_content_hash')):
+                patched = self._fetch_patched_repodata(mod_etag_headers['_content_hash'])
+                if patched is not None:
+                    raw_repodata_str, repodata_index = patched
+            if raw_repodata_str is None:
+                raw_repodata_str = fetch_repodata_remote_request(
+                    self.url_w_credentials,
+                    mod_etag_headers.get('_etag'),
+                    mod_etag_headers.get('_mod'),
+                    repodata_fn=self.repodata_fn,
+                    timing=self._timing)
             # empty file
             if not raw_repodata_str and self.repodata_fn != REPODATA_FN:
                 raise UnavailableInvalidChannel(self.url_w_repodata_fn, 404)
         except UnavailableInvalidChannel:
             if self.repodata_fn != REPODATA_FN:
                 self.repodata_fn = REPODATA_FN
-                return self._load()
+                return self._load(defer_parse)
             else:
                 raise
         except Response304ContentUnchanged:
@@ -404,27 +609,202 @@ class SubdirData(object):
                     raise NotWritableError(self.cache_path_json, e.errno, caused_by=e)
                 else:
                     raise
-            _internal_state = self._process_raw_repodata_str(raw_repodata_str)
-            self._internal_state = _internal_state
-            self._pickle_me()
+            if repodata_index is not None:
+                # already indexed, so there is nothing to defer
+                return self._process_patched_repodata(raw_repodata_str, repodata_index)
+            if defer_parse:
+                return None
+            _internal_state = self._process_raw_repodata_str(raw_repodata_str,
+                                                             write_binary_cache=True)
             return _internal_state
 
-    def _pickle_me(self):
+    def _load_shards(self):
+        # Channels may publish repodata split into one shard per package name, next to
+        # repodata.json:
+        #
+        #   repodata_shards.json   {"info": {...}, "repodata_version": 1,
+        #                           "shards": {<package name>: <sha256 of the shard>, ...},
+        #                           "track_features": {<feature>: [<package name>, ...]}}
+        #   shards/<sha256>.json   {"packages": {...}, "packages.conda": {...}}
+        #
+        # Returns None if the channel has no repodata_shards.json, so the caller falls back
+        # to repodata.json.
+        cache_path = self.cache_path_shards
+        raw_shards_str = None
+        if isfile(cache_path) and (context.offline or context.use_index_cache):
+            log.debug("Using cached repodata shard index for %s at %s", self.url_w_subdir,
+                      cache_path)
+        elif context.offline and not self.url_w_subdir.startswith('file://'):
+            return None
+        else:
+            mod_etag_headers = read_mod_and_etag(cache_path) if isfile(cache_path) else {}
+            try:
+                raw_shards_str = fetch_repodata_remote_request(
+                    self.url_w_credentials,
+                    mod_etag_headers.get('_etag'),
+                    mod_etag_headers.get('_mod'),
+                    repodata_fn=REPODATA_SHARDS_FN,
+                    timing=self._timing)
+            except Response304ContentUnchanged:
+                touch(cache_path)
+            except (UnavailableInvalidChannel, CondaHTTPError) as e:
+                log.debug("No repodata shards for %s: %r", self.url_w_subdir, e)
+                return None
+            else:
+                if not raw_shards_str:
+                    return None
+                mkdir_p(dirname(cache_path))
+                with io_open(cache_path, 'w') as fh:
+                    fh.write(raw_shards_str)
+
+        if raw_shards_str is None:
+            with io_open(cache_path) as fh:
+                raw_shards_str = fh.read()
+        json_obj = json.loads(raw_shards_str)
+        sharded_records = ShardedRecordIndex(json_obj.get('shards', {}),
+                                             json_obj.get('track_features', {}),
+                                             self._load_shard,
+                                             self._package_record_factory(json_obj),
+                                             context.use_only_tar_bz2)
+        return self._make_internal_state(json_obj, sharded_records, lazy=True)
+
+    def _load_shard(self, shard_hash):
+        # Shards are content addressed, so a cached shard never needs revalidating.
+        # Returns None for a shard that isn't cached and mustn't be fetched, like _load
+        #   returning empty repodata.
+        cache_path = join(create_cache_dir(), 'shards', shard_hash + '.json')
+        if not isfile(cache_path):
+            if context.use_index_cache or (context.offline
+                                           and not self.url_w_subdir.startswith('file://')):
+                log.debug("Repodata shard %s for %s is not cached; skipping it.",
+                          shard_hash, self.url_w_subdir)
+                return None
+            raw_shard = fetch_repodata_shard(self.url_w_credentials, shard_hash)
+            mkdir_p(dirname(cache_path))
+            tmp_path = "%s.%s.tmp" % (cache_path, uuid4().hex[:8])
+            with open(tmp_path, 'wb') as fh:
+                fh.write(raw_shard)
+            os.replace(tmp_path, cache_path)
+            return raw_shard.decode('utf-8')
+        with io_open(cache_path) as fh:
+            return fh.read()
+
+    def _fetch_repodata_jlap(self):
         try:
-            log.debug("Saving pickled state for %s at %s", self.url_w_repodata_fn,
-                      self.cache_path_json)
-            with open(self.cache_path_pickle, 'wb') as fh:
-                pickle.dump(self._internal_state, fh, -1)  # -1 means HIGHEST_PROTOCOL
+            with open(self.cache_path_jlap, 'rb') as fh:
+                cached_jlap = fh.read()
+        except (IOError, OSError):
+            cached_jlap = b''
+        try:
+            jlap = fetch_repodata_jlap(self.url_w_credentials, cached_jlap, self._timing)
+            patches, metadata = parse_jlap(jlap)
+        except (HTTPError, ValueError) as e:
+            if not cached_jlap:
+                raise
+            # e.g. 416 Range Not Satisfiable; the server started a new patch series
+            log.debug("Cached repodata.jlap for %s is stale: %r", self.url_w_subdir, e)
+            jlap = fetch_repodata_jlap(self.url_w_credentials, timing=self._timing)
+            patches, metadata = parse_jlap(jlap)
+        tmp_path = "%s.%s.tmp" % (self.cache_path_jlap, uuid4().hex[:8])
+        try:
+            with open(tmp_path, 'wb') as fh:
+                fh.write(jlap)
+            os.replace(tmp_path, self.cache_path_jlap)
+        except (IOError, OSError):
+            log.debug("Failed to write %s", self.cache_path_jlap, exc_info=True)
+        finally:
+            rm_rf(tmp_path)
+        return patches, metadata
+
+    def _fetch_patched_repodata(self, cached_hash):
+        # Bring the cached repodata.json up to date by applying the channel's repodata.jlap
+        # patch series to it.  Returns a tuple of the patched document and, when it could be
+        # built from the binary cache, its index; or None when patching is not possible, so
+        # that the caller falls back to downloading the full repodata.json.
+        try:
+            patches, metadata = self._fetch_repodata_jlap()
+        except (ConnectionError, HTTPError, SSLError, ValueError) as e:
+            log.debug("Unable to use repodata.jlap for %s: %r", self.url_w_subdir, e)
+            return None
+
+        latest = metadata["latest"]
+        if latest == cached_hash:
+            raise Response304ContentUnchanged()
+        patch_chain = find_patch_chain(patches, cached_hash, latest)
+        if patch_chain is None:
+            log.debug("No repodata.jlap patch path from %s to %s for %s",
+                      cached_hash, latest, self.url_w_subdir)
+            return None
+
+        binary_cache = self._open_binary_cache_for_patching(cached_hash)
+        if binary_cache is not None:
+            try:
+                patched = patch_indexed_repodata(binary_cache, patch_chain, latest)
+            except ValueError as e:
+                log.debug("Unable to patch the binary cache of %s: %r", self.url_w_subdir, e)
+            else:
+                log.debug("Applied %d repodata.jlap patches to %s", len(patch_chain),
+                          self.cache_path_binary)
+                return patched
+            finally:
+                binary_cache.close()
+
+        with open(self.cache_path_json) as fh:
+            repodata = json.load(fh)
+        try:
+            for patch in patch_chain:
+                apply_json_patch(repodata, patch["patch"])
+        except ValueError as e:
+            log.debug("Failed to apply repodata.jlap patches for %s: %r", self.url_w_subdir, e)
+            return None
+        log.debug("Applied %d repodata.jlap patches to %s", len(patch_chain),
+                  self.cache_path_json)
+        # the cached document no longer matches the etag/last-modified of the full file, and
+        # _content_hash goes first, where read_mod_and_etag looks for it
+        patched_repodata = odict([('_content_hash', latest)])
+        patched_repodata.update((key, value) for key, value in iteritems(repodata)
+                                if key not in ('_etag', '_mod', '_content_hash'))
+        return json.dumps(patched_repodata), None
+
+    def _open_binary_cache_for_patching(self, cached_hash):
+        # The binary cache of the document hashed ``cached_hash``, or None.  A cache indexed
+        # with use_only_tar_bz2 lacks the .conda entries, so it can't stand in for the document.
+        if context.use_only_tar_bz2 or not isfile(self.cache_path_binary):
+            return None
+        try:
+            binary_cache = read_binary_repodata_cache(self.cache_path_binary)
         except Exception:
-            log.debug("Failed to dump pickled repodata.", exc_info=True)
+            log.debug("Failed to load binary repodata cache.", exc_info=True)
+            return None
+        validation_state = binary_cache.validation_state
+        if (binary_cache.json_obj.get('_content_hash') != cached_hash
+                or validation_state.get('_url') != self.url_w_credentials
+                or validation_state.get('_pickle_version') != REPODATA_PICKLE_VERSION
+                or validation_state.get('fn') != self.repodata_fn):
+            binary_cache.close()
+            return None
+        return binary_cache
+
+    def _write_binary_cache(self, raw_repodata_str, json_obj, entries_by_name,
+                            entries_by_feature):
+        try:
+            log.debug("Saving binary cache for %s at %s", self.url_w_repodata_fn,
+                      self.cache_path_binary)
+            validation_state = {key: self._internal_state[key]
+                                for key in BINARY_CACHE_VALIDATION_KEYS}
+            write_binary_repodata_cache(self.cache_path_binary, validation_state,
+                                        raw_repodata_str, json_obj, entries_by_name,
+                                        entries_by_feature)
+        except Exception:
+            log.debug("Failed to write binary repodata cache.", exc_info=True)
 
     def _read_local_repdata(self, etag, mod_stamp):
-        # first try reading pickled data
-        _pickled_state = self._read_pickled(etag, mod_stamp)
-        if _pickled_state:
-            return _pickled_state
+        # first try reading the binary cache
+        _binary_state = self._read_binary_cache(etag, mod_stamp)
+        if _binary_state:
+            return _binary_state
 
-        # pickled data is bad or doesn't exist; load cached json
+        # binary cache is bad or doesn't exist; load cached json
         log.debug("Loading raw json for %s at %s", self.url_w_repodata_fn, self.cache_path_json)
         with open(self.cache_path_json) as fh:
             try:
@@ -439,57 +819,83 @@ class SubdirData(object):
                 """)
                 raise CondaError(message)
             else:
-                _internal_state = self._process_raw_repodata_str(raw_repodata_str)
-                self._internal_state = _internal_state
-                self._pickle_me()
+                _internal_state = self._process_raw_repodata_str(raw_repodata_str,
+                                                                 write_binary_cache=True)
                 return _internal_state
 
-    def _read_pickled(self, etag, mod_stamp):
+    def _read_binary_cache(self, etag, mod_stamp):
 
-        if not isfile(self.cache_path_pickle) or not isfile(self.cache_path_json):
-            # Don't trust pickled data if there is no accompanying json data
+        if not isfile(self.cache_path_binary) or not isfile(self.cache_path_json):
+            # Don't trust the binary cache if there is no accompanying json data
             return None
 
         try:
-            if isfile(self.cache_path_pickle):
-                log.debug("found pickle file %s", self.cache_path_pickle)
-            with open(self.cache_path_pickle, 'rb') as fh:
-                _pickled_state = pickle.load(fh)
+            log.debug("found binary cache file %s", self.cache_path_binary)
+            binary_cache = read_binary_repodata_cache(self.cache_path_binary)
         except Exception:
-            log.debug("Failed to load pickled repodata.", exc_info=True)
-            rm_rf(self.cache_path_pickle)
+            log.debug("Failed to load binary repodata cache.", exc_info=True)
+            rm_rf(self.cache_path_binary)
             return None
-
-        def _check_pickled_valid():
-            yield _pickled_state.get('_url') == self.url_w_credentials
-            yield _pickled_state.get('_schannel') == self.channel.canonical_name
-            yield _pickled_state.get('_add_pip') == context.add_pip_as_python_dependency
-            yield _pickled_state.get('_mod') == mod_stamp
-            yield _pickled_state.get('_etag') == etag
-            yield _pickled_state.get('_pickle_version') == REPODATA_PICKLE_VERSION
-            yield _pickled_state.get('fn') == self.repodata_fn
-
-        if not all(_check_pickled_valid()):
-            log.debug("Pickle load validation failed for %s at %s.",
+        validation_state = binary_cache.validation_state
+
+        def _check_binary_cache_valid():
+            yield validation_state.get('_url') == self.url_w_credentials
+            yield validation_state.get('_schannel') == self.channel.canonical_name
+            yield validation_state.get('_add_pip') == context.add_pip_as_python_dependency
+            yield validation_state.get('_mod') == mod_stamp
+            yield validation_state.get('_etag') == etag
+            yield validation_state.get('_pickle_version') == REPODATA_PICKLE_VERSION
+            yield validation_state.get('fn') == self.repodata_fn
+
+        if not all(_check_binary_cache_valid()):
+            log.debug("Binary cache validation failed for %s at %s.",
                       self.url_w_repodata_fn, self.cache_path_json)
+            binary_cache.close()
             return None
 
-        return _pickled_state
+        # Records are always built lazily from a valid binary cache; building all of them up
+        #   front would cost what the cache is there to save.
+        return self._process_indexed_repodata(binary_cache.json_obj,
+                                              binary_cache.entries_by_name,
+                                              binary_cache.entries_by_feature,
+                                              binary_cache.decode_entry, lazy=True)
+
+    def _process_raw_repodata_str(self, raw_repodata_str, write_binary_cache=False):
+        raw_repodata_str = raw_repodata_str or '{}'
+        decoded_entries = {}
+        json_obj, entries_by_name, entries_by_feature = index_raw_repodata_str(
+            raw_repodata_str, context.use_only_tar_bz2, decoded_entries)
+        decode = partial(_pop_decoded_entry, decoded_entries)
+        _internal_state = self._process_indexed_repodata(json_obj, entries_by_name,
+                                                         entries_by_feature, decode)
+        if write_binary_cache:
+            self._write_binary_cache(raw_repodata_str, json_obj, entries_by_name,
+                                     entries_by_feature)
+        return _internal_state
 
-    def _process_raw_repodata_str(self, raw_repodata_str):
-        json_obj = json.loads(raw_repodata_str or '{}')
+    def _process_patched_repodata(self, raw_repodata_str, repodata_index):
+        json_obj, entries_by_name, entries_by_feature = repodata_index
+        decode = partial(_decode_raw_entry, raw_repodata_str)
+        _internal_state = self._process_indexed_repodata(json_obj, entries_by_name,
+                                                         entries_by_feature, decode, lazy=True)
+        self._write_binary_cache(raw_repodata_str, json_obj, entries_by_name,
+                                 entries_by_feature)
+        return _internal_state
 
+    def _process_indexed_repodata(self, json_obj, entries_by_name, entries_by_feature,
+                                  decode_entry, lazy=None):
+        lazy_records = LazyRecordIndex(entries_by_name, entries_by_feature, decode_entry,
+                                       self._package_record_factory(json_obj))
+        if lazy is None:
+            lazy = context.lazy_repodata
+        return self._make_internal_state(json_obj, lazy_records, lazy)
+
+    def _make_internal_state(self, json_obj, record_index, lazy):
         subdir = json_obj.get('info', {}).get('subdir') or self.channel.subdir
         assert subdir == self.channel.subdir
         add_pip = context.add_pip_as_python_dependency
         schannel = self.channel.canonical_name
 
-        self._package_records = _package_records = []
-        self._names_index = _names_index = defaultdict(list)
-        self._track_features_index = _track_features_index = defaultdict(list)
-
-        signatures = json_obj.get("signatures", {})
-
         _internal_state = {
             'channel': self.channel,
             'url_w_subdir': self.url_w_subdir,
@@ -497,10 +903,6 @@ class SubdirData(object):
             'cache_path_base': self.cache_path_base,
             'fn': self.repodata_fn,
 
-            '_package_records': _package_records,
-            '_names_index': _names_index,
-            '_track_features_index': _track_features_index,
-
             '_etag': json_obj.get('_etag'),
             '_mod': json_obj.get('_mod'),
             '_cache_control': json_obj.get('_cache_control'),
@@ -520,23 +922,41 @@ class SubdirData(object):
                 Please update conda to use this channel.
                 """) % self.url_w_subdir)
 
+        if lazy:
+            _package_records = record_index
+            _names_index = record_index.names_index
+            _track_features_index = record_index.track_features_index
+        else:
+            _package_records = list(record_index)
+            _names_index = defaultdict(list)
+            _track_features_index = defaultdict(list)
+            for package_record in _package_records:
+                _names_index[package_record.name].append(package_record)
+                for ftr_name in package_record.track_features:
+                    _track_features_index[ftr_name].append(package_record)
+
+        self._package_records = _internal_state['_package_records'] = _package_records
+        self._names_index = _internal_state['_names_index'] = _names_index
+        self._track_features_index = _internal_state['_track_features_index'] = (
+            _track_features_index)
+        self._internal_state = _internal_state
+        return _internal_state
+
+    def _package_record_factory(self, json_obj):
+        # Returns a function turning one raw repodata entry into a PackageRecord, or None if
+        # the entry should be ignored.  Shared by eager, lazy and sharded loading of repodata.
+        add_pip = context.add_pip_as_python_dependency
+        channel_url = self.url_w_credentials
+        signatures = json_obj.get("signatures", {})
+        interned = {}  # strings and depends tuples shared by all records of this subdir
         meta_in_common = {  # just need to make this once, then apply with .update()
             'arch': json_obj.get('info', {}).get('arch'),
             'channel': self.channel,
             'platform': json_obj.get('info', {}).get('platform'),
-            'schannel': schannel,
-            'subdir': subdir,
+            'schannel': self.channel.canonical_name,
+            'subdir': self.channel.subdir,
         }
 
-        channel_url = self.url_w_credentials
-        legacy_packages = json_obj.get("packages", {})
-        conda_packages = {} if context.use_only_tar_bz2 else json_obj.get("packages.conda", {})
-
-        _tar_bz2 = CONDA_PACKAGE_EXTENSION_V1
-        use_these_legacy_keys = set(iterkeys(legacy_packages)) - set(
-            k[:-6] + _tar_bz2 for k in iterkeys(conda_packages)
-        )
-
         if context.extra_safety_checks:
             if cct is None:
                 log.warn("metadata signature verification requested, "
@@ -553,53 +973,601 @@ class SubdirData(object):
         else:
             verify_metadata_signatures = False
 
-        for group, copy_legacy_md5 in (
-                (iteritems(conda_packages), True),
-                (((k, legacy_packages[k]) for k in use_these_legacy_keys), False)):
-            for fn, info in group:
-
-                # Verify metadata signature before anything else so run-time
-                # updates to the info dictionary performed below do not
-                # invalidate the signatures provided in metadata.json.
-                if verify_metadata_signatures:
-                    if fn in signatures:
-                        signable = wrap_as_signable(info)
-                        signable['signatures'].update(signatures[fn])
-                        try:
-                            verify_trust_delegation('pkg_mgr', signable, self._key_mgr)
-                            info['metadata_signature_status'] = MetadataSignatureStatus.verified
-                        # TODO (AV): more granular signature errors (?)
-                        except SignatureError:
-                            log.warn(f"invalid signature for {fn}")
-                            info['metadata_signature_status'] = MetadataSignatureStatus.error
-                    else:
-                        info['metadata_signature_status'] = MetadataSignatureStatus.unsigned
-
-                info['fn'] = fn
-                info['url'] = join_url(channel_url, fn)
-                if copy_legacy_md5:
-                    counterpart = fn.replace('.conda', '.tar.bz2')
-                    if counterpart in legacy_packages:
-                        info['legacy_bz2_md5'] = legacy_packages[counterpart].get('md5')
-                        info['legacy_bz2_size'] = legacy_packages[counterpart].get('size')
-                if (add_pip and info['name'] == 'python' and
-                        info['version'].startswith(('2.', '3.'))):
-                    info['depends'].append('pip')
-                info.update(meta_in_common)
-                if info.get('record_version', 0) > 1:
-                    log.debug("Ignoring record_version %d from %s",
-                              info["record_version"], info['url'])
-                    continue
-
-                package_record = PackageRecord(**info)
-
-                _package_records.append(package_record)
-                _names_index[package_record.name].append(package_record)
-                for ftr_name in package_record.track_features:
-                    _track_features_index[ftr_name].append(package_record)
+        def make_package_record(fn, info, legacy_info):
+            # Verify metadata signature before anything else so run-time
+            # updates to the info dictionary performed below do not
+            # invalidate the signatures provided in metadata.json.
+            if verify_metadata_signatures:
+                if fn in signatures:
+                    signable = wrap_as_signable(info)
+                    signable['signatures'].update(signatures[fn])
+                    try:
+                        verify_trust_delegation('pkg_mgr', signable, self._key_mgr)
+                        info['metadata_signature_status'] = MetadataSignatureStatus.verified
+                    # TODO (AV): more granular signature errors (?)
+                    except SignatureError:
+                        log.warn(f"invalid signature for {fn}")
+                        info['metadata_signature_status'] = MetadataSignatureStatus.error
+                else:
+                    info['metadata_signature_status'] = MetadataSignatureStatus.unsigned
+
+            info['fn'] = fn
+            info['url'] = join_url(channel_url, fn)
+            if legacy_info is not None:
+                info['legacy_bz2_md5'] = legacy_info.get('md5')
+                info['legacy_bz2_size'] = legacy_info.get('size')
+            if (add_pip and info['name'] == 'python' and
+                    info['version'].startswith(('2.', '3.'))):
+                info['depends'].append('pip')
+            info.update(meta_in_common)
+            if info.get('record_version', 0) > 1:
+                log.debug("Ignoring record_version %d from %s",
+                          info["record_version"], info['url'])
+                return None
+            return PackageRecord.from_repodata(info, interned)
 
-        self._internal_state = _internal_state
-        return _internal_state
+        return make_package_record
+
+
+class RepodataEntry(namedtuple('RepodataEntry', ('fn', 'span', 'legacy_span'))):
+    """Location of a single package entry within a raw repodata document.
+
+    ``span`` is the (start, end) offset of the entry's JSON object, and ``legacy_span`` is
+    the offset of the matching .tar.bz2 entry for a .conda package, if there is one.
+    """
+    __slots__ = ()
+
+
+class LazyRecordIndex(object):
+    """PackageRecords of a subdir, materialized from raw repodata entries only when a
+    package name (or track_feature) is first looked up.
+
+    Iterating the index materializes every record.
+    """
+
+    def __init__(self, entries_by_name, entries_by_feature, decode_entry, make_package_record):
+        self._entries_by_name = entries_by_name
+        self._entries_by_feature = entries_by_feature
+        self._decode_entry = decode_entry
+        self._make_package_record = make_package_record
+        self._records_by_span = {}
+        self._records_by_name = {}
+        self.names_index = _LazyGroupIndex(entries_by_name, self.get_by_name)
+        self.track_features_index = _LazyGroupIndex(entries_by_feature, self.get_by_feature)
+
+    def __iter__(self):
+        for name in self._entries_by_name:
+            for package_record in self.get_by_name(name):
+                yield package_record
+
+    def __len__(self):
+        return sum(len(entries) for entries in itervalues(self._entries_by_name))
+
+    def get_by_name(self, name):
+        try:
+            return self._records_by_name[name]
+        except KeyError:
+            records = self._records_by_name[name] = self._materialize(
+                self._entries_by_name.get(name, ()))
+            return records
+
+    def get_by_feature(self, feature_name):
+        return self._materialize(self._entries_by_feature.get(feature_name, ()))
+
+    def _materialize(self, entries):
+        records = []
+        for entry in entries:
+            try:
+                package_record = self._records_by_span[entry.span]
+            except KeyError:
+                info, legacy_info = self._decode_entry(entry)
+                package_record = self._records_by_span[entry.span] = self._make_package_record(
+                    entry.fn, info, legacy_info)
+            if package_record is not None:
+                records.append(package_record)
+        return records
+
+
+class ShardedRecordIndex(object):
+    """PackageRecords of a subdir published as one repodata shard per package name.
+
+    A shard is fetched, and its records built, only when its package name (or a name listed
+    for a looked-up track_feature) is first queried, or prefetched with other names.
+    Iterating the index, or taking its length, fetches every shard.
+    """
+
+    def __init__(self, shards, names_by_feature, load_shard, make_package_record,
+                 use_only_tar_bz2=False):
+        self._shards = shards
+        self._names_by_feature = names_by_feature
+        self._load_shard = load_shard
+        self._make_package_record = make_package_record
+        self._use_only_tar_bz2 = use_only_tar_bz2
+        self._records_by_name = {}
+        self._prefetched_shards = {}
+        self.names_index = _LazyGroupIndex(shards, self.get_by_name)
+        self.track_features_index = _LazyGroupIndex(names_by_feature, self.get_by_feature)
+
+    def __iter__(self):
+        self.prefetch(self._shards)
+        for name in self._shards:
+            for package_record in self.get_by_name(name):
+                yield package_record
+
+    def __len__(self):
+        self.prefetch(self._shards)
+        return sum(len(self.get_by_name(name)) for name in self._shards)
+
+    def prefetch(self, names, max_workers=None):
+        """Load the shards of those of ``names`` not loaded yet, concurrently."""
+        shard_hashes = set(self._shards[name] for name in names
+                           if name in self._shards and name not in self._records_by_name)
+        shard_hashes.difference_update(self._prefetched_shards)
+        if len(shard_hashes) < 2:
+            return
+        with ThreadLimitedThreadPoolExecutor(max_workers or len(shard_hashes)) as executor:
+            futures = {executor.submit(self._load_shard, shard_hash): shard_hash
+                       for shard_hash in shard_hashes}
+            for future in as_completed(futures):
+                self._prefetched_shards[futures[future]] = future.result()
+
+    def get_by_name(self, name):
+        try:
+            return self._records_by_name[name]
+        except KeyError:
+            pass
+        shard_hash = self._shards.get(name)
+        raw_shard = None
+        if shard_hash is not None:
+            try:
+                raw_shard = self._prefetched_shards.pop(shard_hash)
+            except KeyError:
+                raw_shard = self._load_shard(shard_hash)
+        if raw_shard is None:
+            if shard_hash is not None:
+                # Not cached and can't be fetched now; look again on the next query.
+                return []
+            records = []
+        else:
+            decoded_entries = {}
+            _, entries_by_name, _ = index_raw_repodata_str(raw_shard, self._use_only_tar_bz2,
+                                                           decoded_entries)
+            decode = partial(_pop_decoded_entry, decoded_entries)
+            records = list(LazyRecordIndex(entries_by_name, {}, decode,
+                                           self._make_package_record))
+        self._records_by_name[name] = records
+        return records
+
+    def get_by_feature(self, feature_name):
+        return [package_record
+                for name in self._names_by_feature.get(feature_name, ())
+                for package_record in self.get_by_name(name)
+                if feature_name in package_record.track_features]
+
+
+class _LazyGroupIndex(object):
+    # Read-only stand-in for the ``defaultdict(list)`` indexes of an eagerly loaded SubdirData.
+
+    def __init__(self, entries, getter):
+        self._entries = entries
+        self._getter = getter
+
+    def __getitem__(self, key):
+        return self._getter(key)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def keys(self):
+        return self._entries.keys()
+
+
+def _pop_decoded_entry(decoded_entries, entry):
+    # LazyRecordIndex decodes each entry only once, and a legacy entry belongs to a single
+    #   .conda entry, so the decoded objects can be let go of
+    info = decoded_entries.pop(entry.span)
+    legacy_info = None
+    if entry.legacy_span is not None:
+        legacy_info = decoded_entries.pop(entry.legacy_span)
+    return info, legacy_info
+
+
+def _decode_raw_entry(raw_repodata_str, entry):
+    info = json.loads(raw_repodata_str[entry.span[0]:entry.span[1]])
+    legacy_info = None
+    if entry.legacy_span is not None:
+        legacy_info = json.loads(raw_repodata_str[entry.legacy_span[0]:entry.legacy_span[1]])
+    return info, legacy_info
+
+
+def _scan_json_object(raw, idx, on_value):
+    # Walk the members of the JSON object starting at raw[idx] == '{', calling
+    # on_value(key, value_start) for each member; on_value returns the end offset of the value.
+    # Returns the offset just past the closing brace.
+    ws = JSON_WHITESPACE.match
+    if raw[idx:idx + 1] != '{':
+        raise json.JSONDecodeError("Expecting '{'", raw, idx)
+    idx = ws(raw, idx + 1).end()
+    if raw[idx:idx + 1] == '}':
+        return idx + 1
+    while True:
+        if raw[idx:idx + 1] != '"':
+            raise json.JSONDecodeError("Expecting property name enclosed in double quotes",
+                                       raw, idx)
+        key, idx = json_scanstring(raw, idx + 1)
+        idx = ws(raw, idx).end()
+        if raw[idx:idx + 1] != ':':
+            raise json.JSONDecodeError("Expecting ':' delimiter", raw, idx)
+        idx = on_value(key, ws(raw, idx + 1).end())
+        idx = ws(raw, idx).end()
+        nextchar = raw[idx:idx + 1]
+        if nextchar == '}':
+            return idx + 1
+        if nextchar != ',':
+            raise json.JSONDecodeError("Expecting ',' delimiter", raw, idx)
+        idx = ws(raw, idx + 1).end()
+
+
+def index_raw_repodata_str(raw_repodata_str, use_only_tar_bz2=False, decoded_entries=None):
+    """Index a raw repodata.json document in a single pass, without building PackageRecords.
+
+    Returns a tuple of
+      - the decoded top-level document, without its "packages" and "packages.conda" members,
+      - a dict mapping package name to a list of RepodataEntry,
+      - a dict mapping track_features name to a list of RepodataEntry.
+
+    Offsets in the returned entries point back into ``raw_repodata_str``.  Every package
+    entry has to be decoded to find its name; if ``decoded_entries`` is given, the decoded
+    objects of the returned entries (and of their legacy entries) are stored in it by span,
+    so that they don't have to be decoded again.
+    """
+    raw_decode = json.JSONDecoder().raw_decode
+    json_obj = {}
+    sections = {"packages": [], "packages.conda": []}
+
+    def on_package(section, fn, value_start):
+        info, value_end = raw_decode(raw_repodata_str, value_start)
+        section.append((fn, (value_start, value_end), info))
+        return value_end
+
+    def on_top_level_value(key, value_start):
+        if key in sections and raw_repodata_str[value_start:value_start + 1] == '{':
+            return _scan_json_object(raw_repodata_str, value_start,
+                                     partial(on_package, sections[key]))
+        json_obj[key], value_end = raw_decode(raw_repodata_str, value_start)
+        return value_end
+
+    idx = JSON_WHITESPACE.match(raw_repodata_str, 0).end()
+    idx = _scan_json_object(raw_repodata_str, idx, on_top_level_value)
+    if JSON_WHITESPACE.match(raw_repodata_str, idx).end() != len(raw_repodata_str):
+        raise json.JSONDecodeError("Extra data", raw_repodata_str, idx)
+
+    legacy_packages = sections["packages"]
+    conda_packages = () if use_only_tar_bz2 else sections["packages.conda"]
+    legacy_by_fn = {fn: (span, info) for fn, span, info in legacy_packages}
+    _tar_bz2 = CONDA_PACKAGE_EXTENSION_V1
+    superseded_legacy_fns = set(fn[:-6] + _tar_bz2 for fn, _, _ in conda_packages)
+
+    entries_by_name = defaultdict(list)
+    entries_by_feature = defaultdict(list)
+    for group, copy_legacy_md5 in ((conda_packages, True), (legacy_packages, False)):
+        for fn, span, info in group:
+            legacy_span = None
+            if copy_legacy_md5:
+                legacy = legacy_by_fn.get(fn.replace('.conda', '.tar.bz2'))
+                if legacy is not None:
+                    legacy_span, legacy_info = legacy
+                    if decoded_entries is not None:
+                        decoded_entries[legacy_span] = legacy_info
+            elif fn in superseded_legacy_fns:
+                continue
+            entry = RepodataEntry(fn, span, legacy_span)
+            entries_by_name[info.get('name')].append(entry)
+            if decoded_entries is not None:
+                decoded_entries[span] = info
+            track_features = info.get('track_features')
+            if isinstance(track_features, string_types):
+                track_features = track_features.replace(' ', ',').split(',')
+            for ftr_name in (f.strip() for f in track_features or ()):
+                if ftr_name:
+                    entries_by_feature[ftr_name].append(entry)
+    return json_obj, dict(entries_by_name), dict(entries_by_feature)
+
+
+def _binary_cache_entry(row):
+    fn, start, end, legacy_start, legacy_end = row
+    return RepodataEntry(fn, (start, end),
+                         None if legacy_start is None else (legacy_start, legacy_end))
+
+
+class _MmapEntriesByName(Mapping):
+    # Package name -> RepodataEntry list, decoding a name's row table on first access.
+
+    def __init__(self, mm, tables):
+        self._mm = mm
+        self._tables = tables
+        self._entries = {}
+
+    def __getitem__(self, name):
+        try:
+            return self._entries[name]
+        except KeyError:
+            start, end = self._tables[name]
+            entries = self._entries[name] = [_binary_cache_entry(row)
+                                             for row in json.loads(self._mm[start:end])]
+            return entries
+
+    def __iter__(self):
+        return iter(self._tables)
+
+    def __len__(self):
+        return len(self._tables)
+
+
+class BinaryRepodataCache(object):
+    """A memory-mapped binary repodata cache file, as written by write_binary_repodata_cache.
+
+    Only the header is decoded when the file is opened; package entries are decoded from
+    the mapped file as they are looked up.
+    """
+
+    def __init__(self, mm, header):
+        self._mm = mm
+        self._parsed_specs_span = header.get('parsed_specs')
+        self.validation_state = header['state']
+        self.json_obj = header['repodata']
+        self.entries_by_name = _MmapEntriesByName(mm, header['names'])
+        self.entries_by_feature = {
+            ftr_name: [_binary_cache_entry(row) for row in rows]
+            for ftr_name, rows in iteritems(header['track_features'])
+        }
+
+    def decode_entry(self, entry):
+        mm = self._mm
+        info = json.loads(mm[entry.span[0]:entry.span[1]])
+        legacy_info = None
+        if entry.legacy_span is not None:
+            legacy_info = json.loads(mm[entry.legacy_span[0]:entry.legacy_span[1]])
+        return info, legacy_info
+
+    def read_parsed_specs(self):
+        # as stored by write_binary_cache_parsed_specs
+        span = self._parsed_specs_span
+        if span is None:
+            return {}
+        return json.loads(self._mm[span[0]:span[1]])
+
+    def read_span(self, span):
+        return self._mm[span[0]:span[1]].decode('utf-8')
+
+    def close(self):
+        self._mm.close()
+
+
+def write_binary_repodata_cache(path, validation_state, raw_repodata_str, json_obj,
+                                entries_by_name, entries_by_feature):
+    """Write a binary repodata cache file from an index built by index_raw_repodata_str.
+
+    The file starts with a fixed-size preamble (magic bytes, header offset, header length),
+    followed by the utf-8 encoded JSON object of every package entry, one row table per
+    package name locating its entries, and finally a JSON header holding
+    ``validation_state``, the top-level repodata metadata, the location of each name's row
+    table, and the track_features index.
+    """
+    rows_by_span = {}
+    tables = {}
+    tmp_path = "%s.%s.tmp" % (path, uuid4().hex[:8])
+    try:
+        with open(tmp_path, 'wb') as fh:
+            fh.write(BINARY_CACHE_PREAMBLE.pack(BINARY_CACHE_MAGIC, 0, 0))
+
+            def write(data):
+                start = fh.tell()
+                fh.write(data.encode('utf-8'))
+                return start, fh.tell()
+
+            for name, entries in iteritems(entries_by_name):
+                rows = []
+                for entry in entries:
+                    start, end = write(raw_repodata_str[entry.span[0]:entry.span[1]])
+                    legacy_start = legacy_end = None
+                    if entry.legacy_span is not None:
+                        legacy_start, legacy_end = write(
+                            raw_repodata_str[entry.legacy_span[0]:entry.legacy_span[1]])
+                    rows.append([entry.fn, start, end, legacy_start, legacy_end])
+                    rows_by_span[entry.span] = rows[-1]
+                tables[name] = write(json.dumps(rows))
+
+            header_start, header_end = write(json.dumps({
+                'state': validation_state,
+                'repodata': json_obj,
+                'names': tables,
+                'track_features': {
+                    ftr_name: [rows_by_span[entry.span] for entry in entries]
+                    for ftr_name, entries in iteritems(entries_by_feature)
+                },
+            }))
+            fh.seek(0)
+            fh.write(BINARY_CACHE_PREAMBLE.pack(BINARY_CACHE_MAGIC, header_start,
+                                                header_end - header_start))
+        os.replace(tmp_path, path)
+    finally:
+        rm_rf(tmp_path)
+
+
+def _read_binary_cache_header(mm, path):
+    magic, header_offset, header_length = BINARY_CACHE_PREAMBLE.unpack_from(mm, 0)
+    if magic != BINARY_CACHE_MAGIC:
+        raise ValueError("%s is not a binary repodata cache file" % path)
+    return header_offset, json.loads(mm[header_offset:header_offset + header_length])
+
+
+def read_binary_repodata_cache(path):
+    with open(path, 'rb') as fh:
+        mm = mmap(fh.fileno(), 0, access=ACCESS_READ)
+    try:
+        _, header = _read_binary_cache_header(mm, path)
+    except Exception:
+        mm.close()
+        raise
+    return BinaryRepodataCache(mm, header)
+
+
+def write_binary_cache_parsed_specs(path, parsed_specs):
+    """Store the JSON object ``parsed_specs`` in the binary repodata cache file at ``path``,
+    replacing any stored before.
+
+    It goes between the row tables and the header, which is written again after it; the
+    package entries and row tables stay where they are.
+    """
+    with open(path, 'rb') as fh:
+        mm = mmap(fh.fileno(), 0, access=ACCESS_READ)
+    tmp_path = "%s.%s.tmp" % (path, uuid4().hex[:8])
+    try:
+        with closing(mm):
+            header_offset, header = _read_binary_cache_header(mm, path)
+            keep = header.get('parsed_specs', (header_offset,))[0]
+            with open(tmp_path, 'wb') as fh:
+                for start in range(0, keep, BINARY_CACHE_COPY_CHUNK_SIZE):
+                    fh.write(mm[start:min(start + BINARY_CACHE_COPY_CHUNK_SIZE, keep)])
+                specs_start = fh.tell()
+                fh.write(json.dumps(parsed_specs).encode('utf-8'))
+                header['parsed_specs'] = specs_start, fh.tell()
+                header_start = fh.tell()
+                fh.write(json.dumps(header).encode('utf-8'))
+                header_length = fh.tell() - header_start
+                fh.seek(0)
+                fh.write(BINARY_CACHE_PREAMBLE.pack(BINARY_CACHE_MAGIC, header_start,
+                                                    header_length))
+        os.replace(tmp_path, path)
+    finally:
+        rm_rf(tmp_path)
+
+
+def _entry_members(entry):
+    # The (section, fn, span) of the repodata.json members behind ``entry``.
+    if entry.fn.endswith(CONDA_PACKAGE_EXTENSION_V2):
+        yield "packages.conda", entry.fn, entry.span
+        if entry.legacy_span is not None:
+            legacy_fn = entry.fn[:-len(CONDA_PACKAGE_EXTENSION_V2)] + CONDA_PACKAGE_EXTENSION_V1
+            yield "packages", legacy_fn, entry.legacy_span
+    else:
+        yield "packages", entry.fn, entry.span
+
+
+def patch_indexed_repodata(binary_cache, patch_chain, latest):
+    """Apply the jlap ``patch_chain`` to the repodata.json document indexed by
+    ``binary_cache``, decoding only the entries of the package names the patches touch.
+
+    Returns a tuple of the patched document, whose ``_content_hash`` is ``latest``, and its
+    index, as returned by index_raw_repodata_str.  Entries of untouched names are copied
+    from the binary cache as they are.  Raises ValueError for patches that don't operate on
+    single package entries or top-level metadata, or that fail to apply.
+    """
+    sections = ("packages", "packages.conda")
+    touched_fns = set()
+    for patch in patch_chain:
+        for operation in patch["patch"]:
+            for pointer in (operation.get("path"), operation.get("from")):
+                parts = () if pointer is None else split_json_pointer(pointer)
+                if parts and parts[0] in sections:
+                    if len(parts) < 2:
+                        raise ValueError("patch operates on all of %r" % parts[0])
+                    touched_fns.add(parts[1])
+
+    entries_by_name = binary_cache.entries_by_name
+    name_by_fn = {}
+    for name in entries_by_name:
+        for entry in entries_by_name[name]:
+            for _, fn, _ in _entry_members(entry):
+                name_by_fn[fn] = name
+    patched_names = set(name_by_fn[fn] for fn in touched_fns if fn in name_by_fn)
+
+    doc = {key: value for key, value in iteritems(binary_cache.json_obj)
+           if key not in ('_etag', '_mod', '_content_hash')}
+    doc.update((section, {}) for section in sections)
+
+    def add_entries(names):
+        for name in names:
+            for entry in entries_by_name[name]:
+                for section, fn, span in _entry_members(entry):
+                    doc[section][fn] = json.loads(binary_cache.read_span(span))
+
+    add_entries(patched_names)
+    for patch in patch_chain:
+        apply_json_patch(doc, patch["patch"])
+    if any(not isinstance(doc.get(section), dict) for section in sections):
+        raise ValueError("patches replaced a packages section")
+    # a patch may also give an entry the name of a package it didn't touch
+    renamed_names = set(info.get('name') for section in sections
+                        for info in itervalues(doc[section]) if isinstance(info, dict))
+    renamed_names = set(name for name in renamed_names - patched_names
+                        if name in entries_by_name)
+    add_entries(renamed_names)
+    patched_names |= renamed_names
+    patched_str = json.dumps({section: doc.pop(section) for section in sections})
+    _, patched_entries_by_name, patched_entries_by_feature = index_raw_repodata_str(patched_str)
+
+    # Lay out the new document, the top-level metadata first, keeping track of where the
+    #   spans of the binary cache ('old') and of patched_str ('new') end up.
+    json_obj = odict([('_content_hash', latest)])
+    json_obj.update(iteritems(doc))
+    members = {section: [] for section in sections}
+    for name in entries_by_name:
+        if name not in patched_names:
+            for entry in entries_by_name[name]:
+                for section, fn, span in _entry_members(entry):
+                    members[section].append((fn, binary_cache.read_span(span), ('old', span)))
+    for entries in itervalues(patched_entries_by_name):
+        for entry in entries:
+            for section, fn, span in _entry_members(entry):
+                members[section].append((fn, patched_str[span[0]:span[1]], ('new', span)))
+    chunks = [json.dumps(json_obj)[:-1]]
+    length = len(chunks[0])
+    new_spans = {}
+    for section in sections:
+        chunks.append(', %s: {' % json.dumps(section))
+        length += len(chunks[-1])
+        for idx, (fn, text, key) in enumerate(members[section]):
+            prefix = '%s%s: ' % (', ' if idx else '', json.dumps(fn))
+            chunks.extend((prefix, text))
+            start = length + len(prefix)
+            length = start + len(text)
+            new_spans[key] = start, length
+        chunks.append('}')
+        length += 1
+    chunks.append('}')
+
+    def relocate(entry, origin):
+        legacy_span = entry.legacy_span
+        return RepodataEntry(entry.fn, new_spans[origin, entry.span],
+                             None if legacy_span is None else new_spans[origin, legacy_span])
+
+    result_by_name = {}
+    relocated_by_span = {}
+    for name in entries_by_name:
+        if name not in patched_names:
+            result_by_name[name] = []
+            for entry in entries_by_name[name]:
+                relocated_by_span[entry.span] = relocate(entry, 'old')
+                result_by_name[name].append(relocated_by_span[entry.span])
+    result_by_feature = defaultdict(list)
+    for ftr_name, entries in iteritems(binary_cache.entries_by_feature):
+        result_by_feature[ftr_name].extend(relocated_by_span[entry.span] for entry in entries
+                                           if entry.span in relocated_by_span)
+    for name, entries in iteritems(patched_entries_by_name):
+        result_by_name[name] = [relocate(entry, 'new') for entry in entries]
+    for ftr_name, entries in iteritems(patched_entries_by_feature):
+        result_by_feature[ftr_name].extend(relocate(entry, 'new') for entry in entries)
+    result_by_feature = {ftr_name: entries for ftr_name, entries in iteritems(result_by_feature)
+                         if entries}
+    return ''.join(chunks), (json_obj, result_by_name, result_by_feature)
 
 
 def read_mod_and_etag(path):
@@ -608,6 +1576,10 @@ def read_mod_and_etag(path):
             with closing(mmap(f.fileno(), 0, access=ACCESS_READ)) as m:
                 match_objects = take(3, re.finditer(REPODATA_HEADER_RE, m))
                 result = dict(map(ensure_unicode, mo.groups()) for mo in match_objects)
+                if context.repodata_jlap_enabled:
+                    content_hash_match = re.search(CONTENT_HASH_RE, m[:REPODATA_HEADER_SIZE])
+                    if content_hash_match:
+                        result['_content_hash'] = ensure_unicode(content_hash_match.group(1))
                 return result
         except (BufferError, ValueError, OSError):  # pragma: no cover
             # BufferError: cannot close exported pointers exist
@@ -680,7 +1652,7 @@ def fetch_channel_signing_data(signing_data_url, filename, etag=None, mod_stamp=
     return str_data
 
 
-def fetch_repodata_remote_request(url, etag, mod_stamp, repodata_fn=REPODATA_FN):
+def fetch_repodata_remote_request(url, etag, mod_stamp, repodata_fn=REPODATA_FN, timing=None):
     if not context.ssl_verify:
         warnings.simplefilter('ignore', InsecureRequestWarning)
 
@@ -698,8 +1670,8 @@ def fetch_repodata_remote_request(url, etag, mod_stamp, repodata_fn=REPODATA_FN)
 
     try:
         timeout = context.remote_connect_timeout_secs, context.remote_read_timeout_secs
-        resp = session.get(join_url(url, filename), headers=headers, proxies=session.proxies,
-                           timeout=timeout)
+        resp = _timed_get(session, join_url(url, filename), timing, headers=headers,
+                          proxies=session.proxies, timeout=timeout)
         if log.isEnabledFor(DEBUG):
             log.debug(stringify(resp, content_max_len=256))
         resp.raise_for_status()
@@ -825,6 +1797,9 @@ def fetch_repodata_remote_request(url, etag, mod_stamp, repodata_fn=REPODATA_FN)
     add_http_value_to_dict(resp, 'Etag', saved_fields, '_etag')
     add_http_value_to_dict(resp, 'Last-Modified', saved_fields, '_mod')
     add_http_value_to_dict(resp, 'Cache-Control', saved_fields, '_cache_control')
+    if context.repodata_jlap_enabled and filename == REPODATA_FN:
+        # identifies the cached document to the patch series in repodata.jlap
+        saved_fields['_content_hash'] = content_hash(resp.content)
 
     # add extra values to the raw repodata json
     if json_str and json_str != "{}":
@@ -837,6 +1812,120 @@ def fetch_repodata_remote_request(url, etag, mod_stamp, repodata_fn=REPODATA_FN)
     return raw_repodata_str
 
 
+def fetch_repodata_jlap(url, cached_jlap=b'', timing=None):
+    # With a previously fetched copy of repodata.jlap in ``cached_jlap``, only the lines past
+    #   its last patch are requested.  There is no If-Range: the file changes every time
+    #   patches are appended, and the checksum chain catches a server-side rewrite.
+    if not context.ssl_verify:
+        warnings.simplefilter('ignore', InsecureRequestWarning)
+
+    session = CondaSession()
+    timeout = context.remote_connect_timeout_secs, context.remote_read_timeout_secs
+    offset = resume_offset(cached_jlap)
+    headers = {"Range": "bytes=%d-" % offset} if offset else None
+    resp = _timed_get(session, join_url(url, REPODATA_JLAP_FN), timing,
+                      headers=headers, proxies=session.proxies, timeout=timeout)
+    if log.isEnabledFor(DEBUG):
+        log.debug(stringify(resp, content_max_len=256))
+    resp.raise_for_status()
+    if (resp.status_code == 206
+            and resp.headers.get("Content-Range", "").startswith("bytes %d-" % offset)):
+        return cached_jlap[:offset] + resp.content
+    return resp.content
+
+
+def fetch_repodata_shard(url, shard_hash):
+    if not context.ssl_verify:
+        warnings.simplefilter('ignore', InsecureRequestWarning)
+
+    session = CondaSession()
+    shard_url = join_url(url, 'shards', shard_hash + '.json')
+    try:
+        timeout = context.remote_connect_timeout_secs, context.remote_read_timeout_secs
+        resp = session.get(shard_url, proxies=session.proxies, timeout=timeout)
+        if log.isEnabledFor(DEBUG):
+            log.debug(stringify(resp, content_max_len=256))
+        resp.raise_for_status()
+    except (ConnectionError, HTTPError, SSLError) as e:
+        raise CondaHTTPError("Unable to retrieve repodata shard.\n",
+                             shard_url,
+                             getattr(e.response, 'status_code', None),
+                             getattr(e.response, 'reason', None),
+                             getattr(e.response, 'elapsed', None),
+                             e.response,
+                             caused_by=e)
+
+    actual_hash = hashlib.sha256(resp.content).hexdigest()
+    if actual_hash != shard_hash:
+        raise ChecksumMismatchError(shard_url, None, 'sha256', shard_hash, actual_hash)
+    return resp.content
+
+
+def _timed_get(session, url, timing, **kwargs):
+    # session.get, adding the time spent waiting for the response headers (which includes
+    # connection setup, as requests doesn't expose that separately), and reading the response
+    # body to the ``timing`` dict (when not None).
+    if timing is None:
+        return session.get(url, **kwargs)
+    start = time()
+    resp = session.get(url, **kwargs)
+    total = time() - start
+    ttfb = resp.elapsed.total_seconds()
+    timing['ttfb'] += ttfb
+    timing['transfer'] += max(total - ttfb, 0.0)
+    timing['status'] = resp.status_code
+    return resp
+
+
+class RepodataTiming(namedtuple('RepodataTiming',
+                                ('url', 'status', 'ttfb', 'transfer', 'parse'))):
+    """Where the time went when loading the repodata of one channel subdir, in seconds.
+
+    ``status`` is the HTTP status of the last repodata request made, or 'cached' if the
+    local cache was used without asking the server.  ``parse`` covers everything that
+    isn't network time: reading, patching, indexing and writing the local caches.
+    """
+
+
+# Callables receiving a RepodataTiming for every SubdirData load.  Timings are also written
+# to the instrumentation record when CONDA_INSTRUMENTATION_ENABLED is set.
+REPODATA_TIMING_HOOKS = []
+
+
+def repodata_timing_enabled():
+    return bool(REPODATA_TIMING_HOOKS) or time_recorder.is_enabled()
+
+
+def report_repodata_timing(timing):
+    log.debug("repodata timing for %s: status=%s ttfb=%.3f transfer=%.3f parse=%.3f",
+              *timing)
+    if time_recorder.is_enabled():
+        for phase in ('ttfb', 'transfer', 'parse'):
+            time_recorder.record("repodata.%s %s" % (phase, timing.url), getattr(timing, phase))
+    for hook in REPODATA_TIMING_HOOKS:
+        hook(timing)
+
+
+def build_binary_repodata_cache(json_path, binary_path, base_state, use_only_tar_bz2):
+    """
+    Index the cached repodata.json at ``json_path`` into a binary cache at ``binary_path``.
+
+    Runs in worker processes, so it depends on nothing but its arguments; ``base_state`` is
+    the validation state without the HTTP fields, which are read from the repodata itself.
+    Returns the time taken.
+    """
+    start = time()
+    with open(json_path) as fh:
+        raw_repodata_str = fh.read() or '{}'
+    json_obj, entries_by_name, entries_by_feature = index_raw_repodata_str(
+        raw_repodata_str, use_only_tar_bz2)
+    validation_state = dict(base_state, _url=json_obj.get('_url'), _mod=json_obj.get('_mod'),
+                            _etag=json_obj.get('_etag'))
+    write_binary_repodata_cache(binary_path, validation_state, raw_repodata_str, json_obj,
+                                entries_by_name, entries_by_feature)
+    return time() - start
+
+
 def make_feature_record(feature_name):
     # necessary for the SAT solver to do the right thing with features
     pkg_name = "%s@" % feature_name
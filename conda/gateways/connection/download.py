@@ -5,20 +5,22 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 
 import hashlib
 from logging import DEBUG, getLogger
-from os.path import basename, exists, join
+from os.path import basename, exists, getsize, join
 import tempfile
+from threading import Lock
 import warnings
 
-from . import (ConnectionError, HTTPError, InsecureRequestWarning, InvalidSchema,
-               SSLError, RequestsProxyError)
+from . import (ChunkedEncodingError, ConnectionError, HTTPError, InsecureRequestWarning,
+               InvalidSchema, SSLError, RequestsProxyError)
 from .session import CondaSession
 from ..disk.delete import rm_rf
+from ..disk.update import rename
 from ... import CondaError
 from ..._vendor.auxlib.ish import dals
 from ..._vendor.auxlib.logz import stringify
 from ...base.context import context
 from ...common.compat import text_type
-from ...common.io import time_recorder
+from ...common.io import ThreadLimitedThreadPoolExecutor, time_recorder
 from ...exceptions import (BasicClobberError, CondaDependencyError, CondaHTTPError,
                            ChecksumMismatchError, maybe_raise, ProxyError)
 
@@ -29,90 +31,77 @@ def disable_ssl_verify_warning():
     warnings.simplefilter('ignore', InsecureRequestWarning)
 
 
+PARTIAL_EXTENSION = ".partial"
+
+
 @time_recorder("download")
 def download(
-        url, target_full_path, md5=None, sha256=None, size=None, progress_update_callback=None
+        url, target_full_path, md5=None, sha256=None, size=None, progress_update_callback=None,
+        chunk_consumer=None,
 ):
+    """
+    Download url to target_full_path, verifying the size and checksum given.  If given,
+    chunk_consumer is called with every chunk of the response body as it is written, e.g. to
+    extract the package while it is downloaded.  The checksum and size are only verified at
+    the end, so the consumer must not commit anything before download returns.
+
+    The file is downloaded to target_full_path + PARTIAL_EXTENSION first.  When the
+    connection drops, the download resumes from there with an HTTP Range request, up to
+    context.remote_max_retries times; an interrupted partial download left behind by an
+    earlier call is resumed as well, as long as the server's ETag for url is unchanged.
+    Large files are downloaded in up to context.download_segments parallel byte ranges.
+    """
     if exists(target_full_path):
         maybe_raise(BasicClobberError(target_full_path, url, context), context)
     if not context.ssl_verify:
         disable_ssl_verify_warning()
 
+    # prefer sha256 over md5 when both are available
+    checksum_type = checksum = None
+    if sha256:
+        checksum_type = "sha256"
+        checksum = sha256
+    elif md5:
+        checksum_type = "md5"
+        checksum = md5
+
     try:
         timeout = context.remote_connect_timeout_secs, context.remote_read_timeout_secs
-        session = CondaSession()
-        resp = session.get(url, stream=True, proxies=session.proxies, timeout=timeout)
-        if log.isEnabledFor(DEBUG):
-            log.debug(stringify(resp, content_max_len=256))
-        resp.raise_for_status()
-
-        content_length = int(resp.headers.get('Content-Length', 0))
-
-        # prefer sha256 over md5 when both are available
-        checksum_builder = checksum_type = checksum = None
-        if sha256:
-            checksum_builder = hashlib.new("sha256")
-            checksum_type = "sha256"
-            checksum = sha256
-        elif md5:
-            checksum_builder = hashlib.new("md5") if md5 else None
-            checksum_type = "md5"
-            checksum = md5
-
-        size_builder = 0
-        try:
-            with open(target_full_path, 'wb') as fh:
-                streamed_bytes = 0
-                for chunk in resp.iter_content(2 ** 14):
-                    # chunk could be the decompressed form of the real data
-                    # but we want the exact number of bytes read till now
-                    streamed_bytes = resp.raw.tell()
-                    try:
-                        fh.write(chunk)
-                    except IOError as e:
-                        message = "Failed to write to %(target_path)s\n  errno: %(errno)d"
-                        # TODO: make this CondaIOError
-                        raise CondaError(message, target_path=target_full_path, errno=e.errno)
-
-                    checksum_builder and checksum_builder.update(chunk)
-                    size_builder += len(chunk)
-
-                    if content_length and 0 <= streamed_bytes <= content_length:
-                        if progress_update_callback:
-                            progress_update_callback(streamed_bytes / content_length)
-
-            if content_length and streamed_bytes != content_length:
-                # TODO: needs to be a more-specific error type
-                message = dals("""
-                Downloaded bytes did not match Content-Length
-                  url: %(url)s
-                  target_path: %(target_path)s
-                  Content-Length: %(content_length)d
-                  downloaded bytes: %(downloaded_bytes)d
-                """)
-                raise CondaError(message, url=url, target_path=target_full_path,
-                                 content_length=content_length,
-                                 downloaded_bytes=streamed_bytes)
-
-        except (IOError, OSError) as e:
-            if e.errno == 104:
-                # Connection reset by peer
-                log.debug("%s, trying again" % e)
-            raise
+        partial = _PartialDownload(url, target_full_path + PARTIAL_EXTENSION, checksum_type,
+                                   progress_update_callback, chunk_consumer)
+        segments = min(context.download_segments,
+                       (size or 0) // max(context.download_segment_size, 1))
+        segmented = segments > 1 and chunk_consumer is None and not partial.resumable()
+        retries = context.remote_max_retries
+        for attempt in range(retries + 1):
+            try:
+                if segmented and not attempt:
+                    partial.fetch_segmented(timeout, size, segments)
+                else:
+                    partial.fetch(timeout)
+                break
+            except (ConnectionError, ChunkedEncodingError) as e:
+                if attempt == retries or not partial.resumable():
+                    raise
+                log.debug("download of %s interrupted after %d bytes, resuming: %r",
+                          url, partial.size, e)
 
         if checksum:
-            actual_checksum = checksum_builder.hexdigest()
+            actual_checksum = partial.hexdigest()
             if actual_checksum != checksum:
                 log.debug("%s mismatch for download: %s (%s != %s)",
                           checksum_type, url, actual_checksum, checksum)
+                partial.discard()
                 raise ChecksumMismatchError(
                     url, target_full_path, checksum_type, checksum, actual_checksum
                 )
         if size is not None:
-            actual_size = size_builder
+            actual_size = partial.size
             if actual_size != size:
                 log.debug("size mismatch for download: %s (%s != %s)", url, actual_size, size)
+                partial.discard()
                 raise ChecksumMismatchError(url, target_full_path, "size", size, actual_size)
+        partial.commit(target_full_path)
 
     except RequestsProxyError:
         raise ProxyError()  # see #3962
@@ -129,7 +118,7 @@ def download(
         else:
             raise
 
-    except (ConnectionError, HTTPError, SSLError) as e:
+    except (ConnectionError, HTTPError, SSLError, ChunkedEncodingError) as e:
         help_message = dals("""
         An HTTP error occurred when trying to retrieve this URL.
         HTTP errors are often intermittent, and a simple retry will get you on your way.
@@ -143,6 +132,223 @@ def download(
                              caused_by=e)
 
 
+class _PartialDownload(object):
+    """
+    The state of a download into partial_path.  The ETag of the response is kept next to the
+    partial file (in partial_path + ".etag"), so that a later attempt can resume the
+    download with a Range request that is only honored if the file is still the same.
+    """
+
+    def __init__(self, url, partial_path, checksum_type, progress_update_callback=None,
+                 chunk_consumer=None):
+        self.url = url
+        self.partial_path = partial_path
+        self.etag_path = partial_path + ".etag"
+        self.checksum_type = checksum_type
+        self.progress_update_callback = progress_update_callback
+        self.chunk_consumer = chunk_consumer
+        self.size = 0
+        self._checksum_builder = None
+        # number of bytes that have been passed to chunk_consumer
+        self._consumed = 0
+
+    def resumable(self):
+        return self._resume_etag() is not None and getsize(self.partial_path) > 0
+
+    def _resume_etag(self):
+        try:
+            with open(self.etag_path) as fh:
+                resume_url, etag = fh.read().split("\n", 1)
+        except (IOError, OSError, ValueError):
+            return None
+        if resume_url != self.url or not exists(self.partial_path):
+            return None
+        return etag
+
+    def _save_etag(self, resp):
+        etag = resp.headers.get("ETag")
+        if etag and not etag.startswith("W/") and resp.headers.get("Accept-Ranges") == "bytes":
+            with open(self.etag_path, "w") as fh:
+                fh.write("%s\n%s" % (self.url, etag))
+        else:
+            # a weak or missing ETag can't validate a Range request
+            rm_rf(self.etag_path)
+
+    def _get(self, timeout, headers=None):
+        session = CondaSession()
+        resp = session.get(self.url, stream=True, proxies=session.proxies, timeout=timeout,
+                           headers=headers)
+        if log.isEnabledFor(DEBUG):
+            log.debug(stringify(resp, content_max_len=256))
+        return resp
+
+    def fetch(self, timeout):
+        """Download the rest of the file, resuming the partial download if possible."""
+        etag = self._resume_etag()
+        offset = getsize(self.partial_path) if etag is not None else 0
+        if offset:
+            resp = self._get(timeout, {"Range": "bytes=%d-" % offset, "If-Range": etag})
+            if resp.status_code == 416:
+                # the partial file is no shorter than the file on the server
+                resp.close()
+                offset = 0
+                resp = self._get(timeout)
+        else:
+            resp = self._get(timeout)
+        resp.raise_for_status()
+        if offset:
+            content_range = resp.headers.get("Content-Range", "")
+            if resp.status_code != 206 or not content_range.startswith("bytes %d-" % offset):
+                # the server sent the whole file; the file changed, or ranges aren't supported
+                offset = 0
+            else:
+                log.debug("resuming download of %s at byte %d", self.url, offset)
+        self._receive(resp, offset)
+
+    def _receive(self, resp, offset):
+        # append the body of resp to the first offset bytes of the partial file
+        self._save_etag(resp)
+        self._restart_checksum(offset)
+
+        content_length = int(resp.headers.get('Content-Length', 0))
+        total_length = content_length and offset + content_length
+        with open(self.partial_path, 'ab' if offset else 'wb') as fh:
+            streamed_bytes = 0
+            for chunk in resp.iter_content(2 ** 14):
+                # chunk could be the decompressed form of the real data
+                # but we want the exact number of bytes read till now
+                streamed_bytes = resp.raw.tell()
+                self._write(fh, chunk)
+
+                if total_length and 0 <= streamed_bytes <= content_length:
+                    if self.progress_update_callback:
+                        self.progress_update_callback((offset + streamed_bytes) / total_length)
+
+        if content_length and streamed_bytes != content_length:
+            # TODO: needs to be a more-specific error type
+            message = dals("""
+            Downloaded bytes did not match Content-Length
+              url: %(url)s
+              target_path: %(target_path)s
+              Content-Length: %(content_length)d
+              downloaded bytes: %(downloaded_bytes)d
+            """)
+            raise CondaError(message, url=self.url, target_path=self.partial_path,
+                             content_length=content_length,
+                             downloaded_bytes=streamed_bytes)
+
+    def _restart_checksum(self, offset):
+        # hash the bytes already on disk, and hand those the consumer hasn't seen yet to it
+        self.size = 0
+        self._checksum_builder = (hashlib.new(self.checksum_type)
+                                  if self.checksum_type else None)
+        if self.chunk_consumer and self._consumed > offset:
+            # the consumer has seen bytes that are downloaded again; it can't take them twice
+            log.debug("download of %s restarted; no longer streaming it", self.url)
+            self.chunk_consumer = None
+        if offset:
+            with open(self.partial_path, 'rb') as fh:
+                for chunk in iter(lambda: fh.read(2 ** 20), b''):
+                    self._update(chunk[:offset - self.size])
+                    if self.size >= offset:
+                        break
+            if self.size < offset:
+                raise CondaError("partial download %(path)s was truncated",
+                                 path=self.partial_path)
+
+    def _update(self, chunk):
+        if self._checksum_builder:
+            self._checksum_builder.update(chunk)
+        end = self.size + len(chunk)
+        if self.chunk_consumer and end > self._consumed:
+            self.chunk_consumer(chunk[self._consumed - self.size:] if self._consumed > self.size
+                                else chunk)
+            self._consumed = end
+        self.size = end
+
+    def _write(self, fh, chunk):
+        try:
+            fh.write(chunk)
+        except IOError as e:
+            message = "Failed to write to %(target_path)s\n  errno: %(errno)d"
+            # TODO: make this CondaIOError
+            raise CondaError(message, target_path=self.partial_path, errno=e.errno)
+        self._update(chunk)
+
+    def fetch_segmented(self, timeout, size, segments):
+        """
+        Download the file of the expected size in parallel byte ranges, or in one piece if
+        the server doesn't support that.  Segmented downloads aren't resumed; the partial
+        file is removed if any segment fails.
+        """
+        segment_size = -(-size // segments)
+        # the first segment doubles as the probe for range support
+        resp = self._get(timeout, {"Range": "bytes=0-%d" % (segment_size - 1)})
+        resp.raise_for_status()
+        if resp.status_code == 200:
+            log.debug("%s can't be downloaded in segments", self.url)
+            return self._receive(resp, 0)
+        content_range = resp.headers.get("Content-Range", "")
+        etag = resp.headers.get("ETag")
+        if (not etag or etag.startswith("W/")
+                or content_range != "bytes 0-%d/%d" % (segment_size - 1, size)):
+            log.debug("%s can't be downloaded in segments", self.url)
+            resp.close()
+            return self.fetch(timeout)
+
+        rm_rf(self.etag_path)
+        with open(self.partial_path, 'wb') as fh:
+            fh.truncate(size)
+        progress_lock = Lock()
+        downloaded = [0]
+
+        def write_segment(resp, start, end):
+            with open(self.partial_path, 'r+b') as fh:
+                fh.seek(start)
+                for chunk in resp.iter_content(2 ** 16):
+                    fh.write(chunk[:end - fh.tell()])
+                    with progress_lock:
+                        downloaded[0] += len(chunk)
+                        if self.progress_update_callback:
+                            self.progress_update_callback(min(downloaded[0] / size, 1))
+                if fh.tell() != end:
+                    raise CondaError("segment %(start)d-%(end)d of %(url)s is incomplete",
+                                     start=start, end=end, url=self.url)
+
+        def fetch_segment(start):
+            end = min(start + segment_size, size)
+            resp = self._get(timeout, {"Range": "bytes=%d-%d" % (start, end - 1),
+                                       "If-Range": etag})
+            resp.raise_for_status()
+            if resp.headers.get("Content-Range") != "bytes %d-%d/%d" % (start, end - 1, size):
+                raise CondaError("server ignored the range request for %(url)s", url=self.url)
+            write_segment(resp, start, end)
+
+        try:
+            with ThreadLimitedThreadPoolExecutor(segments - 1) as executor:
+                futures = [executor.submit(fetch_segment, start)
+                           for start in range(segment_size, size, segment_size)]
+                write_segment(resp, 0, segment_size)
+                for future in futures:
+                    future.result()
+        except BaseException:
+            self.discard()
+            raise
+
+        self._restart_checksum(size)
+
+    def hexdigest(self):
+        return self._checksum_builder.hexdigest()
+
+    def discard(self):
+        rm_rf(self.partial_path)
+        rm_rf(self.etag_path)
+
+    def commit(self, target_full_path):
+        rename(self.partial_path, target_full_path, force=True)
+        rm_rf(self.etag_path)
+
+
 def download_text(url):
     if not context.ssl_verify:
         disable_ssl_verify_warning()
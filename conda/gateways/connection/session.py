@@ -45,6 +45,31 @@ class EnforceUnusedAdapter(BaseAdapter):
         raise NotImplementedError()
 
 
+_SHARED_HTTP_ADAPTERS = {}
+
+
+def get_shared_http_adapter():
+    """
+    Return the HTTPAdapter mounted for http(s) by every CondaSession.
+
+    Sessions are per-thread, but worker threads are short-lived; sharing the adapter (and
+    with it the urllib3 connection pools, which are thread-safe) lets keep-alive connections
+    to a channel be reused across threads and across thread pools.
+    """
+    key = (context.remote_max_retries, context.remote_backoff_factor)
+    try:
+        return _SHARED_HTTP_ADAPTERS[key]
+    except KeyError:
+        retry = Retry(total=context.remote_max_retries,
+                      backoff_factor=context.remote_backoff_factor,
+                      status_forcelist=[413, 429, 500, 503],
+                      raise_on_status=False)
+        # one pool per host, sized so every concurrent repodata request keeps its connection
+        pool_maxsize = max(context.repodata_threads or 0, 10)
+        adapter = HTTPAdapter(max_retries=retry, pool_maxsize=pool_maxsize)
+        return _SHARED_HTTP_ADAPTERS.setdefault(key, adapter)
+
+
 class CondaSessionType(type):
     """
     Takes advice from https://github.com/requests/requests/issues/1871#issuecomment-33327847
@@ -81,12 +106,7 @@ class CondaSession(Session):
             self.mount("s3://", unused_adapter)
 
         else:
-            # Configure retries
-            retry = Retry(total=context.remote_max_retries,
-                          backoff_factor=context.remote_backoff_factor,
-                          status_forcelist=[413, 429, 500, 503],
-                          raise_on_status=False)
-            http_adapter = HTTPAdapter(max_retries=retry)
+            http_adapter = get_shared_http_adapter()
             self.mount("http://", http_adapter)
             self.mount("https://", http_adapter)
             self.mount("ftp://", FTPAdapter())
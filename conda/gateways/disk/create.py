@@ -3,25 +3,30 @@
 # SPDX-License-Identifier: BSD-3-Clause
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+import bz2
 import codecs
 from errno import EACCES, EPERM, EROFS
-from io import open
+from io import BufferedReader, RawIOBase, open
 from logging import getLogger
 import os
 from os.path import basename, dirname, isdir, isfile, join, splitext
+from queue import Queue
 from shutil import copyfileobj, copystat
+import struct
 import sys
 import tempfile
+from threading import Thread
 import warnings as _warnings
 
 from . import mkdir_p
 from .delete import path_is_clean, rm_rf
-from .link import islink, lexists, link, readlink, symlink
+from .link import islink, lexists, link, readlink, reflink, symlink
 from .permissions import make_executable
 from .update import touch
 from ... import CondaError
 from ..._vendor.auxlib.ish import dals
-from ...base.constants import CONDA_PACKAGE_EXTENSION_V1, PACKAGE_CACHE_MAGIC_FILE
+from ...base.constants import (CONDA_PACKAGE_EXTENSION_V1, CONDA_PACKAGE_EXTENSION_V2,
+                               PACKAGE_CACHE_MAGIC_FILE)
 from ...base.context import context
 from ...common.compat import on_win
 from ...common.path import ensure_pad, expand, win_path_double_escape, win_path_ok
@@ -217,7 +222,10 @@ def extract_tarball(tarball_full_path, destination_directory=None, progress_upda
                   destination_directory)
 
     conda_package_handling.api.extract(tarball_full_path, dest_dir=destination_directory)
+    _chown_extracted_files(destination_directory)
 
+
+def _chown_extracted_files(destination_directory):
     if sys.platform.startswith('linux') and os.getuid() == 0:
         # When extracting as root, tarfile will by restore ownership
         # of extracted files.  However, we want root to be the owner
@@ -228,6 +236,169 @@ def extract_tarball(tarball_full_path, destination_directory=None, progress_upda
                 os.lchown(p, 0, 0)
 
 
+class _ChunkQueueReader(RawIOBase):
+    """A read-only, non-seekable file object over chunks of bytes put on a queue."""
+
+    def __init__(self, chunk_queue):
+        self._queue = chunk_queue
+        self._chunk = b''
+        self._eof = False
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._chunk and not self._eof:
+            chunk = self._queue.get()
+            if chunk is None:
+                self._eof = True
+            else:
+                self._chunk = chunk
+        n = min(len(buffer), len(self._chunk))
+        buffer[:n] = self._chunk[:n]
+        self._chunk = self._chunk[n:]
+        return n
+
+
+class _LimitedReader(RawIOBase):
+    """Read at most `limit` bytes from `fileobj`."""
+
+    def __init__(self, fileobj, limit):
+        self._fileobj = fileobj
+        self.remaining = limit
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self._fileobj.read(min(len(buffer), self.remaining))
+        n = len(data)
+        buffer[:n] = data
+        self.remaining -= n
+        return n
+
+    def drain(self):
+        while self.remaining and self.read(2 ** 16):
+            pass
+
+
+class StreamingExtractor(object):
+    """
+    Extract a .conda or .tar.bz2 package from its bytes while they are being downloaded.
+
+    The downloading thread passes each chunk of the package to `feed`; a background thread
+    decodes them and extracts the package into `destination_directory`.  Call `finish` once
+    the download is complete and verified: it returns True if the package was extracted
+    completely, and False if it could not be streamed, in which case the partial extraction
+    is removed and the downloaded tarball has to be extracted the regular way.  `abort`
+    stops the extraction and removes what was extracted so far.
+    """
+
+    # bounds the memory held by chunks the decoder hasn't gotten to yet
+    max_queued_chunks = 256
+    # whether conda_package_streaming, which the extraction uses, is installed
+    _available = None
+
+    @classmethod
+    def available(cls):
+        if cls._available is None:
+            try:
+                import conda_package_streaming  # NOQA
+                cls._available = True
+            except ImportError:
+                log.warning("streaming_extract is enabled, but conda-package-streaming is "
+                            "not installed; packages are extracted after they are downloaded.")
+                cls._available = False
+        return cls._available
+
+    def __init__(self, package_basename, destination_directory):
+        self.package_basename = package_basename
+        self.destination_directory = destination_directory
+        self._queue = Queue(self.max_queued_chunks)
+        self._error = None
+        self._fed = False
+        self._thread = Thread(target=self._run, name="conda-streaming-extract")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def feed(self, chunk):
+        self._fed = True
+        if self._error is None:
+            self._queue.put(chunk)
+
+    def finish(self):
+        self._close()
+        if self._error is None and not self._fed:
+            # e.g. the tarball was copied from another package cache instead of downloaded
+            self._error = CondaError("no data was streamed")
+        if self._error is not None:
+            log.debug("could not extract %s while downloading; extracting it afterwards",
+                      self.package_basename, exc_info=self._error)
+            rm_rf(self.destination_directory)
+            return False
+        _chown_extracted_files(self.destination_directory)
+        return True
+
+    def abort(self):
+        self._error = self._error or CondaError("aborted")
+        self._close()
+        rm_rf(self.destination_directory)
+
+    def _close(self):
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+    def _run(self):
+        fileobj = BufferedReader(_ChunkQueueReader(self._queue), 2 ** 16)
+        try:
+            if self.package_basename.endswith(CONDA_PACKAGE_EXTENSION_V2):
+                self._extract_conda(fileobj)
+            elif self.package_basename.endswith(CONDA_PACKAGE_EXTENSION_V1):
+                self._extract_stream(bz2.open(fileobj, 'rb'))
+            else:
+                raise CondaError("not a conda package: %s" % self.package_basename)
+        except Exception as e:
+            self._error = e
+        finally:
+            # keep consuming, so that the downloading thread never blocks on a full queue
+            while fileobj.read(2 ** 16):
+                pass
+
+    def _extract_conda(self, fileobj):
+        # A .conda package is a zip archive of stored (uncompressed) members, so each
+        #   member can be read right after its local file header, without the central
+        #   directory at the end of the archive.
+        from conda_package_streaming.package_streaming import zstd
+        if zstd is None:
+            raise CondaError("no zstd module available")
+        while True:
+            header = fileobj.read(30)
+            if header[:4] in (b'PK\x01\x02', b'PK\x05\x06'):
+                # the central directory; all members have been read
+                break
+            if header[:4] != b'PK\x03\x04':
+                raise CondaError("truncated or invalid zip archive %s" % self.package_basename)
+            (flags, method, compressed_size, name_length, extra_length
+             ) = struct.unpack('<6xHH8xI4xHH', header)
+            if flags & 0x08 or method != 0 or compressed_size == 0xFFFFFFFF:
+                raise CondaError("unsupported zip member layout in %s" % self.package_basename)
+            name = fileobj.read(name_length).decode('utf-8')
+            fileobj.read(extra_length)
+            member = _LimitedReader(fileobj, compressed_size)
+            if name.endswith('.tar.zst'):
+                self._extract_stream(zstd.open(BufferedReader(member, 2 ** 16)))
+            member.drain()
+
+    def _extract_stream(self, reader):
+        from conda_package_streaming.extract import extract_stream
+        from conda_package_streaming.package_streaming import tar_generator
+        extract_stream(tar_generator(reader), self.destination_directory)
+        # read up to the end of the compressed stream, past the end-of-archive blocks
+        while reader.read(2 ** 16):
+            pass
+
+
 def make_menu(prefix, file_path, remove=False):
     """
     Create cross-platform menu items (e.g. Windows Start Menu)
@@ -331,6 +502,27 @@ def _do_copy(src, dst):
         log.debug('%r', e)
 
 
+def _do_reflink(src, dst):
+    if islink(src):
+        # links are copied as links
+        copy(src, dst)
+        return
+    try:
+        log.trace("reflinking %s => %s", src, dst)
+        reflink(src, dst)
+    except (IOError, OSError) as e:
+        log.debug("reflink failed. falling back to copy\n"
+                  "  error: %r\n"
+                  "  src: %s\n"
+                  "  dst: %s", e, src, dst)
+        _do_copy(src, dst)
+        return
+    try:
+        copystat(src, dst)
+    except (IOError, OSError) as e:  # pragma: no cover
+        log.debug('%r', e)
+
+
 def create_link(src, dst, link_type=LinkType.hardlink, force=False):
     if link_type == LinkType.directory:
         # A directory is technically not a link.  So link_type is a misnomer.
@@ -371,6 +563,8 @@ def create_link(src, dst, link_type=LinkType.hardlink, force=False):
         _do_softlink(src, dst)
     elif link_type == LinkType.copy:
         copy(src, dst)
+    elif link_type == LinkType.reflink:
+        _do_reflink(src, dst)
     else:
         raise CondaError("Did not expect linktype=%r" % link_type)
 
@@ -6,8 +6,9 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 from errno import ENOENT
 import fnmatch
 from logging import getLogger
-from os import environ, getcwd, makedirs, rename, rmdir, unlink, walk
-from os.path import abspath, basename, dirname, exists, isdir, isfile, join, normpath, split
+from os import environ, getcwd, listdir, makedirs, rename, rmdir, unlink, walk
+from os.path import (abspath, basename, dirname, exists, getmtime, isdir, isfile, join,
+                     normpath, split)
 import shutil
 from subprocess import CalledProcessError, STDOUT, check_output
 import sys
@@ -184,6 +185,23 @@ def rm_rf(path, max_retries=5, trash=True, clean_empty_parents=False, *args, **k
 try_rmdir_all_empty = move_to_trash = move_path_to_trash = rm_rf
 
 
+def rm_least_recently_used(directory, max_entries, suffix=''):
+    """
+    Remove the files in directory whose names end with suffix, oldest modification time
+    first, until at most max_entries are left.  Callers touch a file each time they use it.
+    """
+    entries = []
+    for fn in listdir(directory):
+        if fn.endswith(suffix):
+            try:
+                entries.append((getmtime(join(directory, fn)), fn))
+            except (IOError, OSError):
+                pass
+    entries.sort()
+    for _, fn in entries[:max(len(entries) - max_entries, 0)]:
+        rm_rf(join(directory, fn))
+
+
 def delete_trash(prefix):
     if not prefix:
         prefix = sys.prefix
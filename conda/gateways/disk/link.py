@@ -6,14 +6,17 @@
 # https://github.com/jaraco/skeleton/issues/1#issuecomment-285448440
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+from errno import EOPNOTSUPP
 from logging import getLogger
+import os
 from os import chmod as os_chmod, lstat
 from os.path import abspath, isdir, islink as os_islink, lexists as os_lexists
 
-from ...common.compat import PY2, on_win
+from ...common.compat import PY2, on_linux, on_mac, on_win
 from ...exceptions import CondaOSError, ParseError
 
-__all__ = ('islink', 'lchmod', 'lexists', 'link', 'readlink', 'stat_nlink', 'symlink')
+__all__ = ('islink', 'lchmod', 'lexists', 'link', 'readlink', 'reflink', 'stat_nlink',
+           'symlink')
 
 log = getLogger(__name__)
 
@@ -74,6 +77,46 @@ else:  # pragma: unix no cover
     symlink = win_soft_link
 
 
+if on_linux:
+    from fcntl import ioctl
+    FICLONE = 0x40049409  # _IOW(0x94, 9, int), from linux/fs.h
+
+    def reflink(src, dst):
+        """
+        Create dst as a copy-on-write clone of the file src, sharing its data blocks.  Raises
+        OSError where the file system doesn't support that, as on ext4 or across file systems.
+        """
+        with open(src, 'rb') as fsrc:
+            with open(dst, 'wb') as fdst:
+                try:
+                    ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+                except (IOError, OSError):
+                    fdst.close()
+                    os.unlink(dst)
+                    raise
+
+elif on_mac:
+    import ctypes
+    _libc = ctypes.CDLL(None, use_errno=True)
+    _clonefile = getattr(_libc, 'clonefile', None)
+    CLONE_NOFOLLOW = 0x0001
+
+    def reflink(src, dst):
+        """
+        Create dst as a copy-on-write clone of the file src with clonefile(2), which APFS
+        supports.  Raises OSError where the file system doesn't.
+        """
+        if _clonefile is None:
+            raise OSError(EOPNOTSUPP, 'clonefile is not available', dst)
+        if _clonefile(src.encode('utf-8'), dst.encode('utf-8'), CLONE_NOFOLLOW):
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno), dst)
+
+else:  # pragma: no cover
+    def reflink(src, dst):
+        raise OSError(EOPNOTSUPP, 'reflinks are not supported on this platform', dst)
+
+
 if not (on_win and PY2):
     from os import readlink
     islink = os_islink
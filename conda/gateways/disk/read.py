@@ -18,7 +18,7 @@ from .create import TemporaryDirectory
 from ..._vendor.auxlib.collection import first
 from ..._vendor.auxlib.compat import shlex_split_unicode
 from ..._vendor.auxlib.ish import dals
-from ...base.constants import PREFIX_PLACEHOLDER
+from ...base.constants import PACKAGE_PLACEHOLDER_OFFSETS_FILE, PREFIX_PLACEHOLDER
 from ...common.compat import open, scandir
 from ...common.pkg_formats.python import (
     PythonDistribution, PythonEggInfoDistribution, PythonEggLinkDistribution,
@@ -88,6 +88,7 @@ def read_package_info(record, package_cache_record):
     icondata = read_icondata(epd)
     package_metadata = read_package_metadata(epd)
     paths_data = read_paths_json(epd)
+    placeholder_offsets = read_placeholder_offsets(epd)
 
     return PackageInfo(
         extracted_package_dir=epd,
@@ -99,6 +100,7 @@ def read_package_info(record, package_cache_record):
         icondata=icondata,
         package_metadata=package_metadata,
         paths_data=paths_data,
+        placeholder_offsets=placeholder_offsets,
     )
 
 
@@ -121,6 +123,19 @@ def read_repodata_json(extracted_package_directory):
         return json.load(fi)
 
 
+def read_placeholder_offsets(extracted_package_directory):
+    # packages extracted by older versions of conda have no offsets recorded
+    path = join(extracted_package_directory, PACKAGE_PLACEHOLDER_OFFSETS_FILE)
+    try:
+        with open(path) as fh:
+            data = json.load(fh)
+    except (IOError, OSError, ValueError):
+        return None
+    if data.get('placeholder_offsets_version') != 1:
+        return None
+    return data['paths']
+
+
 def read_icondata(extracted_package_directory):
     icon_file_path = join(extracted_package_directory, 'info', 'icon.png')
     if isfile(icon_file_path):
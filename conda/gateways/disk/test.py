@@ -10,7 +10,7 @@ from uuid import uuid4
 
 from .create import create_link
 from .delete import rm_rf
-from .link import islink, lexists
+from .link import islink, lexists, reflink
 from ..._vendor.auxlib.decorators import memoize
 from ...base.constants import PREFIX_MAGIC_FILE
 from ...common.compat import text_type
@@ -83,5 +83,23 @@ def softlink_supported(source_file, dest_dir):
         rm_rf(test_path)
 
 
+@memoize
+def reflink_supported(source_file, dest_dir):
+    # reflinks need a copy-on-write file system (btrfs, XFS, APFS, ...) holding both paths
+    log.trace("checking reflink capability for %s => %s", source_file, dest_dir)
+    test_path = join(dest_dir, '.tmp.%s.%s' % (basename(source_file), text_type(uuid4())[:8]))
+    if not isfile(source_file) or not isdir(dest_dir):
+        return False
+    try:
+        reflink(source_file, test_path)
+        log.trace("reflink supported for %s => %s", source_file, dest_dir)
+        return True
+    except (IOError, OSError):
+        log.trace("reflink IS NOT supported for %s => %s", source_file, dest_dir)
+        return False
+    finally:
+        rm_rf(test_path)
+
+
 def is_conda_environment(prefix):
     return isfile(join(prefix, PREFIX_MAGIC_FILE))
@@ -76,6 +76,8 @@ class LinkType(Enum):
     softlink = 2
     copy = 3
     directory = 4
+    # a copy-on-write clone, where the file system supports it; otherwise a copy
+    reflink = 5
 
     def __int__(self):
         return self.value
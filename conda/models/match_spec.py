@@ -16,7 +16,7 @@ from os.path import basename
 import re
 
 from .channel import Channel
-from .version import BuildNumberMatch, VersionSpec
+from .version import BuildNumberMatch, LRUCache, VersionSpec
 from .._vendor.auxlib.collection import frozendict
 from .._vendor.auxlib.decorators import memoizedproperty
 from .._vendor.toolz import concat, concatv, groupby
@@ -44,6 +44,14 @@ class MatchSpecType(type):
                 new_kwargs['_original_spec_str'] = spec_arg.original_spec_str
                 new_kwargs.update(**kwargs)
                 return super(MatchSpecType, cls).__call__(**new_kwargs)
+            elif isinstance(spec_arg, string_types) and not kwargs:
+                # MatchSpecs are immutable, so every plain spec string maps to one instance
+                try:
+                    return cls._INTERN_CACHE[spec_arg]
+                except KeyError:
+                    match_spec = cls._INTERN_CACHE[spec_arg] = super(MatchSpecType, cls).__call__(
+                        **_parse_spec_str(spec_arg))
+                    return match_spec
             elif isinstance(spec_arg, string_types):
                 parsed = _parse_spec_str(spec_arg)
                 if kwargs:
@@ -169,6 +177,7 @@ class MatchSpec(object):
     )
     FIELD_NAMES_SET = frozenset(FIELD_NAMES)
     _MATCHER_CACHE = {}
+    _INTERN_CACHE = LRUCache(maxsize=50000)
 
     def __init__(self, optional=False, target=None, **kwargs):
         self._optional = optional
@@ -563,6 +572,39 @@ def _parse_channel(channel_val):
     return channel_name, chn.subdir
 
 
+def parse_spec_strs(spec_strs):
+    """Parse many spec strings, such as all depends of a set of records, in one pass.
+
+    Returns a dict mapping each distinct spec string to its MatchSpec.  Each string is parsed
+    at most once, and the MatchSpec is the same instance later ``MatchSpec(spec_str)`` calls
+    return.
+    """
+    return {spec_str: MatchSpec(spec_str) for spec_str in set(spec_strs)}
+
+
+def dump_parsed_spec_strs(spec_strs):
+    """The components parsed from each of ``spec_strs``, for later use by
+    load_parsed_spec_strs, possibly in another process.
+
+    Returns a dict mapping spec strings to their components.  Only spec strings that parse
+    into string components are included, as those survive a round trip through JSON.
+    """
+    dumped = {}
+    for spec_str in set(spec_strs):
+        components = _parse_spec_str(spec_str)
+        if all(isinstance(value, string_types) for value in itervalues(components)):
+            dumped[spec_str] = components
+    return dumped
+
+
+def load_parsed_spec_strs(parsed_spec_strs):
+    """Have spec strings not parsed yet take their components from ``parsed_spec_strs``, as
+    returned by dump_parsed_spec_strs, instead of parsing them.
+    """
+    for spec_str, components in iteritems(parsed_spec_strs):
+        _PARSE_CACHE.setdefault(spec_str, components)
+
+
 _PARSE_CACHE = {}
 
 
@@ -9,7 +9,7 @@ from .channel import Channel
 from .enums import NoarchType
 from .records import PackageRecord, PathsData
 from .._vendor.auxlib.entity import (ComposableField, Entity, EnumField, ImmutableEntity,
-                                     IntegerField, ListField, StringField)
+                                     IntegerField, ListField, MapField, StringField)
 from ..common.compat import string_types
 
 log = getLogger(__name__)
@@ -53,6 +53,8 @@ class PackageInfo(ImmutableEntity):
     icondata = StringField(required=False, nullable=True)
     package_metadata = ComposableField(PackageMetadata, required=False, nullable=True)
     paths_data = ComposableField(PathsData)
+    # see conda.core.portability.index_package_placeholders
+    placeholder_offsets = MapField(required=False, nullable=True, default=None)
 
     def dist_str(self):
         return "%s::%s-%s-%s" % (self.channel.canonical_name, self.name, self.version, self.build)
@@ -19,9 +19,11 @@ from .channel import Channel
 from .enums import FileMode, LinkType, NoarchType, PackageType, PathType, Platform
 from .enums import MetadataSignatureStatus
 from .match_spec import MatchSpec
-from .._vendor.auxlib.entity import (BooleanField, ComposableField, DictSafeMixin, Entity,
-                                     EnumField, IntegerField, ListField, NumberField,
-                                     StringField)
+from .._vendor.auxlib import NULL
+from .._vendor.auxlib.entity import (KEY_OVERRIDES_MAP, BooleanField, ComposableField,
+                                     DictSafeMixin, Entity, EnumField, IntegerField, ListField,
+                                     NumberField, StringField)
+from .._vendor.auxlib.exceptions import ValidationError
 from .._vendor.boltons.timeutils import dt_to_timestamp, isoparse
 from ..base.context import context
 from ..common.compat import isiterable, itervalues, string_types, text_type
@@ -378,6 +380,82 @@ class PackageRecord(DictSafeMixin, Entity):
         return "%s/%s::%s-%s-%s" % (self.channel.name, self.subdir,
                                     self.name, self.version, self.build)
 
+    # checksums and locations are unique to each record, so there is nothing to share
+    _unique_text_fields = frozenset(('md5', 'legacy_bz2_md5', 'url', 'sha256'))
+
+    @classmethod
+    def from_repodata(cls, info, interned=None):
+        """Build a record from one decoded repodata entry; equivalent to ``cls(**info)``.
+
+        Plain string, integer and string-list fields are stored without going through their
+        field descriptors.  Strings that repeat across records (names, versions, dependency
+        specs, ...) and the depends/constrains tuples themselves are shared through
+        ``interned``, a dict the caller keeps for all records of a subdir.
+        """
+        if interned is None:
+            interned = {}
+        self = cls.__new__(cls)
+        values = self.__dict__
+        overrides = getattr(cls, KEY_OVERRIDES_MAP)
+        check_required = []
+        for key, field, kind in cls._repodata_fields():
+            val = info.get(key, NULL)
+            if kind == 'shared_text' and type(val) is text_type:
+                values[key] = interned.setdefault(val, val)
+                continue
+            elif (kind == 'text' and type(val) is text_type
+                  or kind == 'int' and type(val) is int):
+                values[key] = val
+                continue
+            elif kind == 'text_list' and type(val) in (list, tuple) and all(
+                    type(v) is text_type for v in val):
+                val = tuple(interned.setdefault(v, v) for v in val)
+                values[key] = interned.setdefault(val, val)
+                continue
+            # everything else goes through the field, as in Entity.__init__
+            if val is NULL and field._aliases:
+                val = next((info[ls] for ls in field._aliases if ls in info), NULL)
+            if val is NULL:
+                if key in overrides:
+                    setattr(self, key, overrides[key])
+                elif field.required and field.default is NULL:
+                    raise ValidationError(key, msg="%s requires a %s field. Instantiated with "
+                                                   "%s" % (cls.__name__, key, info))
+            else:
+                try:
+                    setattr(self, key, val)
+                except ValidationError:
+                    if val is not None or field.required:
+                        raise
+            if field.required:
+                check_required.append(key)
+        try:
+            for key in check_required:
+                getattr(self, key)
+        except AttributeError as e:
+            raise ValidationError(None, msg=e)
+        setattr(self, '_%s__initd' % cls.__name__, True)
+        return self
+
+    @classmethod
+    def _repodata_fields(cls):
+        # (name, field, kind) for every field; kind tells from_repodata how it may store the
+        # value directly, or is None when the value has to be boxed by the field
+        if '_repodata_fields_cache' not in cls.__dict__:
+            def kind(name, field):
+                if field._validation is not None:
+                    return None
+                elif type(field) is StringField:
+                    return 'text' if name in cls._unique_text_fields else 'shared_text'
+                elif type(field) is IntegerField:
+                    return 'int'
+                elif type(field) is ListField and field._element_type == string_types:
+                    return 'text_list'
+                return None
+            cls._repodata_fields_cache = tuple((name, field, kind(name, field))
+                                               for name, field in cls.__fields__.items())
+        return cls._repodata_fields_cache
+
 
 class Md5Field(StringField):
 
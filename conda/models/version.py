@@ -2,12 +2,14 @@
 # Copyright (C) 2012 Anaconda, Inc
 # SPDX-License-Identifier: BSD-3-Clause
 from __future__ import absolute_import, division, print_function, unicode_literals
+from collections import namedtuple
+from functools import reduce
 from logging import getLogger
 import operator as op
 import re
 
 from .._vendor.toolz import excepts
-from ..common.compat import string_types, zip, zip_longest, text_type, with_metaclass
+from ..common.compat import odict, string_types, text_type, with_metaclass, zip_longest
 from ..exceptions import InvalidVersionSpec
 
 log = getLogger(__name__)
@@ -28,6 +30,49 @@ version_split_re = re.compile('([0-9]+|[*]+|[^0-9*]+)')
 version_cache = {}
 
 
+CacheInfo = namedtuple('CacheInfo', ('hits', 'misses', 'maxsize', 'currsize'))
+
+
+class LRUCache(object):
+    """A dict-like cache holding at most ``maxsize`` entries, evicting the least recently used
+    one first, and counting lookup hits and misses.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.hits = self.misses = 0
+        self._data = odict()
+
+    def __getitem__(self, key):
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            raise
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def __setitem__(self, key, value):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    def clear(self):
+        self._data.clear()
+        self.hits = self.misses = 0
+
+    def info(self):
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self._data))
+
+
 class SingleStrArgCachingType(type):
 
     def __call__(cls, arg):
@@ -43,6 +88,54 @@ class SingleStrArgCachingType(type):
             return super(SingleStrArgCachingType, cls).__call__(arg)
 
 
+def _subcomponent_key(c):
+    # strings < integers < 'post' (infinity); the tags keep strings and ints from being compared
+    if isinstance(c, string_types):
+        return 0, c
+    elif c == float('inf'):
+        return 2,
+    return 1, c
+
+
+def _padded_key(keys, fill_key):
+    """Make a sequence of keys, implicitly padded with ``fill_key`` forever (as zip_longest
+    does in a comparison), comparable as a plain tuple.
+
+    Trailing fills are dropped and a final fill marks the end.  Each fill also records
+    whether the next key that is not a fill is smaller (-1) or greater (1) than the fill, so
+    that a shorter sequence compares correctly against the padding it stands for.
+    """
+    keys = list(keys)
+    while keys and keys[-1] == fill_key:
+        keys.pop()
+    result = []
+    lookahead = 0
+    for key in reversed(keys):
+        if key == fill_key:
+            result.append((key, lookahead))
+        else:
+            lookahead = 1 if key > fill_key else -1
+            result.append((key, 0))
+    result.reverse()
+    result.append((fill_key, 0))
+    return tuple(result)
+
+
+# a missing subcomponent is treated as integer 0, a missing component as [0]
+_ZERO_SUBCOMPONENT_KEY = _subcomponent_key(0)
+
+
+def _component_key(v):
+    return _padded_key((_subcomponent_key(c) for c in v), _ZERO_SUBCOMPONENT_KEY)
+
+
+_ZERO_COMPONENT_KEY = _component_key(())
+
+# subcomponent keys sorting before and after all others, used for interval bounds
+_BELOW_ALL_KEY = ()
+_ABOVE_ALL_KEY = (3,)
+
+
 @with_metaclass(SingleStrArgCachingType)
 class VersionOrder(object):
     """
@@ -154,7 +247,7 @@ class VersionOrder(object):
 
       1.0.1_ < 1.0.1a =>  True   # ensure correct ordering for openssl
     """
-    _cache_ = {}
+    _cache_ = LRUCache(maxsize=50000)
 
     def __init__(self, vstr):
         # version comparison is case-insensitive
@@ -249,7 +342,21 @@ class VersionOrder(object):
         return True
 
     def __eq__(self, other):
-        return self._eq(self.version, other.version) and self._eq(self.local, other.local)
+        return self.sort_key == other.sort_key
+
+    @property
+    def sort_key(self):
+        """A tuple of plain tuples, strings and ints that compares exactly like this
+        VersionOrder.  It is computed on first use and kept, so sorting and comparing
+        versions repeatedly is a tuple comparison.
+        """
+        try:
+            return self._sort_key
+        except AttributeError:
+            self._sort_key = tuple(_padded_key((_component_key(v) for v in t),
+                                               _ZERO_COMPONENT_KEY)
+                                   for t in (self.version, self.local))
+            return self._sort_key
 
     def startswith(self, other):
         # Tests if the version lists match up to the last element in "other".
@@ -279,22 +386,7 @@ class VersionOrder(object):
         return not (self == other)
 
     def __lt__(self, other):
-        for t1, t2 in zip([self.version, self.local], [other.version, other.local]):
-            for v1, v2 in zip_longest(t1, t2, fillvalue=[]):
-                for c1, c2 in zip_longest(v1, v2, fillvalue=self.fillvalue):
-                    if c1 == c2:
-                        continue
-                    elif isinstance(c1, string_types):
-                        if not isinstance(c2, string_types):
-                            # str < int
-                            return True
-                    elif isinstance(c2, string_types):
-                        # not (int < str)
-                        return False
-                    # c1 and c2 have the same type
-                    return c1 < c2
-        # self == other
-        return False
+        return self.sort_key < other.sort_key
 
     def __gt__(self, other):
         return other < self
@@ -426,6 +518,170 @@ OPERATOR_MAP = {
 }
 OPERATOR_START = frozenset(('=', '<', '>', '!', '~'))
 
+
+def _lower_sort_key(interval):
+    lower, lower_closed = interval[0], interval[1]
+    return (0,) if lower is None else (1, lower, not lower_closed)
+
+
+def _is_empty_interval(interval):
+    lower, lower_closed, upper, upper_closed = interval
+    if lower is None or upper is None:
+        return False
+    return lower > upper or lower == upper and not (lower_closed and upper_closed)
+
+
+class VersionIntervals(object):
+    """
+    A set of versions, as a union of disjoint intervals of VersionOrder sort keys in
+    increasing order.  Each interval is a ``(lower, lower_closed, upper, upper_closed)``
+    tuple, where a ``None`` bound is unbounded.
+    """
+    __slots__ = ('intervals',)
+
+    def __init__(self, intervals=()):
+        normalized = []
+        for interval in sorted((iv for iv in intervals if not _is_empty_interval(iv)),
+                               key=_lower_sort_key):
+            if normalized:
+                lower, lower_closed, upper, upper_closed = normalized[-1]
+                if (upper is None or interval[0] is None or interval[0] < upper
+                        or interval[0] == upper and (upper_closed or interval[1])):
+                    # overlapping or adjacent: extend the previous interval
+                    if upper is not None and (interval[2] is None or interval[2] > upper
+                                              or interval[2] == upper and interval[3]):
+                        normalized[-1] = (lower, lower_closed, interval[2], interval[3])
+                    continue
+            normalized.append(interval)
+        self.intervals = tuple(normalized)
+
+    @classmethod
+    def everything(cls):
+        return cls(((None, False, None, False),))
+
+    @classmethod
+    def from_operator(cls, operator_str, vo):
+        """Intervals for a relational VersionSpec; None if the operator has none."""
+        key = vo.sort_key
+        if operator_str == '==':
+            return cls(((key, True, key, True),))
+        elif operator_str == '!=':
+            return cls(((None, False, key, False), (key, False, None, False)))
+        elif operator_str == '<':
+            return cls(((None, False, key, False),))
+        elif operator_str == '<=':
+            return cls(((None, False, key, True),))
+        elif operator_str == '>':
+            return cls(((key, False, None, False),))
+        elif operator_str == '>=':
+            return cls(((key, True, None, False),))
+        elif operator_str in ('=', '!=startswith'):
+            result = cls.startswith(vo)
+            return result if operator_str == '=' else result.complement()
+        elif operator_str == '~=':
+            try:
+                prefix = VersionOrder(".".join(text_type(vo).split(".")[:-1]))
+            except InvalidVersionSpec:
+                # left for match() to raise, as it always has
+                return None
+            return cls.from_operator('>=', vo).intersection(cls.startswith(prefix))
+        return None
+
+    @classmethod
+    def startswith(cls, vo):
+        """The versions for which ``VersionOrder.startswith(vo)`` is true.
+
+        They all share the components of ``vo`` but the last one, and the leading
+        subcomponents of that, so they form a single interval.  Its bounds are not the sort
+        keys of real versions: their last subcomponent is below or above all others.
+        """
+        if vo.local:
+            head = (_padded_key((_component_key(v) for v in vo.version), _ZERO_COMPONENT_KEY),)
+            components = vo.local
+        else:
+            head = ()
+            components = vo.version
+        last = components[-1]
+        c = last[-1]
+        subcomponents = [_subcomponent_key(sc) for sc in last[:-1]]
+        if isinstance(c, string_types):
+            # strings starting with c sort before c with its last character incremented
+            lower = subcomponents + [(0, c), _BELOW_ALL_KEY]
+            upper = subcomponents + [(0, c[:-1] + chr(ord(c[-1]) + 1)), _BELOW_ALL_KEY]
+        else:
+            lower = subcomponents + [_subcomponent_key(c), _BELOW_ALL_KEY]
+            upper = subcomponents + [_subcomponent_key(c), _ABOVE_ALL_KEY]
+        prefix = [_component_key(v) for v in components[:-1]]
+        lower, upper = (
+            head + (_padded_key(prefix + [_padded_key(bound, _ZERO_SUBCOMPONENT_KEY)],
+                                _ZERO_COMPONENT_KEY),)
+            for bound in (lower, upper)
+        )
+        return cls(((lower, False, upper, False),))
+
+    def is_empty(self):
+        return not self.intervals
+
+    def is_everything(self):
+        return self.intervals == ((None, False, None, False),)
+
+    def contains(self, key):
+        for lower, lower_closed, upper, upper_closed in self.intervals:
+            if lower is not None and (key < lower or key == lower and not lower_closed):
+                # intervals are in increasing order, so no later one can hold key either
+                return False
+            if upper is None or key < upper or key == upper and upper_closed:
+                return True
+        return False
+
+    def complement(self):
+        gaps = []
+        lower, lower_closed = None, False
+        for interval in self.intervals:
+            if interval[0] is not None:
+                gaps.append((lower, lower_closed, interval[0], not interval[1]))
+            if interval[2] is None:
+                break
+            lower, lower_closed = interval[2], not interval[3]
+        else:
+            gaps.append((lower, lower_closed, None, False))
+        return self.__class__(gaps)
+
+    def union(self, other):
+        return self.__class__(self.intervals + other.intervals)
+
+    def intersection(self, other):
+        result = []
+        for lower1, lower_closed1, upper1, upper_closed1 in self.intervals:
+            for lower2, lower_closed2, upper2, upper_closed2 in other.intervals:
+                if lower1 is None or lower2 is not None and lower2 > lower1:
+                    lower, lower_closed = lower2, lower_closed2
+                elif lower2 is None or lower1 > lower2:
+                    lower, lower_closed = lower1, lower_closed1
+                else:
+                    lower, lower_closed = lower1, lower_closed1 and lower_closed2
+                if upper1 is None or upper2 is not None and upper2 < upper1:
+                    upper, upper_closed = upper2, upper_closed2
+                elif upper2 is None or upper1 < upper2:
+                    upper, upper_closed = upper1, upper_closed1
+                else:
+                    upper, upper_closed = upper1, upper_closed1 and upper_closed2
+                result.append((lower, lower_closed, upper, upper_closed))
+        return self.__class__(result)
+
+    def __eq__(self, other):
+        return self.intervals == other.intervals
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.intervals)
+
+    def __repr__(self):
+        return "%s(%r)" % (self.__class__.__name__, self.intervals)
+
+
 class BaseSpec(object):
 
     def __init__(self, spec_str, matcher, is_exact):
@@ -485,13 +741,19 @@ class BaseSpec(object):
     def exact_match(self, spec_str):
         return self.spec == spec_str
 
+    def interval_match(self, spec_str):
+        return self.intervals.contains(VersionOrder(text_type(spec_str)).sort_key)
+
     def always_true_match(self, spec_str):
         return True
 
 
 @with_metaclass(SingleStrArgCachingType)
 class VersionSpec(BaseSpec):  # lgtm [py/missing-equals]
-    _cache_ = {}
+    _cache_ = LRUCache(maxsize=20000)
+
+    # the matched versions as VersionIntervals, or None for regex and '@' specs
+    intervals = None
 
     def __init__(self, vspec):
         vspec_str, matcher, is_exact = self.get_matcher(vspec)
@@ -510,6 +772,13 @@ class VersionSpec(BaseSpec):  # lgtm [py/missing-equals]
             self.tup = tup
             matcher = _matcher
             is_exact = False
+            if all(t.intervals is not None for t in tup):
+                combine = (VersionIntervals.union if vspec_tree[0] == '|'
+                           else VersionIntervals.intersection)
+                self.intervals = reduce(combine, (t.intervals for t in tup))
+                # one lookup against the combined intervals instead of one match per element
+                matcher = (self.always_true_match if self.intervals.is_everything()
+                           else self.interval_match)
             return vspec_str, matcher, is_exact
 
         vspec_str = text_type(vspec).strip()
@@ -544,9 +813,11 @@ class VersionSpec(BaseSpec):  # lgtm [py/missing-equals]
             except KeyError:
                 raise InvalidVersionSpec(vspec_str, "invalid operator: %s" % operator_str)
             self.matcher_vo = VersionOrder(vo_str)
+            self.intervals = VersionIntervals.from_operator(operator_str, self.matcher_vo)
             matcher = self.operator_match
             is_exact = operator_str == "=="
         elif vspec_str == '*':
+            self.intervals = VersionIntervals.everything()
             matcher = self.always_true_match
             is_exact = False
         elif '*' in vspec_str.rstrip('*'):
@@ -572,11 +843,13 @@ class VersionSpec(BaseSpec):  # lgtm [py/missing-equals]
             vo_str = vspec_str.rstrip('*').rstrip('.')
             self.operator_func = VersionOrder.startswith
             self.matcher_vo = VersionOrder(vo_str)
+            self.intervals = VersionIntervals.startswith(self.matcher_vo)
             matcher = self.operator_match
             is_exact = False
         elif '@' not in vspec_str:
             self.operator_func = OPERATOR_MAP["=="]
             self.matcher_vo = VersionOrder(vspec_str)
+            self.intervals = VersionIntervals.from_operator("==", self.matcher_vo)
             matcher = self.operator_match
             is_exact = True
         else:
@@ -602,7 +875,7 @@ VersionMatch = VersionSpec
 
 @with_metaclass(SingleStrArgCachingType)
 class BuildNumberMatch(BaseSpec):  # lgtm [py/missing-equals]
-    _cache_ = {}
+    _cache_ = LRUCache(maxsize=1000)
 
     def __init__(self, vspec):
         vspec_str, matcher, is_exact = self.get_matcher(vspec)
@@ -669,3 +942,9 @@ class BuildNumberMatch(BaseSpec):  # lgtm [py/missing-equals]
 
     def __repr__(self):
         return text_type(self.spec)
+
+
+def version_cache_info():
+    """CacheInfo of the VersionOrder, VersionSpec and BuildNumberMatch caches, by class name."""
+    return {cls.__name__: cls._cache_.info()
+            for cls in (VersionOrder, VersionSpec, BuildNumberMatch)}
@@ -5,6 +5,7 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 
 from collections import defaultdict, OrderedDict, deque
 import copy
+from itertools import compress
 from logging import DEBUG, getLogger
 
 from ._vendor.auxlib.collection import frozendict
@@ -15,8 +16,8 @@ from .base.constants import ChannelPriority, MAX_CHANNEL_PRIORITY, SatSolverChoi
 from .base.context import context
 from .common.compat import iteritems, iterkeys, itervalues, odict, on_win, text_type
 from .common.io import time_recorder
-from .common.logic import (Clauses, PycoSatSolver, PyCryptoSatSolver, PySatSolver, TRUE,
-                           minimal_unsatisfiable_subset)
+from .common.logic import (Clauses, PycoSatSolver, PyCryptoSatSolver, PySatSolver,
+                           PySatIncrementalSolver, TRUE, minimal_unsatisfiable_subset)
 from .common.toposort import toposort
 from .exceptions import (CondaDependencyError, InvalidSpec, ResolvePackageNotFound,
                          UnsatisfiableError)
@@ -37,6 +38,7 @@ _sat_solvers = odict([
     (SatSolverChoice.PYCOSAT, PycoSatSolver),
     (SatSolverChoice.PYCRYPTOSAT, PyCryptoSatSolver),
     (SatSolverChoice.PYSAT, PySatSolver),
+    (SatSolverChoice.PYSAT_INCREMENTAL, PySatIncrementalSolver),
 ])
 
 
@@ -91,6 +93,69 @@ def exactness_and_number_of_deps(resolve_obj, ms):
     return value
 
 
+class _GroupMatchIndex(object):
+    """
+    Bitset index over the records of one name group, used to answer find_matches.
+
+    Bit i of a bitset (a plain int) stands for the i-th record of the group.  For each
+    MatchSpec field the records are grouped by their distinct values of that field, so a
+    field matcher is evaluated once per distinct value (e.g. once per version rather than
+    once per build), and the resulting bitset is cached per matcher.  A spec then matches
+    the AND of the bitsets of its fields, and a set of specs the OR of those.
+    """
+
+    def __init__(self, precs):
+        self.precs = tuple(precs)
+        self.all_bits = (1 << len(self.precs)) - 1
+        self._field_values = {}  # Dict[field_name, List[Tuple[PackageRecord, bits]]]
+        self._matcher_bits = {}  # Dict[Tuple[field_name, matcher], bits]
+
+    def _get_field_values(self, field_name):
+        # one representative record per distinct field value, with the bits of all records
+        # sharing that value
+        field_values = self._field_values.get(field_name)
+        if field_values is None:
+            representatives = {}
+            value_bits = {}
+            for i, prec in enumerate(self.precs):
+                value = getattr(prec, field_name)
+                if value in value_bits:
+                    value_bits[value] |= 1 << i
+                else:
+                    representatives[value] = prec
+                    value_bits[value] = 1 << i
+            field_values = [(representatives[value], bits)
+                            for value, bits in iteritems(value_bits)]
+            self._field_values[field_name] = field_values
+        return field_values
+
+    def match_bits(self, spec):
+        bits = self.all_bits
+        for field_name, matcher in iteritems(spec._match_components):
+            key = field_name, matcher
+            field_bits = self._matcher_bits.get(key)
+            if field_bits is None:
+                field_bits = 0
+                for prec, value_bits in self._get_field_values(field_name):
+                    if spec._match_individual(prec, field_name, matcher):
+                        field_bits |= value_bits
+                self._matcher_bits[key] = field_bits
+            bits &= field_bits
+            if not bits:
+                break
+        return bits
+
+    def flags(self, bits):
+        """Return a list with one bool per record of the group, True if its bit is set."""
+        flags = [c == '1' for c in reversed(format(bits, 'b'))] if bits else []
+        flags.extend(False for _ in range(len(self.precs) - len(flags)))
+        return flags
+
+    def select(self, bits):
+        """Return the records whose bits are set, in group order."""
+        return tuple(compress(self.precs, self.flags(bits)))
+
+
 class Resolve(object):
 
     def __init__(self, index, processed=False, channels=()):
@@ -117,10 +182,12 @@ class Resolve(object):
         self.groups = groups  # Dict[package_name, List[PackageRecord]]
         self.trackers = trackers  # Dict[track_feature, Set[PackageRecord]]
         self._cached_find_matches = {}  # Dict[MatchSpec, Set[PackageRecord]]
+        self._group_match_indexes = {}  # Dict[package_name, _GroupMatchIndex]
         self.ms_depends_ = {}  # Dict[PackageRecord, List[MatchSpec]]
         self._reduced_index_cache = {}
         self._pool_cache = {}
         self._strict_channel_cache = {}
+        self._valid_spec_cache = {}
 
         self._system_precs = {_ for _ in index if (
             hasattr(_, 'package_type') and _.package_type == PackageType.VIRTUAL_SYSTEM)}
@@ -203,18 +270,25 @@ class Resolve(object):
             else:
                 return is_valid_prec(_spec_or_prec)
 
-        @memoizemethod
-        def is_valid_spec(_spec):
-            return optional and _spec.optional or any(
-                is_valid_prec(_prec) for _prec in self.find_matches(_spec)
-            )
+        # MatchSpecs parsed from strings are shared between records and Resolve instances, so
+        # results are memoized here for each depending record rather than on the specs
+        valid_spec_cache = self._valid_spec_cache
+
+        def is_valid_spec(_spec, _depending_prec=None):
+            key = _depending_prec, _spec
+            val = valid_spec_cache.get(key)
+            if val is None:
+                val = valid_spec_cache[key] = optional and _spec.optional or any(
+                    is_valid_prec(_prec) for _prec in self.find_matches(_spec)
+                )
+            return val
 
         def is_valid_prec(prec):
             val = filter_out.get(prec)
             if val is None:
                 filter_out[prec] = False
                 try:
-                    has_valid_deps = all(is_valid_spec(ms) for ms in self.ms_depends(prec))
+                    has_valid_deps = all(is_valid_spec(ms, prec) for ms in self.ms_depends(prec))
                 except InvalidSpec:
                     val = filter_out[prec] = "invalid dep specs"
                 else:
@@ -608,10 +682,16 @@ class Resolve(object):
             # Prune packages that don't match any of the patterns,
             # have unsatisfiable dependencies, or conflict with the explicit specs
             nold = nnew = 0
-            for prec in group:
+            if group:
+                group_index = self._get_group_match_index(name)
+                match_bits = 0
+                for ms in _specs:
+                    match_bits |= group_index.match_bits(ms)
+                matches_any = group_index.flags(match_bits)
+            for i, prec in enumerate(group):
                 if not filter_out.setdefault(prec, False):
                     nold += 1
-                    if (not self.match_any(_specs, prec)) or (
+                    if (not matches_any[i]) or (
                             explicit_spec_package_pool.get(name) and
                             prec not in explicit_spec_package_pool[name]):
                         filter_out[prec] = "incompatible with required spec %s" % top_level_spec
@@ -776,7 +856,10 @@ class Resolve(object):
 
         spec_name = spec.get_exact_value('name')
         if spec_name:
-            candidate_precs = self.groups.get(spec_name, ())
+            group_index = self._get_group_match_index(spec_name)
+            res = group_index.select(group_index.match_bits(spec)) if group_index else ()
+            self._cached_find_matches[spec] = res
+            return res
         elif spec.get_exact_value('track_features'):
             feature_names = spec.get_exact_value('track_features')
             candidate_precs = concat(
@@ -789,6 +872,16 @@ class Resolve(object):
         self._cached_find_matches[spec] = res
         return res
 
+    def _get_group_match_index(self, name):
+        # type: (str) -> Optional[_GroupMatchIndex]
+        group_index = self._group_match_indexes.get(name)
+        if group_index is None:
+            group = self.groups.get(name)
+            if group is None:
+                return None
+            group_index = self._group_match_indexes[name] = _GroupMatchIndex(group)
+        return group_index
+
     def ms_depends(self, prec):
         # type: (PackageRecord) -> List[MatchSpec]
         deps = self.ms_depends_.get(prec)
@@ -802,7 +895,7 @@ class Resolve(object):
         channel = prec.channel
         channel_priority = self._channel_priorities_map.get(channel.name, 1)  # TODO: ask @mcg1969 why the default value is 1 here  # NOQA
         valid = 1 if channel_priority < MAX_CHANNEL_PRIORITY else 0
-        version_comparator = VersionOrder(prec.get('version', ''))
+        version_comparator = VersionOrder(prec.get('version', '')).sort_key
         build_number = prec.get('build_number', 0)
         build_string = prec.get('build')
         noarch = - int(prec.subdir == 'noarch')
@@ -875,7 +968,10 @@ class Resolve(object):
             tgroup = libs = self.index.keys()
             simple = False
         if not simple:
-            libs = [fkey for fkey in tgroup if spec.match(fkey)]
+            if nm:
+                libs = self.find_matches(spec)
+            else:
+                libs = [fkey for fkey in tgroup if spec.match(fkey)]
         if len(libs) == len(tgroup):
             if spec.optional:
                 m = TRUE
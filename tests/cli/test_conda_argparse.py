@@ -2,9 +2,14 @@
 from __future__ import absolute_import, division, print_function, unicode_literals
 
 from logging import getLogger
+from os.path import dirname
+from subprocess import PIPE, Popen
+import sys
 
 import pytest
 
+import conda
+from conda.cli import conda_argparse
 from conda.cli.main import generate_parser
 from conda.cli.python_api import Commands, run_command
 from conda.exceptions import CommandNotFoundError, EnvironmentLocationNotFound
@@ -45,3 +50,74 @@ def test_cli_args_as_list():
 def test_cli_args_as_strings():
     out, err, rc = run_command(Commands.CONFIG, "--show", "add_anaconda_token")
     assert rc == 0
+
+
+@pytest.mark.parametrize("argv", (
+    ["install", "-vv", "-n", "foo", "numpy"],
+    ["upgrade", "--all"],
+    ["uninstall", "--force", "numpy"],
+    ["run", "-n", "base", "python", "-c", "pass"],
+    ["list", "--explicit"],
+))
+def test_subcommand_parser(argv):
+    p = conda_argparse.generate_parser(argv[0])
+    assert conda_argparse.find_builtin_commands(p) == (argv[0],)
+    assert vars(p.parse_args(argv)) == vars(generate_parser().parse_args(argv))
+
+    # `conda help` and unknown commands get the full parser
+    full_commands = conda_argparse.find_builtin_commands(generate_parser())
+    for command in ("help", "blarg", "-h"):
+        p = conda_argparse.generate_parser(command)
+        assert conda_argparse.find_builtin_commands(p) == full_commands
+
+
+# modules kept off the startup path of commands that don't fetch or solve anything
+DEFERRED_STARTUP_MODULES = (
+    "distutils",
+    "concurrent.futures.process",
+    "conda._vendor.tqdm",
+    "requests",
+    "conda.core.solve",
+    "conda.resolve",
+)
+
+
+def _startup_import_times(*argv):
+    # cumulative import time in microseconds of every module imported by `conda *argv`, and
+    # the total import time of the process
+    p = Popen((sys.executable, "-X", "importtime", "-m", "conda") + argv,
+              cwd=dirname(dirname(conda.__file__)), stdout=PIPE, stderr=PIPE)
+    _, stderr = p.communicate()
+    import_times = {}
+    total = 0
+    for line in stderr.decode("utf-8").splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cumulative, module = line.split("|")
+            if cumulative.strip().isdigit():
+                import_times[module.strip()] = int(cumulative)
+                if not module.startswith("  "):
+                    total += int(cumulative)
+    return import_times, total
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("argv", (
+    ("shell.posix", "hook"),
+    ("list", "--help"),
+    ("run", "--help"),
+))
+def test_startup_import_time(argv):
+    import_times, total = _startup_import_times(*argv)
+    conda_modules = tuple(module for module in import_times if module.split(".")[0] == "conda")
+    print("conda %s: %d conda modules imported, imports took %.1f ms"
+          % (" ".join(argv), len(conda_modules), total / 1e3))
+    assert conda_modules
+
+    deferred_modules = DEFERRED_STARTUP_MODULES
+    if "conda._vendor.auxlib.packaging" in import_times:
+        # a source checkout derives conda.__version__ through auxlib.packaging, which imports
+        # distutils; built packages have the version written into conda/__init__.py instead
+        deferred_modules = tuple(m for m in deferred_modules if m != "distutils")
+    assert not [module for module in import_times
+                if any(module == deferred or module.startswith(deferred + ".")
+                       for deferred in deferred_modules)]
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from logging import getLogger
+
+import pytest
+
+from conda.common.jlap import apply_json_patch, content_hash, dump_jlap, find_patch_chain, \
+    parse_jlap, resume_offset
+
+log = getLogger(__name__)
+
+
+def test_jlap_roundtrip():
+    patches = [
+        {"from": "a" * 64, "to": "b" * 64, "patch": [{"op": "add", "path": "/x", "value": 1}]},
+        {"from": "b" * 64, "to": "c" * 64, "patch": [{"op": "remove", "path": "/x"}]},
+    ]
+    data = dump_jlap(patches, "c" * 64)
+    parsed_patches, metadata = parse_jlap(data)
+    assert parsed_patches == patches
+    assert metadata == {"url": "repodata.json", "latest": "c" * 64}
+
+
+def test_jlap_checksum_mismatch():
+    data = dump_jlap([{"from": "a", "to": "b", "patch": []}], "b")
+    with pytest.raises(ValueError):
+        parse_jlap(data.replace(b'"from":"a"', b'"from":"z"'))
+    with pytest.raises(ValueError):
+        parse_jlap(b"0000\n")
+
+
+def test_resume_offset():
+    patches = [{"from": "h%d" % idx, "to": "h%d" % (idx + 1), "patch": []} for idx in range(3)]
+    data = dump_jlap(patches[:2], "h2")
+    updated = dump_jlap(patches, "h3")
+    offset = resume_offset(data)
+    assert data[:offset] == updated[:offset]
+    assert parse_jlap(data[:offset] + updated[offset:]) == (patches, {"url": "repodata.json",
+                                                                     "latest": "h3"})
+    assert resume_offset(b"") == 0
+
+
+def test_find_patch_chain():
+    patches = [
+        {"from": "h0", "to": "h1", "patch": []},
+        {"from": "h1", "to": "h2", "patch": []},
+        {"from": "h2", "to": "h3", "patch": []},
+    ]
+    assert find_patch_chain(patches, "h1", "h3") == patches[1:]
+    assert find_patch_chain(patches, "h3", "h3") == []
+    assert find_patch_chain(patches, "unknown", "h3") is None
+    cyclic = [{"from": "h1", "to": "h2", "patch": []}, {"from": "h2", "to": "h1", "patch": []}]
+    assert find_patch_chain(cyclic, "h0", "h2") is None
+
+
+def test_apply_json_patch():
+    doc = {"packages": {"a/b": {"depends": ["x"]}, "c~d": 1}, "list": [1, 2, 3]}
+    apply_json_patch(doc, [
+        {"op": "add", "path": "/packages/e", "value": {"depends": []}},
+        {"op": "add", "path": "/packages/a~1b/depends/-", "value": "y"},
+        {"op": "replace", "path": "/packages/c~0d", "value": 2},
+        {"op": "remove", "path": "/list/0"},
+        {"op": "move", "from": "/list/0", "path": "/moved"},
+        {"op": "copy", "from": "/packages/e", "path": "/copied"},
+        {"op": "test", "path": "/moved", "value": 2},
+    ])
+    assert doc == {
+        "packages": {"a/b": {"depends": ["x", "y"]}, "c~d": 2, "e": {"depends": []}},
+        "list": [3],
+        "moved": 2,
+        "copied": {"depends": []},
+    }
+    with pytest.raises(ValueError):
+        apply_json_patch(doc, [{"op": "remove", "path": "/not-there"}])
+    with pytest.raises(ValueError):
+        apply_json_patch(doc, [{"op": "test", "path": "/moved", "value": 3}])
+
+
+def test_content_hash():
+    assert content_hash(b"") == (
+        "0e5751c026e543b2e8ab2eb06099daa1d1e5df47778f7787faab45cdf12fe3a8")
@@ -49,3 +49,11 @@ def tmpdir(tmpdir, request):
 @pytest.fixture(autouse=True)
 def clear_subdir_cache():
     SubdirData.clear_cached_local_channel_data()
+
+
+@pytest.fixture(scope='function')
+def http_server(tmpdir):
+    """Serve the test's tmpdir over HTTP on localhost; see tests/http_test_server.py."""
+    from .http_test_server import run_test_server
+    with run_test_server(tmpdir) as server:
+        yield server
@@ -68,6 +68,19 @@ class EnvsManagerUnitTests(TestCase):
         unregister_env(gascon_location)  # should be idempotent
         assert gascon_location not in list_all_known_prefixes()
 
+    def test_unregister_env_ignores_prefix_cache(self):
+        location = join(self.prefix, 'gascon')
+        touch(join(location, PREFIX_MAGIC_FILE), mkdir=True)
+        mkdir_p(join(location, 'conda-meta', '.cache'))
+        with patch('conda.core.envs_manager._clean_environments_txt') as clean_environments_txt:
+            unregister_env(location)
+            assert clean_environments_txt.call_count == 1
+
+        touch(join(location, 'conda-meta', 'gascon-1.0-0.json'))
+        with patch('conda.core.envs_manager._clean_environments_txt') as clean_environments_txt:
+            unregister_env(location)
+            assert clean_environments_txt.call_count == 0
+
     def test_prefix_cli_flag(self):
         envs_dirs = (join(self.prefix, 'first-envs-dir'), join(self.prefix, 'seconds-envs-dir'))
         with env_var('CONDA_ENVS_DIRS', os.pathsep.join(envs_dirs), stack_callback=conda_tests_ctxt_mgmt_def_pol):
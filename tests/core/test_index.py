@@ -1,7 +1,10 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+import json
 from logging import getLogger
+import os
+from os.path import join
 from unittest import TestCase
 
 import pytest
@@ -9,13 +12,16 @@ import pytest
 from conda.base.constants import DEFAULT_CHANNELS
 from conda.base.context import context, Context, conda_tests_ctxt_mgmt_def_pol
 from conda.common.compat import iteritems, on_win, on_mac, on_linux
-from conda.common.io import env_vars
+from conda.common.io import env_var, env_vars
+from conda.core import index as core_index
 from conda.core.index import check_whitelist, get_index, get_reduced_index, _supplement_index_with_system
+from conda.core.subdir_data import SubdirData
 from conda.exceptions import ChannelNotAllowed
 from conda.models.channel import Channel
 from conda.models.enums import PackageType
 from conda.models.match_spec import MatchSpec
 from tests.core.test_subdir_data import platform_in_record
+from tests.helpers import make_synthetic_repodata
 
 try:
     from unittest.mock import patch
@@ -98,6 +104,63 @@ def test_supplement_index_with_system_glibc():
     assert glibc_pkg.package_type == PackageType.VIRTUAL_SYSTEM
 
 
+def test_reduced_index_cache(tmpdir):
+    subdir_path = tmpdir.mkdir("channel").mkdir(context.subdir)
+    repodata_path = subdir_path.join("repodata.json")
+    repodata_path.write(json.dumps(make_synthetic_repodata(n_names=30, n_versions=3)))
+    channel = Channel(str(tmpdir.join("channel")))
+    specs = (MatchSpec("pkg0010"),)
+
+    def reduced_index():
+        SubdirData.clear_cached_local_channel_data()
+        return get_reduced_index(None, (channel,), (context.subdir,), specs, "repodata.json")
+
+    with env_vars({'CONDA_REDUCED_INDEX_CACHE': 'true',
+                   'CONDA_PKGS_DIRS': str(tmpdir.join("pkgs"))},
+                  stack_callback=conda_tests_ctxt_mgmt_def_pol):
+        with patch.object(core_index, '_collect_reduced_index_records',
+                          wraps=core_index._collect_reduced_index_records) as collect:
+            cold = reduced_index()
+            assert collect.call_count == 1
+            warm = reduced_index()
+            assert collect.call_count == 1
+            assert list(warm) == list(cold)
+            assert {prec.name for prec in warm if prec.name.startswith("pkg")} == {
+                "pkg%04d" % n for n in range(11)}
+
+            # changed repodata is served with a new last-modified header
+            repodata = make_synthetic_repodata(n_names=30, n_versions=4)
+            repodata_path.write(json.dumps(repodata))
+            mtime = os.stat(str(repodata_path)).st_mtime + 10
+            os.utime(str(repodata_path), (mtime, mtime))
+            changed = reduced_index()
+            assert collect.call_count == 2
+            assert len(changed) > len(cold)
+
+            specs = (MatchSpec("pkg0003"),)
+            reduced_index()
+            assert collect.call_count == 3
+
+            # the least recently used entries are removed beyond the maximum
+            cache_dir = str(tmpdir.join("pkgs", "cache", "reduced_index"))
+            for fn in os.listdir(cache_dir):
+                os.utime(join(cache_dir, fn), (mtime - 100, mtime - 100))
+            with env_var('CONDA_REDUCED_INDEX_CACHE_MAX_ENTRIES', '2',
+                         stack_callback=conda_tests_ctxt_mgmt_def_pol):
+                reduced_index()
+                assert collect.call_count == 3
+                specs = (MatchSpec("pkg0005"),)
+                reduced_index()
+                assert collect.call_count == 4
+                assert len(os.listdir(cache_dir)) == 2
+                specs = (MatchSpec("pkg0003"),)
+                reduced_index()
+                assert collect.call_count == 4
+                specs = (MatchSpec("pkg0010"),)
+                reduced_index()
+                assert collect.call_count == 5
+
+
 @pytest.mark.integration
 class GetIndexIntegrationTests(TestCase):
 
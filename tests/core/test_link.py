@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2012 Anaconda, Inc
+# SPDX-License-Identifier: BSD-3-Clause
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from os.path import join
+
+from conda.core.link import _existing_paths
+from conda.gateways.disk import mkdir_p
+from conda.gateways.disk.update import touch
+
+
+def test_existing_paths(tmpdir):
+    prefix = str(tmpdir)
+    mkdir_p(join(prefix, 'bin'))
+    mkdir_p(join(prefix, 'lib', 'python3.8'))
+    for short_path in ('bin/python', 'lib/libpython.so', 'lib/python3.8/os.py', 'license'):
+        touch(join(prefix, short_path))
+
+    short_paths = ('bin/python', 'bin/pip', 'lib/libpython.so', 'lib/python3.8/os.py',
+                   'lib/python3.8/site-packages/foo.py', 'license', 'readme',
+                   'lib/libpython.so/not-a-dir', 'share/doc/foo')
+    assert _existing_paths(prefix, short_paths) == {
+        'bin/python', 'lib/libpython.so', 'lib/python3.8/os.py', 'license',
+    }
@@ -1,24 +1,35 @@
+import errno
+import hashlib
 import json
+import os
+import sys
 from os.path import abspath, basename, dirname, join
 
 import pytest
 
 from conda import CondaMultiError
-from conda.base.constants import PACKAGE_CACHE_MAGIC_FILE
+from conda.base.constants import PACKAGE_CACHE_MAGIC_FILE, PACKAGE_PLACEHOLDER_OFFSETS_FILE
 from conda.base.context import conda_tests_ctxt_mgmt_def_pol
 from conda.common.io import env_vars, env_var
 from conda.core.index import get_index
-from conda.core.package_cache_data import PackageCacheData, ProgressiveFetchExtract
+from conda.cli.main_clean import find_pkgs
+from conda.core.package_cache_data import (PackageBlobStore, PackageCacheData,
+                                           ProgressiveFetchExtract)
 from conda.core.path_actions import CacheUrlAction
 from conda.exceptions import ChecksumMismatchError
 from conda.exports import url_path
-from conda.gateways.disk.create import copy
+from conda.gateways.disk.create import StreamingExtractor, copy, extract_tarball
+from conda.gateways.disk.delete import rm_rf
 from conda.gateways.disk.permissions import make_read_only
 from conda.gateways.disk.read import isfile, listdir, yield_lines
 from conda.models.records import PackageRecord
+from tests.helpers import make_synthetic_package
 from tests.test_create import make_temp_package_cache
 from conda.common.compat import on_win
 import datetime
+from time import time
+from unittest.mock import patch
+import zipfile
 
 CHANNEL_DIR = abspath(join(dirname(__file__), '..', 'data', 'conda_format_repo'))
 CONDA_PKG_REPO = url_path(CHANNEL_DIR)
@@ -372,3 +383,258 @@ def test_instantiating_package_cache_when_both_tar_bz2_and_conda_exist_read_only
         assert zlib_base_fn not in pkgs_dir_files
         assert zlib_tar_bz2_fn in pkgs_dir_files
         assert zlib_conda_fn in pkgs_dir_files
+
+
+def _make_channel_packages(tmpdir, http_server, n_packages, payload_size):
+    subdir_path = tmpdir.mkdir("noarch")
+    return tuple(
+        make_synthetic_package(subdir_path, "pkg%02d" % i, payload_size=payload_size * (i + 1),
+                               url_base=http_server.url + "/noarch")
+        for i in range(n_packages)
+    )
+
+
+@pytest.mark.parametrize("extract_processes", ("0", "2"))
+def test_ProgressiveFetchExtract_pipelined(tmpdir, http_server, extract_processes):
+    precs = _make_channel_packages(tmpdir, http_server, 6, 20000)
+    # a bad checksum fails only that package, and is reported once all others are done
+    bad_prec = PackageRecord.from_objects(precs[2], md5="0" * 32, sha256="0" * 64)
+    with make_temp_package_cache() as pkgs_dir:
+        with env_vars({'CONDA_FETCH_THREADS': '3',
+                       'CONDA_EXTRACT_PROCESSES': extract_processes},
+                      stack_callback=conda_tests_ctxt_mgmt_def_pol):
+            pfe = ProgressiveFetchExtract(precs[:2] + (bad_prec,) + precs[3:])
+            with pytest.raises(CondaMultiError) as exc:
+                pfe.execute()
+        assert len(exc.value.errors) == 1
+        assert isinstance(exc.value.errors[0], ChecksumMismatchError)
+        for prec in precs:
+            extracted = join(pkgs_dir, prec.fn[:-len(".tar.bz2")])
+            assert isfile(join(extracted, "lib", prec.name + ".txt")) == (prec is not precs[2])
+        assert sorted(pcrec.name for pcrec in PackageCacheData(pkgs_dir).iter_records()
+                      if pcrec.is_extracted) == sorted(p.name for p in precs if p is not precs[2])
+        # every package was requested exactly once
+        assert all(http_server.requests["/noarch/" + prec.fn] == 1 for prec in precs)
+
+
+@pytest.mark.benchmark
+def test_ProgressiveFetchExtract_pipelined_benchmark(tmpdir, http_server):
+    # a slow server, so that most of the time goes into waiting for downloads
+    precs = _make_channel_packages(tmpdir, http_server, 24, 20000)
+    http_server.response_delay = 0.25
+    timings = {}
+    for fetch_threads, extract_processes in (("1", "0"), ("5", "0"), ("5", "2")):
+        with make_temp_package_cache():
+            with env_vars({'CONDA_FETCH_THREADS': fetch_threads,
+                           'CONDA_EXTRACT_PROCESSES': extract_processes},
+                          stack_callback=conda_tests_ctxt_mgmt_def_pol):
+                start = time()
+                ProgressiveFetchExtract(precs).execute()
+                timings[fetch_threads, extract_processes] = elapsed = time() - start
+        print("fetch_threads=%s extract_processes=%s: %.2f s"
+              % (fetch_threads, extract_processes, elapsed))
+    assert timings["5", "0"] < timings["1", "0"]
+
+
+def _deflate_package(directory, prec):
+    # rewrite a .conda package with compressed zip members, which can't be streamed
+    path = join(str(directory), prec.fn)
+    with zipfile.ZipFile(path) as zf:
+        members = [(info.filename, zf.read(info)) for info in zf.infolist()]
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        for member_name, data in members:
+            zf.writestr(member_name, data)
+    with open(path, "rb") as fh:
+        data = fh.read()
+    return PackageRecord.from_objects(prec, md5=hashlib.md5(data).hexdigest(),
+                                      sha256=hashlib.sha256(data).hexdigest(), size=len(data))
+
+
+@pytest.mark.parametrize("extension", (".tar.bz2", ".conda"))
+def test_ProgressiveFetchExtract_streaming_extract(tmpdir, http_server, extension):
+    if extension == ".conda":
+        pytest.importorskip("conda_package_streaming.package_streaming").zstd or pytest.skip()
+    subdir_path = tmpdir.mkdir("noarch")
+    precs = [make_synthetic_package(subdir_path, "pkg%02d" % i, payload_size=100000,
+                                    url_base=http_server.url + "/noarch", extension=extension)
+             for i in range(4)]
+    # a bad checksum is only detected once the package has been streamed
+    precs[1] = PackageRecord.from_objects(precs[1], md5="0" * 32, sha256="0" * 64)
+    if extension == ".conda":
+        precs[2] = _deflate_package(subdir_path, precs[2])
+    with make_temp_package_cache() as pkgs_dir:
+        with env_vars({'CONDA_STREAMING_EXTRACT': 'true'},
+                      stack_callback=conda_tests_ctxt_mgmt_def_pol):
+            with patch("conda.core.path_actions.extract_tarball",
+                       wraps=extract_tarball) as mock_extract_tarball:
+                with pytest.raises(CondaMultiError) as exc:
+                    ProgressiveFetchExtract(precs).execute()
+        assert len(exc.value.errors) == 1
+        assert isinstance(exc.value.errors[0], ChecksumMismatchError)
+        for prec in precs:
+            extracted = join(pkgs_dir, prec.fn[:-len(extension)])
+            assert isfile(join(extracted, "lib", prec.name + ".txt")) == (prec is not precs[1])
+        assert not [fn for fn in listdir(pkgs_dir) if ".stream" in fn]
+        # only the package that couldn't be streamed was extracted after its download
+        assert [call[0][0] for call in mock_extract_tarball.call_args_list] == (
+            [join(pkgs_dir, precs[2].fn)] if extension == ".conda" else [])
+        with open(join(pkgs_dir, precs[0].fn[:-len(extension)], "lib", "pkg00.txt"),
+                  "rb") as fh:
+            assert len(fh.read()) == 100000
+
+
+def test_ProgressiveFetchExtract_streaming_extract_unavailable(tmpdir, http_server, caplog):
+    subdir_path = tmpdir.mkdir("noarch")
+    prec = make_synthetic_package(subdir_path, "pkg", url_base=http_server.url + "/noarch")
+    with make_temp_package_cache() as pkgs_dir:
+        with env_var('CONDA_STREAMING_EXTRACT', 'true',
+                     stack_callback=conda_tests_ctxt_mgmt_def_pol), \
+                patch.dict(sys.modules, {"conda_package_streaming": None}), \
+                patch.object(StreamingExtractor, "_available", None), \
+                patch("conda.core.package_cache_data.StreamingExtractor.__init__") as init:
+            ProgressiveFetchExtract([prec]).execute()
+            assert not init.called
+        assert isfile(join(pkgs_dir, "pkg-1.0-0", "lib", "pkg.txt"))
+    assert "conda-package-streaming is not installed" in caplog.text
+
+
+def test_deduplicate_package_cache(tmpdir, http_server):
+    subdir_path = tmpdir.mkdir("noarch")
+    precs = [make_synthetic_package(subdir_path, "pkg", build=build, payload_size=50000,
+                                    url_base=http_server.url + "/noarch", extension=extension)
+             for build, extension in (("0", ".tar.bz2"), ("1", ".conda"), ("2", ".tar.bz2"))]
+    with make_temp_package_cache() as pkgs_dir:
+        with env_vars({'CONDA_DEDUPLICATE_PACKAGE_CACHE': 'true'},
+                      stack_callback=conda_tests_ctxt_mgmt_def_pol):
+            ProgressiveFetchExtract(precs).execute()
+        blob_store = PackageBlobStore(pkgs_dir)
+        paths = [join(pkgs_dir, "pkg-1.0-%s" % build, "lib", "pkg.txt") for build in "012"]
+        with open(paths[0], "rb") as fh:
+            blob_path = blob_store.blob_path(hashlib.sha256(fh.read()).hexdigest())
+        # all three builds share one copy of the file
+        assert all(os.path.samefile(path, blob_path) for path in paths)
+        assert os.lstat(blob_path).st_nlink == 4
+
+        # a file linked into an environment can't be attributed to one of the builds
+        installed_path = join(pkgs_dir, "installed.txt")
+        os.link(paths[0], installed_path)
+        pkgs_dirs, _, _, _ = find_pkgs()
+        assert not pkgs_dirs[pkgs_dir]
+        os.unlink(installed_path)
+        pkgs_dirs, _, _, _ = find_pkgs()
+        assert sorted(pkgs_dirs[pkgs_dir]) == ["pkg-1.0-0", "pkg-1.0-1", "pkg-1.0-2"]
+
+        for build in "12":
+            rm_rf(join(pkgs_dir, "pkg-1.0-%s" % build))
+        assert blob_store.collect_garbage() == []
+        rm_rf(join(pkgs_dir, "pkg-1.0-0"))
+        assert [path for path, _ in blob_store.collect_garbage(dry_run=True)] == [blob_path]
+        assert [path for path, _ in blob_store.collect_garbage()] == [blob_path]
+        assert not os.path.exists(blob_path)
+
+
+def test_index_placeholder_offsets(tmpdir, http_server):
+    subdir_path = tmpdir.mkdir("noarch")
+    precs = [make_synthetic_package(subdir_path, "pkg", build=build,
+                                    url_base=http_server.url + "/noarch") for build in "012"]
+    with make_temp_package_cache() as pkgs_dir:
+        def offsets_path(build):
+            return join(pkgs_dir, "pkg-1.0-%s" % build, PACKAGE_PLACEHOLDER_OFFSETS_FILE)
+
+        ProgressiveFetchExtract(precs[:1]).execute()
+        assert not isfile(offsets_path("0"))
+        with env_var('CONDA_INDEX_PLACEHOLDER_OFFSETS', 'true',
+                     stack_callback=conda_tests_ctxt_mgmt_def_pol):
+            ProgressiveFetchExtract(precs[1:2]).execute()
+            assert isfile(offsets_path("1"))
+
+            # failing to index the placeholders doesn't fail the extraction
+            with patch("conda.core.path_actions.index_package_placeholders",
+                       side_effect=OSError(errno.EIO, "I/O error")):
+                ProgressiveFetchExtract(precs[2:]).execute()
+            assert not isfile(offsets_path("2"))
+            assert isfile(join(pkgs_dir, "pkg-1.0-2", "info", "repodata_record.json"))
+
+
+def _make_extracted_packages(pkgs_dir, count):
+    # extracted packages with just the metadata PackageCacheData.load reads
+    for i in range(count):
+        prec = PackageRecord(name="pkg%05d" % i, version="1.0", build="0", build_number=0,
+                             channel="https://conda.example/channel", subdir="noarch",
+                             fn="pkg%05d-1.0-0.tar.bz2" % i, md5="0" * 32)
+        info_dir = join(pkgs_dir, "pkg%05d-1.0-0" % i, "info")
+        os.makedirs(info_dir)
+        with open(join(info_dir, "index.json"), "w") as fh:
+            json.dump(prec.dump(), fh)
+        with open(join(info_dir, "repodata_record.json"), "w") as fh:
+            json.dump(prec.dump(), fh)
+    # old enough to be trusted by the manifest
+    os.utime(pkgs_dir, (time() - 10, time() - 10))
+
+
+def _load_package_cache(pkgs_dir):
+    # returns the package cache, and the packages whose metadata load() read
+    PackageCacheData._cache_.clear()
+    with patch.object(PackageCacheData, "_read_manifest_entry", autospec=True,
+                      side_effect=PackageCacheData._read_manifest_entry) as mock_read, \
+            patch.object(PackageCacheData, "_make_single_record", autospec=True,
+                         side_effect=PackageCacheData._make_single_record) as mock_make:
+        pcd = PackageCacheData(pkgs_dir)
+        pcd.load()
+    calls = mock_read.call_args_list + mock_make.call_args_list
+    return pcd, sorted(set(call[0][1] for call in calls))
+
+
+def test_package_cache_manifest(tmpdir, http_server):
+    with make_temp_package_cache() as pkgs_dir:
+        _make_extracted_packages(pkgs_dir, 3)
+        pcd, made = _load_package_cache(pkgs_dir)
+        assert made == ["pkg00000-1.0-0", "pkg00001-1.0-0", "pkg00002-1.0-0"]
+        records = sorted(pcd.iter_records(), key=lambda pcrec: pcrec.name)
+
+        # nothing changed; the records come from the manifest, and are only made when asked for
+        pcd, made = _load_package_cache(pkgs_dir)
+        assert made == []
+        pcrec = next(pcd.query("pkg00001"))
+        assert pcrec == records[1]
+        assert pcrec.extracted_package_dir == records[1].extracted_package_dir
+        assert pcd.get(records[2]) == records[2]
+        assert sorted(pcd.iter_records(), key=lambda pcrec: pcrec.name) == records
+
+        # only new and changed packages are read again
+        subdir_path = tmpdir.mkdir("noarch")
+        prec = make_synthetic_package(subdir_path, "newpkg", url_base=http_server.url + "/noarch")
+        ProgressiveFetchExtract((prec,)).execute()
+        rm_rf(join(pkgs_dir, "pkg00000-1.0-0"))
+        os.utime(join(pkgs_dir, "pkg00002-1.0-0"), (time() + 10, time() + 10))
+        pcd, made = _load_package_cache(pkgs_dir)
+        assert made == ["pkg00002-1.0-0"]
+        assert sorted(pcrec.name for pcrec in pcd.iter_records()) == [
+            "newpkg", "pkg00001", "pkg00002"]
+
+        with env_vars({'CONDA_PACKAGE_CACHE_MANIFEST': 'false'},
+                      stack_callback=conda_tests_ctxt_mgmt_def_pol):
+            pcd, made = _load_package_cache(pkgs_dir)
+        assert made == ["newpkg-1.0-0.tar.bz2", "pkg00001-1.0-0", "pkg00002-1.0-0"]
+
+
+@pytest.mark.benchmark
+def test_package_cache_manifest_benchmark():
+    with make_temp_package_cache() as pkgs_dir:
+        _make_extracted_packages(pkgs_dir, 5000)
+        timings = {}
+        for label, manifest in (("scanned", "false"), ("first load", "true"),
+                                ("validated", "true"), ("trusted", "true")):
+            if label == "validated":
+                # the manifest is only trusted once the pkgs_dir mtime was old when it was read
+                os.utime(pkgs_dir, (time() - 10, time() - 10))
+            with env_vars({'CONDA_PACKAGE_CACHE_MANIFEST': manifest},
+                          stack_callback=conda_tests_ctxt_mgmt_def_pol):
+                PackageCacheData._cache_.clear()
+                start = time()
+                pcrecs = list(PackageCacheData(pkgs_dir).query("pkg00042"))
+                timings[label] = elapsed = time() - start
+            assert [pcrec.name for pcrec in pcrecs] == ["pkg00042"]
+            print("%s: %.3f s" % (label, elapsed))
+        assert timings["validated"] < timings["scanned"] / 5
+        assert timings["trusted"] < timings["validated"] / 5
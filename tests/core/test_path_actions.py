@@ -1,7 +1,10 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+from concurrent.futures import ProcessPoolExecutor
+import json
 from logging import getLogger
+from multiprocessing import get_context as get_mp_context
 from os.path import basename, dirname, isdir, isfile, join, lexists, getsize
 import sys
 from tempfile import gettempdir
@@ -17,7 +20,9 @@ from conda.common.compat import PY2, on_win
 from conda.common.path import get_bin_directory_short_path, get_python_noarch_target_path, \
     get_python_short_path, get_python_site_packages_short_path, parse_entry_point_def, pyc_path, \
     win_path_ok
-from conda.core.path_actions import CompileMultiPycAction, CreatePythonEntryPointAction, LinkPathAction
+from conda.core.path_actions import CompileMultiPycAction, CreatePrefixRecordAction, \
+    CreatePythonEntryPointAction, LinkPathAction, PrefixReplaceLinkAction
+from conda.core.prefix_data import PrefixData
 from conda.exceptions import ParseError
 from conda.gateways.disk.create import create_link, mkdir_p
 from conda.gateways.disk.delete import rm_rf
@@ -26,8 +31,13 @@ from conda.gateways.disk.permissions import is_executable
 from conda.gateways.disk.read import compute_md5sum, compute_sha256sum
 from conda.gateways.disk.test import softlink_supported
 from conda.gateways.disk.update import touch
-from conda.models.enums import LinkType, NoarchType, PathType
-from conda.models.records import PathDataV1
+from conda.models.enums import FileMode, LinkType, NoarchType, PathType
+from conda.models.records import PackageRecord, PathDataV1
+
+try:
+    from unittest.mock import patch
+except ImportError:
+    from mock import patch
 
 log = getLogger(__name__)
 
@@ -360,6 +370,128 @@ class PathActionsTests(TestCase):
         axn.reverse()
         assert not lexists(axn.target_full_path)
 
+    def test_create_file_link_actions_copy_link_type(self):
+        def make_package_info(*paths):
+            return AttrDict(
+                extracted_package_dir=self.pkgs_dir,
+                repodata_record=AttrDict(noarch=None),
+                package_metadata=None,
+                paths_data=AttrDict(paths=[PathDataV1(_path=path, path_type=PathType.hardlink,
+                                                      no_link=no_link)
+                                           for path, no_link in paths]),
+            )
+
+        with patch('conda.core.path_actions.reflink_supported', return_value=True) as supported:
+            # nothing has to be copied, so reflinks aren't checked for
+            axns = LinkPathAction.create_file_link_actions(
+                {}, make_package_info(('a', False), ('b', False)), self.prefix, LinkType.hardlink)
+            assert [axn.link_type for axn in axns] == [LinkType.hardlink] * 2
+            assert not supported.called
+
+            # and once a file has to be copied, only once per package
+            axns = LinkPathAction.create_file_link_actions(
+                {}, make_package_info(('a', False), ('b', True), ('c', True)), self.prefix,
+                LinkType.hardlink)
+            assert [axn.link_type for axn in axns] == [
+                LinkType.hardlink, LinkType.reflink, LinkType.reflink]
+            assert supported.call_count == 1
+
+    def test_CreatePrefixRecordAction_reflink_recorded_as_copy(self):
+        mkdir_p(join(self.prefix, 'conda-meta'))
+        repodata_record = PackageRecord(name='pkg', version='1.0', build='0', build_number=0,
+                                        channel='defaults', subdir=context.subdir,
+                                        fn='pkg-1.0-0.tar.bz2')
+        package_info = AttrDict(
+            repodata_record=repodata_record,
+            package_metadata=None,
+            url=None,
+            extracted_package_dir=join(self.pkgs_dir, 'pkg-1.0-0'),
+            package_tarball_full_path=join(self.pkgs_dir, 'pkg-1.0-0.tar.bz2'),
+        )
+        axn, = CreatePrefixRecordAction.create_actions(
+            {}, package_info, self.prefix, LinkType.reflink, 'pkg', ())
+        try:
+            axn.execute()
+            assert axn.prefix_record.link.type == LinkType.copy
+            with open(axn.target_full_path) as fh:
+                assert json.load(fh)['link']['type'] == LinkType.copy.value
+        finally:
+            PrefixData._cache_.pop(self.prefix, None)
+
+    @pytest.mark.skipif(on_win, reason="no binary replacement done on win")
+    def test_PrefixReplaceLinkAction_process_pool(self):
+        placeholder = '/' + 'placeholder_' * 10
+        contents = {
+            FileMode.text: ('#!%s/bin/python\nprint(1)\n' % placeholder).encode('utf-8'),
+            FileMode.binary: b'\x7fELF' + ('%s/lib\0' % placeholder).encode('utf-8') * 100,
+        }
+        package_info = AttrDict(repodata_record=AttrDict(subdir=context.subdir),
+                                placeholder_offsets=None)
+        transaction_context = {'temp_dir': join(self.pkgs_dir, 'tmp')}
+        actions = []
+        for file_mode, data in contents.items():
+            source_short_path = str(uuid4())[:8]
+            source_full_path = join(self.pkgs_dir, source_short_path)
+            with open(source_full_path, 'wb') as fh:
+                fh.write(data)
+            source_path_data = PathDataV1(
+                _path=source_short_path,
+                path_type=PathType.hardlink,
+                sha256=compute_sha256sum(source_full_path),
+                size_in_bytes=len(data),
+            )
+            actions.append(PrefixReplaceLinkAction(
+                transaction_context, package_info, self.pkgs_dir, source_short_path,
+                self.prefix, source_short_path, LinkType.hardlink, placeholder, file_mode,
+                source_path_data))
+
+        executor = ProcessPoolExecutor(1, mp_context=get_mp_context('spawn'))
+        try:
+            for axn in actions:
+                assert not axn.start_verify(executor)
+            for axn in actions:
+                axn.finish_verify()
+        finally:
+            executor.shutdown()
+
+        for axn in actions:
+            assert axn.verified
+            assert axn.prefix_replace_time >= 0
+            axn.execute()
+            assert axn.prefix_path_data.sha256_in_prefix == compute_sha256sum(axn.target_full_path)
+            with open(axn.target_full_path, 'rb') as fh:
+                data = fh.read()
+            assert placeholder.encode('utf-8') not in data
+            assert self.prefix.encode('utf-8') in data
+            if axn.file_mode == FileMode.binary:
+                assert len(data) == len(contents[FileMode.binary])
+        for axn in actions:
+            axn.reverse()
+            assert not lexists(axn.target_full_path)
+
+    def test_PrefixReplaceLinkAction_intermediate_link_type(self):
+        placeholder = '/' + 'placeholder_' * 10
+        package_info = AttrDict(repodata_record=AttrDict(subdir=context.subdir),
+                                placeholder_offsets=None)
+        transaction_context = {'temp_dir': join(self.pkgs_dir, 'tmp')}
+        source_full_path = make_test_file(self.pkgs_dir,
+                                          contents='#!%s/bin/python\n' % placeholder)
+        source_short_path = basename(source_full_path)
+        source_path_data = PathDataV1(_path=source_short_path, path_type=PathType.hardlink,
+                                      sha256=compute_sha256sum(source_full_path))
+        # the intermediate copy is only cloned when reflinks were found to be supported
+        for link_type, intermediate_link_type in ((LinkType.hardlink, LinkType.copy),
+                                                  (LinkType.copy, LinkType.copy),
+                                                  (LinkType.reflink, LinkType.reflink)):
+            axn = PrefixReplaceLinkAction(
+                transaction_context, package_info, self.pkgs_dir, source_short_path,
+                self.prefix, source_short_path, link_type, placeholder, FileMode.text,
+                source_path_data)
+            with patch('conda.core.path_actions.create_link', wraps=create_link) as mock_link:
+                assert not axn.verify()
+            assert mock_link.call_args[0][2] == intermediate_link_type
+            rm_rf(axn.intermediate_path)
+
     # @pytest.mark.skipif(on_win, reason="unix-only test")
     # def test_CreateApplicationSoftlinkAction_basic_symlink_unix(self):
     #     from conda.core.path_actions import CreateApplicationSoftlinkAction
@@ -1,11 +1,25 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import, division, print_function, unicode_literals
 
-from conda.core.portability import SHEBANG_REGEX, replace_long_shebang
+from conda.base.constants import PACKAGE_PLACEHOLDER_OFFSETS_FILE
+from conda.core.portability import (SHEBANG_REGEX, _PaddingError, binary_replace,
+                                    find_binary_placeholders, index_package_placeholders,
+                                    replace_long_shebang, update_binary_prefix_in_place,
+                                    update_prefix)
+from conda.common.compat import on_win
+from conda.gateways.disk.read import read_placeholder_offsets
 from conda.models.enums import FileMode
+from hashlib import sha256
+import json
 from logging import getLogger
+import os
+from os.path import isfile, join
+import pytest
 import re
+from tempfile import mkdtemp
+from time import time
 from unittest import TestCase
+import shutil
 
 log = getLogger(__name__)
 
@@ -76,3 +90,139 @@ class ReplaceShebangTests(TestCase):
         new_shebang = b"#!/usr/bin/env escaped\\ space --and --flags -x"
         new_expected_data = b'\n'.join((new_shebang, content_line, content_line, content_line))
         assert new_expected_data == new_data
+
+
+@pytest.mark.skipif(on_win, reason="no binary replacement done on win")
+class UpdateBinaryPrefixInPlaceTests(TestCase):
+
+    def setUp(self):
+        self.tmpdir = mkdtemp()
+        self.path = join(self.tmpdir, 'testfile')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _update(self, data, a, b, offsets=None):
+        with open(self.path, 'wb') as fh:
+            fh.write(data)
+        updated, digest = update_binary_prefix_in_place(self.path, a, b, offsets)
+        with open(self.path, 'rb') as fh:
+            new_data = fh.read()
+        assert digest == sha256(new_data).hexdigest()
+        assert updated == (new_data != data)
+        return new_data
+
+    def test_matches_binary_replace(self):
+        cases = (
+            (b'xxxaaaaaxyz\x00zz', b'aaaaa', b'bbbbb'),
+            (b'xxxaaaaaxyz\x00zz', b'aaaaa', b'bbbb'),
+            (b'aaaaa\x00', b'aaaaa', b'bbbbb'),
+            (b'aaaaa\x001234aaaaacc\x00\x00', b'aaaaa', b'bbbbb'),
+            (b' aaaa \x00', b'aaaa', b'bbbb'),
+            (b'aaaacaaaa\x00', b'aaaa', b'bbb'),
+            (b'aaaa\x00aaaa no terminator', b'aaaa', b'bb'),
+            (b'\x7fELF' + b'\x00' * 4096 + b'/placeholder/lib\x00' * 3, b'/placeholder', b'/p'),
+            (b'no placeholder at all\x00', b'aaaa', b'bb'),
+        )
+        for data, a, b in cases:
+            expected = binary_replace(data, a, b)
+            assert self._update(data, a, b) == expected
+            offsets = list(find_binary_placeholders(data, a))
+            assert self._update(data, a, b, offsets) == expected
+
+    def test_stale_offsets(self):
+        data = b'xxxaaaaaxyz\x00zz aaaaa\x00'
+        expected = binary_replace(data, b'aaaaa', b'bb')
+        # offsets that don't point at the placeholder are ignored in favor of searching
+        for offsets in ([(0, 12)], [(3, 11)], [(3, 12), (15, 40)], []):
+            assert self._update(data, b'aaaaa', b'bb', offsets) == (
+                data if offsets == [] else expected)
+        # offsets that do are trusted, so only the indexed span is patched
+        assert self._update(data, b'aaaaa', b'bb', [(3, 12)]) == (
+            b'xxxbbxyz\x00\x00\x00\x00zz aaaaa\x00')
+
+    def test_index_package_placeholders(self):
+        placeholder = '/opt/anaconda1anaconda2anaconda3'
+        files = {
+            'lib/libfoo.so': b'\x7fELF\x00' + ('%s/lib\x00' % placeholder).encode('utf-8') * 2,
+            'lib/empty.so': b'',
+            'bin/script': ('#!%s/bin/python\n' % placeholder).encode('utf-8'),
+        }
+        os.makedirs(join(self.tmpdir, 'info'))
+        os.makedirs(join(self.tmpdir, 'lib'))
+        os.makedirs(join(self.tmpdir, 'bin'))
+        for path, data in files.items():
+            with open(join(self.tmpdir, path), 'wb') as fh:
+                fh.write(data)
+        with open(join(self.tmpdir, 'info', 'paths.json'), 'w') as fh:
+            json.dump({'paths_version': 1, 'paths': [
+                {'_path': 'lib/libfoo.so', 'path_type': 'hardlink', 'file_mode': 'binary',
+                 'prefix_placeholder': placeholder},
+                {'_path': 'lib/empty.so', 'path_type': 'hardlink', 'file_mode': 'binary',
+                 'prefix_placeholder': placeholder},
+                {'_path': 'bin/script', 'path_type': 'hardlink', 'file_mode': 'text',
+                 'prefix_placeholder': placeholder},
+            ]}, fh)
+
+        assert read_placeholder_offsets(self.tmpdir) is None
+        index_package_placeholders(self.tmpdir)
+        assert isfile(join(self.tmpdir, PACKAGE_PLACEHOLDER_OFFSETS_FILE))
+        placeholder_offsets = read_placeholder_offsets(self.tmpdir)
+        assert list(placeholder_offsets) == ['lib/libfoo.so']
+        entry = placeholder_offsets['lib/libfoo.so']
+        assert entry['placeholder'] == placeholder
+        assert entry['size_in_bytes'] == len(files['lib/libfoo.so'])
+        assert entry['offsets'] == [[5, 42], [42, 79]]
+
+    def test_too_long(self):
+        with open(self.path, 'wb') as fh:
+            fh.write(b'xxxaaaaaxyz\x00zz')
+        with pytest.raises(_PaddingError):
+            update_binary_prefix_in_place(self.path, b'aaaaa', b'bbbbbbbb')
+
+    def test_empty_file(self):
+        assert self._update(b'', b'aaaa', b'bb') == b''
+
+    def test_update_prefix_returns_sha256(self):
+        for mode, data in ((FileMode.binary, b'\x7fELF.../some-placeholder/lib\x00'),
+                           (FileMode.text, b'#!/some-placeholder/bin/python\n'),
+                           (FileMode.text, b'nothing to replace\n')):
+            with open(self.path, 'wb') as fh:
+                fh.write(data)
+            digest = update_prefix(self.path, '/usr/local', placeholder='/some-placeholder',
+                                   mode=mode)
+            with open(self.path, 'rb') as fh:
+                assert digest == sha256(fh.read()).hexdigest()
+
+
+@pytest.mark.benchmark
+@pytest.mark.skipif(on_win, reason="no binary replacement done on win")
+def test_binary_prefix_replacement_benchmark(tmpdir):
+    # a 64 MB shared library, with a placeholder string in every 1 MB
+    placeholder = b'/opt/anaconda1anaconda2anaconda3'
+    chunk = os.urandom(2 ** 20 - 64)
+    data = b''.join(chunk + placeholder + b'/lib/python3.8\0' + b'\0' * 17 for _ in range(64))
+    path = str(tmpdir.join('libbig.so'))
+    offsets = list(find_binary_placeholders(data, placeholder))
+    new_prefix = b'/home/user/miniconda3/envs/test'
+
+    timings = {}
+    results = {}
+    for label in ('regex', 'mmap search', 'mmap indexed'):
+        with open(path, 'wb') as fh:
+            fh.write(data)
+        start = time()
+        if label == 'regex':
+            with open(path, 'rb+') as fh:
+                new_data = binary_replace(fh.read(), placeholder, new_prefix)
+                fh.seek(0)
+                fh.write(new_data)
+            digest = sha256(new_data).hexdigest()
+        else:
+            _, digest = update_binary_prefix_in_place(
+                path, placeholder, new_prefix, offsets if label == 'mmap indexed' else None)
+        timings[label] = elapsed = time() - start
+        results[label] = digest
+        print("%s: %.3f s" % (label, elapsed))
+    assert len(set(results.values())) == 1
+    assert timings['mmap indexed'] < timings['regex']
@@ -4,19 +4,34 @@
 from __future__ import absolute_import, division, print_function, unicode_literals
 
 from contextlib import contextmanager
-from os.path import isdir, join, lexists
+import os
+from os.path import isdir, isfile, join, lexists
 from tempfile import gettempdir
+from time import time
 from unittest import TestCase
 from uuid import uuid4
 
+import pytest
+
+from conda.base.context import conda_tests_ctxt_mgmt_def_pol
 from conda.common.compat import on_win, odict
-from conda.core.prefix_data import PrefixData, get_conda_anchor_files_and_records
+from conda.common.io import env_var
+from conda.core.prefix_data import (PrefixData, PrefixDatabase,
+                                    get_conda_anchor_files_and_records)
 from tests.data.env_metadata import (
     PATH_TEST_ENV_1, PATH_TEST_ENV_2, PATH_TEST_ENV_3, PATH_TEST_ENV_4,
 )
 from conda.base.constants import PREFIX_STATE_FILE
 from conda.gateways.disk import mkdir_p
 from conda.gateways.disk.delete import rm_rf
+from conda.gateways.disk.update import touch
+from conda.models.enums import PathType
+from conda.models.records import PathDataV1, PathsData, PrefixRecord
+
+try:
+    from unittest.mock import patch
+except ImportError:
+    from mock import patch
 
 
 ENV_VARS_FILE = '''
@@ -237,3 +252,154 @@ class PrefixDatarUnitTests(TestCase):
         self.pd.unset_environment_env_vars(['WOAH'])
         env_vars = self.pd.get_environment_env_vars()
         assert env_vars_one == env_vars
+
+
+def make_record(name, files, paths_data=None):
+    return PrefixRecord(name=name, version='1.0', build='0', build_number=0,
+                        channel='defaults', fn='%s-1.0-0.tar.bz2' % name, files=files,
+                        paths_data=paths_data)
+
+
+def make_paths_data(files):
+    return PathsData(paths_version=1, paths=(
+        PathDataV1(_path=path, path_type=PathType.hardlink, sha256='0' * 64, size_in_bytes=1)
+        for path in files
+    ))
+
+
+def test_get_path_owner(tmpdir):
+    prefix = str(tmpdir)
+    mkdir_p(join(prefix, 'conda-meta'))
+
+    PrefixData._cache_.pop(prefix, None)
+    pd = PrefixData(prefix)
+    pd.insert(make_record('one', ['bin/one', 'lib/Shared.so']))
+    pd.insert(make_record('two', ['bin/two', 'lib/Shared.so']))
+    try:
+        assert pd.get_path_owner('bin/one').name == 'one'
+        assert pd.get_path_owner('bin/two').name == 'two'
+        assert pd.get_path_owner('bin/three') is None
+        assert pd.get_path_owner('lib/Shared.so').name in ('one', 'two')
+        assert (pd.get_path_owner('lib/shared.so') is not None) == on_win
+
+        # the index follows records being inserted and removed
+        pd.insert(make_record('three', ['bin/three']))
+        assert pd.get_path_owner('bin/three').name == 'three'
+        pd.remove('one')
+        assert pd.get_path_owner('bin/one') is None
+        assert pd.get_path_owner('lib/Shared.so').name == 'two'
+
+        # and is rebuilt when the records are reloaded from disk
+        assert PrefixData(prefix).reload().get_path_owner('bin/three').name == 'three'
+    finally:
+        PrefixData._cache_.pop(prefix, None)
+
+
+def _make_prefix(prefix, count, file_count):
+    mkdir_p(join(prefix, 'conda-meta'))
+    touch(join(prefix, 'conda-meta', 'history'))
+    PrefixData._cache_.pop(prefix, None)
+    pd = PrefixData(prefix)
+    for n in range(count):
+        files = ['lib/pkg%05d/file%05d.py' % (n, m) for m in range(file_count)]
+        pd.insert(make_record('pkg%05d' % n, files, make_paths_data(files)))
+    PrefixData._cache_.pop(prefix, None)
+
+
+def _load_prefix(prefix):
+    PrefixData._cache_.pop(prefix, None)
+    try:
+        return PrefixData(prefix).reload()
+    finally:
+        PrefixData._cache_.pop(prefix, None)
+
+
+def test_prefix_database(tmpdir):
+    prefix = str(tmpdir)
+    conda_meta_dir = join(prefix, 'conda-meta')
+    with env_var('CONDA_PREFIX_DATABASE', 'true', stack_callback=conda_tests_ctxt_mgmt_def_pol):
+        _make_prefix(prefix, 3, 2)
+        # the json files are written as always
+        assert sorted(fn for fn in os.listdir(conda_meta_dir) if fn.endswith('.json')) == [
+            'pkg00000-1.0-0.json', 'pkg00001-1.0-0.json', 'pkg00002-1.0-0.json']
+        database = PrefixDatabase(prefix)
+        assert isfile(database.database_path)
+        assert sorted(database.read(False)[1]) == [
+            'pkg00000-1.0-0.json', 'pkg00001-1.0-0.json', 'pkg00002-1.0-0.json']
+
+        # records come from the database, with their file lists read on first use
+        pd = _load_prefix(prefix)
+        prefix_rec = pd.get('pkg00001')
+        assert 'files' not in prefix_rec.__dict__
+        assert prefix_rec.files == ('lib/pkg00001/file00000.py', 'lib/pkg00001/file00001.py')
+        assert 'files' in pd.get('pkg00002').__dict__
+        assert [p.path for p in pd.get('pkg00002').paths_data.paths] == [
+            'lib/pkg00002/file00000.py', 'lib/pkg00002/file00001.py']
+        with env_var('CONDA_PREFIX_DATABASE', 'false',
+                     stack_callback=conda_tests_ctxt_mgmt_def_pol):
+            json_pd = _load_prefix(prefix)
+        assert [rec.dump() for rec in sorted(pd.iter_records(), key=lambda rec: rec.name)] == [
+            rec.dump() for rec in sorted(json_pd.iter_records(), key=lambda rec: rec.name)]
+
+        # a changed json file is read again
+        pd = PrefixData(prefix)
+        pd.load()
+        pd.remove('pkg00000')
+        with open(join(conda_meta_dir, 'pkg00001-1.0-0.json'), 'w') as fh:
+            fh.write(make_record('pkg00001', ['changed.py']).json())
+        PrefixData._cache_.pop(prefix, None)
+        pd = _load_prefix(prefix)
+        assert sorted(rec.name for rec in pd.iter_records()) == ['pkg00001', 'pkg00002']
+        assert pd.get('pkg00001').files == ('changed.py',)
+        assert sorted(database.read(False)[1]) == ['pkg00001-1.0-0.json', 'pkg00002-1.0-0.json']
+
+        # the database is an optional copy of the json files
+        os.unlink(database.database_path)
+        pd = _load_prefix(prefix)
+        assert pd.get('pkg00002').files == (
+            'lib/pkg00002/file00000.py', 'lib/pkg00002/file00001.py')
+        assert isfile(database.database_path)
+
+
+def test_prefix_database_not_rewritten(tmpdir):
+    prefix = str(tmpdir)
+    conda_meta_dir = join(prefix, 'conda-meta')
+    with env_var('CONDA_PREFIX_DATABASE', 'true', stack_callback=conda_tests_ctxt_mgmt_def_pol):
+        _make_prefix(prefix, 3, 2)
+        os.utime(conda_meta_dir, (time() - 10, time() - 10))
+        conda_meta_mtime = os.stat(conda_meta_dir).st_mtime_ns
+        # the first load records the conda-meta mtime, without changing it
+        _load_prefix(prefix)
+        assert os.stat(conda_meta_dir).st_mtime_ns == conda_meta_mtime
+        assert PrefixDatabase(prefix).read(False)[0] == conda_meta_mtime
+
+        with patch.object(PrefixDatabase, 'write') as write:
+            for _ in range(2):
+                pd = _load_prefix(prefix)
+                assert sorted(rec.name for rec in pd.iter_records()) == [
+                    'pkg00000', 'pkg00001', 'pkg00002']
+        assert not write.called
+        assert os.stat(conda_meta_dir).st_mtime_ns == conda_meta_mtime
+
+
+@pytest.mark.benchmark
+def test_prefix_database_benchmark(tmpdir):
+    prefix = str(tmpdir)
+    with env_var('CONDA_PREFIX_DATABASE', 'true', stack_callback=conda_tests_ctxt_mgmt_def_pol):
+        _make_prefix(prefix, 800, 100)
+    # the database is only trusted once the conda-meta mtime was old when it was read
+    os.utime(join(prefix, 'conda-meta'), (time() - 10, time() - 10))
+    timings = {}
+    for label, database in (("json files", "false"), ("first load", "true"),
+                            ("validated", "true"), ("trusted", "true")):
+        with env_var('CONDA_PREFIX_DATABASE', database,
+                     stack_callback=conda_tests_ctxt_mgmt_def_pol):
+            start = time()
+            pd = _load_prefix(prefix)
+            # what conda list needs
+            names = sorted("%s-%s-%s" % (rec.name, rec.version, rec.build)
+                           for rec in pd.iter_records())
+            timings[label] = elapsed = time() - start
+        assert len(names) == 800
+        print("%s: %.3f s" % (label, elapsed))
+    assert timings["trusted"] < timings["json files"] / 3
@@ -18,6 +18,7 @@ from conda._vendor.auxlib.ish import dals
 from conda.base.context import context, Context, reset_context, conda_tests_ctxt_mgmt_def_pol
 from conda.common.compat import on_linux
 from conda.common.io import env_var, env_vars, stderr_log_level, captured
+from conda.core import solve
 from conda.core.prefix_data import PrefixData
 from conda.core.solve import DepsModifier, Solver, UpdateModifier, Resolve
 from conda.exceptions import UnsatisfiableError, SpecsConfigurationConflictError, ResolvePackageNotFound
@@ -186,6 +187,101 @@ def test_solve_1(tmpdir):
         assert convert_to_dist_str(final_state) == order
 
 
+def test_solve_cache(tmpdir):
+    specs = MatchSpec("numpy"),
+    with env_vars({"CONDA_SOLVE_CACHE": "true",
+                   "CONDA_SOLVE_CACHE_MAX_ENTRIES": "2",
+                   "CONDA_PKGS_DIRS": tmpdir.join("pkgs").strpath},
+                  stack_callback=conda_tests_ctxt_mgmt_def_pol):
+        with patch.object(Solver, "_run_sat", autospec=True,
+                          side_effect=Solver._run_sat) as run_sat:
+            with get_solver(tmpdir, specs) as solver:
+                final_state = solver.solve_final_state()
+            assert run_sat.call_count == 1
+            with get_solver(tmpdir, specs) as solver:
+                assert convert_to_dist_str(solver.solve_final_state()) == (
+                    convert_to_dist_str(final_state))
+            assert run_sat.call_count == 1
+
+            # a different problem is solved, and evicts the least recently used solution
+            for spec in ("python=2", "zlib", "python=2"):
+                with get_solver(tmpdir, (MatchSpec(spec),)) as solver:
+                    solver.solve_final_state()
+            assert run_sat.call_count == 3
+            with get_solver(tmpdir, specs) as solver:
+                solver.solve_final_state()
+            assert run_sat.call_count == 4
+            assert len(os.listdir(solve.get_solve_cache_dir())) == 2
+
+
+def test_solve_cache_prefix_setup(tmpdir):
+    specs = MatchSpec("numpy"),
+    with get_solver(tmpdir, specs) as solver:
+        final_state = solver.solve_final_state()
+
+    def solve_for_prefix_setup():
+        # installing python 2 neuters the numpy spec from the history
+        with get_solver(tmpdir, specs_to_add=(MatchSpec("python=2"),),
+                        prefix_records=final_state,
+                        history_specs=(MatchSpec("numpy=1.7.1=py33_0"),)) as solver:
+            return solver.solve_for_transaction().prefix_setups[solver.prefix]
+
+    def dump_prefix_setup(stp):
+        return (stp.target_prefix, convert_to_dist_str(stp.unlink_precs),
+                convert_to_dist_str(stp.link_precs), stp.remove_specs, stp.update_specs,
+                stp.neutered_specs)
+
+    uncached_stp = solve_for_prefix_setup()
+    assert uncached_stp.neutered_specs == (MatchSpec("numpy==1.7.1"),)
+    with env_vars({"CONDA_SOLVE_CACHE": "true",
+                   "CONDA_PKGS_DIRS": tmpdir.join("pkgs").strpath},
+                  stack_callback=conda_tests_ctxt_mgmt_def_pol):
+        with patch.object(Solver, "_run_sat", autospec=True,
+                          side_effect=Solver._run_sat) as run_sat:
+            assert dump_prefix_setup(solve_for_prefix_setup()) == (
+                dump_prefix_setup(uncached_stp))
+            cached_stp = solve_for_prefix_setup()
+            assert run_sat.call_count == 1
+    assert dump_prefix_setup(cached_stp) == dump_prefix_setup(uncached_stp)
+
+
+@pytest.mark.parametrize("update_modifier, deps_modifier", (
+    (UpdateModifier.UPDATE_SPECS, DepsModifier.ONLY_DEPS),
+    (UpdateModifier.UPDATE_DEPS, DepsModifier.NOT_SET),
+))
+def test_solve_cache_history(tmpdir, update_modifier, deps_modifier):
+    # --only-deps and --update-deps change specs_to_add after the SAT solve, and what they
+    # change it to is recorded in the history
+    specs = MatchSpec("python=2.7.3"), MatchSpec("numpy=1.7.0")
+    with get_solver(tmpdir, specs) as solver:
+        final_state = solver.solve_final_state()
+
+    def solve_for_history(history_dir):
+        with get_solver(tmpdir, (MatchSpec("iopro"),), prefix_records=final_state,
+                        history_specs=specs) as solver:
+            stp = solver.solve_for_transaction(
+                update_modifier=update_modifier, deps_modifier=deps_modifier,
+            ).prefix_setups[solver.prefix]
+        os.makedirs(join(history_dir, 'conda-meta'))
+        history = History(history_dir)
+        history.write_specs(stp.remove_specs, stp.update_specs, stp.neutered_specs)
+        with open(history.path) as fh:
+            return fh.read()
+
+    cold_history = solve_for_history(tmpdir.join("cold").strpath)
+    assert "# update specs: ['iopro']" not in cold_history
+    with env_vars({"CONDA_SOLVE_CACHE": "true",
+                   "CONDA_PKGS_DIRS": tmpdir.join("pkgs").strpath},
+                  stack_callback=conda_tests_ctxt_mgmt_def_pol):
+        with patch.object(Solver, "_run_sat", autospec=True,
+                          side_effect=Solver._run_sat) as run_sat:
+            solve_for_history(tmpdir.join("first").strpath)
+            run_sat_count = run_sat.call_count
+            warm_history = solve_for_history(tmpdir.join("warm").strpath)
+            assert run_sat.call_count == run_sat_count
+    assert warm_history == cold_history
+
+
 def test_solve_2(tmpdir):
     specs = MatchSpec("numpy"),
 
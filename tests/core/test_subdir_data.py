@@ -1,21 +1,33 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+import json
 from logging import getLogger
 from os.path import dirname, join
 from unittest import TestCase
-from time import sleep
+from time import sleep, time
+import tracemalloc
 
 import pytest
 
 from conda.base.context import context, conda_tests_ctxt_mgmt_def_pol
 from conda.common.compat import iteritems
 from conda.common.disk import temporary_content_in_file
-from conda.common.io import env_var
-from conda.core.index import get_index
+from conda.common.io import ThreadLimitedThreadPoolExecutor, env_var
+from conda.gateways.disk.delete import rm_rf
+from conda.core.index import get_index, get_reduced_index
 from conda.core.subdir_data import Response304ContentUnchanged, cache_fn_url, read_mod_and_etag, \
-    SubdirData, fetch_repodata_remote_request, UnavailableInvalidChannel
+    SubdirData, fetch_repodata_remote_request, UnavailableInvalidChannel, index_raw_repodata_str, \
+    read_binary_repodata_cache, fetch_repodata_shard, LazyRecordIndex, ShardedRecordIndex, \
+    REPODATA_TIMING_HOOKS, patch_indexed_repodata, write_binary_repodata_cache
+from conda._vendor.toolz import concat
+from conda.common.jlap import apply_json_patch, content_hash, dump_jlap, resume_offset
 from conda.models.channel import Channel
+from conda.models.match_spec import MatchSpec, parse_spec_strs
+import conda.models.match_spec
+from conda.models.version import BuildNumberMatch, VersionOrder, VersionSpec, version_cache
+
+from ..helpers import make_synthetic_repodata, write_sharded_repodata
 
 try:
     from unittest.mock import patch
@@ -255,6 +267,494 @@ def test_metadata_cache_clearing():
         assert precs_b == precs_a
 
 
+def test_index_raw_repodata_str():
+    repodata = {
+        "info": {"subdir": "linux-64"},
+        "packages": {
+            "a-1.0-0.tar.bz2": {"name": "a", "version": "1.0", "md5": "a-bz2"},
+            "b-1.0-0.tar.bz2": {"name": "b", "version": "1.0", "track_features": "feat1 feat2"},
+        },
+        "packages.conda": {
+            "a-1.0-0.conda": {"name": "a", "version": "1.0", "md5": "a-conda"},
+        },
+        "repodata_version": 1,
+    }
+    raw = json.dumps(repodata, indent=2)
+    json_obj, entries_by_name, entries_by_feature = index_raw_repodata_str(raw)
+    assert json_obj == {"info": {"subdir": "linux-64"}, "repodata_version": 1}
+    assert sorted(entries_by_name) == ["a", "b"]
+    assert [entry.fn for entry in entries_by_name["a"]] == ["a-1.0-0.conda"]
+    a_entry = entries_by_name["a"][0]
+    assert json.loads(raw[slice(*a_entry.span)])["md5"] == "a-conda"
+    assert json.loads(raw[slice(*a_entry.legacy_span)])["md5"] == "a-bz2"
+    assert sorted(entries_by_feature) == ["feat1", "feat2"]
+    assert entries_by_feature["feat1"] == entries_by_name["b"]
+
+    # the objects decoded while indexing are kept for the records that get built later
+    decoded_entries = {}
+    assert index_raw_repodata_str(raw, decoded_entries=decoded_entries)[1] == entries_by_name
+    b_entry = entries_by_name["b"][0]
+    assert sorted(decoded_entries) == sorted([a_entry.span, a_entry.legacy_span, b_entry.span])
+    assert decoded_entries[a_entry.span] == repodata["packages.conda"]["a-1.0-0.conda"]
+    assert decoded_entries[a_entry.legacy_span] == repodata["packages"]["a-1.0-0.tar.bz2"]
+
+    json_obj, entries_by_name, _ = index_raw_repodata_str(raw, use_only_tar_bz2=True)
+    assert [entry.fn for entry in entries_by_name["a"]] == ["a-1.0-0.tar.bz2"]
+    assert entries_by_name["a"][0].legacy_span is None
+
+    with pytest.raises(ValueError):
+        index_raw_repodata_str(raw[:-10])
+
+
+def _write_synthetic_channel(tmpdir, **kwargs):
+    subdir_path = tmpdir.mkdir("channel").mkdir(context.subdir)
+    subdir_path.join("repodata.json").write(json.dumps(make_synthetic_repodata(**kwargs)))
+    return Channel(str(subdir_path))
+
+
+def test_lazy_repodata_matches_eager(tmpdir):
+    channel = _write_synthetic_channel(tmpdir, n_names=20, n_versions=5)
+    eager = SubdirData(channel).load()
+    eager_records = set(eager.iter_records())
+    SubdirData.clear_cached_local_channel_data()
+    with env_var('CONDA_LAZY_REPODATA', 'true', stack_callback=conda_tests_ctxt_mgmt_def_pol):
+        lazy = SubdirData(channel).load()
+        assert not lazy._package_records._records_by_span
+        precs = tuple(lazy.query("pkg0003 >=1.2"))
+        assert precs == tuple(eager.query("pkg0003 >=1.2"))
+        assert all(prec.fn.endswith(".conda") for prec in precs)
+        assert precs[0].legacy_bz2_md5 == precs[0].md5
+        assert set(span for span, _ in lazy._package_records._records_by_span.items()) == set(
+            entry.span for entry in lazy._package_records._entries_by_name["pkg0003"])
+        assert tuple(lazy.query("not-a-package")) == ()
+        assert set(lazy.iter_records()) == eager_records
+
+
+def test_binary_cache_roundtrip(tmpdir):
+    channel = _write_synthetic_channel(tmpdir, n_names=20, n_versions=5)
+    sd = SubdirData(channel).load()
+    expected = set(sd.iter_records())
+    etag, mod_stamp = sd._internal_state['_etag'], sd._internal_state['_mod']
+
+    binary_cache = read_binary_repodata_cache(sd.cache_path_binary)
+    try:
+        assert binary_cache.validation_state['_url'] == sd.url_w_credentials
+        assert len(binary_cache.entries_by_name) == 20
+        entry = binary_cache.entries_by_name["pkg0004"][0]
+        info, legacy_info = binary_cache.decode_entry(entry)
+        assert entry.fn.endswith(".conda") and info["name"] == "pkg0004"
+        assert legacy_info["md5"] == info["md5"]
+    finally:
+        binary_cache.close()
+
+    # records are built from a valid binary cache lazily, whatever lazy_repodata says
+    for lazy_repodata in ('true', 'false'):
+        with env_var('CONDA_LAZY_REPODATA', lazy_repodata,
+                     stack_callback=conda_tests_ctxt_mgmt_def_pol):
+            with patch.object(SubdirData, '_process_raw_repodata_str') as process_json:
+                state = sd._read_local_repdata(etag, mod_stamp)
+                assert process_json.call_count == 0
+            assert isinstance(state['_package_records'], LazyRecordIndex)
+            assert not state['_package_records']._records_by_span
+            assert set(state['_names_index']['pkg0004']) == set(sd.query('pkg0004'))
+            assert len(state['_package_records']._records_by_span) == 5
+            assert set(state['_package_records']) == expected
+
+    # a stale binary cache falls back to the json cache, and gets rewritten
+    with patch.object(SubdirData, '_write_binary_cache') as write_binary_cache:
+        state = sd._read_local_repdata('"some-other-etag"', mod_stamp)
+        assert write_binary_cache.call_count == 1
+    assert set(state['_package_records']) == expected
+
+
+def test_patch_indexed_repodata(tmpdir):
+    repodata = make_synthetic_repodata(n_names=5, n_versions=2)
+    repodata["packages"]["feat-1.0-0.tar.bz2"] = {"name": "feat", "version": "1.0",
+                                                  "track_features": "f1"}
+    raw = json.dumps(repodata)
+    path = str(tmpdir.join("repodata.bin"))
+    write_binary_repodata_cache(path, {}, raw, *index_raw_repodata_str(raw))
+    conda_fn = sorted(fn for fn in repodata["packages.conda"] if fn.startswith("pkg0001"))[0]
+    legacy_fn = sorted(fn for fn in repodata["packages"] if fn.startswith("pkg0002"))[0]
+    operations = [
+        {"op": "replace", "path": "/packages.conda/%s/depends" % conda_fn, "value": []},
+        {"op": "remove", "path": "/packages/%s" % legacy_fn},
+        {"op": "add", "path": "/packages/new-1.0-0.tar.bz2",
+         "value": {"name": "new", "version": "1.0", "track_features": "f2"}},
+        {"op": "add", "path": "/info/notice", "value": "patched"},
+    ]
+    expected = dict(apply_json_patch(json.loads(raw), operations), _content_hash="f" * 64)
+
+    binary_cache = read_binary_repodata_cache(path)
+    try:
+        with patch("conda.core.subdir_data.index_raw_repodata_str",
+                   side_effect=index_raw_repodata_str) as index:
+            patched_str, patched_index = patch_indexed_repodata(
+                binary_cache, [{"patch": operations}], "f" * 64)
+        # only the entries of the touched names were decoded and indexed again
+        indexed = json.loads(index.call_args[0][0])
+        assert set(info["name"] for section in indexed.values()
+                   for info in section.values()) == {"pkg0001", "pkg0002", "new"}
+
+        with pytest.raises(ValueError):
+            patch_indexed_repodata(binary_cache, [{"patch": [
+                {"op": "replace", "path": "/packages", "value": {}}]}], "f" * 64)
+    finally:
+        binary_cache.close()
+
+    assert json.loads(patched_str) == expected
+    assert next(iter(patched_index[0])) == "_content_hash"
+    reindexed = index_raw_repodata_str(patched_str)
+    assert patched_index[0] == reindexed[0]
+    for patched_entries, entries in zip(patched_index[1:], reindexed[1:]):
+        assert {key: sorted(value) for key, value in iteritems(patched_entries)} == {
+            key: sorted(value) for key, value in iteritems(entries)}
+
+
+def _serve_repodata_with_patches(subdir_path, base_repodata, n_updates):
+    # Write repodata.json after `n_updates` package additions to `base_repodata`, and the
+    # repodata.jlap patch series leading there.  Returns the base document's bytes.
+    base_bytes = json.dumps(base_repodata).encode("utf-8")
+    repodata = json.loads(base_bytes)
+    patches = []
+    previous_hash = content_hash(base_bytes)
+    for idx in range(n_updates):
+        fn = "newpkg-1.0-%d.tar.bz2" % idx
+        info = {"name": "newpkg", "version": "1.0", "build": str(idx), "build_number": idx,
+                "depends": ["python >=3.7"], "md5": "%032x" % idx, "size": 1}
+        repodata["packages"][fn] = info
+        new_hash = content_hash(json.dumps(repodata).encode("utf-8"))
+        patches.append({"from": previous_hash, "to": new_hash, "patch": [
+            {"op": "add", "path": "/packages/%s" % fn, "value": info},
+        ]})
+        previous_hash = new_hash
+    subdir_path.join("repodata.json").write(json.dumps(repodata))
+    subdir_path.join("repodata.jlap").write_binary(dump_jlap(patches, previous_hash))
+    return base_bytes
+
+
+def test_repodata_jlap_update(tmpdir, http_server):
+    subdir_path = tmpdir.mkdir(context.subdir)
+    base_repodata = make_synthetic_repodata(n_names=20, n_versions=5)
+    subdir_path.join("repodata.json").write(json.dumps(base_repodata))
+    channel = Channel(http_server.url + "/" + context.subdir)
+    repodata_path = "/%s/repodata.json" % context.subdir
+    jlap_path = "/%s/repodata.jlap" % context.subdir
+
+    with env_var('CONDA_REPODATA_JLAP_ENABLED', 'true',
+                 stack_callback=conda_tests_ctxt_mgmt_def_pol):
+        with env_var('CONDA_LOCAL_REPODATA_TTL', '0',
+                     stack_callback=conda_tests_ctxt_mgmt_def_pol):
+            sd = SubdirData(channel).load()
+            assert tuple(sd.query("newpkg")) == ()
+            assert read_mod_and_etag(sd.cache_path_json)["_content_hash"] == content_hash(
+                json.dumps(base_repodata).encode("utf-8"))
+            assert http_server.requests[repodata_path] == 1
+
+            _serve_repodata_with_patches(subdir_path, base_repodata, 3)
+            sd = SubdirData(channel).reload()
+            assert len(tuple(sd.query("newpkg"))) == 3
+            assert http_server.requests[jlap_path] == 1
+            assert http_server.requests[repodata_path] == 1
+            patched_hash = read_mod_and_etag(sd.cache_path_json)["_content_hash"]
+            assert patched_hash != content_hash(json.dumps(base_repodata).encode("utf-8"))
+
+            # nothing changed: served as if the server answered 304, and only what follows
+            #   the patches already seen is fetched
+            jlap_size = subdir_path.join("repodata.jlap").size()
+            offset = resume_offset(subdir_path.join("repodata.jlap").read_binary())
+            http_server.bytes_sent.clear()
+            sd = SubdirData(channel).reload()
+            assert len(tuple(sd.query("newpkg"))) == 3
+            assert http_server.requests[repodata_path] == 1
+            assert http_server.range_requests[jlap_path] == [None, "bytes=%d-" % offset]
+            assert http_server.bytes_sent[jlap_path] == jlap_size - offset
+
+            # further patches are applied to the binary cache, without indexing it again
+            expected = set(sd.query("pkg0003"))
+            _serve_repodata_with_patches(subdir_path, base_repodata, 5)
+            with patch.object(SubdirData, '_process_raw_repodata_str') as process_json:
+                sd = SubdirData(channel).reload()
+                assert len(tuple(sd.query("newpkg"))) == 5
+                assert set(sd.query("pkg0003")) == expected
+                assert process_json.call_count == 0
+            assert http_server.range_requests[jlap_path][-1] == "bytes=%d-" % offset
+            assert http_server.requests[repodata_path] == 1
+            SubdirData.clear_cached_local_channel_data()
+            assert len(tuple(SubdirData(channel).query("newpkg"))) == 5
+
+            # a cached document the patches don't start from needs a full download
+            subdir_path.join("repodata.jlap").write_binary(dump_jlap([], "f" * 64))
+            sd = SubdirData(channel).reload()
+            assert len(tuple(sd.query("newpkg"))) == 5
+            assert http_server.requests[repodata_path] == 2
+
+    # _content_hash is only looked for with jlap enabled
+    assert "_content_hash" not in read_mod_and_etag(sd.cache_path_json)
+
+
+@pytest.mark.benchmark
+def test_repodata_jlap_benchmark(tmpdir, http_server):
+    subdir_path = tmpdir.mkdir(context.subdir)
+    base_repodata = make_synthetic_repodata(n_names=300, n_versions=20)
+    channel = Channel(http_server.url + "/" + context.subdir)
+    results = {}
+    for jlap_enabled in ('false', 'true'):
+        subdir_path.join("repodata.json").write(json.dumps(base_repodata))
+        rm_rf(str(subdir_path.join("repodata.jlap")))
+        with env_var('CONDA_REPODATA_JLAP_ENABLED', jlap_enabled,
+                     stack_callback=conda_tests_ctxt_mgmt_def_pol):
+            with env_var('CONDA_LOCAL_REPODATA_TTL', '0',
+                         stack_callback=conda_tests_ctxt_mgmt_def_pol):
+                rm_rf(SubdirData(channel).cache_path_json)
+                SubdirData(channel).reload()
+                _serve_repodata_with_patches(subdir_path, base_repodata, 3)
+                http_server.bytes_sent.clear()
+                start = time()
+                sd = SubdirData(channel).reload()
+                assert len(tuple(sd.query("newpkg"))) == 3
+                elapsed = time() - start
+        results[jlap_enabled] = bytes_sent = sum(http_server.bytes_sent.values())
+        print("repodata_jlap_enabled=%s: update took %.3f s, downloaded %d bytes"
+              % (jlap_enabled, elapsed, bytes_sent))
+    assert results['true'] < results['false'] / 10
+
+
+@pytest.mark.parametrize("repodata_processes", ("0", "2"))
+def test_query_all_concurrent_fetch(tmpdir, http_server, repodata_processes):
+    subdirs = ("linux-64", "osx-64", "win-64", "noarch")
+    for subdir in subdirs:
+        tmpdir.mkdir(subdir).join("repodata.json").write(json.dumps(
+            make_synthetic_repodata(subdir=subdir, n_names=20, n_versions=5)))
+    timings = []
+    REPODATA_TIMING_HOOKS.append(timings.append)
+    try:
+        with env_var('CONDA_REPODATA_PROCESSES', repodata_processes,
+                     stack_callback=conda_tests_ctxt_mgmt_def_pol):
+            with patch.object(SubdirData, '_process_raw_repodata_str', autospec=True,
+                              side_effect=SubdirData._process_raw_repodata_str) as process_json:
+                precs = SubdirData.query_all("pkg0003", channels=(http_server.url,),
+                                             subdirs=subdirs)
+    finally:
+        REPODATA_TIMING_HOOKS.remove(timings.append)
+    assert len(precs) == 5 * len(subdirs)
+    assert [prec.subdir for prec in precs[::5]] == list(subdirs)
+    # with worker processes, this process only builds the records it's asked for, from the
+    #   binary caches the workers wrote
+    assert process_json.call_count == (0 if repodata_processes != "0" else len(subdirs))
+    for subdir in subdirs:
+        assert http_server.requests["/%s/repodata.json" % subdir] == 1
+        sd = SubdirData(Channel(http_server.url + "/" + subdir))
+        assert sd._loaded
+        if repodata_processes != "0":
+            assert len(sd._package_records._records_by_span) == 5
+        assert read_binary_repodata_cache(sd.cache_path_binary).validation_state["_url"] == (
+            sd.url_w_credentials)
+    assert sorted(timing.url for timing in timings) == sorted(
+        http_server.url + "/%s/repodata.json" % subdir for subdir in subdirs)
+    assert all(timing.status == 200 and timing.ttfb > 0 and timing.parse > 0
+               for timing in timings)
+
+
+def test_sharded_repodata_get_reduced_index(tmpdir):
+    repodata = make_synthetic_repodata(n_names=50, n_versions=3)
+    repodata["packages"]["tracked-1.0-0.tar.bz2"] = {
+        "name": "tracked", "version": "1.0", "build": "0", "build_number": 0,
+        "depends": [], "md5": "0" * 32, "track_features": "feat1",
+    }
+    subdir_path = tmpdir.mkdir("channel").mkdir(context.subdir)
+    write_sharded_repodata(subdir_path, repodata)
+    channel = Channel(str(tmpdir.join("channel")))
+    specs = (MatchSpec("pkg0005"),)
+
+    reduced_index = get_reduced_index(None, (channel,), (context.subdir,), specs, "repodata.json")
+    SubdirData.clear_cached_local_channel_data()
+
+    with env_var('CONDA_REPODATA_SHARDS_ENABLED', 'true',
+                 stack_callback=conda_tests_ctxt_mgmt_def_pol), \
+            env_var('CONDA_PKGS_DIRS', str(tmpdir.join("pkgs")),
+                    stack_callback=conda_tests_ctxt_mgmt_def_pol):
+        with patch('conda.core.subdir_data.fetch_repodata_shard',
+                   wraps=fetch_repodata_shard) as fetcher:
+            sharded_reduced_index = get_reduced_index(None, (channel,), (context.subdir,),
+                                                      specs, "repodata.json")
+            # pkg0000 through pkg0005
+            assert fetcher.call_count == 6
+        assert set(sharded_reduced_index) == set(reduced_index)
+
+        sd = SubdirData(Channel(str(subdir_path)))
+        with patch('conda.core.subdir_data.fetch_repodata_shard',
+                   wraps=fetch_repodata_shard) as fetcher:
+            assert [prec.name for prec in sd._track_features_index["feat1"]] == ["tracked"]
+            assert fetcher.call_count == 1
+
+        # shards are cached by content hash
+        SubdirData.clear_cached_local_channel_data()
+        with patch('conda.core.subdir_data.fetch_repodata_shard') as fetcher:
+            sd = SubdirData(Channel(str(subdir_path)))
+            assert len(tuple(sd.query("pkg0003"))) == 3
+            assert fetcher.call_count == 0
+
+        # a batch of names has its uncached shards fetched concurrently
+        SubdirData.clear_cached_local_channel_data()
+        with env_var('CONDA_PKGS_DIRS', str(tmpdir.join("pkgs2")),
+                     stack_callback=conda_tests_ctxt_mgmt_def_pol):
+            sd = SubdirData(Channel(str(subdir_path))).load()
+            with patch('conda.core.subdir_data.fetch_repodata_shard',
+                       wraps=fetch_repodata_shard) as fetcher, \
+                    patch('conda.core.subdir_data.ThreadLimitedThreadPoolExecutor',
+                          wraps=ThreadLimitedThreadPoolExecutor) as executor:
+                SubdirData.prefetch_all(("pkg0010", "pkg0011", "pkg0012", "nonexistent"),
+                                        (channel,), (context.subdir,), "repodata.json")
+                assert executor.call_count == 1
+                assert fetcher.call_count == 3
+                assert len(tuple(sd.query("pkg0010"))) == 3
+                assert fetcher.call_count == 3
+
+                # uncached shards aren't fetched when the index cache must be used
+                with env_var('CONDA_USE_INDEX_CACHE', 'true',
+                             stack_callback=conda_tests_ctxt_mgmt_def_pol):
+                    assert tuple(sd.query("pkg0020")) == ()
+                    assert fetcher.call_count == 3
+                assert len(tuple(sd.query("pkg0020"))) == 3
+                assert fetcher.call_count == 4
+
+                # the length counts the records of every shard, with .conda packages
+                #   superseding their .tar.bz2 counterparts
+                assert len(sd._package_records) == len(repodata["packages"])
+
+        # channels without an index fall back to repodata.json
+        SubdirData.clear_cached_local_channel_data()
+        subdir_path.join("repodata_shards.json").remove()
+        sd = SubdirData(Channel(str(subdir_path)))
+        assert len(tuple(sd.query("pkg0049"))) == 3
+        assert not isinstance(sd._package_records, ShardedRecordIndex)
+
+
+def _load_without_parsed_specs(channel):
+    SubdirData.clear_cached_local_channel_data()
+    MatchSpec._INTERN_CACHE.clear()
+    conda.models.match_spec._PARSE_CACHE.clear()
+    return SubdirData(channel).load()
+
+
+def test_parsed_specs_roundtrip(tmpdir, http_server):
+    tmpdir.mkdir(context.subdir).join("repodata.json").write(
+        json.dumps(make_synthetic_repodata(n_names=20, n_versions=5)))
+    channel = Channel(http_server.url + "/" + context.subdir)
+    # a cache of its own, so that one left at the same url by an earlier test isn't used
+    with env_var('CONDA_LOCAL_REPODATA_TTL', '3600',
+                 stack_callback=conda_tests_ctxt_mgmt_def_pol), \
+            env_var('CONDA_PKGS_DIRS', str(tmpdir.join("pkgs")),
+                    stack_callback=conda_tests_ctxt_mgmt_def_pol):
+        sd = _load_without_parsed_specs(channel)
+        precs = tuple(sd.query("pkg0010"))
+        sd.save_parsed_specs(precs)
+        spec_strs = set(concat(prec.depends for prec in precs))
+        assert sd._parsed_spec_strs == spec_strs
+
+        # the parsed specs are only loaded when asked for, i.e. on the solve path
+        sd = _load_without_parsed_specs(channel)
+        assert sd._parsed_spec_strs is None
+        assert not conda.models.match_spec._PARSE_CACHE
+        sd.load_parsed_specs()
+        assert sd._parsed_spec_strs == spec_strs
+        assert set(conda.models.match_spec._PARSE_CACHE) == spec_strs
+
+        # they are kept in the binary cache, which records are still read from
+        binary_cache = read_binary_repodata_cache(sd.cache_path_binary)
+        try:
+            assert set(binary_cache.read_parsed_specs()['specs']) == spec_strs
+        finally:
+            binary_cache.close()
+        assert set(_load_without_parsed_specs(channel).query("pkg0010")) == set(precs)
+
+        # specs are added as other records take part in solves, with parsed_specs_cache set
+        sd = _load_without_parsed_specs(channel)
+        with patch('conda.core.subdir_data.write_binary_cache_parsed_specs') as write:
+            sd.save_parsed_specs(precs)
+            assert write.call_count == 0
+        for parsed_specs_cache in ('false', 'true'):
+            with env_var('CONDA_PARSED_SPECS_CACHE', parsed_specs_cache,
+                         stack_callback=conda_tests_ctxt_mgmt_def_pol):
+                reduced_index = get_reduced_index(None, (Channel(http_server.url),),
+                                                  (context.subdir,), (MatchSpec("pkg0019"),),
+                                                  "repodata.json")
+                assert sd._parsed_spec_strs == (spec_strs if parsed_specs_cache == 'false'
+                                                else set(concat(prec.depends
+                                                                for prec in reduced_index)))
+        sd = _load_without_parsed_specs(channel)
+        sd.load_parsed_specs()
+        assert sd._parsed_spec_strs == set(concat(prec.depends for prec in reduced_index))
+    assert http_server.requests["/%s/repodata.json" % context.subdir] == 1
+
+
+@pytest.mark.benchmark
+def test_parsed_specs_benchmark(tmpdir, http_server):
+    with open(join(dirname(dirname(__file__)), 'data', 'repodata', 'r_linux-64.json')) as fh:
+        repodata = json.load(fh)
+    # without the _url etc. of the cache it was taken from, which would invalidate ours
+    repodata = {key: value for key, value in iteritems(repodata) if not key.startswith('_')}
+    tmpdir.mkdir("linux-64").join("repodata.json").write(json.dumps(repodata))
+    channel = Channel(http_server.url + "/linux-64")
+    with env_var('CONDA_LOCAL_REPODATA_TTL', '3600',
+                 stack_callback=conda_tests_ctxt_mgmt_def_pol), \
+            env_var('CONDA_PKGS_DIRS', str(tmpdir.join("pkgs")),
+                    stack_callback=conda_tests_ctxt_mgmt_def_pol):
+        sd = _load_without_parsed_specs(channel)
+        precs = tuple(sd.iter_records())
+        spec_strs = set(concat(prec.depends for prec in precs))
+        sd.save_parsed_specs(precs)
+
+        results = {}
+        for warm in (False, True):
+            timings = []
+            for _ in range(3):
+                sd = _load_without_parsed_specs(channel)
+                # as in a new process
+                version_cache.clear()
+                for cache in (VersionOrder._cache_, VersionSpec._cache_,
+                              BuildNumberMatch._cache_):
+                    cache.clear()
+                start = time()
+                if warm:
+                    sd.load_parsed_specs()
+                parse_spec_strs(spec_strs)
+                timings.append(time() - start)
+            results[warm] = min(timings)
+    print("%d distinct specs: parsed in %.3f s, with the parsed specs cache in %.3f s"
+          % (len(spec_strs), results[False], results[True]))
+    assert results[True] < results[False]
+
+
+@pytest.mark.benchmark
+def test_lazy_repodata_benchmark(tmpdir):
+    channel = _write_synthetic_channel(tmpdir, n_names=300, n_versions=20)
+    raw_repodata_str = tmpdir.join("channel", context.subdir, "repodata.json").read()
+    results = {}
+    for lazy_repodata in ('false', 'true'):
+        SubdirData.clear_cached_local_channel_data()
+        with env_var('CONDA_LAZY_REPODATA', lazy_repodata,
+                     stack_callback=conda_tests_ctxt_mgmt_def_pol):
+            sd = SubdirData(channel)
+            tracemalloc.start()
+            try:
+                start = time()
+                sd._process_raw_repodata_str(raw_repodata_str)
+                sd._loaded = True
+                prec = next(sd.query("pkg0150"))
+                elapsed = time() - start
+                peak = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+        assert prec.name == "pkg0150"
+        results[lazy_repodata] = elapsed, peak
+        print("lazy_repodata=%s: first query result after %.3f s, peak memory %.1f MB"
+              % (lazy_repodata, elapsed, peak / 1e6))
+    # both keep the decoded package entries until their records are built
+    assert results['true'][0] < results['false'][0]
+
+
 # @pytest.mark.integration
 # class SubdirDataTests(TestCase):
 #
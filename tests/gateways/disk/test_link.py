@@ -10,10 +10,11 @@ import uuid
 import pytest
 
 from conda.common.compat import on_win, PY2
-from conda.gateways.disk.create import mkdir_p
+from conda.models.enums import LinkType
+from conda.gateways.disk.create import create_link, mkdir_p
 from conda.gateways.disk.delete import rm_rf
-from conda.gateways.disk.link import link, islink, readlink, stat_nlink, symlink
-from conda.gateways.disk.test import softlink_supported
+from conda.gateways.disk.link import link, islink, readlink, reflink, stat_nlink, symlink
+from conda.gateways.disk.test import reflink_supported, softlink_supported
 from conda.gateways.disk.update import touch
 
 log = getLogger(__name__)
@@ -91,3 +92,59 @@ class LinkSymlinkUnlinkIslinkReadlinkTests(TestCase):
         os.unlink(path2_symlink)
         assert not lexists(path2_symlink)
         assert not exists(path2_symlink)
+
+
+class ReflinkTests(TestCase):
+    # reflinks need a copy-on-write file system; point CONDA_TEST_REFLINK_DIR at a directory
+    #   on one (a btrfs or XFS loopback image, say) to run the tests that depend on them
+
+    def setUp(self):
+        tempdirdir = os.environ.get('CONDA_TEST_REFLINK_DIR') or gettempdir()
+        self.test_dir = join(tempdirdir, str(uuid.uuid4())[:8])
+        mkdir_p(self.test_dir)
+        self.src = join(self.test_dir, 'src')
+        with open(self.src, 'wb') as fh:
+            fh.write(b'conda' * 10000)
+        os.chmod(self.src, 0o755)
+
+    def tearDown(self):
+        rm_rf(self.test_dir)
+        assert not lexists(self.test_dir)
+
+    def test_reflink(self):
+        dst = join(self.test_dir, 'dst')
+        if not reflink_supported(self.src, self.test_dir):
+            with pytest.raises(OSError):
+                reflink(self.src, dst)
+            assert not lexists(dst)
+            pytest.skip("reflinks not supported in %s" % self.test_dir)
+
+        reflink(self.src, dst)
+        assert os.stat(self.src).st_ino != os.stat(dst).st_ino
+        with open(dst, 'r+b') as fh:
+            assert fh.read() == b'conda' * 10000
+            fh.seek(0)
+            fh.write(b'CONDA')
+        with open(self.src, 'rb') as fh:
+            assert fh.read(5) == b'conda'
+
+    def test_create_link_reflink(self):
+        # where reflinks aren't supported, this falls back to a copy
+        dst = join(self.test_dir, 'dst')
+        create_link(self.src, dst, LinkType.reflink)
+        assert not islink(dst)
+        assert os.stat(self.src).st_ino != os.stat(dst).st_ino
+        assert stat_nlink(self.src) == stat_nlink(dst) == 1
+        with open(dst, 'rb') as fh:
+            assert fh.read() == b'conda' * 10000
+        if not on_win:
+            assert os.stat(dst).st_mode == os.stat(self.src).st_mode
+
+    @pytest.mark.skipif(on_win, reason="relative symlinks are copied as files on windows")
+    def test_create_link_reflink_relative_symlink(self):
+        src_link = join(self.test_dir, 'src_link')
+        symlink('src', src_link)
+        dst = join(self.test_dir, 'dst')
+        create_link(src_link, dst, LinkType.reflink)
+        assert islink(dst)
+        assert readlink(dst) == 'src'
@@ -1,7 +1,10 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+from hashlib import sha256
 from logging import getLogger
+import os
+from os.path import exists, join
 from conda._vendor.auxlib.compat import Utf8NamedTemporaryFile
 from unittest import TestCase
 import warnings
@@ -9,9 +12,13 @@ import warnings
 import pytest
 from requests import HTTPError
 
+from conda.base.context import conda_tests_ctxt_mgmt_def_pol
 from conda.common.compat import ensure_binary, PY3
+from conda.common.io import env_vars
 from conda.common.url import path_to_url
 from conda.gateways.anaconda_client import remove_binstar_token, set_binstar_token
+from conda.exceptions import ChecksumMismatchError, CondaHTTPError
+from conda.gateways.connection.download import PARTIAL_EXTENSION, download
 from conda.gateways.connection.session import CondaHttpAuth, CondaSession
 from conda.gateways.disk.delete import rm_rf
 
@@ -66,3 +73,82 @@ class CondaSessionTests(TestCase):
         finally:
             if test_path is not None:
                 rm_rf(test_path)
+
+
+@pytest.fixture
+def served_file(tmpdir, http_server):
+    data = os.urandom(100000)
+    tmpdir.join("pkg.tar.bz2").write_binary(data)
+    return http_server.url + "/pkg.tar.bz2", data
+
+
+def _download(served_file, target_full_path, **env):
+    url, data = served_file
+    with env_vars(env, stack_callback=conda_tests_ctxt_mgmt_def_pol):
+        download(url, target_full_path, sha256=sha256(data).hexdigest(), size=len(data))
+
+
+def test_download_resumes_dropped_connection(tmpdir, http_server, served_file):
+    http_server.drop_after["/pkg.tar.bz2"] = 32768
+    target = join(str(tmpdir.mkdir("pkgs")), "pkg.tar.bz2")
+    _download(served_file, target)
+    with open(target, "rb") as fh:
+        assert fh.read() == served_file[1]
+    assert http_server.range_requests["/pkg.tar.bz2"] == [None, "bytes=32768-"]
+    assert http_server.bytes_sent["/pkg.tar.bz2"] == len(served_file[1])
+    assert not exists(target + PARTIAL_EXTENSION)
+
+
+def test_download_resumes_partial_download(tmpdir, http_server, served_file):
+    http_server.drop_after["/pkg.tar.bz2"] = 32768
+    target = join(str(tmpdir.mkdir("pkgs")), "pkg.tar.bz2")
+    with pytest.raises(CondaHTTPError):
+        _download(served_file, target, CONDA_REMOTE_MAX_RETRIES="0")
+    assert not exists(target)
+    assert os.path.getsize(target + PARTIAL_EXTENSION) == 32768
+
+    _download(served_file, target)
+    with open(target, "rb") as fh:
+        assert fh.read() == served_file[1]
+    assert http_server.range_requests["/pkg.tar.bz2"] == [None, "bytes=32768-"]
+    assert os.listdir(os.path.dirname(target)) == ["pkg.tar.bz2"]
+
+
+def test_download_restarts_when_range_is_rejected(tmpdir, http_server, served_file):
+    http_server.drop_after["/pkg.tar.bz2"] = 32768
+    target = join(str(tmpdir.mkdir("pkgs")), "pkg.tar.bz2")
+    with pytest.raises(CondaHTTPError):
+        _download(served_file, target, CONDA_REMOTE_MAX_RETRIES="0")
+
+    http_server.support_ranges = False
+    _download(served_file, target)
+    with open(target, "rb") as fh:
+        assert fh.read() == served_file[1]
+    assert http_server.range_requests["/pkg.tar.bz2"] == [None, "bytes=32768-"]
+    assert http_server.bytes_sent["/pkg.tar.bz2"] == 32768 + len(served_file[1])
+
+
+def test_download_checksum_mismatch_removes_partial(tmpdir, http_server, served_file):
+    url, data = served_file
+    target = join(str(tmpdir.mkdir("pkgs")), "pkg.tar.bz2")
+    with pytest.raises(ChecksumMismatchError):
+        download(url, target, sha256="0" * 64)
+    assert not os.listdir(os.path.dirname(target))
+
+
+@pytest.mark.parametrize("support_ranges", (True, False))
+def test_download_segmented(tmpdir, http_server, served_file, support_ranges):
+    http_server.support_ranges = support_ranges
+    target = join(str(tmpdir.mkdir("pkgs")), "pkg.tar.bz2")
+    _download(served_file, target, CONDA_DOWNLOAD_SEGMENTS="4",
+              CONDA_DOWNLOAD_SEGMENT_SIZE="20000")
+    with open(target, "rb") as fh:
+        assert fh.read() == served_file[1]
+    if support_ranges:
+        assert sorted(http_server.range_requests["/pkg.tar.bz2"]) == [
+            "bytes=0-24999", "bytes=25000-49999", "bytes=50000-74999", "bytes=75000-99999"]
+    else:
+        # the first segment's request is answered with the whole file
+        assert http_server.range_requests["/pkg.tar.bz2"] == ["bytes=0-24999"]
+    assert http_server.bytes_sent["/pkg.tar.bz2"] == len(served_file[1])
+    assert os.listdir(os.path.dirname(target)) == ["pkg.tar.bz2"]
@@ -415,3 +415,137 @@ def get_index_cuda(subdir=context.subdir):
     add_feature_records_legacy(index)
     r = Resolve(index, channels=(channel,))
     return index, r
+
+
+def make_synthetic_repodata(subdir=context.subdir, n_names=200, n_versions=20, conda_format=True):
+    """
+    Build a repodata document shaped like a large real-world channel subdir, with
+    `n_names` packages each having `n_versions` versions.  Every package depends on
+    python and on the previous package name.
+    """
+    packages = {}
+    packages_conda = {}
+    for name_idx in range(n_names):
+        name = "pkg%04d" % name_idx
+        depends = ["python >=3.7,<3.8.0a0", "libgcc-ng >=7.5.0"]
+        if name_idx:
+            depends.append("pkg%04d >=1.0" % (name_idx - 1))
+        for version_idx in range(n_versions):
+            version = "%d.%d.%d" % (1 + version_idx // 10, version_idx % 10, name_idx % 3)
+            build = "py37h%07x_0" % (name_idx * n_versions + version_idx)
+            fn = "%s-%s-%s.tar.bz2" % (name, version, build)
+            info = {
+                "build": build,
+                "build_number": 0,
+                "depends": list(depends),
+                "license": "BSD",
+                "md5": "%032x" % (name_idx * n_versions + version_idx),
+                "name": name,
+                "sha256": "%064x" % (name_idx * n_versions + version_idx),
+                "size": 1024 * (version_idx + 1),
+                "subdir": subdir,
+                "timestamp": 1580000000000 + version_idx,
+                "version": version,
+            }
+            packages[fn] = info
+            if conda_format:
+                packages_conda[fn[:-len(".tar.bz2")] + ".conda"] = dict(info, size=info["size"] // 2)
+    return {
+        "info": {"subdir": subdir},
+        "packages": packages,
+        "packages.conda": packages_conda,
+        "repodata_version": 1,
+    }
+
+
+def write_sharded_repodata(subdir_path, repodata):
+    """
+    Write `repodata` to `subdir_path` both as repodata.json and as a repodata_shards.json
+    index with one content-addressed shard per package name.
+    """
+    from hashlib import sha256
+    subdir_path = str(subdir_path)
+    shards_dir = join(subdir_path, "shards")
+    if not os.path.isdir(shards_dir):
+        os.makedirs(shards_dir)
+    by_name = {}
+    for section in ("packages", "packages.conda"):
+        for fn, info in iteritems(repodata.get(section, {})):
+            by_name.setdefault(info["name"], {"packages": {}, "packages.conda": {}})
+            by_name[info["name"]][section][fn] = info
+    shards = {}
+    track_features = {}
+    for name, shard in iteritems(by_name):
+        data = json.dumps(shard).encode("utf-8")
+        shard_hash = sha256(data).hexdigest()
+        with open(join(shards_dir, shard_hash + ".json"), "wb") as fh:
+            fh.write(data)
+        shards[name] = shard_hash
+        for info in list(itervalues(shard["packages"])) + list(itervalues(shard["packages.conda"])):
+            for feature in (info.get("track_features") or "").replace(",", " ").split():
+                track_features.setdefault(feature, []).append(name)
+    index = {key: value for key, value in iteritems(repodata)
+             if key not in ("packages", "packages.conda")}
+    index["shards"] = shards
+    index["track_features"] = {ftr: sorted(set(names)) for ftr, names in track_features.items()}
+    with open(join(subdir_path, "repodata_shards.json"), "w") as fh:
+        json.dump(index, fh)
+    with open(join(subdir_path, "repodata.json"), "w") as fh:
+        json.dump(repodata, fh)
+
+def make_synthetic_package(directory, name, version="1.0", build="0", payload_size=0,
+                           url_base=None, extension=".tar.bz2"):
+    """
+    Write a minimal .tar.bz2 or .conda package to `directory` and return its PackageRecord.
+    The package holds info/index.json, info/paths.json and `payload_size` bytes of
+    pseudo-random hex text in lib/<name>.txt, which are the same for all builds of a version.
+    The record's url is `url_base` joined with the file name.
+    """
+    from hashlib import md5, sha256
+    from io import BytesIO
+    import random
+    import tarfile
+    import zipfile
+    dist_name = "%s-%s-%s" % (name, version, build)
+    fn = dist_name + extension
+    index_json = {"name": name, "version": version, "build": build, "build_number": 0,
+                  "depends": [], "subdir": "noarch"}
+    # all builds of a version have the same payload
+    rand = random.Random("%s-%s" % (name, version))
+    payload = "".join("%016x\n" % rand.getrandbits(64)
+                      for _ in range(payload_size // 17 + 1))[:payload_size].encode("ascii")
+    payload_path = "lib/%s.txt" % name
+    paths_json = {"paths_version": 1, "paths": [{
+        "_path": payload_path, "path_type": "hardlink",
+        "sha256": sha256(payload).hexdigest(), "size_in_bytes": len(payload),
+    }]}
+    members = (("info/index.json", json.dumps(index_json).encode("utf-8")),
+               ("info/paths.json", json.dumps(paths_json).encode("utf-8")),
+               (payload_path, payload))
+
+    def write_tar(fileobj, mode, members):
+        with tarfile.open(fileobj=fileobj, mode=mode) as tar:
+            for member_name, data in members:
+                member = tarfile.TarInfo(member_name)
+                member.size = len(data)
+                tar.addfile(member, BytesIO(data))
+
+    path = join(str(directory), fn)
+    if extension == ".conda":
+        from conda_package_streaming.package_streaming import zstd
+        with zipfile.ZipFile(path, "w", zipfile.ZIP_STORED) as zf:
+            zf.writestr("metadata.json", json.dumps({"conda_pkg_format_version": 2}))
+            for component, component_members in (("pkg", members[2:]), ("info", members[:2])):
+                tar_data = BytesIO()
+                write_tar(tar_data, "w", component_members)
+                zf.writestr("%s-%s.tar.zst" % (component, dist_name),
+                            zstd.compress(tar_data.getvalue()))
+    else:
+        with open(path, "wb") as fh:
+            write_tar(fh, "w:bz2", members)
+    with open(path, "rb") as fh:
+        data = fh.read()
+    return PackageRecord.from_objects(
+        index_json, fn=fn, url=url_base and "%s/%s" % (url_base, fn),
+        md5=md5(data).hexdigest(), sha256=sha256(data).hexdigest(), size=len(data),
+    )
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2012 Anaconda, Inc
+# SPDX-License-Identifier: BSD-3-Clause
+"""
+A local HTTP server serving a directory, for tests that need a real HTTP channel.
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from collections import defaultdict
+from contextlib import contextmanager
+from functools import partial
+import http.server
+import os
+import re
+import threading
+import time
+
+
+class CountingHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
+    """
+    Serves files like SimpleHTTPRequestHandler, counting requests and bytes per path.  Files
+    are sent with an ETag, and single byte ranges are honored (also with If-Range) unless
+    ``server.support_ranges`` is unset.
+    """
+
+    def copyfile(self, source, outputfile):
+        data = source.read(self.range_length)
+        drop_after = self.server.drop_after.pop(self.path, None)
+        if drop_after is not None:
+            # simulate a dropped connection
+            data = data[:drop_after]
+            self.close_connection = True
+        outputfile.write(data)
+        self.server.bytes_sent[self.path] += len(data)
+
+    def send_head(self):
+        self.server.requests[self.path] += 1
+        self.server.range_requests[self.path].append(self.headers.get("Range"))
+        if self.server.response_delay:
+            time.sleep(self.server.response_delay)
+        path = self.translate_path(self.path)
+        if not os.path.isfile(path):
+            self.range_length = -1
+            return super(CountingHTTPRequestHandler, self).send_head()
+        fh = open(path, "rb")
+        st = os.fstat(fh.fileno())
+        size = st.st_size
+        etag = '"%x-%x"' % (st.st_mtime_ns, size)
+        start, end = 0, size - 1
+        match = re.match(r"bytes=(\d+)-(\d*)$", self.headers.get("Range", ""))
+        if (match and self.server.support_ranges
+                and self.headers.get("If-Range", etag) == etag):
+            start = int(match.group(1))
+            end = min(int(match.group(2) or size - 1), size - 1)
+            if start >= size:
+                fh.close()
+                self.send_response(416)
+                self.send_header("Content-Range", "bytes */%d" % size)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return None
+            self.send_response(206)
+            self.send_header("Content-Range", "bytes %d-%d/%d" % (start, end, size))
+        else:
+            self.send_response(200)
+        self.send_header("Content-type", self.guess_type(path))
+        self.send_header("Content-Length", str(end - start + 1))
+        self.send_header("ETag", etag)
+        if self.server.support_ranges:
+            self.send_header("Accept-Ranges", "bytes")
+        self.end_headers()
+        fh.seek(start)
+        self.range_length = end - start + 1
+        return fh
+
+    def log_message(self, format, *args):
+        pass
+
+
+@contextmanager
+def run_test_server(directory, handler_class=CountingHTTPRequestHandler):
+    """
+    Serve ``directory`` on a random localhost port for the duration of the context.
+
+    Yields the server; ``server.url`` is its base url, and ``server.requests`` and
+    ``server.bytes_sent`` count the requests made and response body bytes sent per path.
+    Setting ``server.response_delay`` (seconds) simulates a slow, remote server.
+    ``server.range_requests`` lists the Range header (or None) of every request per path,
+    ``server.support_ranges = False`` makes the server ignore Range headers, and an entry
+    ``server.drop_after[path] = n`` drops the connection of the next response for path
+    after n body bytes.
+    """
+    handler = partial(handler_class, directory=str(directory))
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    server.requests = defaultdict(int)
+    server.bytes_sent = defaultdict(int)
+    server.response_delay = 0
+    server.range_requests = defaultdict(list)
+    server.support_ranges = True
+    server.drop_after = {}
+    server.url = "http://%s:%d" % server.server_address
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
@@ -1,14 +1,25 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import, division, print_function, unicode_literals
+from functools import partial
+import json
 from logging import getLogger
+from os.path import dirname, join
+from time import time
+import tracemalloc
 from unittest import TestCase
 
+import pytest
+
+from conda._vendor.auxlib.exceptions import ValidationError
 from conda.base.context import context, conda_tests_ctxt_mgmt_def_pol
-from conda.common.compat import text_type
+from conda.common.compat import iteritems, text_type
 from conda.common.io import env_unmodified
 from conda.models.channel import Channel
+from conda.models.match_spec import MatchSpec
 from conda.models.records import PackageRecord, PrefixRecord
 
+from tests.helpers import make_synthetic_repodata
+
 log = getLogger(__name__)
 
 blas_value = 'accelerate' if context.subdir == 'osx-64' else 'openblas'
@@ -73,3 +84,72 @@ class PrefixRecordTests(TestCase):
         )
         assert rec.timestamp == ts_secs
         assert rec.dump()['timestamp'] == ts_millis
+
+
+def _repodata_infos(repodata, channel):
+    for group in ('packages', 'packages.conda'):
+        for fn, info in iteritems(repodata.get(group, {})):
+            yield dict(info, fn=fn, url=channel.base_url + '/' + fn, channel=channel,
+                       schannel=channel.canonical_name)
+
+
+def test_package_record_from_repodata():
+    with open(join(dirname(dirname(__file__)), 'data', 'repodata', 'r_linux-64.json')) as fh:
+        repodata = json.load(fh)
+    channel = Channel('https://conda.anaconda.org/r/linux-64')
+    interned = {}
+    specs = [MatchSpec('r-base >=3.4'), MatchSpec('r::*[track_features=anacondar]'),
+             MatchSpec('mro-base[build_number=0]'), MatchSpec('*[license=GPL-3]')]
+    for info in _repodata_infos(repodata, channel):
+        prec = PackageRecord(**info)
+        compact = PackageRecord.from_repodata(info, interned)
+        assert compact == prec and hash(compact) == hash(prec)
+        assert compact.dump() == prec.dump()
+        assert compact.dist_str() == prec.dist_str()
+        assert compact.record_id() == prec.record_id()
+        assert compact.track_features == prec.track_features
+        assert [spec.match(compact) for spec in specs] == [spec.match(prec) for spec in specs]
+
+    r_bases = [PackageRecord.from_repodata(info, interned)
+               for info in _repodata_infos(repodata, channel) if info['name'] == 'r-base']
+    assert all(prec.name is r_bases[0].name for prec in r_bases)
+    same_depends = [prec for prec in r_bases if prec.depends == r_bases[0].depends]
+    assert len(same_depends) > 1
+    assert all(prec.depends is r_bases[0].depends for prec in same_depends)
+
+    with pytest.raises(ValidationError):
+        PackageRecord.from_repodata(dict(name='a', version='1.0', build_number=0))
+    with pytest.raises(ValidationError):
+        PackageRecord.from_repodata(dict(name='a', version='1.0', build='0', build_number='0'))
+    prec = PackageRecord.from_repodata(dict(name='a', version=1, build_string='0',
+                                            build_number=0, depends=['b'], license=None))
+    assert (prec.version, prec.build, prec.depends, prec.license) == ('1', '0', ('b',), None)
+
+
+@pytest.mark.benchmark
+def test_package_record_from_repodata_benchmark():
+    # records are built from freshly decoded entries, as SubdirData does
+    repodata = make_synthetic_repodata(n_names=600, n_versions=20)
+    raw_entries = [(fn, json.dumps(info)) for group in ('packages', 'packages.conda')
+                   for fn, info in iteritems(repodata[group])]
+    channel = Channel('https://conda.anaconda.org/conda-forge/' + context.subdir)
+    meta = dict(channel=channel, schannel=channel.canonical_name)
+    results = {}
+    for label, make_record in (("PackageRecord(**info)", lambda info: PackageRecord(**info)),
+                               ("from_repodata", partial(PackageRecord.from_repodata,
+                                                         interned={}))):
+        tracemalloc.start()
+        try:
+            start = time()
+            records = [make_record(dict(json.loads(raw), fn=fn, **meta))
+                       for fn, raw in raw_entries]
+            elapsed = time() - start
+            retained = tracemalloc.get_traced_memory()[0]
+        finally:
+            tracemalloc.stop()
+        results[label] = elapsed, retained
+        print("%s: %d records in %.3f s, %.1f MB retained"
+              % (label, len(records), elapsed, retained / 1e6))
+        del records
+    assert results["from_repodata"][0] < results["PackageRecord(**info)"][0]
+    assert results["from_repodata"][1] < results["PackageRecord(**info)"][1]
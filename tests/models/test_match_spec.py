@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+import json
 from unittest import TestCase
 
 from conda._vendor.auxlib.collection import frozendict
@@ -16,7 +17,8 @@ from conda.exceptions import CondaValueError, InvalidMatchSpec, InvalidSpec
 from conda.models.channel import Channel
 from conda.models.dist import Dist
 from conda.models.records import PackageRecord
-from conda.models.match_spec import ChannelMatch, MatchSpec, _parse_spec_str
+from conda.models.match_spec import ChannelMatch, MatchSpec, _PARSE_CACHE, _parse_spec_str, \
+    dump_parsed_spec_strs, load_parsed_spec_strs, parse_spec_strs
 from conda.models.version import VersionSpec
 
 
@@ -117,7 +119,7 @@ class MatchSpecTests(TestCase):
         d = MatchSpec(c, optional=True)
         assert d.optional
         assert not c.optional
-        assert a is not b
+        assert a is b
         assert a is not c
         assert a is not d
         assert a == b
@@ -137,6 +139,35 @@ class MatchSpecTests(TestCase):
         assert c != d
         assert hash(c) != hash(d)
 
+    def test_interned_spec_strs(self):
+        a = MatchSpec('numpy >=1.7,<2')
+        assert MatchSpec('numpy >=1.7,<2') is a
+        assert MatchSpec('numpy >=1.7,<2', optional=True) is not a
+        assert MatchSpec('numpy >=1.7,<2', optional=True).optional
+        assert not a.optional
+        for _ in range(2):
+            with pytest.raises(InvalidSpec):
+                MatchSpec('blas [optional')
+
+        parsed = parse_spec_strs(['numpy >=1.7,<2', 'python 3.8.*', 'numpy >=1.7,<2'])
+        assert len(parsed) == 2
+        assert parsed['numpy >=1.7,<2'] is a
+        assert MatchSpec('python 3.8.*') is parsed['python 3.8.*']
+
+    def test_parsed_spec_strs_roundtrip(self):
+        dumped = json.loads(json.dumps(dump_parsed_spec_strs(['numpy >=1.7,<2', 'mkl@'])))
+        # 'mkl@' parses into a tuple of track_features, which JSON doesn't keep
+        assert list(dumped) == ['numpy >=1.7,<2']
+
+        MatchSpec._INTERN_CACHE.clear()
+        _PARSE_CACHE.clear()
+        load_parsed_spec_strs(dumped)
+        assert _parse_spec_str('numpy >=1.7,<2') is dumped['numpy >=1.7,<2']
+        assert MatchSpec('numpy >=1.7,<2') == MatchSpec('numpy[version=">=1.7,<2"]')
+        # already parsed spec strings are kept
+        load_parsed_spec_strs({'numpy >=1.7,<2': {'name': 'numpy'}})
+        assert _parse_spec_str('numpy >=1.7,<2') is dumped['numpy >=1.7,<2']
+
     # def test_string_mcg1969(self):
     #     a = MatchSpec("foo1 >=1.3 2", optional=True, target="burg")
     #     b = MatchSpec('* [name="foo1", version=">=1.3", build="2"]', optional=True, target="burg")
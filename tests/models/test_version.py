@@ -1,11 +1,18 @@
 from __future__ import absolute_import, print_function
 
 from copy import copy
-from random import shuffle
+from functools import cmp_to_key
+from itertools import product
+import json
+from os.path import dirname, join
+from random import Random, shuffle
+from time import time
 import unittest
 
+from conda.common.compat import string_types, zip_longest
 from conda.exceptions import InvalidVersionSpec
-from conda.models.version import VersionOrder, VersionSpec, normalized_version, ver_eval, treeify
+from conda.models.version import (LRUCache, VersionOrder, VersionSpec,
+                                  normalized_version, ver_eval, treeify, version_cache_info)
 import pytest
 
 
@@ -320,3 +327,139 @@ class TestVersionSpec(unittest.TestCase):
         # We're going to leave the not implemented for now.
         with pytest.raises(InvalidVersionSpec):
             VersionSpec("===3.3.2")
+
+
+def _reference_cmp(vo1, vo2):
+    # the list-walking comparison VersionOrder.sort_key has to agree with
+    for t1, t2 in zip([vo1.version, vo1.local], [vo2.version, vo2.local]):
+        for v1, v2 in zip_longest(t1, t2, fillvalue=[]):
+            for c1, c2 in zip_longest(v1, v2, fillvalue=0):
+                if c1 == c2:
+                    continue
+                elif isinstance(c1, string_types) != isinstance(c2, string_types):
+                    return -1 if isinstance(c1, string_types) else 1
+                return -1 if c1 < c2 else 1
+    return 0
+
+
+def test_version_order_sort_key():
+    rand = Random(1)
+    parts = ('0', '1', '2', '10', 'a', 'b', 'dev', 'post', 'rc', '*')
+    version_strs = set(("1", "1.0", "1.0.0", "1.0.a", "1.0a", "1.0.0.post", "1.0.0.0.1",
+                        "1.0.0.0.a", "1_", "1.1_", "1.0+0", "1.0+0.a", "1!0", "0!1.0.0"))
+    while len(version_strs) < 400:
+        version_str = ".".join("".join(rand.choice(parts) for _ in range(rand.randint(1, 3)))
+                               for _ in range(rand.randint(1, 5)))
+        if rand.random() < 0.2:
+            version_str += "+" + ".".join(rand.choice(parts[:6]) for _ in range(2))
+        version_strs.add(version_str)
+    versions = [VersionOrder(v) for v in sorted(version_strs)]
+    for vo1, vo2 in product(versions, versions):
+        expected = _reference_cmp(vo1, vo2)
+        assert (vo1.sort_key < vo2.sort_key) == (vo1 < vo2) == (expected < 0), (vo1, vo2)
+        assert (vo1.sort_key == vo2.sort_key) == (vo1 == vo2) == (expected == 0), (vo1, vo2)
+
+
+
+def _random_version_str(rand, parts=('0', '1', '2', '10', 'a', 'b', 'dev', 'post', 'rc')):
+    version_str = ".".join("".join(rand.choice(parts) for _ in range(rand.randint(1, 2)))
+                           for _ in range(rand.randint(1, 4)))
+    if rand.random() < 0.1:
+        version_str = rand.choice("01") + "!" + version_str
+    if rand.random() < 0.15:
+        version_str += "+" + ".".join(rand.choice(parts[:6]) for _ in range(2))
+    return version_str
+
+
+def test_version_spec_intervals():
+    rand = Random(2)
+    versions = [_random_version_str(rand) for _ in range(300)]
+    leaves = []
+    for version_str in versions[:150]:
+        leaves.extend(op + version_str for op in ('==', '!=', '<', '<=', '>', '>=', '=', '~='))
+        leaves.extend((version_str + '.*', '!=' + version_str + '.*', version_str))
+    leaves = [VersionSpec(leaf) for leaf in leaves]
+    # ~= without a release prefix raises on match, so it is left uncompiled
+    assert all(leaf.intervals is not None for leaf in leaves
+               if not (leaf.spec.startswith('~=') and '.' not in leaf.spec))
+    leaves = [leaf for leaf in leaves if leaf.intervals is not None]
+    assert VersionSpec("^1.2$").intervals is None
+    assert VersionSpec("1.2@rc").intervals is None
+    assert VersionSpec("*").intervals.is_everything()
+
+    def expected_match(spec, version_str):
+        try:
+            return spec.match(version_str)
+        except InvalidVersionSpec:
+            # e.g. ~=1 has no release prefix to compare with
+            return None
+
+    for leaf in leaves:
+        for version_str in versions:
+            expected = expected_match(leaf, version_str)
+            if expected is not None:
+                assert leaf.intervals.contains(VersionOrder(version_str).sort_key) == expected, (
+                    leaf, version_str)
+
+    for _ in range(300):
+        spec1, spec2 = rand.choice(leaves), rand.choice(leaves)
+        intersection = VersionSpec("%s,%s" % (spec1, spec2))
+        union = VersionSpec("%s|%s" % (spec1, spec2))
+        assert intersection.intervals == spec1.intervals.intersection(spec2.intervals)
+        assert union.intervals == spec1.intervals.union(spec2.intervals)
+        complement = spec1.intervals.complement()
+        assert complement.complement() == spec1.intervals
+        assert complement.intersection(spec1.intervals).is_empty()
+        assert complement.union(spec1.intervals).is_everything()
+        for version_str in versions:
+            match1, match2 = (expected_match(spec1, version_str),
+                              expected_match(spec2, version_str))
+            if match1 is not None and match2 is not None:
+                assert intersection.match(version_str) == (match1 and match2)
+                assert union.match(version_str) == (match1 or match2)
+                key = VersionOrder(version_str).sort_key
+                assert complement.contains(key) == (not match1)
+
+    assert VersionSpec(">=1.2,<1.2").intervals.is_empty()
+    assert VersionSpec("1.2.*,>=1.3").intervals.is_empty()
+    assert VersionSpec(">1.0,<1.0.0|==2").intervals == VersionSpec("2.0").intervals
+    assert not VersionSpec(">=1.2,<=1.2").intervals.is_empty()
+    assert VersionSpec("<1.3|>=1.2").intervals.is_everything()
+    assert VersionSpec("<1.3|>=1.2").match("anything@else")
+
+
+def test_version_caches_are_bounded():
+    cache = LRUCache(maxsize=2)
+    cache['a'] = 1
+    cache['b'] = 2
+    assert cache['a'] == 1
+    cache['c'] = 3
+    assert 'b' not in cache and 'a' in cache and len(cache) == 2
+    with pytest.raises(KeyError):
+        cache['b']
+    assert cache.info() == (1, 1, 2, 2)
+
+    VersionSpec._cache_.clear()
+    VersionSpec(">=1.0,<2")
+    VersionSpec(">=1.0,<2")
+    info = version_cache_info()['VersionSpec']
+    # the combined spec, then each of its parts
+    assert (info.hits, info.misses, info.currsize) == (1, 3, 3)
+
+
+@pytest.mark.benchmark
+def test_version_order_sort_benchmark():
+    with open(join(dirname(dirname(__file__)), 'data', 'repodata', 'r_linux-64.json')) as fh:
+        version_strs = [info['version'] for info in json.load(fh)['packages'].values()]
+    version_strs *= 5
+    Random(0).shuffle(version_strs)
+    timings = {}
+    for label, sort_key in (("reference comparison", cmp_to_key(_reference_cmp)),
+                            ("VersionOrder", None),
+                            ("VersionOrder.sort_key", lambda vo: vo.sort_key)):
+        VersionOrder._cache_.clear()
+        start = time()
+        result = sorted((VersionOrder(v) for v in version_strs), key=sort_key)
+        timings[label] = elapsed = time() - start
+        print("%s: sorted %d versions in %.3f s" % (label, len(result), elapsed))
+    assert timings["VersionOrder.sort_key"] < timings["reference comparison"]
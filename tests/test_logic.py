@@ -2,8 +2,10 @@ from itertools import chain, combinations, permutations, product
 
 import pytest
 
+from conda.common._logic import _ClauseArray, _ClauseList
 from conda.common.compat import iteritems, string_types
-from conda.common.logic import Clauses, FALSE, TRUE, minimal_unsatisfiable_subset
+from conda.common.logic import (Clauses, FALSE, PycoSatSolver, PySatIncrementalSolver, TRUE,
+                                minimal_unsatisfiable_subset)
 from tests.helpers import raises
 
 
@@ -253,6 +255,25 @@ def test_LinearBound():
             assert not(rhs[0] <= my_EVAL(eq2, sol) <= rhs[1]), ('Cneg', Cneg.as_list())
 
 
+@pytest.mark.parametrize("clauses_cls", (_ClauseList, _ClauseArray))
+def test_clause_storage(clauses_cls):
+    clauses = clauses_cls()
+    clauses.append((1, -2))
+    clauses.extend([(3,), (-1, 2, -3)])
+    state = clauses.save_state()
+    clauses.extend(iter([(4, 5), (-5,)]))
+    clauses.append(map(abs, (-6, 7)))
+    assert clauses.get_clause_count() == 6
+    assert [tuple(c) for c in clauses.iter_clauses(2, 4)] == [(-1, 2, -3), (4, 5)]
+    clauses.restore_state(state)
+    assert clauses.get_clause_count() == 3
+    assert list(clauses.as_list()) == [(1, -2), (3,), (-1, 2, -3)]
+    assert list(clauses.as_array()) == [1, -2, 0, 3, 0, -1, 2, -3, 0]
+    # the storage can still grow after the clauses were iterated
+    clauses.append((8,))
+    clauses.restore_state(0)
+    assert clauses.get_clause_count() == 0 and not list(clauses.iter_clauses())
+
 def test_sat():
     C = Clauses()
     C.new_var('x1')
@@ -296,6 +317,26 @@ def test_minimize():
     assert sval == 11
 
 
+def test_minimize_incremental():
+    # Same problems as test_minimize, solved by one live solver that keeps its learned clauses
+    # across the bound passes and the checkpoint/rollback cycles of minimize.
+    pytest.importorskip("pysat")
+    results = []
+    for sat_solver in (PycoSatSolver, PySatIncrementalSolver):
+        C = Clauses(15, sat_solver=sat_solver)
+        C.Require(C.ExactlyOne, range(1, 6))
+        sol, sval = C.minimize([(k, k) for k in range(1, 6)], C.sat())
+        assert sval == 1
+        C.Require(C.ExactlyOne, range(6, 11))
+        sol, sval = C.minimize([(k, k) for k in range(6, 11)], sol)
+        assert sval == 6
+        C.Require(C.ExactlyOne, range(11, 16))
+        sol, sval = C.minimize([(k, k) for k in range(11, 16)])
+        assert sval == 11
+        results.append((sol, [C.sat([(k,)]) for k in range(1, 16)]))
+    assert results[0] == results[1]
+
+
 @pytest.mark.xfail(reason="Broke this with reworking minimal_unsatisfiable_set.  Not sure how to fix.  minimal_unsatisfiable_subset function is otherwise working well.")
 def test_minimal_unsatisfiable_subset():
     def sat(val):
@@ -1,9 +1,12 @@
 from __future__ import absolute_import, print_function
 
 from collections import OrderedDict
+from logging import getLogger
 from os.path import isdir, join
 from pprint import pprint
+from time import time
 import unittest
+from unittest.mock import patch
 
 import pytest
 
@@ -16,7 +19,10 @@ from conda.models.channel import Channel
 from conda.models.enums import PackageType
 from conda.models.records import PackageRecord
 from conda.resolve import MatchSpec, Resolve, ResolvePackageNotFound
-from .helpers import TEST_DATA_DIR, add_subdir, add_subdir_to_iter, get_index_r_1, get_index_r_4, raises
+from .helpers import (TEST_DATA_DIR, add_subdir, add_subdir_to_iter, get_index_r_1, get_index_r_2,
+                      get_index_r_4, raises)
+
+log = getLogger(__name__)
 
 index, r, = get_index_r_1()
 f_mkl = set(['mkl'])
@@ -564,6 +570,44 @@ def test_nonexistent():
     assert raises(ResolvePackageNotFound, lambda: r.install(['numpy 1.5']))
 
 
+def test_find_matches_bitset_index():
+    index4, r4 = get_index_r_4()
+    specs = [
+        'numpy', 'numpy 1.11*', 'numpy >=1.9,<1.12', 'numpy 1.14.0|1.13.3',
+        'numpy[build=py36*]', 'numpy *mkl*', 'numpy[build_number=">=1"]',
+        'python 3.6*', 'python >=2.7.13,<3', 'python[version="3.6.*", build=*_0]',
+        'defaults::numpy', 'pkgs/free::numpy', 'conda-build[md5=deadbeef]',
+        'notarealpackage',
+    ]
+    specs.extend(ms for prec in r4.groups['conda-build'] for ms in r4.ms_depends(prec))
+    for spec in specs:
+        ms = MatchSpec(spec)
+        expected = tuple(prec for prec in r4.groups.get(ms.name, ()) if ms.match(prec))
+        assert r4.find_matches(ms) == expected, ms
+    # matcher bitsets are shared between specs of the same group
+    group_index = r4._get_group_match_index('numpy')
+    assert ('version', MatchSpec('numpy 1.11*').version) in group_index._matcher_bits
+
+
+@pytest.mark.benchmark
+def test_find_matches_bitset_index_benchmark():
+    for getter in (get_index_r_1, get_index_r_2, get_index_r_4):
+        index_, r_ = getter()
+        specs = set(ms for prec in itervalues(index_) for ms in r_.ms_depends(prec)
+                    if ms.get_exact_value('name'))
+        start = time()
+        linear = {ms: tuple(prec for prec in r_.groups.get(ms.name, ()) if ms.match(prec))
+                  for ms in specs}
+        linear_time = time() - start
+        r_ = Resolve(index_, channels=r_.channels)
+        start = time()
+        indexed = {ms: r_.find_matches(ms) for ms in specs}
+        indexed_time = time() - start
+        log.debug("%-14s %5d specs  linear %.3fs  bitset index %.3fs",
+                  getter.__name__, len(specs), linear_time, indexed_time)
+        assert indexed == linear
+
+
 def test_timestamps_and_deps():
     # If timestamp maximization is performed too early in the solve optimization,
     # it will force unnecessary changes to dependencies. Timestamp maximization needs
@@ -2355,3 +2399,57 @@ def test_noarch_preferred_over_arch_when_build_greater_dep():
         if d.name == 'abc':
             assert d.subdir == 'noarch'
             assert d.build_number == 1
+
+
+def _timed_installs(sat_solver, specs_sets):
+    # Solves every set of specs with a fresh Resolve, and returns the solutions, the total
+    # solve time, and the time spent in clause generation and in the SAT backend.
+    from conda.common import _logic
+    timings = {"gen_clauses": 0.0, "sat": 0.0}
+
+    def timed(key, func):
+        def wrapper(*args, **kwargs):
+            start = time()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                timings[key] += time() - start
+        return wrapper
+
+    solutions = []
+    with env_var("CONDA_SAT_SOLVER", sat_solver, stack_callback=conda_tests_ctxt_mgmt_def_pol), \
+            patch.object(Resolve, "gen_clauses", timed("gen_clauses", Resolve.gen_clauses)), \
+            patch.object(_logic.Clauses, "_run_sat", timed("sat", _logic.Clauses._run_sat)):
+        start = time()
+        for specs in specs_sets:
+            solutions.append(Resolve(index, channels=r.channels).install(specs))
+        timings["total"] = time() - start
+    return solutions, timings
+
+
+def test_incremental_sat_solver():
+    pytest.importorskip("pysat")
+    specs_sets = (
+        ['anaconda 1.5.0', 'python 2.7*', 'numpy 1.7*'],
+        ['iopro 1.4*', 'python 2.7*', 'numpy 1.7*'],
+        ['scipy', 'python 3.3*'],
+    )
+    assert _timed_installs("pysat-incremental", specs_sets)[0] == (
+        _timed_installs("pycosat", specs_sets)[0])
+
+
+@pytest.mark.benchmark
+def test_incremental_sat_solver_benchmark():
+    pytest.importorskip("pysat")
+    specs_sets = (
+        ['anaconda 1.5.0 np17py27_0'],
+        ['anaconda 1.4.0 np17py33_0'],
+        ['iopro 1.4*', 'python 2.7*', 'numpy 1.7*'],
+        ['scipy', 'python 3.3*'],
+    ) * 3
+    results = {sat_solver: _timed_installs(sat_solver, specs_sets)
+               for sat_solver in ("pycosat", "pysat", "pysat-incremental")}
+    for sat_solver, (solutions, timings) in iteritems(results):
+        log.debug("%-18s total %.3fs  gen_clauses %.3fs  sat %.3fs",
+                  sat_solver, timings["total"], timings["gen_clauses"], timings["sat"])
+        assert solutions == results["pycosat"][0]